@@ -81,6 +81,42 @@ class ErrorMetrics(db.Model):
         }
 
 
+class ErrorGroup(db.Model):
+    """Model for deduplicated errors, grouped by fingerprint (type + frame)"""
+    __tablename__ = 'error_groups'
+    
+    id = Column(Integer, primary_key=True)
+    fingerprint = Column(String(40), unique=True, nullable=False)
+    error_type = Column(String(100), nullable=False)
+    frame = Column(String(255))
+    error_message = Column(Text, nullable=False)  # First message seen
+    severity = Column(String(20), nullable=False)  # Highest severity seen
+    count = Column(Integer, default=0, nullable=False)
+    first_seen = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_seen = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Indexes for efficient querying
+    __table_args__ = (
+        Index('idx_error_groups_fingerprint', 'fingerprint'),
+        Index('idx_error_groups_last_seen', 'last_seen'),
+        Index('idx_error_groups_error_type', 'error_type'),
+    )
+    
+    def to_dict(self):
+        """Convert error group to dictionary"""
+        return {
+            'id': self.id,
+            'fingerprint': self.fingerprint,
+            'error_type': self.error_type,
+            'frame': self.frame,
+            'error_message': self.error_message,
+            'severity': self.severity,
+            'count': self.count,
+            'first_seen': self.first_seen.isoformat() if self.first_seen else None,
+            'last_seen': self.last_seen.isoformat() if self.last_seen else None
+        }
+
+
 class AlarmRule(db.Model):
     """Model for alarm rules"""
     __tablename__ = 'alarm_rules'
@@ -3,10 +3,12 @@ Alarm system for BDC application monitoring
 """
 import time
 import json
+import uuid
+import random
 import logging
 from typing import Dict, Any, Optional, List, Callable
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import defaultdict, deque
 from enum import Enum
 import threading
 from dataclasses import dataclass
@@ -22,6 +24,134 @@ from backend.app.utils.notifications import send_notification
 logger = logging.getLogger(__name__)
 
 
+LEADER_LOCK_KEY = "alarm:leader"
+EVENT_QUEUE_KEY = "alarm:events"
+
+# Renew the leader lock only if we still own it
+_RENEW_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class MetricWindow:
+    """Streaming aggregates for one metric over a sliding time window
+
+    Samples are folded into fixed-size time buckets holding count, sum, max
+    and a bounded reservoir sample used for percentiles, so memory stays
+    constant regardless of the event rate.
+    """
+
+    def __init__(self, retention: int = 3600, bucket_seconds: int = 10,
+                 reservoir_size: int = 64):
+        self.retention = retention
+        self.bucket_seconds = bucket_seconds
+        self.reservoir_size = reservoir_size
+        self._buckets: deque = deque()
+        self._lock = threading.Lock()
+
+    def add(self, value: float, timestamp: Optional[float] = None):
+        """Record one sample"""
+        timestamp = timestamp or time.time()
+        start = int(timestamp // self.bucket_seconds) * self.bucket_seconds
+
+        with self._lock:
+            bucket = self._find_bucket(start)
+            if bucket is None:
+                return
+            bucket['count'] += 1
+            bucket['sum'] += value
+            bucket['max'] = max(bucket['max'], value)
+            bucket['min'] = min(bucket['min'], value)
+            bucket['last'] = value
+
+            samples = bucket['samples']
+            if len(samples) < self.reservoir_size:
+                samples.append(value)
+            else:
+                slot = random.randrange(bucket['count'])
+                if slot < self.reservoir_size:
+                    samples[slot] = value
+
+    def _find_bucket(self, start: int) -> Optional[Dict[str, Any]]:
+        """Return the bucket starting at ``start``, creating it if needed"""
+        newest = self._buckets[-1]['start'] if self._buckets else start
+        if start <= newest - self.retention:
+            return None  # Too old to matter
+
+        # Samples nearly always land in the newest bucket; late ones scan back
+        index = len(self._buckets)
+        while index > 0 and self._buckets[index - 1]['start'] > start:
+            index -= 1
+        if index > 0 and self._buckets[index - 1]['start'] == start:
+            return self._buckets[index - 1]
+
+        bucket = {'start': start, 'count': 0, 'sum': 0.0, 'max': float('-inf'),
+                  'min': float('inf'), 'last': None, 'samples': []}
+        self._buckets.insert(index, bucket)
+        while self._buckets[0]['start'] <= self._buckets[-1]['start'] - self.retention:
+            self._buckets.popleft()
+        return bucket
+
+    def aggregate(self, aggregation: str, window: int,
+                  now: Optional[float] = None) -> Optional[float]:
+        """Aggregate samples from the last ``window`` seconds
+
+        Supports avg, sum, count, min, max, last and percentiles such as p95.
+        Returns None when the window holds no samples.
+        """
+        now = now or time.time()
+        cutoff = now - window
+
+        with self._lock:
+            buckets = [b for b in self._buckets if b['start'] + self.bucket_seconds > cutoff]
+            if not buckets:
+                return None
+
+            if aggregation == 'count':
+                return float(sum(b['count'] for b in buckets))
+            if aggregation == 'sum':
+                return sum(b['sum'] for b in buckets)
+            if aggregation == 'avg':
+                return sum(b['sum'] for b in buckets) / sum(b['count'] for b in buckets)
+            if aggregation == 'max':
+                return max(b['max'] for b in buckets)
+            if aggregation == 'min':
+                return min(b['min'] for b in buckets)
+            if aggregation == 'last':
+                return buckets[-1]['last']
+            if aggregation.startswith('p'):
+                # Each reservoir sample stands for count / len(samples) events
+                weighted = [
+                    (value, b['count'] / len(b['samples']))
+                    for b in buckets for value in b['samples']
+                ]
+                return self._percentile(weighted, float(aggregation[1:]))
+
+        raise ValueError(f"Unknown aggregation: {aggregation}")
+
+    @staticmethod
+    def _percentile(weighted: List[tuple], percentile: float) -> float:
+        """Weighted nearest-rank percentile"""
+        weighted.sort(key=lambda item: item[0])
+        target = sum(weight for _, weight in weighted) * percentile / 100
+        cumulative = 0.0
+        for value, weight in weighted:
+            cumulative += weight
+            if cumulative >= target:
+                return value
+        return weighted[-1][0]
+
+
 class AlarmSeverity(Enum):
     """Alarm severity levels"""
     INFO = "info"
@@ -52,6 +182,8 @@ class AlarmRule:
     notification_channels: List[str]
     enabled: bool = True
     metadata: Dict[str, Any] = None
+    aggregation: str = "last"  # last, avg, sum, count, min, max, p50, p95, p99
+    window: int = 0  # seconds to aggregate over; 0 uses the latest value
 
 
 class AlarmSystem:
@@ -69,8 +201,12 @@ class AlarmSystem:
         self.active_alarms: Dict[str, Dict[str, Any]] = {}
         self.alarm_history: List[Dict[str, Any]] = []
         
-        # Metric evaluators
-        self.metric_evaluators: Dict[str, Callable] = {}
+        # Streaming metric state shared by all rules
+        self.metric_windows: Dict[str, MetricWindow] = defaultdict(MetricWindow)
+        self.latest_values: Dict[str, float] = {}
+        self._dirty_metrics: set = set()
+        self._outbox: deque = deque(maxlen=10000)
+        self._metrics_lock = threading.Lock()
         
         # Notification handlers
         self.notification_handlers: Dict[str, Callable] = {
@@ -83,8 +219,14 @@ class AlarmSystem:
         # Background monitoring
         self._monitoring_thread = None
         self._stop_monitoring = threading.Event()
+        self._wakeup = threading.Event()
         self._lock = threading.Lock()
         
+        # Leader election among worker processes
+        self._leader_token = uuid.uuid4().hex
+        self._is_leader = False
+        self._leader_checked_at = 0.0
+        
         if app:
             self.init_app(app, redis_client, db_session)
     
@@ -94,12 +236,13 @@ class AlarmSystem:
         self.redis_client = redis_client
         self.db_session = db_session
         
+        self.evaluation_interval = app.config.get('ALARM_EVALUATION_INTERVAL', 30)
+        self.event_flush_interval = app.config.get('ALARM_EVENT_FLUSH_INTERVAL', 0.5)
+        self.leader_ttl = app.config.get('ALARM_LEADER_TTL', 90)
+        
         # Load alarm rules from configuration
         self._load_alarm_rules()
         
-        # Register metric evaluators
-        self._register_metric_evaluators()
-        
         # Start monitoring
         self.start_monitoring()
     
@@ -116,18 +259,22 @@ class AlarmSystem:
                 severity=AlarmSeverity.ERROR,
                 duration=300,  # 5 minutes
                 cooldown=900,  # 15 minutes
-                notification_channels=["email", "slack"]
+                notification_channels=["email", "slack"],
+                aggregation="avg",
+                window=300
             ),
             AlarmRule(
                 name="high_response_time",
-                description="High average response time",
+                description="High p95 response time",
                 metric_type="response_time",
                 threshold_value=1000,  # 1 second
                 operator="gt",
                 severity=AlarmSeverity.WARNING,
                 duration=300,
                 cooldown=600,
-                notification_channels=["slack"]
+                notification_channels=["slack"],
+                aggregation="p95",
+                window=300
             ),
             AlarmRule(
                 name="high_cpu_usage",
@@ -193,17 +340,6 @@ class AlarmSystem:
             if rule.name not in self.rules:
                 self.rules[rule.name] = rule
     
-    def _register_metric_evaluators(self):
-        """Register metric evaluation functions"""
-        self.metric_evaluators = {
-            'error_rate': self._evaluate_error_rate,
-            'response_time': self._evaluate_response_time,
-            'cpu_percent': self._evaluate_cpu_percent,
-            'memory_percent': self._evaluate_memory_percent,
-            'disk_free_percent': self._evaluate_disk_free_percent,
-            'db_connection_errors': self._evaluate_db_errors
-        }
-    
     def add_rule(self, rule: AlarmRule):
         """Add or update an alarm rule"""
         with self._lock:
@@ -246,34 +382,103 @@ class AlarmSystem:
                     except Exception as e:
                         logger.error(f"Failed to remove alarm rule: {str(e)}")
     
-    def evaluate_metrics(self):
-        """Evaluate all metrics against alarm rules"""
+    def collect_snapshot(self) -> Dict[str, float]:
+        """Sample every polled metric once for this evaluation tick"""
+        snapshot = {}
+        collector = getattr(self.app, 'performance_collector', None)
+        
+        if collector:
+            system = self._latest_system_metrics(collector)
+            if system:
+                snapshot['cpu_percent'] = system.get('cpu', {}).get('percent', 0)
+                snapshot['memory_percent'] = system.get('memory', {}).get('percent', 0)
+                disk = system.get('disk', {})
+                if disk.get('total', 0) > 0:
+                    snapshot['disk_free_percent'] = (disk.get('free', 0) / disk['total']) * 100
+        
+        if self.redis_client:
+            try:
+                count = self.redis_client.get("metrics:db_errors:count")
+                snapshot['db_connection_errors'] = int(count) if count else 0
+            except redis.RedisError as e:
+                logger.error(f"Failed to read database error count: {str(e)}")
+        
+        now = time.time()
+        for metric_type, value in snapshot.items():
+            self._record(metric_type, value, now)
+        
+        return snapshot
+    
+    def _latest_system_metrics(self, collector) -> Dict[str, Any]:
+        """Reuse the collector's latest sample when fresh, otherwise take one"""
+        if collector.system_metrics:
+            latest = collector.system_metrics[-1]
+            if time.time() - latest.get('timestamp', 0) < self.evaluation_interval:
+                return latest
+        return collector.collect_system_metrics()
+    
+    def push_metric(self, metric_type: str, value: float,
+                    timestamp: Optional[float] = None):
+        """Feed a metric event into the alarm engine
+        
+        Cheap enough to call per request. On the leader the affected rules
+        are re-evaluated within a fraction of a second; followers forward
+        events to the leader through Redis in small batches.
+        """
+        timestamp = timestamp or time.time()
+        
+        if self._is_leader or not self.redis_client:
+            self._record(metric_type, value, timestamp)
+            with self._metrics_lock:
+                self._dirty_metrics.add(metric_type)
+            self._wakeup.set()
+        else:
+            self._outbox.append((metric_type, value, timestamp))
+    
+    def _record(self, metric_type: str, value: float, timestamp: float):
+        """Add a sample to the metric's window and latest value"""
+        self.metric_windows[metric_type].add(value, timestamp)
+        with self._metrics_lock:
+            self.latest_values[metric_type] = value
+    
+    def _rule_value(self, rule: AlarmRule, now: float) -> Optional[float]:
+        """Resolve the value a rule is compared against"""
+        if rule.window:
+            window = self.metric_windows.get(rule.metric_type)
+            if window is None:
+                return None
+            return window.aggregate(rule.aggregation, rule.window, now)
+        with self._metrics_lock:
+            return self.latest_values.get(rule.metric_type)
+    
+    def evaluate_metrics(self, metric_types: Optional[set] = None):
+        """Evaluate alarm rules against the current metric state
+        
+        Args:
+            metric_types: Only evaluate rules for these metrics (pushed
+                events); None evaluates every rule
+        """
         with self._lock:
             current_time = time.time()
             
             for rule_name, rule in self.rules.items():
                 if not rule.enabled:
                     continue
-                
-                # Get metric evaluator
-                evaluator = self.metric_evaluators.get(rule.metric_type)
-                if not evaluator:
-                    logger.warning(f"No evaluator for metric type: {rule.metric_type}")
+                if metric_types is not None and rule.metric_type not in metric_types:
                     continue
                 
-                # Evaluate metric
                 try:
-                    metric_value = evaluator()
+                    metric_value = self._rule_value(rule, current_time)
                     
-                    # Check threshold
-                    triggered = self._check_threshold(
+                    # No samples means nothing to alarm on
+                    triggered = metric_value is not None and self._check_threshold(
                         metric_value,
                         rule.threshold_value,
                         rule.operator
                     )
                     
                     # Handle alarm state
-                    self._handle_alarm_state(rule, triggered, metric_value, current_time)
+                    self._handle_alarm_state(rule, triggered, metric_value or 0, current_time)
                     
                 except Exception as e:
                     logger.error(f"Error evaluating metric {rule.metric_type}: {str(e)}")
@@ -445,52 +650,6 @@ class AlarmSystem:
             except Exception as e:
                 logger.error(f"Failed to store alarm history: {str(e)}")
     
-    # Metric evaluation functions
-    def _evaluate_error_rate(self) -> float:
-        """Evaluate application error rate"""
-        if hasattr(self.app, 'performance_collector'):
-            summary = self.app.performance_collector.get_performance_summary(hours=1)
-            return summary.get('error_rate', 0)
-        return 0
-    
-    def _evaluate_response_time(self) -> float:
-        """Evaluate average response time"""
-        if hasattr(self.app, 'performance_collector'):
-            summary = self.app.performance_collector.get_performance_summary(hours=1)
-            return summary.get('average_response_time', 0)
-        return 0
-    
-    def _evaluate_cpu_percent(self) -> float:
-        """Evaluate CPU usage percentage"""
-        if hasattr(self.app, 'performance_collector'):
-            metrics = self.app.performance_collector.collect_system_metrics()
-            return metrics.get('cpu', {}).get('percent', 0)
-        return 0
-    
-    def _evaluate_memory_percent(self) -> float:
-        """Evaluate memory usage percentage"""
-        if hasattr(self.app, 'performance_collector'):
-            metrics = self.app.performance_collector.collect_system_metrics()
-            return metrics.get('memory', {}).get('percent', 0)
-        return 0
-    
-    def _evaluate_disk_free_percent(self) -> float:
-        """Evaluate free disk space percentage"""
-        if hasattr(self.app, 'performance_collector'):
-            metrics = self.app.performance_collector.collect_system_metrics()
-            disk = metrics.get('disk', {})
-            if disk.get('total', 0) > 0:
-                return (disk.get('free', 0) / disk.get('total', 1)) * 100
-        return 100
-    
-    def _evaluate_db_errors(self) -> int:
-        """Evaluate database connection errors"""
-        if self.redis_client:
-            error_key = "metrics:db_errors:count"
-            count = self.redis_client.get(error_key)
-            return int(count) if count else 0
-        return 0
-    
     # Notification handlers
     def _send_email_notification(self, data: Dict[str, Any]):
         """Send email notification"""
@@ -736,21 +895,134 @@ class AlarmSystem:
     def stop_monitoring(self):
         """Stop alarm monitoring"""
         self._stop_monitoring.set()
+        self._wakeup.set()
         if self._monitoring_thread:
             self._monitoring_thread.join(timeout=5)
+        self._release_leadership()
+    
+    def _check_leadership(self) -> bool:
+        """Acquire or renew the Redis leader lock
+        
+        Only the leader evaluates rules, so alarms fire once no matter how
+        many worker processes run. Without Redis every process is a leader.
+        """
+        if not self.redis_client:
+            self._is_leader = True
+            return True
+        
+        ttl_ms = int(self.leader_ttl * 1000)
+        try:
+            if self._is_leader:
+                self._is_leader = bool(self.redis_client.eval(
+                    _RENEW_LOCK_SCRIPT, 1, LEADER_LOCK_KEY, self._leader_token, ttl_ms
+                ))
+            if not self._is_leader:
+                self._is_leader = bool(self.redis_client.set(
+                    LEADER_LOCK_KEY, self._leader_token, nx=True, px=ttl_ms
+                ))
+        except redis.RedisError as e:
+            logger.error(f"Alarm leader election failed: {str(e)}")
+            self._is_leader = False
+        
+        self._leader_checked_at = time.time()
+        return self._is_leader
+    
+    def _release_leadership(self):
+        """Give up the leader lock so another worker can take over"""
+        if self.redis_client and self._is_leader:
+            try:
+                self.redis_client.eval(
+                    _RELEASE_LOCK_SCRIPT, 1, LEADER_LOCK_KEY, self._leader_token
+                )
+            except redis.RedisError as e:
+                logger.error(f"Failed to release alarm leader lock: {str(e)}")
+        self._is_leader = False
+    
+    def _flush_events(self):
+        """Forward buffered events to the leader in one round trip"""
+        if not self._outbox:
+            return
+        
+        events = []
+        while self._outbox:
+            metric_type, value, timestamp = self._outbox.popleft()
+            events.append(json.dumps({'metric': metric_type, 'value': value, 'timestamp': timestamp}))
+        
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.rpush(EVENT_QUEUE_KEY, *events)
+            pipe.ltrim(EVENT_QUEUE_KEY, -10000, -1)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.error(f"Failed to forward alarm events: {str(e)}")
+    
+    def _drain_events(self, batch_size: int = 1000):
+        """Pull events forwarded by followers into the local windows"""
+        if not self.redis_client:
+            return
+        
+        try:
+            pipe = self.redis_client.pipeline()
+            pipe.lrange(EVENT_QUEUE_KEY, 0, batch_size - 1)
+            pipe.ltrim(EVENT_QUEUE_KEY, batch_size, -1)
+            raw_events, _ = pipe.execute()
+        except redis.RedisError as e:
+            logger.error(f"Failed to read alarm events: {str(e)}")
+            return
+        
+        for raw in raw_events:
+            try:
+                event = json.loads(raw)
+                self._record(event['metric'], float(event['value']), event['timestamp'])
+            except (ValueError, KeyError, TypeError):
+                continue
+            with self._metrics_lock:
+                self._dirty_metrics.add(event['metric'])
     
     def _monitor_loop(self):
-        """Background monitoring loop"""
+        """Background monitoring loop
+        
+        The leader takes one snapshot and evaluates every rule per tick, and
+        between ticks re-evaluates only the rules whose metrics received
+        events. Followers just forward their events and wait for leadership.
+        """
+        next_tick = 0.0
+        
         while not self._stop_monitoring.is_set():
             try:
-                # Evaluate all metrics
-                self.evaluate_metrics()
+                now = time.time()
+                if now - self._leader_checked_at >= self.leader_ttl / 3:
+                    was_leader = self._is_leader
+                    if self._check_leadership() and not was_leader:
+                        logger.info("Alarm system acquired leadership")
+                        next_tick = 0.0
+                
+                if not self._is_leader:
+                    self._flush_events()
+                    self._stop_monitoring.wait(self.event_flush_interval)
+                    continue
+                
+                self._drain_events()
+                
+                if now >= next_tick:
+                    self.collect_snapshot()
+                    with self._metrics_lock:
+                        self._dirty_metrics.clear()
+                    self.evaluate_metrics()
+                    next_tick = now + self.evaluation_interval
+                else:
+                    with self._metrics_lock:
+                        dirty, self._dirty_metrics = self._dirty_metrics, set()
+                    if dirty:
+                        self.evaluate_metrics(dirty)
                 
-                # Sleep for interval
-                self._stop_monitoring.wait(30)  # Check every 30 seconds
+                # Sleep until the next tick, a local event, or the next queue poll
+                self._wakeup.wait(min(self.event_flush_interval, max(next_tick - time.time(), 0)))
+                self._wakeup.clear()
                 
             except Exception as e:
                 logger.error(f"Error in alarm monitoring loop: {str(e)}")
+                self._stop_monitoring.wait(self.event_flush_interval)
 
 
 def init_alarm_system(app: Flask, redis_client: redis.Redis, db_session: sessionmaker):
@@ -4,11 +4,13 @@ Error tracking system for BDC application
 import os
 import json
 import time
+import queue
+import hashlib
 import logging
 import traceback
 from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import defaultdict, deque
 import threading
 from functools import wraps
 
@@ -16,16 +18,70 @@ from flask import Flask, request, g
 from flask_sqlalchemy import SQLAlchemy
 import redis
 from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 
-from backend.app.models.monitoring import ErrorLog, ErrorMetrics
+from backend.app.models.monitoring import ErrorLog, ErrorMetrics, ErrorGroup
 from backend.app.utils.security import sanitize_sensitive_data
 
 
 logger = logging.getLogger(__name__)
 
 
+SEVERITY_RANK = {'info': 0, 'warning': 1, 'error': 2, 'critical': 3}
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _utc_seconds(timestamp: datetime) -> float:
+    """Epoch seconds for a naive UTC datetime"""
+    return (timestamp - _EPOCH).total_seconds()
+
+
+class SlidingWindowCounter:
+    """Fixed-memory event counter over a sliding time window.
+    
+    Events are counted into a ring of time buckets; counting the last N
+    seconds sums at most ``window / bucket_seconds`` buckets regardless of
+    how many events occurred.
+    """
+    
+    def __init__(self, window_seconds: int = 3600, bucket_seconds: int = 10):
+        self.bucket_seconds = bucket_seconds
+        self.size = window_seconds // bucket_seconds + 1
+        self.counts = [0] * self.size
+        self.bucket_ids = [-1] * self.size
+    
+    def add(self, timestamp: float, count: int = 1):
+        """Record ``count`` events at ``timestamp`` (epoch seconds)"""
+        bucket_id = int(timestamp // self.bucket_seconds)
+        index = bucket_id % self.size
+        if self.bucket_ids[index] != bucket_id:
+            self.bucket_ids[index] = bucket_id
+            self.counts[index] = 0
+        self.counts[index] += count
+    
+    def count(self, window_seconds: int, now: Optional[float] = None) -> int:
+        """Count events in the last ``window_seconds``"""
+        now = time.time() if now is None else now
+        newest = int(now // self.bucket_seconds)
+        span = min(max(window_seconds // self.bucket_seconds, 1), self.size)
+        oldest = newest - span + 1
+        return sum(
+            count for bucket_id, count in zip(self.bucket_ids, self.counts)
+            if oldest <= bucket_id <= newest
+        )
+
+
 class ErrorTracker:
-    """Central error tracking system"""
+    """Central error tracking system
+    
+    ``track_error`` only captures the error and enqueues it; a background
+    writer drains the queue in batches, groups duplicates by fingerprint and
+    persists them with one DB transaction and one Redis pipeline per batch.
+    When the queue is full new errors are counted as dropped rather than
+    blocking the request. With ``ERROR_TRACKING_SYNC`` (the default under
+    ``TESTING``) no writer thread runs and each error is written immediately.
+    """
     
     def __init__(self, app: Optional[Flask] = None, 
                  db: Optional[SQLAlchemy] = None,
@@ -34,14 +90,25 @@ class ErrorTracker:
         self.db = db
         self.redis_client = redis_client
         self.error_counts = defaultdict(int)
-        self.error_history = []
-        self.error_patterns = defaultdict(list)
+        self.error_history = deque(maxlen=1000)
+        self.error_patterns = defaultdict(SlidingWindowCounter)
         self.alert_thresholds = {
             'critical': {'count': 5, 'window': 300},  # 5 errors in 5 minutes
             'warning': {'count': 20, 'window': 3600},  # 20 errors in 1 hour
         }
+        self._last_alerts = {}
         self._lock = threading.Lock()
         
+        # Asynchronous ingestion
+        self.queue_size = 10000
+        self.batch_size = 200
+        self.flush_interval = 1.0
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self.dropped_errors = 0
+        self.synchronous = False
+        self._writer_thread = None
+        self._stop_writer = threading.Event()
+        
         if app:
             self.init_app(app, db, redis_client)
     
@@ -51,6 +118,12 @@ class ErrorTracker:
         self.db = db
         self.redis_client = redis_client
         
+        self.queue_size = app.config.get('ERROR_TRACKING_QUEUE_SIZE', self.queue_size)
+        self.batch_size = app.config.get('ERROR_TRACKING_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('ERROR_TRACKING_FLUSH_INTERVAL', self.flush_interval)
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self.synchronous = app.config.get('ERROR_TRACKING_SYNC', app.config.get('TESTING', False))
+        
         # Register error handlers
         app.register_error_handler(Exception, self.handle_exception)
         app.register_error_handler(404, self.handle_404)
@@ -59,6 +132,9 @@ class ErrorTracker:
         # Add before_request and teardown handlers
         app.before_request(self.before_request)
         app.teardown_appcontext(self.teardown_request)
+        
+        if not self.synchronous:
+            self.start_writer()
     
     def before_request(self):
         """Initialize request tracking"""
@@ -112,122 +188,317 @@ class ErrorTracker:
     
     def track_error(self, error: Exception, severity: str = 'error', 
                    context: Optional[Dict[str, Any]] = None):
-        """Track an error occurrence"""
+        """Capture an error and hand it to the background writer"""
         try:
-            with self._lock:
-                # Extract error information
-                error_type = type(error).__name__
-                error_message = str(error)
-                error_traceback = traceback.format_exc()
-                
-                # Sanitize sensitive data
-                error_message = sanitize_sensitive_data(error_message)
-                
-                # Get request context
-                request_context = self._get_request_context()
+            # Extract error information
+            error_type = type(error).__name__
+            error_message = str(error)
+            error_traceback = ''.join(traceback.format_exception(
+                type(error), error, error.__traceback__
+            ))
+            frame = self._get_error_frame(error)
+            
+            # Sanitize sensitive data
+            error_message = sanitize_sensitive_data(error_message)
+            
+            # Get request context
+            request_context = self._get_request_context()
+            
+            # Combine contexts
+            full_context = {
+                **request_context,
+                **(context or {})
+            }
+            
+            # Create error record
+            error_record = {
+                'timestamp': datetime.utcnow(),
+                'error_type': error_type,
+                'error_message': error_message,
+                'traceback': error_traceback,
+                'severity': severity,
+                'context': full_context,
+                'request_id': getattr(g, 'request_id', None),
+                'user_id': self._get_current_user_id(),
+                'frame': frame,
+                'fingerprint': self._fingerprint(error_type, frame)
+            }
+            
+            try:
+                self._queue.put_nowait(error_record)
+            except queue.Full:
+                with self._lock:
+                    self.dropped_errors += 1
+            
+            if self.synchronous:
+                self.flush()
                 
-                # Combine contexts
-                full_context = {
-                    **request_context,
-                    **(context or {})
+        except Exception as e:
+            # Don't let error tracking errors break the app
+            logger.error(f"Error in error tracking: {str(e)}", exc_info=True)
+    
+    @staticmethod
+    def _get_error_frame(error: Exception) -> str:
+        """Return 'file:function' of the frame that raised the error"""
+        tb = error.__traceback__
+        if tb is None:
+            return ''
+        while tb.tb_next is not None:
+            tb = tb.tb_next
+        code = tb.tb_frame.f_code
+        return f"{code.co_filename}:{code.co_name}"[-255:]
+    
+    @staticmethod
+    def _fingerprint(error_type: str, frame: str) -> str:
+        """Group key for duplicate errors: same type raised from the same frame"""
+        return hashlib.sha1(f"{error_type}|{frame}".encode('utf-8')).hexdigest()
+    
+    def start_writer(self):
+        """Start the background writer thread"""
+        if self._writer_thread is None:
+            self._stop_writer.clear()
+            self._writer_thread = threading.Thread(
+                target=self._writer_loop,
+                name='error-tracker-writer',
+                daemon=True
+            )
+            self._writer_thread.start()
+    
+    def stop_writer(self):
+        """Stop the background writer, flushing queued errors"""
+        self._stop_writer.set()
+        if self._writer_thread:
+            self._writer_thread.join(timeout=5)
+            self._writer_thread = None
+        self.flush()
+    
+    def _writer_loop(self):
+        """Background loop draining the error queue in batches"""
+        while not self._stop_writer.is_set():
+            try:
+                batch = self._next_batch(timeout=self.flush_interval)
+                if batch:
+                    self._process_batch(batch)
+            except Exception as e:
+                logger.error(f"Error in error tracking writer: {str(e)}")
+    
+    def _next_batch(self, timeout: float) -> List[Dict[str, Any]]:
+        """Collect up to ``batch_size`` records, waiting at most ``timeout``"""
+        batch = []
+        deadline = time.monotonic() + timeout
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def flush(self):
+        """Synchronously process everything currently queued"""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._process_batch(batch)
+    
+    def _process_batch(self, batch: List[Dict[str, Any]]):
+        """Aggregate a batch by fingerprint and persist it"""
+        groups = {}
+        for record in batch:
+            group = groups.get(record['fingerprint'])
+            if group is None:
+                groups[record['fingerprint']] = {
+                    'sample': record,
+                    'count': 1,
+                    'severity': record['severity'],
+                    'first_seen': record['timestamp'],
+                    'last_seen': record['timestamp']
                 }
-                
-                # Create error record
-                error_record = {
-                    'timestamp': datetime.utcnow(),
-                    'error_type': error_type,
-                    'error_message': error_message,
-                    'traceback': error_traceback,
-                    'severity': severity,
-                    'context': full_context,
-                    'request_id': getattr(g, 'request_id', None),
-                    'user_id': self._get_current_user_id()
+                continue
+            group['count'] += 1
+            group['last_seen'] = max(group['last_seen'], record['timestamp'])
+            if SEVERITY_RANK.get(record['severity'], 0) > SEVERITY_RANK.get(group['severity'], 0):
+                group['severity'] = record['severity']
+        
+        # Update in-memory metrics
+        self._update_error_metrics(batch)
+        
+        # Store in database
+        if self.db:
+            self._store_errors_db(groups, batch)
+        
+        # Store in Redis for real-time analysis
+        if self.redis_client:
+            self._store_errors_redis(groups)
+        
+        # Check for alert conditions
+        for error_type, severity in {(r['error_type'], r['severity']) for r in batch}:
+            self._check_alerts({'error_type': error_type, 'severity': severity})
+        
+        for group in groups.values():
+            sample = group['sample']
+            logger.error(
+                f"Error tracked: {sample['error_type']} - {sample['error_message']} "
+                f"(x{group['count']})",
+                extra={'error_record': sample}
+            )
+    
+    def _store_errors_db(self, groups: Dict[str, Dict[str, Any]], batch: List[Dict[str, Any]]):
+        """Upsert error groups, one sample log per group and hourly counters
+        in a single transaction"""
+        if not self.app:
+            return
+        
+        with self.app.app_context():
+            try:
+                existing = {
+                    group.fingerprint: group
+                    for group in ErrorGroup.query.filter(
+                        ErrorGroup.fingerprint.in_(list(groups))
+                    ).all()
                 }
                 
-                # Store in database
-                if self.db:
-                    self._store_error_db(error_record)
-                
-                # Store in Redis for real-time analysis
-                if self.redis_client:
-                    self._store_error_redis(error_record)
-                
-                # Update in-memory metrics
-                self._update_error_metrics(error_record)
+                for fingerprint, data in groups.items():
+                    sample = data['sample']
+                    group = existing.get(fingerprint)
+                    if group is None:
+                        group = self._insert_group(fingerprint, data)
+                    if group is not None:
+                        group.count = ErrorGroup.count + data['count']
+                        group.last_seen = max(group.last_seen, data['last_seen'])
+                        if SEVERITY_RANK.get(data['severity'], 0) > SEVERITY_RANK.get(group.severity, 0):
+                            group.severity = data['severity']
+                    
+                    # Keep one full occurrence per group per batch for debugging
+                    self.db.session.add(ErrorLog(
+                        timestamp=sample['timestamp'],
+                        error_type=sample['error_type'],
+                        error_message=sample['error_message'],
+                        traceback=sample['traceback'],
+                        severity=sample['severity'],
+                        context=json.dumps(sample['context']),
+                        request_id=sample['request_id'],
+                        user_id=sample['user_id']
+                    ))
                 
-                # Check for alert conditions
-                self._check_alerts(error_record)
+                self._store_hourly_metrics(batch)
+                self.db.session.commit()
                 
-                # Log the error
-                logger.error(
-                    f"Error tracked: {error_type} - {error_message}",
-                    extra={'error_record': error_record}
-                )
-                
-        except Exception as e:
-            # Don't let error tracking errors break the app
-            logger.error(f"Error in error tracking: {str(e)}", exc_info=True)
+            except Exception as e:
+                logger.error(f"Failed to store errors in database: {str(e)}")
+                self.db.session.rollback()
     
-    def _store_error_db(self, error_record: Dict[str, Any]):
-        """Store error in database"""
+    def _insert_group(self, fingerprint: str, data: Dict[str, Any]) -> Optional[ErrorGroup]:
+        """Insert a new error group in a savepoint
+        
+        Returns None once inserted, or the existing group if another worker
+        inserted the same fingerprint first (its counts are then added to it).
+        """
+        sample = data['sample']
         try:
-            error_log = ErrorLog(
-                timestamp=error_record['timestamp'],
-                error_type=error_record['error_type'],
-                error_message=error_record['error_message'],
-                traceback=error_record['traceback'],
-                severity=error_record['severity'],
-                context=json.dumps(error_record['context']),
-                request_id=error_record['request_id'],
-                user_id=error_record['user_id']
-            )
-            
-            self.db.session.add(error_log)
-            self.db.session.commit()
-            
-        except Exception as e:
-            logger.error(f"Failed to store error in database: {str(e)}")
-            self.db.session.rollback()
+            with self.db.session.begin_nested():
+                self.db.session.add(ErrorGroup(
+                    fingerprint=fingerprint,
+                    error_type=sample['error_type'],
+                    frame=sample['frame'],
+                    error_message=sample['error_message'],
+                    severity=data['severity'],
+                    count=data['count'],
+                    first_seen=data['first_seen'],
+                    last_seen=data['last_seen']
+                ))
+            return None
+        except IntegrityError:
+            return ErrorGroup.query.filter_by(fingerprint=fingerprint).one()
     
-    def _store_error_redis(self, error_record: Dict[str, Any]):
-        """Store error in Redis for real-time analysis"""
+    def _store_hourly_metrics(self, batch: List[Dict[str, Any]]):
+        """Add batch counts to hourly ErrorMetrics rows"""
+        hourly = defaultdict(int)
+        for record in batch:
+            hour = record['timestamp'].replace(minute=0, second=0, microsecond=0)
+            hourly[(hour, record['error_type'], record['severity'])] += 1
+        
+        hours = {key[0] for key in hourly}
+        existing = {
+            (metric.timestamp, metric.error_type, metric.severity): metric
+            for metric in ErrorMetrics.query.filter(
+                ErrorMetrics.metric_type == 'hourly',
+                ErrorMetrics.timestamp.in_(list(hours)),
+                ErrorMetrics.error_type.in_({key[1] for key in hourly})
+            ).all()
+        }
+        
+        for key, count in hourly.items():
+            metric = existing.get(key)
+            if metric is None:
+                hour, error_type, severity = key
+                self.db.session.add(ErrorMetrics(
+                    timestamp=hour,
+                    metric_type='hourly',
+                    error_type=error_type,
+                    severity=severity,
+                    count=count
+                ))
+            else:
+                metric.count = ErrorMetrics.count + count
+    
+    def _store_errors_redis(self, groups: Dict[str, Dict[str, Any]]):
+        """Store error groups in Redis for real-time analysis, in one pipeline"""
         try:
-            # Convert datetime to string
-            error_record_copy = error_record.copy()
-            error_record_copy['timestamp'] = error_record_copy['timestamp'].isoformat()
-            
-            # Store in sorted set by timestamp
-            key = f"errors:{error_record['severity']}"
-            score = error_record['timestamp'].timestamp()
-            value = json.dumps(error_record_copy)
-            
-            self.redis_client.zadd(key, {value: score})
+            pipe = self.redis_client.pipeline(transaction=False)
             
-            # Expire old entries (keep last 7 days)
-            self.redis_client.expire(key, 7 * 86400)
+            for fingerprint, data in groups.items():
+                sample = data['sample']
+                
+                # Store in sorted set by timestamp
+                key = f"errors:{data['severity']}"
+                value = json.dumps({
+                    'timestamp': data['last_seen'].isoformat(),
+                    'fingerprint': fingerprint,
+                    'error_type': sample['error_type'],
+                    'error_message': sample['error_message'],
+                    'severity': data['severity'],
+                    'count': data['count'],
+                    'request_id': sample['request_id'],
+                    'user_id': sample['user_id']
+                })
+                pipe.zadd(key, {value: data['last_seen'].timestamp()})
+                
+                # Expire old entries (keep last 7 days)
+                pipe.expire(key, 7 * 86400)
+                
+                # Update error counters
+                counter_key = f"error_count:{sample['error_type']}"
+                pipe.incrby(counter_key, data['count'])
+                pipe.expire(counter_key, 3600)  # 1 hour expiry
             
-            # Update error counters
-            counter_key = f"error_count:{error_record['error_type']}"
-            self.redis_client.incr(counter_key)
-            self.redis_client.expire(counter_key, 3600)  # 1 hour expiry
+            pipe.execute()
             
         except Exception as e:
-            logger.error(f"Failed to store error in Redis: {str(e)}")
+            logger.error(f"Failed to store errors in Redis: {str(e)}")
     
-    def _update_error_metrics(self, error_record: Dict[str, Any]):
+    def _update_error_metrics(self, batch: List[Dict[str, Any]]):
         """Update in-memory error metrics"""
-        error_type = error_record['error_type']
-        
-        # Update counts
-        self.error_counts[error_type] += 1
-        
-        # Update history (keep last 1000 errors)
-        self.error_history.append(error_record)
-        if len(self.error_history) > 1000:
-            self.error_history.pop(0)
-        
-        # Update patterns
-        self.error_patterns[error_type].append(error_record['timestamp'])
+        with self._lock:
+            for record in batch:
+                error_type = record['error_type']
+                
+                # Update counts
+                self.error_counts[error_type] += 1
+                
+                # Update history (bounded deque keeps the last 1000 errors)
+                self.error_history.append(record)
+                
+                # Update sliding-window counters
+                self.error_patterns[error_type].add(_utc_seconds(record['timestamp']))
     
     def _check_alerts(self, error_record: Dict[str, Any]):
         """Check if error conditions warrant an alert"""
@@ -244,6 +515,13 @@ class ErrorTracker:
                 )
                 
                 if recent_errors >= threshold['count']:
+                    # Alert once per window rather than on every new error
+                    alert_key = (alert_level, error_type)
+                    now = time.time()
+                    if now - self._last_alerts.get(alert_key, 0) < threshold['window']:
+                        continue
+                    self._last_alerts[alert_key] = now
+                    
                     self._send_alert(
                         alert_level,
                         error_type,
@@ -253,16 +531,11 @@ class ErrorTracker:
     
     def _count_recent_errors(self, error_type: str, window_seconds: int) -> int:
         """Count errors within time window"""
-        cutoff_time = datetime.utcnow() - timedelta(seconds=window_seconds)
-        
-        if error_type in self.error_patterns:
-            recent_timestamps = [
-                ts for ts in self.error_patterns[error_type]
-                if ts > cutoff_time
-            ]
-            return len(recent_timestamps)
-        
-        return 0
+        with self._lock:
+            counter = self.error_patterns.get(error_type)
+            if counter is None:
+                return 0
+            return counter.count(window_seconds, _utc_seconds(datetime.utcnow()))
     
     def _send_alert(self, alert_level: str, error_type: str, 
                    error_count: int, threshold: Dict[str, Any]):
@@ -364,11 +637,16 @@ class ErrorTracker:
             'errors_by_type': defaultdict(int),
             'errors_by_severity': defaultdict(int),
             'error_timeline': [],
-            'top_errors': []
+            'top_errors': [],
+            'queued_errors': self._queue.qsize(),
+            'dropped_errors': self.dropped_errors
         }
         
+        with self._lock:
+            history = list(self.error_history)
+        
         # Analyze recent errors
-        for error in self.error_history:
+        for error in history:
             if error['timestamp'] > cutoff_time:
                 summary['total_errors'] += 1
                 summary['errors_by_type'][error['error_type']] += 1
@@ -378,7 +656,7 @@ class ErrorTracker:
         timeline_buckets = defaultdict(int)
         bucket_size = 3600  # 1 hour buckets
         
-        for error in self.error_history:
+        for error in history:
             if error['timestamp'] > cutoff_time:
                 bucket = int(error['timestamp'].timestamp() / bucket_size)
                 timeline_buckets[bucket] += 1
@@ -419,6 +697,17 @@ class ErrorTracker:
         
         return None
     
+    def get_error_groups(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Get the most recently seen error groups"""
+        if not self.db:
+            return []
+        
+        groups = ErrorGroup.query.order_by(
+            ErrorGroup.last_seen.desc()
+        ).limit(limit).all()
+        
+        return [group.to_dict() for group in groups]
+    
     def get_error_trends(self, days: int = 7) -> Dict[str, Any]:
         """Analyze error trends over time"""
         if not self.db:
@@ -426,16 +715,17 @@ class ErrorTracker:
         
         cutoff_date = datetime.utcnow() - timedelta(days=days)
         
-        # Query error counts by day and type
+        # Sum hourly counters by day and type; ErrorLog only keeps samples
         daily_errors = self.db.session.query(
-            func.date(ErrorLog.timestamp).label('date'),
-            ErrorLog.error_type,
-            func.count(ErrorLog.id).label('count')
+            func.date(ErrorMetrics.timestamp).label('date'),
+            ErrorMetrics.error_type,
+            func.sum(ErrorMetrics.count).label('count')
         ).filter(
-            ErrorLog.timestamp >= cutoff_date
+            ErrorMetrics.metric_type == 'hourly',
+            ErrorMetrics.timestamp >= cutoff_date
         ).group_by(
-            func.date(ErrorLog.timestamp),
-            ErrorLog.error_type
+            func.date(ErrorMetrics.timestamp),
+            ErrorMetrics.error_type
         ).all()
         
         # Process results
@@ -546,6 +836,10 @@ def init_error_tracking(app: Flask, db: SQLAlchemy, redis_client: redis.Redis):
     error_tracker = ErrorTracker(app, db, redis_client)
     app.error_tracker = error_tracker
     
+    # Flush queued errors on interpreter shutdown
+    import atexit
+    atexit.register(error_tracker.stop_writer)
+    
     # Create metrics collector
     metrics_collector = ErrorMetricsCollector(error_tracker)
     app.error_metrics_collector = metrics_collector
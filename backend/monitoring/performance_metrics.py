@@ -126,6 +126,12 @@ class PerformanceCollector:
         # Update response time history
         self.response_times[endpoint].append(metrics['elapsed_time'])
         
+        # Feed the alarm engine; the windowed error rate is the mean of these flags
+        alarm_system = getattr(self.app, 'alarm_system', None)
+        if alarm_system:
+            alarm_system.push_metric('response_time', metrics['elapsed_time'], metrics['end_time'])
+            alarm_system.push_metric('error_rate', 0.0 if metrics['successful'] else 1.0, metrics['end_time'])
+        
         # Store in Redis for distributed metrics
         if self.redis_client:
             self._store_redis_metrics(metrics)
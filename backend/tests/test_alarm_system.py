@@ -0,0 +1,248 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from backend.monitoring.alarm_system import (
+    AlarmRule, AlarmSeverity, AlarmSystem, MetricWindow,
+    EVENT_QUEUE_KEY, LEADER_LOCK_KEY, _RELEASE_LOCK_SCRIPT, _RENEW_LOCK_SCRIPT
+)
+
+
+class FakeRedis:
+    """In-memory stand-in for the Redis commands the alarm system uses"""
+
+    def __init__(self):
+        self.values = {}
+        self.lists = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, nx=False, px=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def eval(self, script, numkeys, key, token, *args):
+        if self.values.get(key) != token:
+            return 0
+        if script == _RELEASE_LOCK_SCRIPT:
+            del self.values[key]
+        assert script in (_RELEASE_LOCK_SCRIPT, _RENEW_LOCK_SCRIPT)
+        return 1
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Queues list commands and applies them on execute"""
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.commands = []
+
+    def rpush(self, key, *values):
+        self.commands.append(('rpush', key, values))
+
+    def lrange(self, key, start, end):
+        self.commands.append(('lrange', key, (start, end)))
+
+    def ltrim(self, key, start, end):
+        self.commands.append(('ltrim', key, (start, end)))
+
+    def execute(self):
+        results = []
+        for command, key, args in self.commands:
+            items = self.redis_client.lists.setdefault(key, [])
+            if command == 'rpush':
+                items.extend(args)
+                results.append(len(items))
+                continue
+            start, end = args
+            selected = items[start:] if end == -1 else items[start:end + 1]
+            if command == 'lrange':
+                results.append(list(selected))
+            else:
+                self.redis_client.lists[key] = list(selected)
+                results.append(True)
+        return results
+
+
+def make_rule(**overrides):
+    """Build an alarm rule with test defaults"""
+    values = {
+        'name': 'high_cpu',
+        'description': 'CPU usage is high',
+        'metric_type': 'cpu_percent',
+        'threshold_value': 80,
+        'operator': 'gt',
+        'severity': AlarmSeverity.WARNING,
+        'duration': 0,
+        'cooldown': 300,
+        'notification_channels': []
+    }
+    values.update(overrides)
+    return AlarmRule(**values)
+
+
+class TestMetricWindow:
+    """Tests for streaming metric aggregates"""
+
+    def test_aggregates_recent_samples(self):
+        window = MetricWindow(retention=600, bucket_seconds=10)
+        for offset, value in enumerate([10, 20, 30, 40]):
+            window.add(value, timestamp=1000 + offset * 10)
+
+        now = 1035
+        assert window.aggregate('count', 60, now) == 4
+        assert window.aggregate('sum', 60, now) == 100
+        assert window.aggregate('avg', 60, now) == 25
+        assert window.aggregate('max', 60, now) == 40
+        assert window.aggregate('min', 60, now) == 10
+        assert window.aggregate('last', 60, now) == 40
+        assert window.aggregate('p50', 60, now) == 20
+        # Only the buckets overlapping the last 15 seconds
+        assert window.aggregate('count', 15, now) == 2
+        assert window.aggregate('avg', 60, now=5000) is None
+
+    def test_retention_drops_old_buckets(self):
+        window = MetricWindow(retention=60, bucket_seconds=10)
+        window.add(1, timestamp=1000)
+        window.add(2, timestamp=1100)
+        # Older than the retention relative to the newest bucket
+        window.add(3, timestamp=1010)
+
+        assert [bucket['start'] for bucket in window._buckets] == [1100]
+        assert window.aggregate('count', 3600, now=1100) == 1
+
+    def test_unknown_aggregation_is_rejected(self):
+        window = MetricWindow()
+        window.add(1, timestamp=1000)
+        with pytest.raises(ValueError):
+            window.aggregate('median', 60, now=1000)
+
+
+class TestThresholdEvaluation:
+    """Tests for rule evaluation against pushed and polled metrics"""
+
+    def test_alarm_triggers_and_resolves(self):
+        system = AlarmSystem()
+        system.rules['high_cpu'] = make_rule()
+
+        system.push_metric('cpu_percent', 95)
+        system.evaluate_metrics({'cpu_percent'})
+        assert 'alarm:high_cpu' in system.active_alarms
+
+        system.push_metric('cpu_percent', 50)
+        system.evaluate_metrics({'cpu_percent'})
+        assert system.active_alarms == {}
+        assert [entry['event_type'] for entry in system.alarm_history] == ['resolved']
+
+    def test_windowed_rule_uses_aggregate(self):
+        system = AlarmSystem()
+        system.rules['slow'] = make_rule(name='slow', metric_type='response_time',
+                                         threshold_value=500, aggregation='avg', window=60)
+        now = time.time()
+        for value in (900, 100, 200):
+            system.push_metric('response_time', value, timestamp=now)
+
+        system.evaluate_metrics()
+        assert system.active_alarms == {}
+
+        system.push_metric('response_time', 2000, timestamp=now)
+        system.evaluate_metrics()
+        assert 'alarm:slow' in system.active_alarms
+
+    def test_notification_waits_for_duration(self):
+        system = AlarmSystem()
+        sent = []
+        system.notification_handlers['log'] = sent.append
+        rule = make_rule(duration=60, notification_channels=['log'])
+
+        system._handle_alarm_state(rule, True, 95, current_time=1000)
+        system._handle_alarm_state(rule, True, 95, current_time=1030)
+        assert sent == []
+        system._handle_alarm_state(rule, True, 95, current_time=1060)
+        assert [data['alarm_name'] for data in sent] == ['high_cpu']
+
+    def test_snapshot_records_polled_metrics(self):
+        system = AlarmSystem()
+        system.evaluation_interval = 30
+        collector = SimpleNamespace(system_metrics=[{
+            'timestamp': time.time(),
+            'cpu': {'percent': 91},
+            'memory': {'percent': 40},
+            'disk': {'total': 200, 'free': 50}
+        }])
+        system.app = SimpleNamespace(performance_collector=collector)
+
+        snapshot = system.collect_snapshot()
+
+        assert snapshot == {'cpu_percent': 91, 'memory_percent': 40, 'disk_free_percent': 25.0}
+        assert system.latest_values['cpu_percent'] == 91
+
+
+class TestLeaderElection:
+    """Tests for the Redis leader lock and event forwarding"""
+
+    @pytest.fixture
+    def redis_client(self):
+        return FakeRedis()
+
+    def make_system(self, redis_client):
+        system = AlarmSystem()
+        system.redis_client = redis_client
+        system.leader_ttl = 90
+        return system
+
+    def test_only_one_leader(self, redis_client):
+        first, second = self.make_system(redis_client), self.make_system(redis_client)
+
+        assert first._check_leadership()
+        assert not second._check_leadership()
+        # Renewal keeps the lock with its holder
+        assert first._check_leadership()
+        assert redis_client.get(LEADER_LOCK_KEY) == first._leader_token
+
+    def test_lock_hands_off_on_release(self, redis_client):
+        first, second = self.make_system(redis_client), self.make_system(redis_client)
+        first._check_leadership()
+
+        # A follower cannot release the leader's lock
+        second._is_leader = True
+        second._release_leadership()
+        assert redis_client.get(LEADER_LOCK_KEY) == first._leader_token
+
+        first._release_leadership()
+        assert not first._is_leader
+        assert second._check_leadership()
+        assert not first._check_leadership()
+
+    def test_lock_hands_off_on_expiry(self, redis_client):
+        first, second = self.make_system(redis_client), self.make_system(redis_client)
+        first._check_leadership()
+
+        # The lock expired while the first leader was stalled
+        del redis_client.values[LEADER_LOCK_KEY]
+        assert second._check_leadership()
+        assert not first._check_leadership()
+
+    def test_follower_events_reach_leader(self, redis_client):
+        leader, follower = self.make_system(redis_client), self.make_system(redis_client)
+        leader._check_leadership()
+        follower._check_leadership()
+
+        follower.push_metric('error_rate', 7, timestamp=1000)
+        follower.push_metric('error_rate', 9, timestamp=1001)
+        assert 'error_rate' not in follower.latest_values
+        follower._flush_events()
+        assert [json.loads(raw)['value'] for raw in redis_client.lists[EVENT_QUEUE_KEY]] == [7, 9]
+
+        leader._drain_events()
+        assert leader.latest_values['error_rate'] == 9
+        assert leader._dirty_metrics == {'error_rate'}
+        assert redis_client.lists[EVENT_QUEUE_KEY] == []
@@ -0,0 +1,125 @@
+import queue
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from backend.app.extensions import db
+from backend.app.models.monitoring import ErrorGroup
+from backend.monitoring.error_tracking import ErrorTracker, SlidingWindowCounter, _utc_seconds
+
+
+def make_record(error_type='ValueError', frame='app.py:view', severity='error', timestamp=None):
+    """Build a queued error record the way track_error does"""
+    return {
+        'timestamp': timestamp or datetime.utcnow(),
+        'error_type': error_type,
+        'error_message': 'boom',
+        'traceback': '',
+        'severity': severity,
+        'context': {},
+        'request_id': None,
+        'user_id': None,
+        'frame': frame,
+        'fingerprint': ErrorTracker._fingerprint(error_type, frame)
+    }
+
+
+class TestSlidingWindowCounter:
+    """Tests for the bucketed sliding-window counter"""
+
+    def test_counts_events_within_window(self):
+        counter = SlidingWindowCounter(window_seconds=60, bucket_seconds=10)
+        counter.add(1000)
+        counter.add(1005, count=2)
+        counter.add(1045)
+
+        assert counter.count(60, now=1049) == 4
+        assert counter.count(10, now=1049) == 1
+        assert counter.count(60, now=1200) == 0
+
+    def test_reused_buckets_are_reset(self):
+        counter = SlidingWindowCounter(window_seconds=20, bucket_seconds=10)
+        counter.add(1000, count=5)
+        # Lands in the same ring slot three buckets later
+        counter.add(1030)
+
+        assert counter.count(20, now=1030) == 1
+
+
+class TestErrorQueue:
+    """Tests for asynchronous ingestion and batch grouping"""
+
+    @pytest.fixture
+    def app(self):
+        app = Flask(__name__)
+        app.config.update(TESTING=True, SQLALCHEMY_DATABASE_URI='sqlite:///:memory:')
+        db.init_app(app)
+        with app.app_context():
+            ErrorGroup.__table__.create(db.engine)
+            yield app
+            db.session.remove()
+
+    def test_full_queue_counts_dropped_errors(self, app):
+        tracker = ErrorTracker()
+        tracker._queue = queue.Queue(maxsize=2)
+
+        with app.test_request_context('/'):
+            for _ in range(3):
+                tracker.track_error(ValueError('boom'))
+
+        assert tracker._queue.qsize() == 2
+        assert tracker.dropped_errors == 1
+
+    def test_testing_writes_synchronously(self, app):
+        tracker = ErrorTracker(app, None, None)
+
+        assert tracker.synchronous and tracker._writer_thread is None
+        with app.test_request_context('/'):
+            tracker.track_error(KeyError('missing'))
+
+        assert tracker._queue.empty()
+        assert tracker.error_counts['KeyError'] == 1
+
+    def test_batch_is_grouped_by_fingerprint(self, app):
+        tracker = ErrorTracker()
+        tracker.db = db
+        stored = []
+        tracker._store_errors_db = lambda groups, batch: stored.append(groups)
+        first = datetime(2024, 1, 1, 12, 0)
+        batch = [
+            make_record(timestamp=first),
+            make_record(severity='critical', timestamp=first + timedelta(seconds=5)),
+            make_record(frame='other.py:task', timestamp=first)
+        ]
+
+        tracker._process_batch(batch)
+
+        groups = stored[0]
+        assert len(groups) == 2
+        group = groups[ErrorTracker._fingerprint('ValueError', 'app.py:view')]
+        assert group['count'] == 2
+        assert group['severity'] == 'critical'
+        assert (group['first_seen'], group['last_seen']) == (first, first + timedelta(seconds=5))
+        assert tracker._count_recent_errors('ValueError', 3600) == 0
+        assert tracker.error_patterns['ValueError'].count(60, _utc_seconds(first) + 10) == 3
+
+    def test_concurrent_group_insert_is_merged(self, app):
+        tracker = ErrorTracker()
+        tracker.app, tracker.db = app, db
+        record = make_record()
+        data = {'sample': record, 'count': 2, 'severity': 'error',
+                'first_seen': record['timestamp'], 'last_seen': record['timestamp']}
+
+        # Another worker inserted the fingerprint after this batch looked it up
+        db.session.add(ErrorGroup(fingerprint=record['fingerprint'], error_type='ValueError',
+                                  error_message='boom', severity='error', count=3,
+                                  first_seen=record['timestamp'], last_seen=record['timestamp']))
+        db.session.commit()
+
+        group = tracker._insert_group(record['fingerprint'], data)
+        assert group is not None
+        group.count = ErrorGroup.count + data['count']
+        db.session.commit()
+
+        assert ErrorGroup.query.filter_by(fingerprint=record['fingerprint']).one().count == 5
@@ -10,12 +10,17 @@ from app.extensions import (
 )
 from app.utils import configure_logger
 from app.realtime import configure_socketio
+from app.cli import register_commands, create_schema, seed_default_data
 
 
 def create_app(config_object=None):
     """Application factory pattern."""
     app = Flask(__name__)
 
+    # Encode JSON responses with orjson when available
+    from app.utils.serialization import JSONProvider
+    app.json = JSONProvider(app)
+
     # Load configuration
     if config_object is None:
         config_name = os.getenv('FLASK_ENV', 'default')
@@ -85,89 +90,56 @@ def create_app(config_object=None):
     # Create uploads directory if it doesn't exist
     if not os.path.exists(app.config['UPLOAD_FOLDER']):
         os.makedirs(app.config['UPLOAD_FOLDER'])
+
+    # Initialize file storage (content-addressed blobs and chunked uploads)
+    from app.services.storage_service import storage_service
+    from app.services.image_service import image_service
+    storage_service.init_app(app)
+    image_service.init_app(app)
+
+    # PDF rendering pool and cache
+    from app.services.pdf_service import pdf_service
+    pdf_service.init_app(app)
+
+    # Queued email delivery (workers start on the first queued email)
+    from app.services.mail_outbox import mail_outbox
+    mail_outbox.init_app(app)
+
+    # Cached unread counts for badges
+    from app.services.unread_counters import unread_counters
+    unread_counters.init_app(app)
+
+    # Per-tenant counters maintained on flush
+    from app.services.tenant_counters import init_tenant_counters
+    init_tenant_counters(app)
+
+    # Cached document grants follow trainer reassignments
+    from app.services.document_permission_service import init_document_permissions
+    init_document_permissions(app)
+
+    # Leader-elected job scheduler (scheduled reports, re-grades, counter repair);
+    # SCHEDULER_ENABLED starts it in this process, `flask run-scheduler` runs it standalone
+    from app.services.scheduler import scheduler
+    from app.services.report_runner import ReportRunner
+    from app.services.regrade import RegradeService
+    scheduler.init_app(app)
+    scheduler.register('scheduled-reports', ReportRunner.run_due)
+    scheduler.register('regrade-jobs', RegradeService.run_pending)
+    scheduler.register('unread-counters', unread_counters.reconcile_due)
     
-    # Initialize database and create all test users if needed
-    with app.app_context():
-        db.create_all()
-        
-        # Ensure admin user exists
-        from app.models.user import User
-        from app.models.tenant import Tenant
-        
-        # Create default tenant if needed
-        tenant = Tenant.query.first()
-        if not tenant:
-            tenant = Tenant(
-                name='Default',
-                slug='default', 
-                email='admin@default.com',
-                is_active=True
-            )
-            db.session.add(tenant)
-            db.session.commit()
-            app.logger.info("Created default tenant")
-        
-        # Define all test users
-        test_users = [
-            {
-                'email': 'admin@bdc.com',
-                'username': 'admin',
-                'password': 'Admin123!',
-                'first_name': 'Admin',
-                'last_name': 'User',
-                'role': 'super_admin'
-            },
-            {
-                'email': 'tenant@bdc.com',
-                'username': 'tenant',
-                'password': 'Tenant123!',
-                'first_name': 'Tenant',
-                'last_name': 'Admin',
-                'role': 'tenant_admin'
-            },
-            {
-                'email': 'trainer@bdc.com',
-                'username': 'trainer',
-                'password': 'Trainer123!',
-                'first_name': 'Trainer',
-                'last_name': 'User',
-                'role': 'trainer'
-            },
-            {
-                'email': 'student@bdc.com',
-                'username': 'student',
-                'password': 'Student123!',
-                'first_name': 'Student',
-                'last_name': 'User',
-                'role': 'student'
-            }
-        ]
-        
-        # Create or update all test users
-        for user_data in test_users:
-            user = User.query.filter_by(email=user_data['email']).first()
-            if not user:
-                user = User(
-                    email=user_data['email'],
-                    username=user_data['username'],
-                    first_name=user_data['first_name'],
-                    last_name=user_data['last_name'],
-                    role=user_data['role'],
-                    is_active=True
-                )
-                db.session.add(user)
-                app.logger.info(f"Created user: {user_data['email']}")
-            
-            # Always reset password for testing
-            user.password = user_data['password']
-            
-            # Add tenant relationship if it exists
-            if hasattr(user, 'tenants') and tenant not in user.tenants:
-                user.tenants.append(tenant)
-            
-            db.session.commit()
-        
-        app.logger.info(f"Total users in database: {User.query.count()}")
+    # Register CLI commands (flask init-db, flask seed-db, flask profile-startup, ...)
+    register_commands(app)
+
+    # Schema creation and seeding are explicit CLI steps so workers start
+    # without touching the database; AUTO_INIT_DB keeps the old behaviour
+    # for local development.
+    if app.config.get('AUTO_INIT_DB'):
+        with app.app_context():
+            create_schema()
+            seed_default_data()
+
+    if app.config.get('SCHEDULER_ENABLED'):
+        scheduler.start()
 
     @app.route('/health')
     def health_check():
@@ -283,6 +255,14 @@ def register_middleware(app):
 
     # Apply middleware
     app.before_request(request_context_middleware)
+
+    # Count SQL statements per request in development and tests
+    from app.middleware.query_guard import init_query_guard
+    init_query_guard(app)
+
+    # gzip/brotli for large responses
+    from app.middleware.http_cache import init_compression
+    init_compression(app)
     
     # Handle OPTIONS requests for CORS preflight
     @app.before_request
@@ -10,11 +10,22 @@ from app.models.beneficiary import Beneficiary
 from app.models.evaluation import Evaluation
 from app.models.test import TestSession
 from app.models.appointment import Appointment
+from app.models.program import Program, ProgramEnrollment
+from app.middleware.http_cache import conditional, data_version
+from app.utils.scoping import scope_for
+from app.services.tenant_counters import TenantCounterService
 
 analytics_bp = Blueprint('analytics', __name__)
 
+
+def analytics_version():
+    """Data version of the tables analytics aggregate, for conditional GETs."""
+    return data_version(User, Beneficiary, Evaluation, TestSession, Appointment,
+                        Program, ProgramEnrollment)
+
 @analytics_bp.route('/analytics/dashboard', methods=['GET'])
 @jwt_required()
+@conditional(analytics_version, max_age=300)
 def get_dashboard_analytics():
     """Get dashboard analytics for the current user."""
     user_id = get_jwt_identity()
@@ -25,9 +36,15 @@ def get_dashboard_analytics():
     
     if user.role in ['super_admin', 'tenant_admin']:
         # Admin statistics
-        stats['total_users'] = User.query.filter_by(tenant_id=user.tenant_id).count()
-        stats['total_beneficiaries'] = Beneficiary.query.filter_by(tenant_id=user.tenant_id).count()
-        stats['total_trainers'] = User.query.filter_by(tenant_id=user.tenant_id, role='trainer').count()
+        counter = TenantCounterService.get_counters([user.tenant_id]).get(user.tenant_id) if user.tenant_id else None
+        if counter is not None:
+            stats['total_users'] = counter.user_count
+            stats['total_beneficiaries'] = counter.beneficiary_count
+            stats['total_trainers'] = counter.trainer_count
+        else:
+            stats['total_users'] = User.query.filter_by(tenant_id=user.tenant_id).count()
+            stats['total_beneficiaries'] = Beneficiary.query.filter_by(tenant_id=user.tenant_id).count()
+            stats['total_trainers'] = User.query.filter_by(tenant_id=user.tenant_id, role='trainer').count()
         stats['total_evaluations'] = Evaluation.query.filter_by(tenant_id=user.tenant_id).count()
         
         # Role distribution for pie chart
@@ -154,6 +171,7 @@ def get_dashboard_analytics():
 
 @analytics_bp.route('/analytics/beneficiaries', methods=['GET'])
 @jwt_required()
+@conditional(analytics_version, max_age=300)
 def get_beneficiary_analytics():
     """Get beneficiary analytics."""
     user_id = get_jwt_identity()
@@ -225,14 +243,7 @@ def get_beneficiary_analytics():
     
     else:
         # All beneficiaries analytics
-        query = Beneficiary.query
-        
-        if user.role == 'trainer':
-            query = query.filter_by(trainer_id=user_id)
-        elif user.role == 'tenant_admin':
-            query = query.filter_by(tenant_id=user.tenant_id)
-        
-        beneficiaries = query.all()
+        beneficiaries = scope_for(user, Beneficiary).all()
         
         result = []
         for beneficiary in beneficiaries:
@@ -264,6 +275,7 @@ def get_beneficiary_analytics():
 
 @analytics_bp.route('/analytics/trainers', methods=['GET'])
 @jwt_required()
+@conditional(analytics_version, max_age=300)
 def get_trainer_analytics():
     """Get trainer analytics."""
     user_id = get_jwt_identity()
@@ -344,6 +356,7 @@ def get_trainer_analytics():
 
 @analytics_bp.route('/analytics/programs', methods=['GET'])
 @jwt_required()
+@conditional(analytics_version, max_age=300)
 def get_program_analytics():
     """Get program analytics."""
     user_id = get_jwt_identity()
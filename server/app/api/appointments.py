@@ -10,16 +10,20 @@ from app.models.user import User
 from app.models.integration import UserIntegration
 from app.services.calendar_service import CalendarService
 from app.services.email_service import send_notification_email
+from app.utils.scoping import scope_for
+from app.utils.serialization import sparse
+from app.schemas.projections import APPOINTMENT
+from app.middleware.query_guard import query_budget
 
 appointments_bp = Blueprint('appointments', __name__)
 
 
 @appointments_bp.route('/appointments', methods=['GET'])
 @jwt_required()
+@query_budget(8)
 def get_appointments():
     """Get appointments for current user."""
     from app.models.appointment import Appointment
-    from app.models.beneficiary import Beneficiary
     
     user_id = get_jwt_identity()
     user = User.query.get_or_404(user_id)
@@ -31,21 +35,9 @@ def get_appointments():
     end_date = request.args.get('end_date')
     status = request.args.get('status')
     
-    # Base query
-    query = Appointment.query
-    
-    # Filter by user role
-    if user.role == 'student':
-        # Students see their own appointments
-        beneficiary = Beneficiary.query.filter_by(user_id=user_id).first()
-        if beneficiary:
-            query = query.filter_by(beneficiary_id=beneficiary.id)
-        else:
-            return jsonify({'appointments': [], 'total': 0, 'pages': 0}), 200
-    elif user.role == 'trainer':
-        # Trainers see their appointments
-        query = query.filter_by(trainer_id=user_id)
-    # Admins see all appointments
+    # Students see their own appointments, trainers theirs, tenant admins
+    # those within their tenant
+    query = scope_for(user, Appointment)
     
     # Apply filters
     if start_date:
@@ -69,33 +61,14 @@ def get_appointments():
     # Order by date
     query = query.order_by(Appointment.start_time.asc())
     
+    # Select only the requested fields (?fields=id,start_time,...)
+    projection = sparse(APPOINTMENT)
+    
     # Paginate
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    pagination = projection.apply(query).paginate(page=page, per_page=per_page, error_out=False)
     
-    # Serialize appointments
-    appointments = []
-    for appointment in pagination.items:
-        appointment_dict = appointment.to_dict()
-        
-        # Include beneficiary info for trainers/admins
-        if user.role != 'student' and appointment.beneficiary:
-            appointment_dict['beneficiary'] = {
-                'id': appointment.beneficiary.id,
-                'first_name': appointment.beneficiary.user.first_name,
-                'last_name': appointment.beneficiary.user.last_name,
-                'email': appointment.beneficiary.user.email
-            }
-        
-        # Include trainer info for students/admins
-        if appointment.trainer:
-            appointment_dict['trainer'] = {
-                'id': appointment.trainer.id,
-                'first_name': appointment.trainer.first_name,
-                'last_name': appointment.trainer.last_name,
-                'email': appointment.trainer.email
-            }
-        
-        appointments.append(appointment_dict)
+    # Serialize appointments with beneficiary and trainer summaries
+    appointments = projection.dump_many(pagination.items)
     
     return jsonify({
         'appointments': appointments,
@@ -557,6 +530,7 @@ def sync_appointment_to_calendar(appointment_id):
             'message': f"You have a scheduled appointment with {appointment.trainer.first_name} {appointment.trainer.last_name} on {appointment.start_time.strftime('%Y-%m-%d at %H:%M')}."
         }
     )
+    db.session.commit()
     
     return jsonify({
         'message': 'Appointment synced to Google Calendar successfully',
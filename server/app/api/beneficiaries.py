@@ -20,6 +20,8 @@ from app.services import (
 )
 from app.models import Beneficiary, Evaluation, TestSession, Document, Note
 from app.middleware.request_context import auth_required, role_required
+from app.middleware.query_guard import query_budget
+from app.services.tenant_counters import QuotaExceeded, TenantCounterService
 from app.utils import cache_response
 
 
@@ -30,6 +32,7 @@ beneficiaries_bp = Blueprint('beneficiaries', __name__)
 @jwt_required()
 @role_required(['super_admin', 'tenant_admin', 'trainer'])
 @cache_response(timeout=300, key_prefix='beneficiaries')
+@query_budget(10)
 def get_beneficiaries():
     """Get all beneficiaries with optional filtering."""
     try:
@@ -255,6 +258,15 @@ def create_beneficiary():
                 else:
                     data['tenant_id'] = tenant_id
         
+        try:
+            TenantCounterService.check_quota(data['tenant_id'], 'beneficiaries')
+        except QuotaExceeded as e:
+            db.session.rollback()
+            return jsonify({
+                'error': 'quota_exceeded',
+                'message': str(e)
+            }), 403
+        
         # Extract user data
         user_data = {
             'email': data.pop('email'),
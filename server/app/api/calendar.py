@@ -2,14 +2,23 @@
 
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from app import db
 from app.models.user import User
 from app.models.appointment import Appointment
-from app.models.availability import AvailabilitySchedule, AvailabilitySlot
+from app.models.availability import AvailabilitySchedule
+from app.services.recurrence import RecurrenceEngine
+from app.utils.loading import with_profile
+from app.utils.scoping import scope_for
 
 calendar_bp = Blueprint('calendar', __name__)
 
+
+def _utc(value):
+    """Convert an aware datetime to naive UTC, as stored and returned by the API."""
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
 @calendar_bp.route('/calendar/events', methods=['GET'])
 @jwt_required()
 def get_calendar_events():
@@ -25,17 +34,11 @@ def get_calendar_events():
     start = datetime.strptime(start_date, '%Y-%m-%d')
     end = datetime.strptime(end_date, '%Y-%m-%d')
     
-    # Get appointments based on user role
-    if user.role == 'trainee':
-        appointments = Appointment.query.filter(
-            Appointment.beneficiary_id == user.id,
-            Appointment.datetime.between(start, end)
-        ).all()
-    else:
-        appointments = Appointment.query.filter(
-            Appointment.trainer_id == user_id,
-            Appointment.datetime.between(start, end)
-        ).all()
+    # Appointments visible to the user that overlap the range
+    appointments = with_profile(scope_for(user, Appointment), 'appointment_list').filter(
+        Appointment.start_time < end + timedelta(days=1),
+        Appointment.end_time > start
+    ).order_by(Appointment.start_time).all()
     
     # Format events for calendar
     events = []
@@ -43,9 +46,9 @@ def get_calendar_events():
         events.append({
             'id': appointment.id,
             'title': appointment.title,
-            'start': appointment.datetime.isoformat(),
-            'end': (appointment.datetime + timedelta(hours=appointment.duration)).isoformat(),
-            'type': appointment.appointment_type,
+            'start': appointment.start_time.isoformat(),
+            'end': appointment.end_time.isoformat(),
+            'type': 'appointment',
             'status': appointment.status,
             'description': appointment.description,
             'beneficiary': {
@@ -58,49 +61,30 @@ def get_calendar_events():
             } if appointment.trainer else None
         })
     
-    # Add availability slots
+    # Add the unbooked parts of the user's availability
     if user.role in ['trainer', 'tenant_admin']:
         schedule = AvailabilitySchedule.query.filter_by(
-            user_id=user_id,
+            user_id=user.id,
             is_active=True
         ).first()
         
         if schedule:
-            slots = AvailabilitySlot.query.filter_by(schedule_id=schedule.id).all()
+            own = [a for a in appointments if a.trainer_id == user.id]
+            engine = RecurrenceEngine.for_schedule(schedule, start, end, appointments=own)
             
-            # Create recurring availability events
-            current = start
-            while current <= end:
-                for slot in slots:
-                    if current.weekday() == slot.day_of_week:
-                        slot_start = current.replace(
-                            hour=int(slot.start_time.split(':')[0]),
-                            minute=int(slot.start_time.split(':')[1])
-                        )
-                        slot_end = current.replace(
-                            hour=int(slot.end_time.split(':')[0]),
-                            minute=int(slot.end_time.split(':')[1])
-                        )
-                        
-                        # Check if this slot is not already booked
-                        is_booked = any(
-                            appointment.datetime <= slot_start < 
-                            appointment.datetime + timedelta(hours=appointment.duration)
-                            for appointment in appointments
-                        )
-                        
-                        if not is_booked:
-                            events.append({
-                                'id': f'availability_{slot.id}_{current.date()}',
-                                'title': 'Available',
-                                'start': slot_start.isoformat(),
-                                'end': slot_end.isoformat(),
-                                'type': 'availability',
-                                'status': 'available',
-                                'backgroundColor': '#10b981'
-                            })
-                
-                current += timedelta(days=1)
+            pieces = {}
+            for day, window in engine.free_windows(start, end):
+                key = f'availability_{window.source.id}_{day}'
+                index = pieces[key] = pieces.get(key, -1) + 1
+                events.append({
+                    'id': f'{key}_{index}' if index else key,
+                    'title': 'Available',
+                    'start': _utc(window.start).isoformat(),
+                    'end': _utc(window.end).isoformat(),
+                    'type': 'availability',
+                    'status': 'available',
+                    'backgroundColor': '#10b981'
+                })
     
     return jsonify({
         'events': events,
@@ -1,12 +1,9 @@
 """Document API endpoints."""
 
-from flask import Blueprint, request, jsonify, current_app, send_file
+from flask import Blueprint, Response, request, jsonify, current_app, send_file, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import os
-import uuid
 from datetime import datetime
-from io import BytesIO
-from werkzeug.utils import secure_filename
+from sqlalchemy.orm import joinedload, noload
 
 from app.extensions import db
 from app.models.user import User
@@ -14,14 +11,23 @@ from app.models.beneficiary import Beneficiary
 from app.models.evaluation import Evaluation
 from app.models.document import Document
 from app.models.document_permission import DocumentPermission
+from app.models.file_blob import FileBlob, UploadSession
 from app.services.document_service import DocumentService
+from app.services.document_permission_service import document_permissions
 from app.services.notification_service import NotificationService
-from app.utils import generate_evaluation_report, generate_beneficiary_report, analyze_evaluation_responses, generate_report_content
+from app.services.storage_service import storage_service
+from app.services.image_service import image_service, VARIANTS
+from app.services.pdf_service import pdf_service
+from app.utils.scoping import scope_for
+from app.utils.serialization import sparse
+from app.schemas.projections import DOCUMENT
+from app.middleware.query_guard import query_budget
 
 documents_bp = Blueprint('documents', __name__)
 
 @documents_bp.route('/documents', methods=['GET'])
 @jwt_required()
+@query_budget(8)
 def get_documents():
     """Get documents accessible by the current user."""
     user_id = get_jwt_identity()
@@ -33,24 +39,8 @@ def get_documents():
     document_type = request.args.get('type', None)
     search = request.args.get('search', None)
     
-    # Base query
-    query = Document.query
-    
-    # Filter by user role and permissions
-    if user.role == 'student':
-        # Students can only see their own documents
-        beneficiary = Beneficiary.query.filter_by(user_id=user_id).first()
-        if beneficiary:
-            query = query.filter_by(beneficiary_id=beneficiary.id)
-        else:
-            return jsonify({'documents': [], 'total': 0, 'pages': 0}), 200
-    elif user.role == 'trainer':
-        # Trainers can see documents of their assigned beneficiaries
-        beneficiary_ids = [b.id for b in Beneficiary.query.filter_by(trainer_id=user_id).all()]
-        if beneficiary_ids:
-            query = query.filter(Document.beneficiary_id.in_(beneficiary_ids))
-        else:
-            return jsonify({'documents': [], 'total': 0, 'pages': 0}), 200
+    # Restrict to documents visible to the user's role and tenant
+    query = scope_for(user, Document)
     
     # Apply filters
     if document_type:
@@ -65,11 +55,14 @@ def get_documents():
     # Order by created date
     query = query.order_by(Document.created_at.desc())
     
+    # Select only the requested fields (?fields=id,title,...)
+    projection = sparse(DOCUMENT)
+    
     # Paginate
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    pagination = projection.apply(query).paginate(page=page, per_page=per_page, error_out=False)
     
     # Serialize documents
-    documents = [doc.to_dict() for doc in pagination.items]
+    documents = projection.dump_many(pagination.items)
     
     return jsonify({
         'documents': documents,
@@ -97,19 +90,16 @@ def get_evaluation_report(evaluation_id):
        (user.role != 'trainer' or beneficiary.trainer_id != user_id):
         return jsonify({"error": "Not authorized to access this evaluation"}), 403
     
-    # Generate the PDF
-    pdf_content = generate_evaluation_report(evaluation, user, beneficiary)
-    
-    # Create a file-like buffer for the PDF
-    buffer = BytesIO(pdf_content)
-    buffer.seek(0)
+    # Render off-request, or serve the cached PDF if nothing changed
+    from app.utils.pdf_generator import evaluation_report_data
+    pdf_path = pdf_service.render_file('evaluation', evaluation_report_data(evaluation, user, beneficiary))
     
     # Create filename
     filename = f"evaluation_report_{evaluation_id}_{datetime.now().strftime('%Y%m%d')}.pdf"
     
     # Send the file
     return send_file(
-        buffer,
+        pdf_path,
         mimetype='application/pdf',
         as_attachment=True,
         download_name=filename
@@ -134,25 +124,73 @@ def get_beneficiary_report(beneficiary_id):
     # Get all evaluations for this beneficiary
     evaluations = Evaluation.query.filter_by(beneficiary_id=beneficiary_id).all()
     
-    # Generate the PDF
-    pdf_content = generate_beneficiary_report(beneficiary, evaluations, user)
-    
-    # Create a file-like buffer for the PDF
-    buffer = BytesIO(pdf_content)
-    buffer.seek(0)
+    # Render off-request, or serve the cached PDF if nothing changed
+    from app.utils.pdf_generator import beneficiary_report_data
+    pdf_path = pdf_service.render_file('beneficiary', beneficiary_report_data(beneficiary, evaluations, user))
     
     # Create filename
     filename = f"beneficiary_report_{beneficiary_id}_{datetime.now().strftime('%Y%m%d')}.pdf"
     
     # Send the file
     return send_file(
-        buffer,
+        pdf_path,
         mimetype='application/pdf',
         as_attachment=True,
         download_name=filename
     )
 
 
+@documents_bp.route('/documents/beneficiary-reports/bulk', methods=['POST'])
+@jwt_required()
+def bulk_beneficiary_reports():
+    """Download progress reports for many beneficiaries as one streamed ZIP."""
+    user_id = get_jwt_identity()
+    user = User.query.get_or_404(user_id)
+    
+    data = request.get_json(silent=True) or {}
+    beneficiary_ids = data.get('beneficiary_ids')
+    if beneficiary_ids is not None and not isinstance(beneficiary_ids, list):
+        return jsonify({'error': 'invalid_request', 'message': 'beneficiary_ids must be a list'}), 400
+    
+    # Only beneficiaries the user may see; all of them unless ids are given
+    query = scope_for(user, Beneficiary).with_entities(Beneficiary.id)
+    if beneficiary_ids:
+        query = query.filter(Beneficiary.id.in_(beneficiary_ids))
+    ids = [row.id for row in query.order_by(Beneficiary.id)]
+    if not ids:
+        return jsonify({'error': 'not_found', 'message': 'No beneficiaries to report on'}), 404
+    
+    batch_size = current_app.config.get('PDF_BULK_BATCH_SIZE', 100)
+    
+    def documents():
+        from app.utils.pdf_generator import beneficiary_report_data
+        
+        # Load beneficiaries and their evaluations a batch at a time
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            beneficiaries = Beneficiary.query.options(
+                joinedload(Beneficiary.user), joinedload(Beneficiary.trainer)
+            ).filter(Beneficiary.id.in_(batch)).order_by(Beneficiary.id).all()
+            evaluations = {}
+            for evaluation in Evaluation.query.options(noload('*'), joinedload(Evaluation.test)) \
+                    .filter(Evaluation.beneficiary_id.in_(batch)).order_by(Evaluation.id):
+                evaluations.setdefault(evaluation.beneficiary_id, []).append(evaluation)
+            for beneficiary in beneficiaries:
+                yield (
+                    f"beneficiary_report_{beneficiary.id}.pdf",
+                    'beneficiary',
+                    beneficiary_report_data(beneficiary, evaluations.get(beneficiary.id, []), user)
+                )
+            db.session.expunge_all()
+    
+    filename = f"beneficiary_reports_{datetime.now().strftime('%Y%m%d')}.zip"
+    return Response(
+        stream_with_context(pdf_service.iter_zip(documents())),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
 @documents_bp.route('/documents/analyze-evaluation/<int:evaluation_id>', methods=['GET'])
 @jwt_required()
 def analyze_evaluation(evaluation_id):
@@ -192,6 +230,7 @@ def analyze_evaluation(evaluation_id):
     }
     
     # Analyze the evaluation
+    from app.utils.ai import analyze_evaluation_responses
     analysis = analyze_evaluation_responses(evaluation_dict)
     
     return jsonify(analysis), 200
@@ -235,6 +274,7 @@ def generate_beneficiary_ai_report(beneficiary_id):
     ]
     
     # Generate the report content
+    from app.utils.ai import generate_report_content
     report_content = generate_report_content(beneficiary_dict, evaluation_dicts)
     
     return jsonify(report_content), 200
@@ -266,31 +306,36 @@ def upload_document():
     if not file.filename.lower().endswith(tuple('.' + ext for ext in allowed_extensions)):
         return jsonify({"error": f"Only {', '.join(allowed_extensions)} files are allowed"}), 400
     
-    # Save file
-    filename = secure_filename(file.filename)
-    # Generate unique filename
-    unique_filename = f"{uuid.uuid4()}_{filename}"
-    
-    # Create folder path based on document type
-    folder_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'documents', document_type)
-    if not os.path.exists(folder_path):
-        os.makedirs(folder_path, exist_ok=True)
-    
-    file_path = os.path.join(folder_path, unique_filename)
+    # Stream the file into content-addressed storage; re-uploads of the same
+    # content only add a reference to the existing blob
+    blob, error = storage_service.store_upload(file, 'any', max_size=current_app.config.get('MAX_CONTENT_LENGTH'))
+    if error:
+        return jsonify({"error": error}), 400
     
-    # Save file
-    file.save(file_path)
+    document = _create_document_record(
+        blob, user_id, title, description, document_type, beneficiary_id, evaluation_id
+    )
     
-    # Create document record in database
-    # Note: This assumes you have a Document model; if not, you'd need to create one
-    from app.models.document import Document
+    return jsonify({
+        "message": "Document uploaded successfully",
+        "document_id": document.id,
+        "file_path": document.file_path
+    }), 201
+
+
+def _create_document_record(blob, user_id, title, description, document_type,
+                            beneficiary_id=None, evaluation_id=None):
+    """Create and commit a Document pointing at a stored blob."""
+    # Thumbnails and previews for images and PDFs are rendered off-request
+    image_service.schedule_variants(blob, ('thumbnail', 'preview'))
     
     document = Document(
         title=title,
         description=description,
-        file_path=f"/uploads/documents/{document_type}/{unique_filename}",
-        file_type=os.path.splitext(filename)[1][1:],  # Get extension without the dot
-        file_size=os.path.getsize(file_path),
+        file_path=f"/uploads/{blob.storage_path}",
+        file_type=blob.extension or 'unknown',
+        file_size=blob.size,
+        content_hash=blob.sha256,
         upload_by=user_id,
         document_type=document_type
     )
@@ -304,6 +349,95 @@ def upload_document():
     db.session.add(document)
     db.session.commit()
     
+    return document
+
+
+def _get_upload_or_404(upload_id, user_id):
+    """Return a chunked upload owned by the user, or abort with 404."""
+    return UploadSession.query.filter_by(id=upload_id, user_id=user_id).first_or_404()
+
+
+@documents_bp.route('/documents/uploads', methods=['POST'])
+@jwt_required()
+def start_chunked_upload():
+    """Start a resumable chunked upload."""
+    user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    
+    filename = data.get('filename')
+    try:
+        total_size = int(data.get('total_size', 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "total_size must be an integer"}), 400
+    
+    allowed_extensions = current_app.config.get('ALLOWED_EXTENSIONS', {'pdf', 'doc', 'docx', 'xls', 'xlsx'})
+    if not filename or not filename.lower().endswith(tuple('.' + ext for ext in allowed_extensions)):
+        return jsonify({"error": f"Only {', '.join(allowed_extensions)} files are allowed"}), 400
+    
+    upload, error = storage_service.start_chunked_upload(user_id, filename, total_size, 'any')
+    if error:
+        return jsonify({"error": error}), 400
+    
+    return jsonify({
+        **upload.to_dict(),
+        "chunk_size": storage_service.CHUNK_SIZE
+    }), 201
+
+
+@documents_bp.route('/documents/uploads/<upload_id>', methods=['GET'])
+@jwt_required()
+def get_chunked_upload(upload_id):
+    """Get the status of a chunked upload, used by clients to resume."""
+    upload = _get_upload_or_404(upload_id, get_jwt_identity())
+    return jsonify(upload.to_dict()), 200
+
+
+@documents_bp.route('/documents/uploads/<upload_id>', methods=['PUT'])
+@jwt_required()
+def upload_chunk(upload_id):
+    """
+    Append a chunk to an upload.
+    
+    The raw request body is the chunk; the ``offset`` query parameter (or
+    ``Upload-Offset`` header) must equal the bytes received so far.
+    """
+    upload = _get_upload_or_404(upload_id, get_jwt_identity())
+    
+    offset = request.args.get('offset', request.headers.get('Upload-Offset'))
+    try:
+        offset = int(offset)
+    except (TypeError, ValueError):
+        return jsonify({"error": "offset is required"}), 400
+    
+    _, error = storage_service.append_chunk(upload, offset, request.stream)
+    if error:
+        return jsonify({"error": error, "received_size": upload.received_size}), 409
+    
+    return jsonify(upload.to_dict()), 200
+
+
+@documents_bp.route('/documents/uploads/<upload_id>/complete', methods=['POST'])
+@jwt_required()
+def complete_chunked_upload(upload_id):
+    """Finish a chunked upload and create the document."""
+    user_id = get_jwt_identity()
+    upload = _get_upload_or_404(upload_id, user_id)
+    data = request.get_json() or {}
+    
+    blob, error = storage_service.complete_chunked_upload(upload)
+    if error:
+        return jsonify({"error": error}), 400
+    
+    document = _create_document_record(
+        blob,
+        user_id,
+        data.get('title', 'Untitled Document'),
+        data.get('description', ''),
+        data.get('type', 'general'),
+        data.get('beneficiary_id'),
+        data.get('evaluation_id')
+    )
+    
     return jsonify({
         "message": "Document uploaded successfully",
         "document_id": document.id,
@@ -311,6 +445,102 @@ def upload_document():
     }), 201
 
 
+@documents_bp.route('/documents/uploads/<upload_id>', methods=['DELETE'])
+@jwt_required()
+def abort_chunked_upload(upload_id):
+    """Cancel a chunked upload."""
+    upload = _get_upload_or_404(upload_id, get_jwt_identity())
+    storage_service.abort_chunked_upload(upload)
+    return jsonify({"message": "Upload cancelled"}), 200
+
+
+def _is_avatar(sha256):
+    """Whether a blob is some user's profile picture."""
+    urls = [storage_service.avatar_url(sha256), storage_service.variant_url(sha256, 'avatar')]
+    return db.session.query(User.id).filter(User.profile_picture.in_(urls)).first() is not None
+
+
+def _send_variant(blob, variant, public=False):
+    """
+    Send a variant of a blob, or 202 while it is still being generated.
+    
+    Variants are immutable for a given content hash, so responses carry a
+    strong ETag and a long cache lifetime; only public content may be
+    stored by shared caches.
+    """
+    if not image_service.supports(blob.extension):
+        return jsonify({"error": "No preview available for this file"}), 404
+    
+    path = image_service.get_variant(blob.sha256, variant)
+    if path is None:
+        image_service.schedule_variants(blob, (variant,))
+        path = image_service.get_variant(blob.sha256, variant)
+    
+    if path is None:
+        response = jsonify({"status": "processing"})
+        response.status_code = 202
+        response.headers['Retry-After'] = '1'
+        return response
+    
+    response = send_file(
+        path,
+        mimetype='image/jpeg',
+        etag=image_service.etag(blob.sha256, variant),
+        conditional=True,
+        max_age=31536000
+    )
+    # send_file marks every response with a max age as public
+    response.cache_control.public = public
+    response.cache_control.private = not public
+    response.cache_control.immutable = True
+    return response
+
+
+@documents_bp.route('/files/<sha256>/<variant>', methods=['GET'])
+@jwt_required()
+def get_file_variant(sha256, variant):
+    """
+    Serve a resized variant (avatar, thumbnail, preview) of a stored file.
+    
+    The caller must be able to read a document that references the file.
+    Returns 202 while the variant is still being generated.
+    """
+    if variant not in VARIANTS:
+        return jsonify({"error": "Unknown variant"}), 404
+    
+    user = User.query.get_or_404(get_jwt_identity())
+    blob = FileBlob.query.filter_by(sha256=sha256).first_or_404()
+    
+    if user.role != 'super_admin':
+        document_ids = [document_id for document_id, in db.session.query(Document.id).filter(
+            Document.content_hash == sha256
+        )]
+        grants = document_permissions.resolve(user, document_ids) if document_ids else {}
+        if not any(grant['read'] for grant in grants.values()) and not _is_avatar(sha256):
+            # Do not reveal whether the content exists
+            return jsonify({"error": "File not found"}), 404
+    
+    return _send_variant(blob, variant)
+
+
+@documents_bp.route('/avatars/<sha256>/<variant>', methods=['GET'])
+def get_avatar(sha256, variant):
+    """
+    Serve a profile picture without authentication, so it loads in ``<img>`` tags.
+    
+    Only the avatar and thumbnail variants of files that are some user's
+    profile picture are served.
+    """
+    if variant not in ('avatar', 'thumbnail'):
+        return jsonify({"error": "Unknown variant"}), 404
+    
+    blob = FileBlob.query.filter_by(sha256=sha256).first()
+    if blob is None or not _is_avatar(sha256):
+        return jsonify({"error": "File not found"}), 404
+    
+    return _send_variant(blob, variant, public=True)
+
+
 @documents_bp.route('/documents/<int:document_id>/permissions', methods=['GET'])
 @jwt_required()
 def get_document_permissions(document_id):
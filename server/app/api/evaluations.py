@@ -17,6 +17,8 @@ from app.services import (
     ResponseService, AIFeedbackService
 )
 from app.middleware.request_context import auth_required, role_required
+from app.middleware.http_cache import conditional
+from app.services.question_sets import question_sets
 from app.utils import cache_response
 
 
@@ -399,6 +401,26 @@ def get_questions(evaluation_id):
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         
+        # For students, don't include correct answers
+        is_student = current_user.role == 'student'
+        
+        # Students page through the cached question set, which has no answers
+        if is_student:
+            question_set = question_sets.get(evaluation.test_id)
+            result = [question for question in (question_set.data['questions'] if question_set else [])
+                      if (not category or question['category'] == category)
+                      and (not difficulty or question['difficulty'] == difficulty)
+                      and (not type or question['type'] == type)]
+            total = len(result)
+            pages = -(-total // per_page) if per_page > 0 else 0
+            return jsonify({
+                'items': result[(page - 1) * per_page:page * per_page],
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': pages
+            }), 200
+        
         # Get questions
         questions, total, pages = QuestionService.get_questions(
             evaluation_id=evaluation_id,
@@ -409,18 +431,10 @@ def get_questions(evaluation_id):
             per_page=per_page
         )
         
-        # For students, don't include correct answers
-        is_student = current_user.role == 'student'
-        
         # Serialize data
         schema = QuestionSchema(many=True)
         result = schema.dump(questions)
         
-        # Remove correct answers for students
-        if is_student:
-            for question in result:
-                question.pop('correct_answer', None)
-        
         # Return paginated response
         return jsonify({
             'items': result,
@@ -718,4 +732,122 @@ def get_sessions():
         return jsonify({
             'error': 'server_error',
             'message': 'An unexpected error occurred'
-        }), 500
\ No newline at end of file
+        }), 500
+
+@evaluations_bp.route('/test-sets/<int:test_set_id>/regrade', methods=['POST'])
+@jwt_required()
+@role_required(['super_admin', 'tenant_admin', 'trainer'])
+def regrade_test_set(test_set_id):
+    """Queue a re-grade of every stored response of a test set."""
+    from app.models import TestSet
+    from app.services.regrade import RegradeService
+
+    test_set = db.session.get(TestSet, test_set_id)
+    if not test_set:
+        return jsonify({
+            'error': 'not_found',
+            'message': 'Test set not found'
+        }), 404
+
+    if current_user.role != 'super_admin' and test_set.tenant_id != current_user.tenant_id:
+        return jsonify({
+            'error': 'forbidden',
+            'message': 'You do not have permission to re-grade this test set'
+        }), 403
+
+    job = RegradeService.enqueue(test_set_id, reason='manual', requested_by=current_user.id)
+    return jsonify(job.to_dict()), 202
+
+
+@evaluations_bp.route('/regrade-jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+@role_required(['super_admin', 'tenant_admin', 'trainer'])
+def get_regrade_job(job_id):
+    """Get the status and progress of a re-grade job."""
+    from app.models import RegradeJob, TestSet
+
+    job = db.session.get(RegradeJob, job_id)
+    if not job:
+        return jsonify({
+            'error': 'not_found',
+            'message': 'Re-grade job not found'
+        }), 404
+
+    if current_user.role != 'super_admin' and \
+            db.session.get(TestSet, job.test_set_id).tenant_id != current_user.tenant_id:
+        return jsonify({
+            'error': 'forbidden',
+            'message': 'You do not have permission to view this job'
+        }), 403
+
+    return jsonify(job.to_dict()), 200
+
+
+@evaluations_bp.route('/test-sets/<int:test_set_id>/publish', methods=['POST'])
+@jwt_required()
+@role_required(['super_admin', 'tenant_admin', 'trainer'])
+def publish_test_set(test_set_id):
+    """Publish a test set so students can take it."""
+    from app.models import TestSet
+
+    test_set = db.session.get(TestSet, test_set_id)
+    if not test_set:
+        return jsonify({
+            'error': 'not_found',
+            'message': 'Test set not found'
+        }), 404
+
+    if current_user.role != 'super_admin' and test_set.tenant_id != current_user.tenant_id:
+        return jsonify({
+            'error': 'forbidden',
+            'message': 'You do not have permission to publish this test set'
+        }), 403
+
+    test_set = EvaluationService.publish_test_set(test_set_id)
+    return jsonify(test_set.to_dict()), 200
+
+
+def question_set_version(test_set_id):
+    """Version of a test set's cached questions, for conditional GETs."""
+    return question_sets.version(test_set_id), None
+
+
+@evaluations_bp.route('/test-sets/<int:test_set_id>/questions', methods=['GET'])
+@jwt_required()
+@conditional(question_set_version)
+def get_question_set(test_set_id):
+    """Get every question of a test set in one response, without answers.
+
+    Served from the question set cache; clients revalidate with the ETag,
+    which changes whenever the questions are edited.
+    """
+    question_set = question_sets.get(test_set_id)
+    if not question_set:
+        return jsonify({
+            'error': 'not_found',
+            'message': 'Test set not found'
+        }), 404
+
+    access = question_set.access
+    if current_user.role != 'super_admin' and access['tenant_id'] != current_user.tenant_id:
+        return jsonify({
+            'error': 'forbidden',
+            'message': 'You do not have permission to access questions for this test set'
+        }), 403
+
+    if current_user.role == 'student':
+        from app.models import Beneficiary
+
+        if access['status'] != 'active':
+            return jsonify({
+                'error': 'forbidden',
+                'message': 'This test set is not published'
+            }), 403
+        if access['beneficiary_id'] is not None and not Beneficiary.query.filter_by(
+                id=access['beneficiary_id'], user_id=current_user.id).first():
+            return jsonify({
+                'error': 'forbidden',
+                'message': 'You do not have permission to access questions for this test set'
+            }), 403
+
+    return current_app.response_class(question_set.body, mimetype='application/json')
@@ -15,6 +15,7 @@ from app.services import (
     EvaluationService, TestSessionService, ResponseService
 )
 from app.middleware.request_context import auth_required, role_required
+from app.middleware.query_guard import query_budget
 from app.utils import cache_response
 
 
@@ -169,9 +170,16 @@ def register_additional_routes(evaluations_bp):
     
     
     @evaluations_bp.route('/sessions/<int:session_id>/submit', methods=['POST'])
+    @evaluations_bp.route('/sessions/<int:session_id>/responses', methods=['PUT'])
     @jwt_required()
+    @query_budget(12)
     def submit_all_responses(session_id):
-        """Submit all responses for a test session at once."""
+        """Save many answers of a test session at once.
+
+        Body: ``{"responses": [{"question_id": 1, "answer": "b", "time_spent": 30}, ...]}``;
+        ``complete_session: true`` also completes the session. Clients use the
+        PUT form for periodic autosave of every answer changed since the last one.
+        """
         try:
             # Get current user
             user_id = get_jwt_identity()
@@ -185,47 +193,49 @@ def register_additional_routes(evaluations_bp):
                 }), 404
             
             # Check permissions
-            if session.user_id != user_id:
+            if str(session.beneficiary.user_id) != str(user_id):
                 return jsonify({
                     'error': 'forbidden',
                     'message': 'You do not have permission to submit responses to this session'
                 }), 403
             
-            # Get responses from request
-            data = request.json
-            if 'responses' not in data or not isinstance(data['responses'], list):
+            if session.status != 'in_progress':
+                return jsonify({
+                    'error': 'session_closed',
+                    'message': 'Test session is not in progress'
+                }), 409
+            
+            # Validate responses from request
+            data = request.get_json() or {}
+            try:
+                answers = ResponseService.normalize_answers(data.get('responses'))
+            except ValueError as e:
                 return jsonify({
                     'error': 'invalid_data',
-                    'message': 'Responses must be provided as a list'
+                    'message': str(e)
                 }), 400
             
-            # Submit all responses
-            submitted_responses = []
-            for response_data in data['responses']:
-                response = ResponseService.submit_response(
-                    session_id=session_id,
-                    question_id=response_data['question_id'],
-                    answer=response_data['answer'],
-                    user_id=user_id
-                )
-                submitted_responses.append(response)
+            # Save and grade all responses
+            try:
+                result = ResponseService.submit_batch(session, answers)
+            except LookupError as e:
+                return jsonify({
+                    'error': 'not_found',
+                    'message': str(e)
+                }), 404
             
             # Complete session if requested
             if data.get('complete_session', False):
-                TestSessionService.complete_session(session_id)
-            
-            # Serialize responses
-            response_schema = ResponseSchema(many=True)
-            result = response_schema.dump(submitted_responses)
+                completed_session = TestSessionService.complete_session(session_id)
+                result['session'] = TestSessionSchema(
+                    exclude=('evaluation', 'beneficiary', 'responses')
+                ).dump(completed_session)
             
-            return jsonify({
-                'message': f'{len(submitted_responses)} responses submitted successfully',
-                'responses': result
-            }), 201
+            return jsonify(result), 200
             
         except Exception as e:
             current_app.logger.exception(f"Submit all responses error: {str(e)}")
             return jsonify({
                 'error': 'server_error',
                 'message': 'An unexpected error occurred'
-            }), 500
\ No newline at end of file
+            }), 500
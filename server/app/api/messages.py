@@ -6,6 +6,7 @@ from datetime import datetime
 from app import db
 from app.models.user import User
 from app.models.notification import MessageThread, ThreadParticipant, Message, ReadReceipt
+from app.services.unread_counters import unread_counters
 
 messages_bp = Blueprint('messages', __name__)
 
@@ -20,6 +21,8 @@ def get_message_threads():
         ThreadParticipant.user_id == user_id
     ).order_by(MessageThread.updated_at.desc()).all()
     
+    unread = unread_counters.thread_counts(user_id)['threads']
+    
     result = []
     for thread in threads:
         # Get last message
@@ -27,8 +30,7 @@ def get_message_threads():
             .order_by(Message.created_at.desc()).first()
         
         # Get unread count
-        unread_count = Message.query.filter_by(thread_id=thread.id)\
-            .filter(~Message.read_receipts.any(user_id=user_id)).count()
+        unread_count = unread.get(thread.id, 0)
         
         # Get other participants
         participants = ThreadParticipant.query.filter(
@@ -128,6 +130,7 @@ def get_thread_messages(thread_id):
         .paginate(page=page, per_page=per_page)
     
     result = []
+    newly_read = 0
     for message in messages.items:
         # Mark as read
         read_receipt = ReadReceipt.query.filter_by(
@@ -141,6 +144,8 @@ def get_thread_messages(thread_id):
                 user_id=user_id
             )
             db.session.add(read_receipt)
+            if message.sender_id != int(user_id):
+                newly_read += 1
         
         result.append({
             'id': message.id,
@@ -157,6 +162,7 @@ def get_thread_messages(thread_id):
         })
     
     db.session.commit()
+    unread_counters.thread_read(user_id, thread_id, newly_read)
     
     return jsonify({
         'messages': result,
@@ -197,6 +203,12 @@ def send_message(thread_id):
         
         db.session.commit()
         
+        recipient_ids = [uid for (uid,) in db.session.query(ThreadParticipant.user_id).filter(
+            ThreadParticipant.thread_id == thread_id,
+            ThreadParticipant.user_id != int(user_id)
+        )]
+        unread_counters.message_posted(thread_id, recipient_ids)
+        
         return jsonify({
             'id': message.id,
             'content': message.content,
@@ -254,7 +266,21 @@ def delete_message(message_id):
     if message.sender_id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
+    # Recipients who had not read the message yet
+    unread_by = [uid for (uid,) in db.session.query(ThreadParticipant.user_id).filter(
+        ThreadParticipant.thread_id == message.thread_id,
+        ThreadParticipant.user_id != message.sender_id,
+        ~db.session.query(ReadReceipt.id).filter(
+            ReadReceipt.message_id == message.id,
+            ReadReceipt.user_id == ThreadParticipant.user_id
+        ).exists()
+    )]
+    thread_id = message.thread_id
+    
     db.session.delete(message)
     db.session.commit()
     
+    for uid in unread_by:
+        unread_counters.thread_read(uid, thread_id, 1)
+    
     return jsonify({'message': 'Message deleted successfully'}), 200
\ No newline at end of file
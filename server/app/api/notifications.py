@@ -8,12 +8,16 @@ from app.extensions import db
 from app.models.notification import Notification
 from app.models.user import User
 from app.services.notification_service import NotificationService
+from app.middleware.query_guard import query_budget
+from app.schemas.projections import NOTIFICATION
+from app.utils.serialization import sparse
 
 notifications_bp = Blueprint('notifications', __name__)
 
 
 @notifications_bp.route('/notifications', methods=['GET'])
 @jwt_required()
+@query_budget(8)
 def get_notifications():
     """Get all notifications for the current user."""
     user_id = get_jwt_identity()
@@ -30,7 +34,8 @@ def get_notifications():
         limit=limit,
         offset=offset,
         unread_only=unread_only,
-        type=notification_type
+        type=notification_type,
+        projection=sparse(NOTIFICATION)
     )
     
     # Get unread count
@@ -3,8 +3,7 @@
 from flask import Blueprint
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
-from app.extensions import db
-from app.models.notification import Notification
+from app.services.unread_counters import unread_counters
 
 notifications_unread_bp = Blueprint('notifications_unread', __name__)
 
@@ -14,11 +13,10 @@ def get_unread_count():
     """Get unread notifications count for the current user."""
     user_id = get_jwt_identity()
     
-    unread_count = Notification.query.filter_by(
-        user_id=user_id,
-        read=False
-    ).count()
+    counts = unread_counters.notification_counts(user_id)
     
     return {
-        'count': unread_count
+        'count': counts['total'],
+        'by_type': counts['by_type'],
+        'messages': unread_counters.thread_counts(user_id)['total']
     }, 200
\ No newline at end of file
@@ -1,8 +1,9 @@
 """Portal API for student/beneficiary dashboard."""
 
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import or_, and_, func
+from flask_jwt_extended import jwt_required, get_jwt_identity, current_user
+from sqlalchemy import or_, and_, select
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 
 from app.extensions import db
@@ -12,12 +13,31 @@ from app.models import (
     TestSet, Question, Response, AIFeedback
 )
 from app.middleware.request_context import auth_required, role_required
+from app.middleware.http_cache import conditional, data_version
+from app.services.portal_stats import PortalStatsService
 from app.utils import cache_response
 
 
 portal_bp = Blueprint('portal', __name__)
 
 
+def portal_version():
+    """Data version of the current student's portal, for conditional GETs."""
+    user_id = int(get_jwt_identity())
+    beneficiary_id = select(Beneficiary.id).where(Beneficiary.user_id == user_id).scalar_subquery()
+    return data_version(
+        (User, User.id == user_id),
+        (Beneficiary, Beneficiary.user_id == user_id),
+        (ProgramEnrollment, ProgramEnrollment.beneficiary_id == beneficiary_id),
+        (SessionAttendance, SessionAttendance.beneficiary_id == beneficiary_id),
+        (TestSession, TestSession.beneficiary_id == beneficiary_id),
+        (Appointment, Appointment.beneficiary_id == beneficiary_id),
+        (Document, Document.beneficiary_id == beneficiary_id),
+        (Evaluation, Evaluation.beneficiary_id == beneficiary_id),
+        Program, TrainingSession, TestSet
+    )
+
+
 @portal_bp.route('/test', methods=['GET'])
 def test_portal():
     """Test endpoint to verify portal API is working."""
@@ -30,6 +50,7 @@ def test_portal():
 
 @portal_bp.route('/dashboard', methods=['GET'])
 @jwt_required()
+@conditional(portal_version, max_age=60)
 def get_dashboard():
     """Get student portal dashboard data."""
     try:
@@ -52,15 +73,18 @@ def get_dashboard():
                 'message': 'Beneficiary profile not found for this user'
             }), 404
         
-        # Get enrolled programs
-        enrollments = ProgramEnrollment.query.filter_by(
-            beneficiary_id=beneficiary.id,
-            status='enrolled'
-        ).all()
+        # Enrollment and attendance aggregates
+        stats = PortalStatsService.get(beneficiary.id)
+        enrollments = [entry['enrollment'] for entry in stats['programs']]
+        active = [enrollment for enrollment in enrollments if enrollment['status'] == 'enrolled']
         
         # Get upcoming sessions
         upcoming_sessions = db.session.query(TrainingSession).join(
             SessionAttendance
+        ).options(
+            joinedload(TrainingSession.program),
+            joinedload(TrainingSession.module),
+            joinedload(TrainingSession.trainer)
         ).filter(
             SessionAttendance.beneficiary_id == beneficiary.id,
             TrainingSession.session_date >= datetime.utcnow(),
@@ -73,16 +97,10 @@ def get_dashboard():
         ).order_by(TestSession.created_at.desc()).limit(5).all()
         
         # Calculate overall progress
-        total_progress = 0
-        completed_programs = 0
-        
-        for enrollment in enrollments:
-            if enrollment.progress:
-                total_progress += enrollment.progress
-            if enrollment.status == 'completed':
-                completed_programs += 1
-        
-        average_progress = total_progress / len(enrollments) if enrollments else 0
+        completed_programs = sum(1 for e in enrollments if e['status'] == 'completed')
+        average_progress = sum(e['progress'] for e in active) / len(active) if active else 0
+        attendance = stats['attendance']
+        attendance_rate = 100.0 * attendance['attended'] / attendance['total'] if attendance['total'] else 0
         
         return jsonify({
             'user': {
@@ -93,10 +111,10 @@ def get_dashboard():
             },
             'beneficiary': beneficiary.to_dict(),
             'stats': {
-                'enrolled_programs': len(enrollments),
+                'enrolled_programs': len(active),
                 'completed_programs': completed_programs,
                 'average_progress': round(average_progress, 2),
-                'total_attendance_rate': beneficiary.attendance_rate if hasattr(beneficiary, 'attendance_rate') else 0
+                'total_attendance_rate': round(attendance_rate, 2)
             },
             'upcoming_sessions': [session.to_dict() for session in upcoming_sessions],
             'recent_tests': [test.to_dict() for test in recent_tests]
@@ -111,6 +129,7 @@ def get_dashboard():
 
 @portal_bp.route('/courses', methods=['GET'])
 @jwt_required()
+@conditional(portal_version, max_age=60)
 def get_courses():
     """Get student's enrolled courses/programs."""
     try:
@@ -184,6 +203,7 @@ def get_courses():
 
 @portal_bp.route('/progress', methods=['GET'])
 @jwt_required()
+@conditional(portal_version, max_age=60)
 def get_progress():
     """Get student's progress tracking across all programs."""
     try:
@@ -202,60 +222,33 @@ def get_progress():
                 'message': 'Beneficiary profile not found'
             }), 404
         
-        # Get all enrollments
-        enrollments = ProgramEnrollment.query.filter_by(
-            beneficiary_id=beneficiary.id
-        ).all()
+        # Attendance and scores of every program, grouped by program
+        programs = PortalStatsService.get(beneficiary.id)['programs']
+        enrollments = [entry['enrollment'] for entry in programs]
         
         progress_data = []
         
-        for enrollment in enrollments:
-            # Get attendance for this program
-            attended_sessions = db.session.query(SessionAttendance).join(
-                TrainingSession
-            ).filter(
-                TrainingSession.program_id == enrollment.program_id,
-                SessionAttendance.beneficiary_id == beneficiary.id,
-                SessionAttendance.status == 'present'
-            ).count()
-            
-            total_sessions = TrainingSession.query.filter_by(
-                program_id=enrollment.program_id
-            ).count()
-            
-            # Get test scores for this program
-            test_scores = db.session.query(
-                func.avg(TestSession.score)
-            ).join(TestSet).filter(
-                TestSet.tenant_id == enrollment.program.tenant_id,
-                TestSession.beneficiary_id == beneficiary.id,
-                TestSession.status == 'completed'
-            ).scalar() or 0
-            
+        for entry in programs:
+            enrollment = entry['enrollment']
             progress_data.append({
-                'program': {
-                    'id': enrollment.program.id,
-                    'name': enrollment.program.name,
-                    'code': enrollment.program.code,
-                    'category': enrollment.program.category
-                },
-                'enrollment_date': enrollment.enrollment_date.isoformat(),
-                'status': enrollment.status,
-                'progress_percent': enrollment.progress,
+                'program': entry['program'],
+                'enrollment_date': enrollment['enrollment_date'],
+                'status': enrollment['status'],
+                'progress_percent': enrollment['progress'],
                 'attendance': {
-                    'attended': attended_sessions,
-                    'total': total_sessions,
-                    'rate': enrollment.attendance_rate
+                    'attended': entry['attendance']['attended'],
+                    'total': entry['attendance']['total'],
+                    'rate': enrollment['attendance_rate']
                 },
                 'scores': {
-                    'average': round(test_scores, 2),
-                    'overall': enrollment.overall_score
+                    'average': entry['average_score'],
+                    'overall': enrollment['overall_score']
                 },
                 'completion': {
-                    'is_completed': enrollment.status == 'completed',
-                    'date': enrollment.completion_date.isoformat() if enrollment.completion_date else None,
-                    'certificate_issued': enrollment.certificate_issued,
-                    'certificate_number': enrollment.certificate_number
+                    'is_completed': enrollment['status'] == 'completed',
+                    'date': enrollment['completion_date'],
+                    'certificate_issued': enrollment['certificate_issued'],
+                    'certificate_number': enrollment['certificate_number']
                 }
             })
         
@@ -263,9 +256,9 @@ def get_progress():
             'progress': progress_data,
             'summary': {
                 'total_programs': len(enrollments),
-                'completed_programs': sum(1 for e in enrollments if e.status == 'completed'),
-                'active_programs': sum(1 for e in enrollments if e.status == 'enrolled'),
-                'average_progress': sum(e.progress for e in enrollments) / len(enrollments) if enrollments else 0
+                'completed_programs': sum(1 for e in enrollments if e['status'] == 'completed'),
+                'active_programs': sum(1 for e in enrollments if e['status'] == 'enrolled'),
+                'average_progress': sum(e['progress'] for e in enrollments) / len(enrollments) if enrollments else 0
             }
         })
         
@@ -278,6 +271,7 @@ def get_progress():
 
 @portal_bp.route('/achievements', methods=['GET'])
 @jwt_required()
+@conditional(portal_version, max_age=60)
 def get_achievements():
     """Get student's achievements and badges."""
     try:
@@ -296,49 +290,42 @@ def get_achievements():
                 'message': 'Beneficiary profile not found'
             }), 404
         
-        # Get completed programs
-        completed_enrollments = ProgramEnrollment.query.filter_by(
-            beneficiary_id=beneficiary.id,
-            status='completed'
-        ).all()
-        
-        # Get all test sessions with high scores
-        high_score_tests = TestSession.query.filter(
-            TestSession.beneficiary_id == beneficiary.id,
-            TestSession.score >= 90,
-            TestSession.status == 'completed'
-        ).all()
+        stats = PortalStatsService.get(beneficiary.id)
+        completed_programs = [entry for entry in stats['programs']
+                              if entry['enrollment']['status'] == 'completed']
+        high_score_tests = stats['high_scores']
         
         # Create achievements list
         achievements = []
         
         # Program completion achievements
-        for enrollment in completed_enrollments:
+        for entry in completed_programs:
+            program, enrollment = entry['program'], entry['enrollment']
             achievements.append({
                 'type': 'program_completion',
-                'title': f'Completed {enrollment.program.name}',
-                'description': f'Successfully completed the {enrollment.program.name} program',
-                'date': enrollment.completion_date.isoformat() if enrollment.completion_date else None,
-                'category': enrollment.program.category,
+                'title': f"Completed {program['name']}",
+                'description': f"Successfully completed the {program['name']} program",
+                'date': enrollment['completion_date'],
+                'category': program['category'],
                 'badge': {
-                    'name': f'{enrollment.program.category}_completion',
+                    'name': f"{program['category']}_completion",
                     'color': 'gold'
                 },
                 'certificate': {
-                    'issued': enrollment.certificate_issued,
-                    'number': enrollment.certificate_number
+                    'issued': enrollment['certificate_issued'],
+                    'number': enrollment['certificate_number']
                 }
             })
         
         # High score achievements
         for test_session in high_score_tests:
-            test_set = TestSet.query.get(test_session.test_set_id)
+            test_set = test_session['test_set']
             achievements.append({
                 'type': 'high_score',
-                'title': f'Excellence in {test_set.title}',
-                'description': f'Scored {test_session.score}% in {test_set.title}',
-                'date': test_session.end_time.isoformat() if test_session.end_time else None,
-                'category': test_set.category,
+                'title': f"Excellence in {test_set['title']}",
+                'description': f"Scored {test_session['score']}% in {test_set['title']}",
+                'date': test_session['end_time'],
+                'category': test_set['category'],
                 'badge': {
                     'name': 'high_achiever',
                     'color': 'silver'
@@ -347,16 +334,13 @@ def get_achievements():
         
         # Perfect attendance achievements
         programs_with_perfect_attendance = []
-        enrollments = ProgramEnrollment.query.filter_by(
-            beneficiary_id=beneficiary.id
-        ).all()
         
-        for enrollment in enrollments:
-            if enrollment.attendance_rate >= 100:
-                programs_with_perfect_attendance.append(enrollment)
+        for entry in stats['programs']:
+            if entry['enrollment']['attendance_rate'] >= 100:
+                programs_with_perfect_attendance.append(entry)
                 achievements.append({
                     'type': 'perfect_attendance',
-                    'title': f'Perfect Attendance - {enrollment.program.name}',
+                    'title': f"Perfect Attendance - {entry['program']['name']}",
                     'description': '100% attendance in program',
                     'date': datetime.utcnow().isoformat(),
                     'category': 'attendance',
@@ -373,7 +357,7 @@ def get_achievements():
             'achievements': achievements,
             'stats': {
                 'total_achievements': len(achievements),
-                'completed_programs': len(completed_enrollments),
+                'completed_programs': len(completed_programs),
                 'high_scores': len(high_score_tests),
                 'perfect_attendance': len(programs_with_perfect_attendance)
             }
@@ -388,6 +372,7 @@ def get_achievements():
 
 @portal_bp.route('/assessments', methods=['GET'])
 @jwt_required()
+@conditional(portal_version, max_age=60)
 def get_assessments():
     """Get student's skill assessments and test results."""
     try:
@@ -480,6 +465,7 @@ def get_assessments():
 
 @portal_bp.route('/calendar', methods=['GET'])
 @jwt_required()
+@conditional(portal_version, max_age=60)
 def get_calendar_events():
     """Get student's calendar events including sessions and appointments."""
     try:
@@ -520,6 +506,8 @@ def get_calendar_events():
         # Get training sessions
         sessions = db.session.query(TrainingSession).join(
             SessionAttendance
+        ).options(
+            joinedload(TrainingSession.program)
         ).filter(
             SessionAttendance.beneficiary_id == beneficiary.id,
             TrainingSession.session_date >= start_date,
@@ -544,7 +532,9 @@ def get_calendar_events():
             })
         
         # Get appointments
-        appointments = Appointment.query.filter(
+        appointments = Appointment.query.options(
+            joinedload(Appointment.trainer)
+        ).filter(
             Appointment.beneficiary_id == beneficiary.id,
             Appointment.start_time >= start_date,
             Appointment.start_time <= end_date
@@ -586,6 +576,7 @@ def get_calendar_events():
 
 @portal_bp.route('/resources', methods=['GET'])
 @jwt_required()
+@conditional(portal_version, max_age=60)
 def get_resources():
     """Get student's resources and documents."""
     try:
@@ -674,6 +665,7 @@ def get_resources():
 
 @portal_bp.route('/profile', methods=['GET'])
 @jwt_required()
+@conditional(portal_version, max_age=60)
 def get_profile():
     """Get student's complete profile information."""
     try:
@@ -8,6 +8,7 @@ from app.extensions import db
 from app.models.user import User
 from app.models.profile import UserProfile
 from app.schemas.profile import UserProfileSchema, UserProfileUpdateSchema
+from app.services.storage_service import storage_service
 
 profile_bp = Blueprint('profile', __name__)
 profile_schema = UserProfileSchema()
@@ -125,30 +126,21 @@ def upload_avatar():
     if not file.filename.lower().endswith(('.png', '.jpg', '.jpeg')):
         return jsonify({"error": "Only PNG and JPG files are allowed"}), 400
     
-    # Save file
-    import os
-    from werkzeug.utils import secure_filename
-    import uuid
-    
-    filename = secure_filename(file.filename)
-    # Generate unique filename
-    unique_filename = f"{uuid.uuid4()}_{filename}"
-    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'avatars', unique_filename)
-    
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    
-    # Save file
-    file.save(file_path)
-    
     # Update profile with avatar URL
     profile = UserProfile.query.filter_by(user_id=user_id).first()
     if not profile:
         profile = UserProfile(user_id=user_id)
         db.session.add(profile)
     
+    # Store the original; resizing happens in the image worker pool
+    avatar_url, error = storage_service.save_profile_picture(
+        file, user_id, previous_url=profile.avatar_url
+    )
+    if error:
+        db.session.rollback()
+        return jsonify({"error": error}), 400
+    
     # Set the avatar URL
-    avatar_url = f"/uploads/avatars/{unique_filename}"
     profile.avatar_url = avatar_url
     db.session.commit()
     
@@ -7,6 +7,9 @@ from app import db
 from app.models.user import User
 from app.models.program import Program, ProgramModule, ProgramEnrollment, TrainingSession, SessionAttendance
 from app.models.beneficiary import Beneficiary
+from app.services.attendance_service import AttendanceService
+from app.services.portal_stats import PortalStatsService
+from app.middleware.query_guard import query_budget
 
 programs_bp = Blueprint('programs', __name__)
 
@@ -208,6 +211,7 @@ def enroll_beneficiary(program_id):
         
         db.session.add(enrollment)
         db.session.commit()
+        PortalStatsService.invalidate(beneficiary_id)
         
         return jsonify(enrollment.to_dict()), 201
         
@@ -312,6 +316,7 @@ def record_attendance(session_id):
         if data.get('status') == 'present':
             existing.check_in_time = datetime.utcnow()
         db.session.commit()
+        PortalStatsService.invalidate(beneficiary_id)
         return jsonify(existing.to_dict()), 200
     
     try:
@@ -326,6 +331,7 @@ def record_attendance(session_id):
         
         db.session.add(attendance)
         db.session.commit()
+        PortalStatsService.invalidate(beneficiary_id)
         
         return jsonify(attendance.to_dict()), 201
         
@@ -334,6 +340,41 @@ def record_attendance(session_id):
         return jsonify({'error': str(e)}), 500
 
 
+@programs_bp.route('/sessions/<int:session_id>/attendance/bulk', methods=['POST'])
+@jwt_required()
+@query_budget(10)
+def record_attendance_bulk(session_id):
+    """Record attendance for a whole session roster in one request.
+
+    Body: ``{"records": [{"beneficiary_id": 1, "status": "present"}, ...]}``;
+    an optional top-level ``status`` applies to records without one.
+    """
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+
+    if user.role not in ['super_admin', 'tenant_admin', 'trainer']:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    session = TrainingSession.query.get_or_404(session_id)
+    if user.role != 'super_admin' and session.program.tenant_id != user.tenant_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    data = request.get_json() or {}
+
+    try:
+        roster = AttendanceService.normalize_roster(data.get('records'), data.get('status'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        summary = AttendanceService.record_bulk(session, roster)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify(summary), 200
+
+
 @programs_bp.route('/programs/categories', methods=['GET'])
 @jwt_required()
 def get_program_categories():
@@ -2,11 +2,35 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.tenant import Tenant
-from app.models.user import User
+from app.models.user import User, user_tenant
+from app.services.tenant_counters import TenantCounterService
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload
 
 tenants_bp = Blueprint('tenants', __name__)
 
+
+def tenant_to_dict(tenant, counter=None):
+    """Serialize a tenant with its maintained counters."""
+    counters = TenantCounterService.counters_dict(counter)
+    return {
+        'id': tenant.id,
+        'name': tenant.name,
+        'slug': tenant.slug,
+        'email': tenant.email,
+        'phone': tenant.phone,
+        'address': tenant.address,
+        'plan': tenant.plan,
+        'max_users': tenant.max_users,
+        'max_beneficiaries': tenant.max_beneficiaries,
+        'is_active': tenant.is_active,
+        'user_count': counters['user_count'],
+        'counters': counters,
+        'created_at': tenant.created_at.isoformat() if tenant.created_at else None,
+        'updated_at': tenant.updated_at.isoformat() if tenant.updated_at else None
+    }
+
+
 @tenants_bp.route('/tenants', methods=['GET'])
 @jwt_required()
 def get_tenants():
@@ -18,23 +42,9 @@ def get_tenants():
         if not user or user.role != 'super_admin':
             return jsonify({'error': 'Unauthorized'}), 403
             
-        tenants = Tenant.query.all()
-        
-        return jsonify([{
-            'id': tenant.id,
-            'name': tenant.name,
-            'slug': tenant.slug,
-            'email': tenant.email,
-            'phone': tenant.phone,
-            'address': tenant.address,
-            'plan': tenant.plan,
-            'max_users': tenant.max_users,
-            'max_beneficiaries': tenant.max_beneficiaries,
-            'is_active': tenant.is_active,
-            'user_count': len(tenant.users),
-            'created_at': tenant.created_at.isoformat() if tenant.created_at else None,
-            'updated_at': tenant.updated_at.isoformat() if tenant.updated_at else None
-        } for tenant in tenants]), 200
+        tenants = Tenant.query.options(joinedload(Tenant.counters)).all()
+        
+        return jsonify([tenant_to_dict(tenant, tenant.counters) for tenant in tenants]), 200
         
     except SQLAlchemyError as e:
         return jsonify({'error': str(e)}), 500
@@ -55,21 +65,7 @@ def get_tenant(tenant_id):
         if not tenant:
             return jsonify({'error': 'Tenant not found'}), 404
             
-        return jsonify({
-            'id': tenant.id,
-            'name': tenant.name,
-            'slug': tenant.slug,
-            'email': tenant.email,
-            'phone': tenant.phone,
-            'address': tenant.address,
-            'plan': tenant.plan,
-            'max_users': tenant.max_users,
-            'max_beneficiaries': tenant.max_beneficiaries,
-            'is_active': tenant.is_active,
-            'user_count': len(tenant.users),
-            'created_at': tenant.created_at.isoformat() if tenant.created_at else None,
-            'updated_at': tenant.updated_at.isoformat() if tenant.updated_at else None
-        }), 200
+        return jsonify(tenant_to_dict(tenant, tenant.counters)), 200
         
     except SQLAlchemyError as e:
         return jsonify({'error': str(e)}), 500
@@ -120,21 +116,7 @@ def create_tenant():
         db.session.add(tenant)
         db.session.commit()
         
-        return jsonify({
-            'id': tenant.id,
-            'name': tenant.name,
-            'slug': tenant.slug,
-            'email': tenant.email,
-            'phone': tenant.phone,
-            'address': tenant.address,
-            'plan': tenant.plan,
-            'max_users': tenant.max_users,
-            'max_beneficiaries': tenant.max_beneficiaries,
-            'is_active': tenant.is_active,
-            'user_count': 0,
-            'created_at': tenant.created_at.isoformat() if tenant.created_at else None,
-            'updated_at': tenant.updated_at.isoformat() if tenant.updated_at else None
-        }), 201
+        return jsonify(tenant_to_dict(tenant, tenant.counters)), 201
         
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -177,21 +159,7 @@ def update_tenant(tenant_id):
             
         db.session.commit()
         
-        return jsonify({
-            'id': tenant.id,
-            'name': tenant.name,
-            'slug': tenant.slug,
-            'email': tenant.email,
-            'phone': tenant.phone,
-            'address': tenant.address,
-            'plan': tenant.plan,
-            'max_users': tenant.max_users,
-            'max_beneficiaries': tenant.max_beneficiaries,
-            'is_active': tenant.is_active,
-            'user_count': len(tenant.users),
-            'created_at': tenant.created_at.isoformat() if tenant.created_at else None,
-            'updated_at': tenant.updated_at.isoformat() if tenant.updated_at else None
-        }), 200
+        return jsonify(tenant_to_dict(tenant, tenant.counters)), 200
         
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -214,7 +182,10 @@ def delete_tenant(tenant_id):
             return jsonify({'error': 'Tenant not found'}), 404
             
         # Check if tenant has users
-        if tenant.users:
+        has_users = db.session.query(user_tenant.c.user_id).filter(
+            user_tenant.c.tenant_id == tenant_id
+        ).first() or User.query.filter_by(tenant_id=tenant_id).first()
+        if has_users:
             return jsonify({'error': 'Cannot delete tenant with users'}), 400
             
         db.session.delete(tenant)
@@ -7,6 +7,7 @@ from sqlalchemy import or_
 from app.extensions import db
 from app.models.test import Test, TestSet, Question
 from app.models.user import User
+from app.utils.scoping import scope_for
 
 tests_bp = Blueprint('tests', __name__)
 
@@ -119,26 +120,9 @@ def get_test_sessions():
     sort = request.args.get('sort', 'created_at')
     order = request.args.get('order', 'desc')
     
-    # Base query
-    query = TestSession.query
-    
-    # Filter by user role
-    if user.role == 'student':
-        # Students see their own test sessions
-        from app.models.beneficiary import Beneficiary
-        beneficiary = Beneficiary.query.filter_by(user_id=user_id).first()
-        if beneficiary:
-            query = query.filter_by(beneficiary_id=beneficiary.id)
-        else:
-            # Return empty if no beneficiary record
-            return jsonify({'sessions': [], 'total': 0, 'pages': 0}), 200
-    elif user.role == 'trainer':
-        # Trainers see test sessions of their beneficiaries
-        from app.models.beneficiary import Beneficiary
-        trainer_beneficiaries = Beneficiary.query.filter_by(trainer_id=user_id).all()
-        beneficiary_ids = [b.id for b in trainer_beneficiaries]
-        query = query.filter(TestSession.beneficiary_id.in_(beneficiary_ids))
-    # Admins see all test sessions within their tenant
+    # Students see their own sessions, trainers those of their
+    # beneficiaries, tenant admins those within their tenant
+    query = scope_for(user, TestSession)
     
     # Apply filters
     if status:
@@ -3,12 +3,13 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow import ValidationError
-import time
 
 from app.extensions import db, logger, limiter
 from app.schemas import UserSchema, UserCreateSchema, UserUpdateSchema, UserProfileSchema
 from app.models import User
 from app.middleware.request_context import admin_required, role_required
+from app.services.storage_service import storage_service
+from app.services.tenant_counters import STAFF_ROLES, QuotaExceeded, TenantCounterService
 
 
 users_bp = Blueprint('users', __name__)
@@ -130,9 +131,6 @@ def get_users():
 def upload_profile_picture():
     """Upload profile picture."""
     try:
-        from werkzeug.utils import secure_filename
-        import os
-        
         user_id = get_jwt_identity()
         user = User.query.get(user_id)
         
@@ -157,24 +155,16 @@ def upload_profile_picture():
                    filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
         
         if file and allowed_file(file.filename):
-            # Create secure filename
-            filename = secure_filename(file.filename)
-            timestamp = str(int(time.time()))
-            filename = f"{user_id}_{timestamp}_{filename}"
-            
-            # Save file
-            upload_folder = current_app.config['UPLOAD_FOLDER']
-            profile_pictures_folder = os.path.join(upload_folder, 'profile_pictures')
-            
-            # Create directory if it doesn't exist
-            if not os.path.exists(profile_pictures_folder):
-                os.makedirs(profile_pictures_folder)
-            
-            file_path = os.path.join(profile_pictures_folder, filename)
-            file.save(file_path)
+            # Store the original; resizing happens in the image worker pool
+            profile_picture, error = storage_service.save_profile_picture(
+                file, user_id, previous_url=user.profile_picture
+            )
+            if error:
+                db.session.rollback()
+                return jsonify({'error': error}), 400
             
             # Update user's profile picture URL
-            user.profile_picture = f'/uploads/profile_pictures/{filename}'
+            user.profile_picture = profile_picture
             db.session.commit()
             
             return jsonify({
@@ -257,6 +247,16 @@ def create_user():
             'is_active': True
         }
         
+        if user_data['tenant_id'] and user_data['role'] in STAFF_ROLES:
+            try:
+                TenantCounterService.check_quota(user_data['tenant_id'], 'users')
+            except QuotaExceeded as e:
+                db.session.rollback()
+                return jsonify({
+                    'error': 'quota_exceeded',
+                    'message': str(e)
+                }), 403
+        
         user = User(**user_data)
         db.session.add(user)
         db.session.commit()
@@ -0,0 +1,282 @@
+"""Flask CLI commands for schema setup, seeding, diagnostics and mail delivery."""
+
+import os
+import re
+import subprocess
+import sys
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app.extensions import db
+
+
+DEFAULT_TENANT = {
+    'name': 'Default',
+    'slug': 'default',
+    'email': 'admin@default.com',
+    'is_active': True
+}
+
+DEFAULT_USERS = [
+    {
+        'email': 'admin@bdc.com',
+        'username': 'admin',
+        'password': 'Admin123!',
+        'first_name': 'Admin',
+        'last_name': 'User',
+        'role': 'super_admin'
+    },
+    {
+        'email': 'tenant@bdc.com',
+        'username': 'tenant',
+        'password': 'Tenant123!',
+        'first_name': 'Tenant',
+        'last_name': 'Admin',
+        'role': 'tenant_admin'
+    },
+    {
+        'email': 'trainer@bdc.com',
+        'username': 'trainer',
+        'password': 'Trainer123!',
+        'first_name': 'Trainer',
+        'last_name': 'User',
+        'role': 'trainer'
+    },
+    {
+        'email': 'student@bdc.com',
+        'username': 'student',
+        'password': 'Student123!',
+        'first_name': 'Student',
+        'last_name': 'User',
+        'role': 'student'
+    }
+]
+
+
+def create_schema():
+    """Create all database tables that do not exist yet."""
+    db.create_all()
+
+
+def seed_default_data():
+    """Create the default tenant and the default test users.
+
+    Existing users get their password reset so the documented test
+    credentials always work. All changes are committed in one transaction.
+    """
+    from app.models.user import User
+    from app.models.tenant import Tenant
+
+    tenant = Tenant.query.first()
+    if not tenant:
+        tenant = Tenant(**DEFAULT_TENANT)
+        db.session.add(tenant)
+        current_app.logger.info("Created default tenant")
+
+    emails = [user_data['email'] for user_data in DEFAULT_USERS]
+    existing = {
+        user.email: user
+        for user in User.query.filter(User.email.in_(emails)).all()
+    }
+
+    for user_data in DEFAULT_USERS:
+        user = existing.get(user_data['email'])
+        if not user:
+            user = User(
+                email=user_data['email'],
+                username=user_data['username'],
+                first_name=user_data['first_name'],
+                last_name=user_data['last_name'],
+                role=user_data['role'],
+                is_active=True
+            )
+            db.session.add(user)
+            current_app.logger.info(f"Created user: {user_data['email']}")
+
+        # Always reset password for testing
+        user.password = user_data['password']
+
+        if hasattr(user, 'tenants') and tenant not in user.tenants:
+            user.tenants.append(tenant)
+
+    db.session.commit()
+    return len(DEFAULT_USERS)
+
+
+def profile_imports(target, limit=25):
+    """Measure import cost of ``target`` in a fresh interpreter.
+
+    Runs ``python -X importtime`` and aggregates the per-module report.
+
+    Args:
+        target: Python statement to execute, e.g. ``from app import create_app``
+        limit: Number of most expensive modules to return
+
+    Returns:
+        tuple: (rows, total_us) where rows is a list of
+        ``(module, self_us, cumulative_us)`` sorted by cumulative time
+    """
+    # Profile the import/factory cost only; never create or seed the database
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1', AUTO_INIT_DB='False')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', target],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(current_app.root_path),
+        env=env
+    )
+
+    pattern = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+    rows = []
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = pattern.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us = int(match.group(1)), int(match.group(2))
+        depth = len(match.group(3)) - 1
+        module = match.group(4)
+        rows.append((module, self_us, cumulative_us))
+        if depth == 0:
+            total_us += cumulative_us
+
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows[:limit], total_us
+
+
+def register_commands(app):
+    """Register CLI commands on the application."""
+
+    @app.cli.command('init-db')
+    @with_appcontext
+    def init_db_command():
+        """Create database tables."""
+        create_schema()
+        click.echo('Database schema created.')
+
+    @app.cli.command('seed-db')
+    @with_appcontext
+    def seed_db_command():
+        """Create the default tenant and test users."""
+        count = seed_default_data()
+        click.echo(f'Seeded default tenant and {count} users.')
+
+    @app.cli.command('profile-startup')
+    @click.option('--limit', default=25, show_default=True,
+                  help='Number of modules to show.')
+    @click.option('--target', default='from app import create_app; create_app()',
+                  show_default=True, help='Statement to profile.')
+    @with_appcontext
+    def profile_startup_command(limit, target):
+        """Report per-import cost of application startup."""
+        rows, total_us = profile_imports(target, limit)
+        if not rows:
+            click.echo('No import timings collected.', err=True)
+            return
+
+        click.echo(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        for module, self_us, cumulative_us in rows:
+            click.echo(f'{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {module}')
+        click.echo(f'Total import time: {total_us / 1000:.1f} ms')
+
+    @app.cli.command('send-mail')
+    @click.option('--limit', default=None, type=int, help='Maximum emails to process.')
+    @with_appcontext
+    def send_mail_command(limit):
+        """Deliver queued emails from the mail outbox."""
+        from app.services.mail_outbox import mail_outbox
+
+        totals = mail_outbox.process_pending(limit)
+        click.echo(
+            f"Sent {totals['sent']}, retrying {totals['retried']}, failed {totals['failed']}."
+        )
+
+    @app.cli.command('reconcile-tenant-counters')
+    @click.option('--tenant', 'tenant_ids', multiple=True, type=int, help='Tenant to reconcile (repeatable).')
+    @with_appcontext
+    def reconcile_tenant_counters_command(tenant_ids):
+        """Recompute denormalized tenant counters from the source tables."""
+        from app.services.tenant_counters import TenantCounterService
+
+        drifted = TenantCounterService.reconcile(list(tenant_ids) or None)
+        click.echo(f'Reconciled tenant counters; {len(drifted)} tenants had drifted.')
+
+    @app.cli.command('reconcile-unread-counters')
+    @click.option('--user', 'user_ids', multiple=True, type=int, help='User to reconcile (repeatable).')
+    @with_appcontext
+    def reconcile_unread_counters_command(user_ids):
+        """Rebuild cached unread counters from the database."""
+        from app.services.unread_counters import unread_counters
+
+        drifted = unread_counters.reconcile(list(user_ids) or None)
+        click.echo(f'Reconciled unread counters; {len(drifted)} users had drifted.')
+
+    @app.cli.command('run-scheduler')
+    @with_appcontext
+    def run_scheduler_command():
+        """Run the job scheduler in the foreground until interrupted."""
+        import time
+        from app.services.scheduler import scheduler
+
+        scheduler.start()
+        click.echo(f'Scheduler {scheduler.holder} running every {scheduler.interval}s; Ctrl+C to stop')
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            scheduler.stop()
+
+    @app.cli.command('run-scheduled-reports')
+    @with_appcontext
+    def run_scheduled_reports_command():
+        """Run due scheduled reports once, without taking the scheduler lease."""
+        from app.services.report_runner import ReportRunner
+
+        ran = ReportRunner.run_due()
+        click.echo(f'Ran {ran} scheduled reports.')
+
+    @app.cli.command('regrade-responses')
+    @click.argument('test_set_id', type=int, required=False)
+    @with_appcontext
+    def regrade_responses_command(test_set_id):
+        """Re-grade a test set now, or run queued re-grade jobs."""
+        from app.services.regrade import RegradeService
+
+        if test_set_id is None:
+            ran = RegradeService.run_pending()
+            click.echo(f'Ran {ran} re-grade jobs.')
+            return
+
+        def report(job):
+            click.echo(f'{job.processed_responses}/{job.total_responses} responses, '
+                       f'{job.changed_responses} changed')
+
+        job = RegradeService.enqueue(test_set_id, reason='manual')
+        job = RegradeService.run(job, progress=report)
+        click.echo(f'Re-grade {job.status}: {job.changed_responses} responses changed '
+                   f'in {job.sessions_updated} sessions.')
+
+    @app.cli.command('mail-debug-server')
+    @click.option('--host', default='127.0.0.1', show_default=True)
+    @click.option('--port', default=1025, show_default=True)
+    def mail_debug_server_command(host, port):
+        """Run a local SMTP sink that prints received emails."""
+        import time
+        from app.utils.debug_smtp import DebugSMTPServer
+
+        with DebugSMTPServer(host, port) as server:
+            click.echo(f'Debug SMTP server listening on {host}:{server.port}')
+            seen = 0
+            try:
+                while True:
+                    for message in server.messages[seen:]:
+                        click.echo(f"{message['mail_from']} -> {', '.join(message['rcpt_tos'])}")
+                        click.echo(message['data'].decode('utf-8', 'replace'))
+                    seen = len(server.messages)
+                    time.sleep(0.5)
+            except KeyboardInterrupt:
+                pass
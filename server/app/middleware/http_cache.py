@@ -0,0 +1,148 @@
+"""Conditional GET and response compression.
+
+``conditional`` computes a weak ETag from a cheap data version (row counts
+and ``updated_at`` maxima of the tables a view reads) before the view
+runs, so polling clients get a 304 without the view's expensive queries.
+``init_compression`` gzip- or brotli-encodes responses above
+``COMPRESS_MIN_SIZE``.
+"""
+
+import gzip
+import hashlib
+import time
+from functools import wraps
+
+from flask import current_app, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import func, select
+
+from app.extensions import db
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+
+def data_version(*sources):
+    """
+    Summarize the state of some tables in a single query.
+
+    Args:
+        *sources: ``Model`` or ``(Model, *criteria)`` tuples
+
+    Returns:
+        tuple: (token, last_modified) where token changes whenever a row is
+        inserted, deleted or updated and last_modified is the newest
+        ``updated_at`` (or None)
+    """
+    columns = []
+    for source in sources:
+        model, *criteria = source if isinstance(source, tuple) else (source,)
+        stamp = getattr(model, 'updated_at', None) or getattr(model, 'created_at')
+        columns.append(select(func.count()).select_from(model).where(*criteria).scalar_subquery())
+        columns.append(select(func.max(stamp)).where(*criteria).scalar_subquery())
+
+    row = db.session.execute(select(*columns)).one()
+    stamps = [value for value in row[1::2] if value is not None]
+    last_modified = max(stamps) if stamps else None
+    token = '|'.join(str(value) for value in row)
+    return token, last_modified
+
+
+def _etag(token):
+    key = '|'.join([
+        request.endpoint or '',
+        str(get_jwt_identity() or ''),
+        str(sorted(request.args.items(multi=True))),
+        token
+    ])
+    return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+
+def _not_modified(etag, last_modified, use_last_modified):
+    """Evaluate If-None-Match, then If-Modified-Since."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if use_last_modified and last_modified and request.if_modified_since:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    return False
+
+
+def conditional(version, max_age=None):
+    """
+    Decorator answering conditional GETs from a cheap data version.
+
+    Args:
+        version (callable): Called with the view's arguments; returns
+            ``(token, last_modified)``, usually via ``data_version``
+        max_age (int): Also change the ETag every ``max_age`` seconds, for
+            views whose output depends on the current time
+
+    Returns:
+        function: Decorated function
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if request.method != 'GET' or not current_app.config.get('CONDITIONAL_REQUESTS', True):
+                return f(*args, **kwargs)
+
+            token, last_modified = version(*args, **kwargs)
+            if max_age:
+                token = f"{token}|{int(time.time() // max_age)}"
+            etag = _etag(token)
+
+            if _not_modified(etag, last_modified, use_last_modified=not max_age):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            if last_modified and not max_age:
+                response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Authorization')
+            return response
+        return decorated
+    return decorator
+
+
+def _choose_encoding():
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+
+def _compress(response):
+    config = current_app.config
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in config.get('COMPRESS_MIMETYPES', ())):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if response.content_length is not None and response.content_length < config.get('COMPRESS_MIN_SIZE', 1024):
+        return response
+
+    encoding = _choose_encoding()
+    if not encoding:
+        return response
+
+    data = response.get_data()
+    if encoding == 'br':
+        body = brotli.compress(data, quality=config.get('COMPRESS_BROTLI_QUALITY', 4))
+    else:
+        body = gzip.compress(data, compresslevel=config.get('COMPRESS_LEVEL', 6), mtime=0)
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_compression(app):
+    """Compress responses when ``COMPRESS_RESPONSES`` is set."""
+    if app.config.get('COMPRESS_RESPONSES'):
+        app.after_request(_compress)
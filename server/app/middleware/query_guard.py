@@ -0,0 +1,76 @@
+"""SQL query budget guard.
+
+Counts the statements each request executes and flags requests that go
+over budget, so N+1 regressions show up in development logs and fail the
+test suite. Endpoints may declare their own budget with ``query_budget``;
+the rest use ``SQL_QUERY_BUDGET``.
+"""
+
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised when a request executes more statements than its budget."""
+
+
+def query_budget(limit):
+    """
+    Decorator declaring the number of SQL statements a view may execute.
+
+    Args:
+        limit (int): Maximum statements per request
+
+    Returns:
+        function: Decorated function
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            return f(*args, **kwargs)
+        decorated.query_budget = limit
+        return decorated
+    return decorator
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    """Count a statement against the current request."""
+    if has_request_context() and '_query_count' in g:
+        g._query_count += 1
+
+
+def _start_counting():
+    g._query_count = 0
+
+
+def _check_budget(response):
+    count = g.pop('_query_count', None)
+    if count is None:
+        return response
+
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None) or current_app.config.get('SQL_QUERY_BUDGET', 30)
+    response.headers['X-Query-Count'] = str(count)
+
+    if count > budget:
+        message = f"{request.method} {request.path} executed {count} SQL statements (budget {budget})"
+        if current_app.config.get('SQL_QUERY_GUARD_RAISE'):
+            raise QueryBudgetExceeded(message)
+        current_app.logger.warning(message)
+
+    return response
+
+
+def init_query_guard(app):
+    """Enable the query guard when ``SQL_QUERY_GUARD`` is set."""
+    if not app.config.get('SQL_QUERY_GUARD'):
+        return
+
+    if not event.contains(Engine, 'before_cursor_execute', _count_statement):
+        event.listen(Engine, 'before_cursor_execute', _count_statement)
+
+    app.before_request(_start_counting)
+    app.after_request(_check_budget)
@@ -4,20 +4,24 @@ from app.models.user import User, TokenBlocklist, UserRole
 from app.models.beneficiary import Beneficiary, Note, BeneficiaryAppointment, BeneficiaryDocument
 from app.models.appointment import Appointment
 from app.models.document import Document
-from app.models.test import Test, TestSet, Question, TestSession, Response, AIFeedback
+from app.models.test import Test, TestSet, Question, TestSession, Response, AIFeedback, RegradeJob
 from app.models.notification import Notification, MessageThread, ThreadParticipant, Message, ReadReceipt
 from app.models.evaluation import Evaluation
-from app.models.tenant import Tenant
+from app.models.tenant import Tenant, TenantCounter
 from app.models.folder import Folder
-from app.models.report import Report, ReportSchedule
+from app.models.report import Report, ReportSchedule, ReportRun
 from app.models.program import Program, ProgramModule, ProgramEnrollment, TrainingSession, SessionAttendance
 from app.models.profile import UserProfile
 from app.models.availability import AvailabilitySchedule, AvailabilitySlot, AvailabilityException
+from app.models.file_blob import FileBlob, UploadSession
+from app.models.email_outbox import OutboxEmail
+from app.models.scheduler import SchedulerLease
 
 # Export all models
 __all__ = [
     'User',
     'Tenant',
+    'TenantCounter',
     'TokenBlocklist',
     'UserRole',
     'Beneficiary',
@@ -33,6 +37,7 @@ __all__ = [
     'TestSession',
     'Response',
     'AIFeedback',
+    'RegradeJob',
     'Notification',
     'MessageThread',
     'ThreadParticipant',
@@ -41,6 +46,7 @@ __all__ = [
     'Folder',
     'Report',
     'ReportSchedule',
+    'ReportRun',
     'Program',
     'ProgramModule',
     'ProgramEnrollment',
@@ -49,5 +55,9 @@ __all__ = [
     'UserProfile',
     'AvailabilitySchedule',
     'AvailabilitySlot',
-    'AvailabilityException'
+    'AvailabilityException',
+    'FileBlob',
+    'UploadSession',
+    'OutboxEmail',
+    'SchedulerLease'
 ]
\ No newline at end of file
@@ -1,7 +1,7 @@
 """Appointment model module."""
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 
 from app.extensions import db
@@ -9,9 +9,12 @@ from app.extensions import db
 class Appointment(db.Model):
     """Appointment model."""
     __tablename__ = 'appointments'
+    __table_args__ = (
+        Index('ix_appointments_trainer_id_start_time', 'trainer_id', 'start_time'),
+    )
     
     id = Column(Integer, primary_key=True)
-    beneficiary_id = Column(Integer, ForeignKey('beneficiaries.id'), nullable=False)
+    beneficiary_id = Column(Integer, ForeignKey('beneficiaries.id'), nullable=False, index=True)
     trainer_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     title = Column(String(100), nullable=False)
     description = Column(Text, nullable=True)
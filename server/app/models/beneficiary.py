@@ -1,7 +1,7 @@
 """Beneficiary model module."""
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 
 from app.extensions import db
@@ -10,10 +10,13 @@ from app.extensions import db
 class Beneficiary(db.Model):
     """Beneficiary (Student) model."""
     __tablename__ = 'beneficiaries'
+    __table_args__ = (
+        Index('ix_beneficiaries_tenant_id_created_at', 'tenant_id', 'created_at'),
+    )
     
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    trainer_id = Column(Integer, ForeignKey('users.id'), nullable=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    trainer_id = Column(Integer, ForeignKey('users.id'), nullable=True, index=True)
     tenant_id = Column(Integer, ForeignKey('tenants.id'), nullable=False)
     
     # Personal information
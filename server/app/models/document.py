@@ -1,7 +1,7 @@
 """Document model module."""
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 
 from app.extensions import db
@@ -9,6 +9,9 @@ from app.extensions import db
 class Document(db.Model):
     """Document model."""
     __tablename__ = 'documents'
+    __table_args__ = (
+        Index('ix_documents_beneficiary_id_created_at', 'beneficiary_id', 'created_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     title = Column(String(100), nullable=False)
@@ -16,6 +19,7 @@ class Document(db.Model):
     file_path = Column(String(255), nullable=False)
     file_type = Column(String(20), nullable=False)
     file_size = Column(Integer, nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256, see FileBlob
     document_type = Column(String(50), nullable=False, default='general')
     is_active = Column(Boolean, default=True)
     upload_by = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -38,6 +42,7 @@ class Document(db.Model):
             'file_path': self.file_path,
             'file_type': self.file_type,
             'file_size': self.file_size,
+            'content_hash': self.content_hash,
             'document_type': self.document_type,
             'is_active': self.is_active,
             'upload_by': self.upload_by,
@@ -0,0 +1,54 @@
+"""Durable outgoing email queue model."""
+
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Index
+
+from app.extensions import db
+
+
+class OutboxEmail(db.Model):
+    """One queued email for a single recipient.
+
+    Rows are written by ``send_email`` and delivered by the mail outbox
+    workers, which claim pending rows, send them over pooled SMTP
+    connections and record the outcome.
+    """
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    recipient = Column(String(255), nullable=False)
+    domain = Column(String(255), nullable=False, index=True)
+    sender = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    text_body = Column(Text, nullable=True)
+    html_body = Column(Text, nullable=True)
+    attachments = Column(JSON, nullable=True)  # [{'filename', 'content_type', 'data' (base64)}]
+    status = Column(String(20), nullable=False, default='pending')  # 'pending', 'sending', 'sent', 'failed'
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    claimed_by = Column(String(64), nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    def to_dict(self):
+        """Return a dict representation of the queued email."""
+        return {
+            'id': self.id,
+            'recipient': self.recipient,
+            'subject': self.subject,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
+
+    def __repr__(self):
+        """String representation of the queued email."""
+        return f'<OutboxEmail {self.id} {self.recipient} {self.status}>'
@@ -0,0 +1,78 @@
+"""Content-addressed file storage models."""
+
+from datetime import datetime
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+
+from app.extensions import db
+
+
+class FileBlob(db.Model):
+    """A stored file identified by the SHA-256 of its content.
+
+    Identical uploads share one blob on disk; ``ref_count`` tracks how many
+    records (documents, attachments, ...) point at it.
+    """
+    __tablename__ = 'file_blobs'
+
+    id = Column(Integer, primary_key=True)
+    sha256 = Column(String(64), nullable=False, unique=True, index=True)
+    size = Column(BigInteger, nullable=False)
+    storage_path = Column(String(255), nullable=False)  # Relative to UPLOAD_FOLDER
+    extension = Column(String(20), nullable=True)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_referenced_at = Column(DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Return a dict representation of the blob."""
+        return {
+            'id': self.id,
+            'sha256': self.sha256,
+            'size': self.size,
+            'storage_path': self.storage_path,
+            'extension': self.extension,
+            'ref_count': self.ref_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        """String representation of the blob."""
+        return f'<FileBlob {self.sha256[:12]} refs={self.ref_count}>'
+
+
+class UploadSession(db.Model):
+    """A resumable chunked upload in progress."""
+    __tablename__ = 'upload_sessions'
+
+    id = Column(String(36), primary_key=True)  # UUID
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    filename = Column(String(255), nullable=False)
+    file_type = Column(String(20), nullable=False, default='document')
+    total_size = Column(BigInteger, nullable=False)
+    received_size = Column(BigInteger, nullable=False, default=0)
+    status = Column(String(20), nullable=False, default='pending')  # 'pending', 'completed', 'aborted'
+    content_hash = Column(String(64), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    user = relationship('User', backref='upload_sessions')
+
+    def to_dict(self):
+        """Return a dict representation of the upload session."""
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'file_type': self.file_type,
+            'total_size': self.total_size,
+            'received_size': self.received_size,
+            'status': self.status,
+            'content_hash': self.content_hash,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def __repr__(self):
+        """String representation of the upload session."""
+        return f'<UploadSession {self.id} {self.received_size}/{self.total_size}>'
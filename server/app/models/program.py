@@ -239,6 +239,9 @@ class TrainingSession(db.Model):
 class SessionAttendance(db.Model):
     """Model for session attendance."""
     __tablename__ = 'session_attendance'
+    __table_args__ = (
+        db.UniqueConstraint('session_id', 'beneficiary_id', name='uq_session_attendance_session_beneficiary'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.Integer, db.ForeignKey('training_sessions.id'), nullable=False)
@@ -37,6 +37,8 @@ class Report(db.Model):
     created_by = db.relationship('User', back_populates='reports')
     tenant = db.relationship('Tenant', back_populates='reports')
     schedules = db.relationship('ReportSchedule', back_populates='report', cascade='all, delete-orphan')
+    runs = db.relationship('ReportRun', back_populates='report', cascade='all, delete-orphan',
+                           lazy='dynamic', order_by='ReportRun.version.desc()')
     
     def to_dict(self):
         """Convert report to dictionary."""
@@ -64,6 +66,9 @@ class Report(db.Model):
 class ReportSchedule(db.Model):
     """Model for scheduled reports."""
     __tablename__ = 'report_schedules'
+    __table_args__ = (
+        db.Index('ix_report_schedules_active_next_run', 'is_active', 'next_run'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     report_id = db.Column(db.Integer, db.ForeignKey('reports.id'), nullable=False)
@@ -73,6 +78,7 @@ class ReportSchedule(db.Model):
     schedule_time = db.Column(db.Time)
     day_of_week = db.Column(db.Integer)  # 0-6 for weekly
     day_of_month = db.Column(db.Integer)  # 1-31 for monthly
+    cron = db.Column(db.String(100))  # overrides frequency/time when set, e.g. '30 2 * * 1-5'
     
     # Recipients
     recipients = db.Column(db.JSON, default=[])  # List of email addresses
@@ -83,6 +89,11 @@ class ReportSchedule(db.Model):
     last_run = db.Column(db.DateTime)
     next_run = db.Column(db.DateTime)
     status = db.Column(db.String(20), default='active')  # active, paused, error
+    last_error = db.Column(db.Text)
+    
+    # Claimed by the scheduler while a run is in progress
+    claimed_by = db.Column(db.String(64))
+    claimed_at = db.Column(db.DateTime)
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -104,12 +115,68 @@ class ReportSchedule(db.Model):
             'schedule_time': self.schedule_time.isoformat() if self.schedule_time else None,
             'day_of_week': self.day_of_week,
             'day_of_month': self.day_of_month,
+            'cron': self.cron,
             'recipients': self.recipients,
             'recipients_count': self.recipients_count,
             'is_active': self.is_active,
             'last_run': self.last_run.isoformat() if self.last_run else None,
             'next_run': self.next_run.isoformat() if self.next_run else None,
             'status': self.status,
+            'last_error': self.last_error,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
\ No newline at end of file
+        }
+
+
+class ReportRun(db.Model):
+    """One versioned execution of a report and its stored artifact."""
+    __tablename__ = 'report_runs'
+    __table_args__ = (
+        db.UniqueConstraint('report_id', 'version', name='uq_report_runs_report_version'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    report_id = db.Column(db.Integer, db.ForeignKey('reports.id', ondelete='CASCADE'), nullable=False)
+    schedule_id = db.Column(db.Integer, db.ForeignKey('report_schedules.id', ondelete='SET NULL'))
+    version = db.Column(db.Integer, nullable=False)
+    
+    status = db.Column(db.String(20), default='running')  # running, completed, failed
+    mode = db.Column(db.String(20))  # full, incremental
+    format = db.Column(db.String(20))
+    
+    # Artifact and the cached rows the next incremental run starts from
+    file_path = db.Column(db.String(500))
+    file_size = db.Column(db.Integer)
+    result_path = db.Column(db.String(500))
+    definition_hash = db.Column(db.String(64))
+    
+    row_count = db.Column(db.Integer)
+    changed_rows = db.Column(db.Integer)  # rows recomputed; equals row_count for full runs
+    watermark = db.Column(db.DateTime)  # changes up to this time are included
+    error = db.Column(db.Text)
+    
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    # Relationships
+    report = db.relationship('Report', back_populates='runs')
+    schedule = db.relationship('ReportSchedule')
+    
+    def to_dict(self):
+        """Convert run to dictionary."""
+        return {
+            'id': self.id,
+            'report_id': self.report_id,
+            'schedule_id': self.schedule_id,
+            'version': self.version,
+            'status': self.status,
+            'mode': self.mode,
+            'format': self.format,
+            'file_size': self.file_size,
+            'row_count': self.row_count,
+            'changed_rows': self.changed_rows,
+            'watermark': self.watermark.isoformat() if self.watermark else None,
+            'error': self.error,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,25 @@
+"""Scheduler lease model."""
+
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime
+
+from app.extensions import db
+
+
+class SchedulerLease(db.Model):
+    """A named lease held by one worker at a time.
+
+    The in-process scheduler runs in every worker; only the holder of an
+    unexpired lease executes jobs. Holders renew the lease on every tick,
+    and another worker takes over once it expires.
+    """
+    __tablename__ = 'scheduler_leases'
+
+    name = Column(String(64), primary_key=True)
+    holder = Column(String(64), nullable=False)
+    acquired_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        """String representation of the lease."""
+        return f'<SchedulerLease {self.name} {self.holder}>'
@@ -38,6 +38,7 @@ class Tenant(db.Model):
     folders = relationship('Folder', back_populates='tenant', lazy='dynamic')
     reports = relationship('Report', back_populates='tenant', lazy='dynamic')
     programs = relationship('Program', back_populates='tenant', lazy='dynamic')
+    counters = relationship('TenantCounter', uselist=False, viewonly=True)
     
     def to_dict(self):
         """Convert tenant to dictionary."""
@@ -57,4 +58,32 @@ class Tenant(db.Model):
             'settings': self.settings,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
-        }
\ No newline at end of file
+        }
+
+
+class TenantCounter(db.Model):
+    """Denormalized per-tenant counts, maintained by ``app.services.tenant_counters``."""
+    __tablename__ = 'tenant_counters'
+
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id', ondelete='CASCADE'), primary_key=True)
+    user_count = db.Column(db.Integer, nullable=False, default=0)
+    staff_count = db.Column(db.Integer, nullable=False, default=0)  # admins and trainers
+    trainer_count = db.Column(db.Integer, nullable=False, default=0)
+    beneficiary_count = db.Column(db.Integer, nullable=False, default=0)
+    active_beneficiary_count = db.Column(db.Integer, nullable=False, default=0)
+    program_count = db.Column(db.Integer, nullable=False, default=0)
+    storage_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    reconciled_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        """Convert counters to dictionary."""
+        return {
+            'user_count': self.user_count,
+            'staff_count': self.staff_count,
+            'trainer_count': self.trainer_count,
+            'beneficiary_count': self.beneficiary_count,
+            'active_beneficiary_count': self.active_beneficiary_count,
+            'program_count': self.program_count,
+            'storage_bytes': self.storage_bytes,
+            'reconciled_at': self.reconciled_at.isoformat() if self.reconciled_at else None
+        }
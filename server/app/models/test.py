@@ -2,7 +2,7 @@
 
 from datetime import datetime
 import json
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, Boolean, ForeignKey, JSON, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from app.extensions import db
@@ -160,22 +160,11 @@ class Question(db.Model):
         }
     
     def check_answer(self, answer):
-        """Check if the given answer is correct."""
-        if self.type == 'multiple_choice':
-            if isinstance(self.correct_answer, list):
-                return sorted(answer) == sorted(self.correct_answer)
-            return answer == self.correct_answer
-        elif self.type == 'true_false':
-            return answer == self.correct_answer
-        elif self.type == 'matching':
-            return answer == self.correct_answer
-        elif self.type == 'ordering':
-            return answer == self.correct_answer
-        elif self.type == 'text':
-            # For text questions, this might require more sophisticated checking
-            # like keyword matching or AI-based evaluation
-            return True  # Always mark as correct for now
-        return False
+        """Check if the given answer is fully correct (None if it needs review)."""
+        from app.services.grading import compile_answer
+
+        credit = compile_answer(self.type, self.correct_answer, self.options).credit(answer)
+        return None if credit is None else credit >= 1.0
 
 
 class TestSession(db.Model):
@@ -184,7 +173,7 @@ class TestSession(db.Model):
     
     id = Column(Integer, primary_key=True)
     test_set_id = Column(Integer, ForeignKey('test_sets.id'), nullable=False)
-    beneficiary_id = Column(Integer, ForeignKey('beneficiaries.id'), nullable=False)
+    beneficiary_id = Column(Integer, ForeignKey('beneficiaries.id'), nullable=False, index=True)
     
     # Session state
     start_time = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -228,6 +217,9 @@ class TestSession(db.Model):
 class Response(db.Model):
     """Response model for tracking beneficiary responses to questions."""
     __tablename__ = 'responses'
+    __table_args__ = (
+        UniqueConstraint('session_id', 'question_id', name='uq_responses_session_question'),
+    )
     
     id = Column(Integer, primary_key=True)
     session_id = Column(Integer, ForeignKey('test_sessions.id'), nullable=False)
@@ -264,6 +256,53 @@ class Response(db.Model):
         }
 
 
+class RegradeJob(db.Model):
+    """Background re-grade of a test set's stored responses."""
+    __tablename__ = 'regrade_jobs'
+    
+    id = Column(Integer, primary_key=True)
+    test_set_id = Column(Integer, ForeignKey('test_sets.id', ondelete='CASCADE'), nullable=False, index=True)
+    question_ids = Column(JSON, nullable=True)  # None re-grades every question
+    reason = Column(String(50), nullable=True)  # question_updated, manual, ...
+    requested_by = Column(Integer, ForeignKey('users.id'), nullable=True)
+    
+    status = Column(String(20), default='pending', index=True)  # pending, running, completed, failed
+    claimed_by = Column(String(100), nullable=True)
+    claimed_at = Column(DateTime, nullable=True)  # heartbeat, renewed after every chunk
+    
+    # Progress
+    total_responses = Column(Integer, default=0)
+    processed_responses = Column(Integer, default=0)
+    changed_responses = Column(Integer, default=0)
+    sessions_updated = Column(Integer, default=0)
+    last_session_id = Column(Integer, nullable=True)  # resume point after an interruption
+    error = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    def to_dict(self):
+        """Return a dict representation of the job and its progress."""
+        return {
+            'id': self.id,
+            'test_set_id': self.test_set_id,
+            'question_ids': self.question_ids,
+            'reason': self.reason,
+            'status': self.status,
+            'total_responses': self.total_responses,
+            'processed_responses': self.processed_responses,
+            'changed_responses': self.changed_responses,
+            'sessions_updated': self.sessions_updated,
+            'progress': round(100.0 * self.processed_responses / self.total_responses, 1)
+            if self.total_responses else (100.0 if self.status == 'completed' else 0.0),
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
 class AIFeedback(db.Model):
     """AI-generated feedback model."""
     __tablename__ = 'ai_feedback'
@@ -0,0 +1,58 @@
+"""Compiled projections for list endpoints.
+
+Output matches the corresponding ``to_dict`` methods, except that
+datetimes are encoded by the JSON provider rather than pre-formatted.
+"""
+
+from app.models import Document, Notification
+from app.models.appointment import Appointment
+from app.utils.serialization import Projection
+
+
+def _full_name(user):
+    return f"{user.first_name} {user.last_name}"
+
+
+def _user_summary(user):
+    return {
+        'id': user.id,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'email': user.email
+    }
+
+
+def _appointment_beneficiary(appointment):
+    beneficiary = appointment.beneficiary
+    if beneficiary is None:
+        return None
+    return {**_user_summary(beneficiary.user), 'id': beneficiary.id}
+
+
+def _notification_sender(notification):
+    sender = notification.sender
+    if sender is None:
+        return None
+    return {'id': sender.id, 'name': _full_name(sender), 'email': sender.email}
+
+
+APPOINTMENT = Projection(
+    Appointment,
+    computed={
+        'beneficiary': _appointment_beneficiary,
+        'trainer': lambda a: _user_summary(a.trainer) if a.trainer else None
+    },
+    profile='appointment_list'
+)
+
+DOCUMENT = Projection(
+    Document,
+    computed={'uploader_name': lambda d: _full_name(d.uploader) if d.uploader else None},
+    profile='document_list'
+)
+
+NOTIFICATION = Projection(
+    Notification,
+    computed={'sender': _notification_sender},
+    profile='notification_list'
+)
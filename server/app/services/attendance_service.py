@@ -0,0 +1,181 @@
+"""Attendance service: bulk roster recording."""
+
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import and_, case, func, or_, select, update
+
+from app.extensions import db
+from app.models.program import ProgramEnrollment, SessionAttendance, TrainingSession
+from app.services.portal_stats import PortalStatsService
+from app.utils.bulk import keyed_entries, upsert
+
+ATTENDANCE_STATUSES = ('registered', 'present', 'absent', 'excused')
+
+
+class AttendanceService:
+    """Service for recording session attendance in bulk."""
+
+    @staticmethod
+    def normalize_roster(records, default_status=None):
+        """
+        Validate a roster payload.
+
+        Args:
+            records (list): Dicts with ``beneficiary_id`` and ``status``
+            default_status (str): Status for records that omit one
+
+        Returns:
+            dict: beneficiary_id -> status, last entry wins
+
+        Raises:
+            ValueError: If a record is malformed
+        """
+        limit = current_app.config.get('ATTENDANCE_BULK_MAX', 500)
+        roster = {}
+        for beneficiary_id, record in keyed_entries(records, 'record', 'beneficiary_id', limit):
+            status = record.get('status', default_status)
+            if status not in ATTENDANCE_STATUSES:
+                raise ValueError(f'Invalid status {status!r} for beneficiary {beneficiary_id}')
+            roster[beneficiary_id] = status
+        return roster
+
+    @staticmethod
+    def _upsert(session_id, roster, now):
+        """Insert or update every roster row in one statement."""
+        rows = [{
+            'session_id': session_id,
+            'beneficiary_id': beneficiary_id,
+            'status': status,
+            'check_in_time': now if status == 'present' else None,
+            'created_at': now,
+            'updated_at': now
+        } for beneficiary_id, status in roster.items()]
+
+        def assignments(table, excluded):
+            return {
+                'status': excluded.status,
+                # Keep the first check-in of a beneficiary marked present twice
+                'check_in_time': case(
+                    (excluded.status == 'present',
+                     func.coalesce(table.c.check_in_time, excluded.check_in_time)),
+                    else_=table.c.check_in_time
+                ),
+                'updated_at': excluded.updated_at
+            }
+
+        def merge(record, row):
+            record.status = row['status']
+            if row['status'] == 'present' and not record.check_in_time:
+                record.check_in_time = now
+
+        upsert(SessionAttendance, rows, ('session_id', 'beneficiary_id'), assignments, merge)
+
+    @staticmethod
+    def _refresh_attendance_rates(training_session, beneficiary_ids, now):
+        """
+        Recompute ``attendance_rate`` of the affected enrollments in one UPDATE.
+
+        The rate is the share of the program's held sessions (attendance
+        required, not cancelled, already started or the one being recorded)
+        the beneficiary attended.
+        """
+        held = and_(
+            TrainingSession.program_id == training_session.program_id,
+            TrainingSession.attendance_required.is_(True),
+            TrainingSession.status != 'cancelled',
+            or_(TrainingSession.session_date <= now, TrainingSession.id == training_session.id)
+        )
+        held_count = select(func.count(TrainingSession.id)).where(held).scalar_subquery()
+        attended = (
+            select(func.count(SessionAttendance.id))
+            .join(TrainingSession, TrainingSession.id == SessionAttendance.session_id)
+            .where(
+                held,
+                SessionAttendance.beneficiary_id == ProgramEnrollment.beneficiary_id,
+                SessionAttendance.status == 'present'
+            )
+            .scalar_subquery()
+        )
+
+        db.session.execute(
+            update(ProgramEnrollment)
+            .where(
+                ProgramEnrollment.program_id == training_session.program_id,
+                ProgramEnrollment.beneficiary_id.in_(beneficiary_ids)
+            )
+            .values(
+                attendance_rate=case(
+                    (held_count > 0, 100.0 * attended / held_count),
+                    else_=0.0
+                ),
+                updated_at=now
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def record_bulk(training_session, roster):
+        """
+        Record attendance for a whole roster.
+
+        Args:
+            training_session (TrainingSession): The session
+            roster (dict): beneficiary_id -> status
+
+        Returns:
+            dict: Counts of created and updated records and per-status totals
+
+        Raises:
+            LookupError: If some beneficiaries are not enrolled in the session's program
+        """
+        beneficiary_ids = list(roster)
+        enrolled = set(db.session.scalars(
+            select(ProgramEnrollment.beneficiary_id).where(
+                ProgramEnrollment.program_id == training_session.program_id,
+                ProgramEnrollment.beneficiary_id.in_(beneficiary_ids)
+            )
+        ))
+        missing = sorted(set(beneficiary_ids) - enrolled)
+        if missing:
+            raise LookupError(f"Beneficiaries not enrolled in this program: {', '.join(map(str, missing))}")
+
+        existing = set(db.session.scalars(
+            select(SessionAttendance.beneficiary_id).where(
+                SessionAttendance.session_id == training_session.id,
+                SessionAttendance.beneficiary_id.in_(beneficiary_ids)
+            )
+        ))
+
+        now = datetime.utcnow()
+        try:
+            AttendanceService._upsert(training_session.id, roster, now)
+            AttendanceService._refresh_attendance_rates(training_session, beneficiary_ids, now)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        PortalStatsService.invalidate(*beneficiary_ids)
+
+        totals = {status: 0 for status in ATTENDANCE_STATUSES}
+        for status in roster.values():
+            totals[status] += 1
+
+        summary = {
+            'session_id': training_session.id,
+            'program_id': training_session.program_id,
+            'created': len(set(beneficiary_ids) - existing),
+            'updated': len(existing),
+            'statuses': totals
+        }
+        AttendanceService._broadcast(training_session, summary)
+        return summary
+
+    @staticmethod
+    def _broadcast(training_session, summary):
+        """Send one realtime update for the whole roster."""
+        try:
+            from app.realtime import emit_to_tenant
+            emit_to_tenant(training_session.program.tenant_id, 'attendance_updated', summary)
+        except Exception as e:
+            current_app.logger.warning(f"Attendance update not broadcast: {e}")
@@ -1,6 +1,7 @@
 """Authentication service module."""
 
 from datetime import datetime, timezone
+from flask import current_app
 from flask_jwt_extended import create_access_token, create_refresh_token, get_jwt
 from werkzeug.security import generate_password_hash
 
@@ -77,15 +78,22 @@ class AuthService:
         
         if tenant_id:
             from app.models import Tenant
+            from app.services.tenant_counters import STAFF_ROLES, QuotaExceeded, TenantCounterService
             tenant = Tenant.query.get(tenant_id)
             if tenant:
+                if role in STAFF_ROLES:
+                    try:
+                        TenantCounterService.check_quota(tenant_id, 'users')
+                    except QuotaExceeded as e:
+                        db.session.rollback()
+                        current_app.logger.warning(f"Registration of {email} refused: {e}")
+                        return None
                 user.tenants.append(tenant)
         
         try:
-            db.session.commit()
-            
-            # Send welcome email (non-blocking)
+            # Queue the welcome email with the new account
             send_welcome_email(user)
+            db.session.commit()
             
             return user
         except Exception as e:
@@ -165,7 +173,9 @@ class AuthService:
             return False
         
         # Send password reset email
-        return send_password_reset_email(user)
+        sent = send_password_reset_email(user)
+        db.session.commit()
+        return sent
     
     @staticmethod
     def reset_password(token, password):
@@ -1,12 +1,12 @@
 """Availability service module."""
 
-from datetime import datetime, timedelta, time
+from datetime import datetime, time
 import calendar
 from flask import current_app
 
 from app.extensions import db
 from app.models.availability import AvailabilitySchedule, AvailabilitySlot, AvailabilityException
-from app.models.appointment import Appointment
+from app.services.recurrence import RecurrenceEngine
 
 
 class AvailabilityService:
@@ -79,122 +79,27 @@ class AvailabilityService:
         if not schedule:
             schedule = AvailabilityService.get_or_create_default_schedule(user_id)
         
-        # Get availability slots
-        slots = AvailabilitySlot.query.filter_by(
-            schedule_id=schedule.id
-        ).all()
-        
-        # Get exceptions for the date range
-        exceptions = AvailabilityException.query.filter(
-            AvailabilityException.user_id == user_id,
-            AvailabilityException.date >= start_date,
-            AvailabilityException.date <= end_date
-        ).all()
-        
-        # Get appointments for the date range
-        appointments = Appointment.query.filter(
-            Appointment.trainer_id == user_id,
-            Appointment.start_time >= start_date,
-            Appointment.end_time <= end_date,
-            Appointment.status != 'cancelled'
-        ).all()
-        
-        # Generate daily availability
-        date_range = (end_date - start_date).days + 1
+        # Expand weekly slots, exceptions and appointments day by day
+        engine = RecurrenceEngine.for_schedule(schedule, start_date, end_date)
         availability = []
         
-        for day in range(date_range):
-            current_date = start_date + timedelta(days=day)
-            day_of_week = current_date.weekday()  # 0 = Monday, 6 = Sunday
-            
-            # Get slots for current day
-            day_slots = [slot for slot in slots if slot.day_of_week == day_of_week]
+        for plan in engine.days(start_date, end_date):
+            day_of_week = plan.date.weekday()  # 0 = Monday, 6 = Sunday
             
-            # Get exceptions for current day
-            day_exceptions = [e for e in exceptions if e.date.date() == current_date.date()]
-            
-            # Get appointments for current day
-            day_appointments = [a for a in appointments if a.start_time.date() == current_date.date()]
-            
-            # Format times consistently
-            day_availability = {
-                'date': current_date.strftime('%Y-%m-%d'),
+            availability.append({
+                'date': plan.date.strftime('%Y-%m-%d'),
                 'day_of_week': day_of_week,
                 'day_name': calendar.day_name[day_of_week],
-                'available_slots': [],
-                'unavailable_slots': [],
-                'appointments': []
-            }
-            
-            # First, add regular slots
-            for slot in day_slots:
-                if slot.is_available:
-                    day_availability['available_slots'].append({
-                        'start_time': slot.start_time,
-                        'end_time': slot.end_time,
-                        'type': 'regular'
-                    })
-                else:
-                    day_availability['unavailable_slots'].append({
-                        'start_time': slot.start_time,
-                        'end_time': slot.end_time,
-                        'type': 'regular'
-                    })
-            
-            # Then, apply exceptions
-            for exception in day_exceptions:
-                if exception.start_time and exception.end_time:
-                    # Time-specific exception
-                    if exception.is_available:
-                        day_availability['available_slots'].append({
-                            'start_time': exception.start_time,
-                            'end_time': exception.end_time,
-                            'type': 'exception',
-                            'title': exception.title,
-                            'description': exception.description
-                        })
-                    else:
-                        day_availability['unavailable_slots'].append({
-                            'start_time': exception.start_time,
-                            'end_time': exception.end_time,
-                            'type': 'exception',
-                            'title': exception.title,
-                            'description': exception.description
-                        })
-                else:
-                    # All-day exception
-                    if exception.is_available:
-                        # Clear unavailable slots and add a full day available slot
-                        day_availability['unavailable_slots'] = []
-                        day_availability['available_slots'] = [{
-                            'start_time': '00:00',
-                            'end_time': '23:59',
-                            'type': 'exception',
-                            'title': exception.title,
-                            'description': exception.description
-                        }]
-                    else:
-                        # Clear available slots and add a full day unavailable slot
-                        day_availability['available_slots'] = []
-                        day_availability['unavailable_slots'] = [{
-                            'start_time': '00:00',
-                            'end_time': '23:59',
-                            'type': 'exception',
-                            'title': exception.title,
-                            'description': exception.description
-                        }]
-            
-            # Finally, add appointments
-            for appointment in day_appointments:
-                day_availability['appointments'].append({
-                    'id': appointment.id,
-                    'start_time': appointment.start_time.strftime('%H:%M'),
-                    'end_time': appointment.end_time.strftime('%H:%M'),
-                    'title': appointment.title,
-                    'status': appointment.status
-                })
-            
-            availability.append(day_availability)
+                'available_slots': [AvailabilityService._format_window(w) for w in plan.available],
+                'unavailable_slots': [AvailabilityService._format_window(w) for w in plan.unavailable],
+                'appointments': [{
+                    'id': window.source.id,
+                    'start_time': window.start.strftime('%H:%M'),
+                    'end_time': window.end.strftime('%H:%M'),
+                    'title': window.source.title,
+                    'status': window.source.status
+                } for window in plan.appointments if window.start.date() == plan.date]
+            })
         
         return {
             'user_id': user_id,
@@ -206,6 +111,19 @@ class AvailabilityService:
             'days': availability
         }
     
+    @staticmethod
+    def _format_window(window):
+        """Format a slot or exception window as in the availability API."""
+        data = {
+            'start_time': window.start.strftime('%H:%M'),
+            'end_time': window.end.strftime('%H:%M'),
+            'type': window.kind
+        }
+        if window.kind == 'exception':
+            data['title'] = window.source.title
+            data['description'] = window.source.description
+        return data
+    
     @staticmethod
     def update_availability_schedule(schedule_id, data):
         """
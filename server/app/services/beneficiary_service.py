@@ -2,13 +2,14 @@
 
 import os
 from datetime import datetime, timezone
-from werkzeug.utils import secure_filename
 from flask import current_app
-import uuid
 
 from app.models import User, Beneficiary, Note, Appointment, Document
 from app.extensions import db
 from app.utils import clear_user_cache, clear_model_cache
+from app.services.document_permission_service import invalidate_on_commit
+from app.services.storage_service import storage_service
+from app.utils.loading import with_profile
 
 
 class BeneficiaryService:
@@ -31,7 +32,7 @@ class BeneficiaryService:
             tuple: (beneficiaries, total, pages)
         """
         # Build query
-        beneficiary_query = Beneficiary.query
+        beneficiary_query = with_profile(Beneficiary.query, 'beneficiary_list')
         
         # Apply filters
         if tenant_id:
@@ -279,11 +280,16 @@ class BeneficiaryService:
             # Delete documents
             documents = Document.query.filter_by(beneficiary_id=beneficiary_id).all()
             for document in documents:
-                file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], document.file_path)
-                if os.path.exists(file_path):
-                    os.remove(file_path)
+                # Blobs may be shared with other documents: drop our reference only
+                if document.content_hash:
+                    storage_service.release_blob(document.content_hash)
+                else:
+                    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], document.file_path)
+                    if os.path.exists(file_path):
+                        os.remove(file_path)
             
             Document.query.filter_by(beneficiary_id=beneficiary_id).delete()
+            invalidate_on_commit(db.session, [document.id for document in documents])
             
             # Delete beneficiary
             db.session.delete(beneficiary)
@@ -711,34 +717,24 @@ class DocumentService:
             Document: The created document or None if creation fails.
         """
         try:
-            # Generate a secure filename with a UUID to avoid collisions
-            original_filename = secure_filename(file.filename)
-            filename = f"{uuid.uuid4()}_{original_filename}"
-            
-            # Get file extension
-            _, file_extension = os.path.splitext(original_filename)
-            file_type = file_extension[1:].lower() if file_extension else 'unknown'
-            
-            # Save file
-            file_path = os.path.join('documents', filename)
-            full_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'documents')
-            
-            # Ensure the directory exists
-            if not os.path.exists(full_path):
-                os.makedirs(full_path)
-            
-            file.save(os.path.join(full_path, filename))
+            # Stream the upload into content-addressed storage; identical
+            # files uploaded for several beneficiaries share one blob
+            blob, error = storage_service.store_upload(file, 'document')
+            if error:
+                current_app.logger.error(f"Error storing document: {error}")
+                return None
             
             # Create document record
             document = Document(
                 beneficiary_id=data['beneficiary_id'],
-                user_id=user_id,
+                upload_by=user_id,
                 title=data['title'],
                 description=data.get('description'),
-                file_path=file_path,
-                file_type=file_type,
-                file_size=os.path.getsize(os.path.join(full_path, filename)),
-                is_private=data.get('is_private', False)
+                file_path=blob.storage_path,
+                file_type=blob.extension or 'unknown',
+                file_size=blob.size,
+                content_hash=blob.sha256,
+                document_type=data.get('document_type', 'general')
             )
             
             db.session.add(document)
@@ -802,10 +798,13 @@ class DocumentService:
             if not document:
                 return False
             
-            # Delete file
-            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], document.file_path)
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            # Delete file, or drop our reference to the shared blob
+            if document.content_hash:
+                storage_service.release_blob(document.content_hash)
+            else:
+                file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], document.file_path)
+                if os.path.exists(file_path):
+                    os.remove(file_path)
             
             # Delete document record
             db.session.delete(document)
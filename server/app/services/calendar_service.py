@@ -4,13 +4,13 @@ import os
 import datetime
 import json
 from flask import current_app, url_for
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 
 from app.extensions import db
 
+# The Google client libraries are imported inside the methods that need them:
+# googleapiclient alone adds a noticeable amount to every worker's cold start,
+# and most processes never talk to Google Calendar.
+
 
 class CalendarService:
     """Google Calendar service."""
@@ -20,6 +20,13 @@ class CalendarService:
     API_SERVICE_NAME = 'calendar'
     API_VERSION = 'v3'
     
+    @classmethod
+    def _build_service(cls, credentials):
+        """Build a Google Calendar API client for the given credentials."""
+        from googleapiclient.discovery import build
+
+        return build(cls.API_SERVICE_NAME, cls.API_VERSION, credentials=credentials)
+
     @classmethod
     def get_authorization_url(cls, user_id, redirect_uri=None):
         """
@@ -42,6 +49,8 @@ class CalendarService:
                 current_app.logger.error(f"Client secrets file not found at {client_secrets_path}")
                 return None
             
+            from google_auth_oauthlib.flow import Flow
+
             flow = Flow.from_client_secrets_file(
                 client_secrets_path,
                 scopes=cls.SCOPES
@@ -127,6 +136,8 @@ class CalendarService:
                 current_app.root_path, 'credentials', cls.CLIENT_SECRETS_FILE
             )
             
+            from google_auth_oauthlib.flow import Flow
+
             flow = Flow.from_client_secrets_file(
                 client_secrets_path,
                 scopes=cls.SCOPES,
@@ -188,6 +199,8 @@ class CalendarService:
             data = json.loads(integration.data)
             
             # Create the credentials
+            from google.oauth2.credentials import Credentials
+
             credentials = Credentials(
                 token=data.get('token'),
                 refresh_token=data.get('refresh_token'),
@@ -218,6 +231,8 @@ class CalendarService:
         Returns:
             str: The event ID or None if creation fails
         """
+        from googleapiclient.errors import HttpError
+
         try:
             # Get the credentials
             credentials = cls.get_credentials(user_id)
@@ -226,7 +241,7 @@ class CalendarService:
                 return None
             
             # Build the service
-            service = build(cls.API_SERVICE_NAME, cls.API_VERSION, credentials=credentials)
+            service = cls._build_service(credentials)
             
             # Create the event
             event = {
@@ -282,6 +297,8 @@ class CalendarService:
         Returns:
             bool: True if successful, False otherwise
         """
+        from googleapiclient.errors import HttpError
+
         try:
             # Get the credentials
             credentials = cls.get_credentials(user_id)
@@ -290,7 +307,7 @@ class CalendarService:
                 return False
             
             # Build the service
-            service = build(cls.API_SERVICE_NAME, cls.API_VERSION, credentials=credentials)
+            service = cls._build_service(credentials)
             
             # Get the existing event
             event = service.events().get(calendarId='primary', eventId=event_id).execute()
@@ -335,6 +352,8 @@ class CalendarService:
         Returns:
             bool: True if successful, False otherwise
         """
+        from googleapiclient.errors import HttpError
+
         try:
             # Get the credentials
             credentials = cls.get_credentials(user_id)
@@ -343,7 +362,7 @@ class CalendarService:
                 return False
             
             # Build the service
-            service = build(cls.API_SERVICE_NAME, cls.API_VERSION, credentials=credentials)
+            service = cls._build_service(credentials)
             
             # Delete the event
             service.events().delete(calendarId='primary', eventId=event_id).execute()
@@ -372,6 +391,8 @@ class CalendarService:
         Returns:
             list: The events or None if retrieval fails
         """
+        from googleapiclient.errors import HttpError
+
         try:
             # Get the credentials
             credentials = cls.get_credentials(user_id)
@@ -380,7 +401,7 @@ class CalendarService:
                 return None
             
             # Build the service
-            service = build(cls.API_SERVICE_NAME, cls.API_VERSION, credentials=credentials)
+            service = cls._build_service(credentials)
             
             # Prepare parameters
             params = {
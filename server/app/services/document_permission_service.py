@@ -0,0 +1,324 @@
+"""Document permission resolution.
+
+Resolves effective permissions for many documents at once: two queries per
+batch (documents with their beneficiary's trainer, then matching grants),
+memoized for the rest of the request in ``flask.g`` and cached across
+requests under a per-document version that grant/revoke bumps. Reassigning
+a beneficiary's trainer, moving a document to another beneficiary or
+uploader, or deleting it bumps the affected versions once the change is
+committed (see ``init_document_permissions``).
+"""
+
+import uuid
+from datetime import datetime
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import and_, event, exists, inspect, or_, select
+from sqlalchemy.orm import Session
+
+from app.extensions import db, cache
+
+
+PERMISSION_TYPES = ('read', 'update', 'delete', 'share')
+
+FULL_ACCESS = {permission: True for permission in PERMISSION_TYPES}
+NO_ACCESS = {permission: False for permission in PERMISSION_TYPES}
+
+
+class DocumentPermissionResolver:
+    """Resolve, cache and filter document permissions for a user."""
+
+    CACHE_PREFIX = 'docperm'
+
+    def resolve(self, user, document_ids):
+        """
+        Resolve effective permissions for a batch of documents.
+
+        Args:
+            user (User): The user to resolve permissions for
+            document_ids (iterable): Document IDs
+
+        Returns:
+            dict: ``{document_id: grant}`` for documents that exist, where a
+            grant maps each permission type to a bool plus ``source``
+            ('owner', 'admin', 'trainer', 'user', 'role' or None) and
+            ``expires_at`` (ISO string or None)
+        """
+        document_ids = {int(document_id) for document_id in document_ids}
+        memo = self._memo()
+        resolved = {}
+
+        pending = set()
+        for document_id in document_ids:
+            key = (user.id, document_id)
+            if key in memo:
+                if memo[key] is not None:
+                    resolved[document_id] = memo[key]
+            else:
+                pending.add(document_id)
+
+        if pending:
+            cached, versions = self._get_cached(user, pending)
+            resolved.update(cached)
+            pending -= set(cached)
+
+            if pending:
+                loaded = self._load(user, pending)
+                self._set_cached(user, loaded, versions)
+                resolved.update(loaded)
+
+            for document_id in document_ids:
+                memo[(user.id, document_id)] = resolved.get(document_id)
+
+        return resolved
+
+    def check(self, user, document_id, permission_type='read'):
+        """Check a single permission."""
+        grant = self.resolve(user, [document_id]).get(int(document_id))
+        return bool(grant and grant.get(permission_type))
+
+    def filter_query(self, query, user, permission_type='read'):
+        """
+        Restrict a Document query to documents the user may access.
+
+        Mirrors ``resolve`` in SQL so list views can paginate in the
+        database instead of checking each row.
+
+        Args:
+            query: A query selecting Document
+            user (User): The user
+            permission_type (str): Permission type to require
+
+        Returns:
+            Query: The filtered query
+        """
+        if user.role == 'super_admin':
+            return query
+        return query.filter(self.access_condition(user, permission_type))
+
+    def access_condition(self, user, permission_type='read', via_grants_only=False):
+        """
+        Build the SQL condition for ``filter_query``.
+
+        Args:
+            user (User): The user
+            permission_type (str): Permission type to require, or None for
+                any active grant regardless of its flags
+            via_grants_only (bool): Ignore the trainer-of-beneficiary rule
+        """
+        from app.models.beneficiary import Beneficiary
+        from app.models.document import Document
+        from app.models.document_permission import DocumentPermission
+
+        now = datetime.utcnow()
+
+        def grant_exists(*criteria):
+            conditions = [
+                DocumentPermission.document_id == Document.id,
+                DocumentPermission.is_active == True,
+                *criteria
+            ]
+            return exists().where(and_(*conditions))
+
+        def usable(*criteria):
+            conditions = [or_(DocumentPermission.expires_at.is_(None),
+                              DocumentPermission.expires_at >= now)]
+            if permission_type:
+                conditions.append(getattr(DocumentPermission, f'can_{permission_type}') == True)
+            return grant_exists(*criteria, *conditions)
+
+        # An active user grant overrides role grants, even when it denies
+        has_user_grant = grant_exists(DocumentPermission.user_id == user.id)
+
+        conditions = [
+            Document.upload_by == user.id,
+            usable(DocumentPermission.user_id == user.id),
+            and_(~has_user_grant, usable(DocumentPermission.role == user.role))
+        ]
+
+        if user.role == 'trainer' and not via_grants_only:
+            conditions.append(Document.beneficiary_id.in_(
+                select(Beneficiary.id).where(Beneficiary.trainer_id == user.id)
+            ))
+
+        return or_(*conditions)
+
+    def invalidate(self, document_id):
+        """Drop cached grants for a document after its permissions change."""
+        self._memo().clear()
+        try:
+            cache.set(self._version_key(document_id), uuid.uuid4().hex[:12],
+                      timeout=self._timeout() * 2)
+        except Exception as e:
+            current_app.logger.error(f"Error invalidating document permissions: {str(e)}")
+
+    def _load(self, user, document_ids):
+        """Resolve permissions from the database in two queries."""
+        from app.models.beneficiary import Beneficiary
+        from app.models.document import Document
+        from app.models.document_permission import DocumentPermission
+
+        documents = db.session.query(
+            Document.id, Document.upload_by, Beneficiary.trainer_id
+        ).outerjoin(
+            Beneficiary, Document.beneficiary_id == Beneficiary.id
+        ).filter(Document.id.in_(document_ids)).all()
+
+        if not documents:
+            return {}
+
+        user_grants, role_grants = {}, {}
+        if user.role != 'super_admin':
+            grants = DocumentPermission.query.filter(
+                DocumentPermission.document_id.in_([row.id for row in documents]),
+                DocumentPermission.is_active == True,
+                or_(DocumentPermission.user_id == user.id,
+                    DocumentPermission.role == user.role)
+            ).order_by(DocumentPermission.id).all()
+            for grant in grants:
+                target = user_grants if grant.user_id == user.id else role_grants
+                target.setdefault(grant.document_id, grant)
+
+        resolved = {}
+        for document_id, upload_by, trainer_id in documents:
+            if upload_by == user.id:
+                resolved[document_id] = self._grant(FULL_ACCESS, 'owner')
+            elif user.role == 'super_admin':
+                resolved[document_id] = self._grant(FULL_ACCESS, 'admin')
+            elif user.role == 'trainer' and trainer_id == user.id:
+                resolved[document_id] = self._grant(FULL_ACCESS, 'trainer')
+            elif document_id in user_grants:
+                resolved[document_id] = self._from_permission(user_grants[document_id], 'user')
+            elif document_id in role_grants:
+                resolved[document_id] = self._from_permission(role_grants[document_id], 'role')
+            else:
+                resolved[document_id] = self._grant(NO_ACCESS, None)
+
+        return resolved
+
+    @staticmethod
+    def _grant(permissions, source, expires_at=None):
+        """Build a grant dict."""
+        return {**permissions, 'source': source, 'expires_at': expires_at}
+
+    def _from_permission(self, permission, source):
+        """Build a grant from a DocumentPermission row."""
+        if permission.has_expired():
+            return self._grant(NO_ACCESS, source)
+        return self._grant(
+            {p: bool(getattr(permission, f'can_{p}')) for p in PERMISSION_TYPES},
+            source,
+            permission.expires_at.isoformat() if permission.expires_at else None
+        )
+
+    @staticmethod
+    def _memo():
+        """Per-request memo of resolved grants."""
+        if not has_app_context():
+            return {}
+        if '_document_permissions' not in g:
+            g._document_permissions = {}
+        return g._document_permissions
+
+    def _timeout(self):
+        """Cache lifetime for resolved grants."""
+        return current_app.config.get('DOCUMENT_PERMISSION_CACHE_TIMEOUT', 300)
+
+    def _version_key(self, document_id):
+        """Cache key holding a document's permission version."""
+        return f"{self.CACHE_PREFIX}:version:{document_id}"
+
+    def _grant_key(self, user, document_id, version):
+        """Cache key for one user's grant on one document version."""
+        return f"{self.CACHE_PREFIX}:{document_id}:{version}:{user.id}:{user.role}"
+
+    def _get_cached(self, user, document_ids):
+        """Fetch cached grants; returns (grants, versions)."""
+        document_ids = sorted(document_ids)
+        try:
+            versions = dict(zip(
+                document_ids,
+                (v or '0' for v in cache.get_many(*[self._version_key(d) for d in document_ids]))
+            ))
+            values = cache.get_many(*[self._grant_key(user, d, versions[d]) for d in document_ids])
+        except Exception as e:
+            current_app.logger.error(f"Error reading document permission cache: {str(e)}")
+            return {}, {}
+
+        return {d: v for d, v in zip(document_ids, values) if v is not None}, versions
+
+    def _set_cached(self, user, grants, versions):
+        """Store resolved grants, never past the expiry of the grant itself."""
+        timeout = self._timeout()
+        now = datetime.utcnow()
+        batch = {}
+        try:
+            for document_id, grant in grants.items():
+                key = self._grant_key(user, document_id, versions.get(document_id, '0'))
+                if grant['expires_at']:
+                    remaining = (datetime.fromisoformat(grant['expires_at']) - now).total_seconds()
+                    if remaining > 1:
+                        cache.set(key, grant, timeout=min(timeout, int(remaining)))
+                    continue
+                batch[key] = grant
+            if batch:
+                cache.set_many(batch, timeout=timeout)
+        except Exception as e:
+            current_app.logger.error(f"Error writing document permission cache: {str(e)}")
+
+
+# Global document permission resolver
+document_permissions = DocumentPermissionResolver()
+
+# session.info key: documents whose owner-derived grants changed in this transaction
+_CHANGED = 'document_permissions.changed'
+
+# Document columns that owner, trainer and tenant grants derive from
+_OWNER_FIELDS = ('beneficiary_id', 'upload_by')
+
+
+def invalidate_on_commit(session, document_ids):
+    """Invalidate documents once the session commits (for bulk SQL the flush hook cannot see)."""
+    session.info.setdefault(_CHANGED, set()).update(document_ids)
+
+
+def _after_flush(session, flush_context):
+    """Collect documents that were moved or deleted, or whose beneficiary's trainer changed."""
+    from app.models.beneficiary import Beneficiary
+    from app.models.document import Document
+
+    changed = {obj.id for obj in session.deleted if isinstance(obj, Document)}
+    changed.update(
+        obj.id for obj in session.dirty
+        if isinstance(obj, Document)
+        and any(getattr(inspect(obj).attrs, field).history.has_changes() for field in _OWNER_FIELDS)
+    )
+    beneficiary_ids = [
+        obj.id for obj in session.dirty
+        if isinstance(obj, Beneficiary) and inspect(obj).attrs.trainer_id.history.has_changes()
+    ]
+    if beneficiary_ids:
+        changed.update(session.execute(
+            select(Document.id).where(Document.beneficiary_id.in_(beneficiary_ids))
+        ).scalars())
+    if changed:
+        invalidate_on_commit(session, changed)
+
+
+def _after_commit(session):
+    """Invalidate the collected documents once the change is visible."""
+    for document_id in session.info.pop(_CHANGED, ()):
+        document_permissions.invalidate(document_id)
+
+
+def _discard(session, *args):
+    session.info.pop(_CHANGED, None)
+
+
+def init_document_permissions(app):
+    """Invalidate cached grants when documents move or a beneficiary's trainer changes."""
+    if event.contains(Session, 'after_flush', _after_flush):
+        return
+    event.listen(Session, 'after_flush', _after_flush)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_rollback', _discard)
@@ -5,6 +5,7 @@ from flask import current_app
 
 from app.extensions import db
 from app.services.notification_service import NotificationService
+from app.services.document_permission_service import document_permissions, PERMISSION_TYPES
 
 
 class DocumentService:
@@ -23,68 +24,38 @@ class DocumentService:
         Returns:
             bool: True if the user has permission, False otherwise
         """
-        from app.models.document import Document
-        from app.models.document_permission import DocumentPermission
         from app.models.user import User
         
-        # Get the document
-        document = Document.query.get(document_id)
-        if not document:
-            return False
-        
-        # Get the user
         user = User.query.get(user_id)
         if not user:
             return False
         
-        # Document owner has all permissions
-        if document.upload_by == user_id:
-            return True
+        return document_permissions.check(user, document_id, permission_type)
+    
+    @staticmethod
+    def check_permissions(document_ids, user_id, permission_type='read'):
+        """
+        Check a permission for many documents at once.
         
-        # Super admin has all permissions
-        if user.role == 'super_admin':
-            return True
+        Args:
+            document_ids (list): Document IDs
+            user_id (int): User ID
+            permission_type (str): Permission type ('read', 'update', 'delete', 'share')
             
-        # Check if document is related to the user's beneficiary (for trainers)
-        if user.role == 'trainer' and document.beneficiary_id:
-            # Check if the user is the trainer for this beneficiary
-            from app.models.beneficiary import Beneficiary
-            beneficiary = Beneficiary.query.get(document.beneficiary_id)
-            if beneficiary and beneficiary.trainer_id == user_id:
-                return True
-        
-        # Check specific permission
-        permission_field = f'can_{permission_type}'
-        
-        # Check user-specific permission
-        user_permission = DocumentPermission.query.filter_by(
-            document_id=document_id,
-            user_id=user_id,
-            is_active=True
-        ).first()
-        
-        if user_permission:
-            # Check if permission has expired
-            if user_permission.expires_at and user_permission.expires_at < datetime.utcnow():
-                return False
-                
-            return getattr(user_permission, permission_field, False)
-        
-        # Check role-based permission
-        role_permission = DocumentPermission.query.filter_by(
-            document_id=document_id,
-            role=user.role,
-            is_active=True
-        ).first()
+        Returns:
+            dict: Mapping of document ID to bool; unknown documents map to False
+        """
+        from app.models.user import User
         
-        if role_permission:
-            # Check if permission has expired
-            if role_permission.expires_at and role_permission.expires_at < datetime.utcnow():
-                return False
-                
-            return getattr(role_permission, permission_field, False)
+        user = User.query.get(user_id)
+        if not user:
+            return {int(document_id): False for document_id in document_ids}
         
-        return False
+        grants = document_permissions.resolve(user, document_ids)
+        return {
+            int(document_id): bool(grants.get(int(document_id), {}).get(permission_type))
+            for document_id in document_ids
+        }
     
     @staticmethod
     def grant_permission(document_id, user_id=None, role=None, permissions=None, expires_in=None):
@@ -156,6 +127,7 @@ class DocumentService:
                 existing_permission.updated_at = datetime.utcnow()
                 
                 db.session.commit()
+                document_permissions.invalidate(document_id)
                 
                 return existing_permission
             else:
@@ -174,6 +146,7 @@ class DocumentService:
                 
                 db.session.add(permission)
                 db.session.commit()
+                document_permissions.invalidate(document_id)
                 
                 # Send notification to user if user-specific permission
                 if user_id:
@@ -240,6 +213,7 @@ class DocumentService:
             # Revoke permission
             permission.is_active = False
             db.session.commit()
+            document_permissions.invalidate(document_id)
             
             return True
             
@@ -278,97 +252,51 @@ class DocumentService:
         """
         Get all documents a user has access to.
         
+        Documents are selected with a single SQL filter and their
+        permissions resolved in one batch.
+        
         Args:
             user_id (int): User ID
             
         Returns:
             list: List of documents with permissions
         """
-        from app.models.document_permission import DocumentPermission
         from app.models.document import Document
         from app.models.user import User
         
         try:
-            # Get user's role
             user = User.query.get(user_id)
             if not user:
                 return []
-                
-            # Get documents the user has uploaded
-            own_documents = Document.query.filter_by(
-                upload_by=user_id
-            ).all()
             
-            # Get documents the user has explicit permissions for
-            user_permissions = DocumentPermission.query.filter_by(
-                user_id=user_id,
-                is_active=True
-            ).all()
+            # Own documents plus any active, unexpired user or role grant
+            documents = Document.query.filter(
+                document_permissions.access_condition(user, permission_type=None, via_grants_only=True)
+            ).order_by(Document.id).all()
             
-            # Get documents the user has role-based permissions for
-            role_permissions = DocumentPermission.query.filter_by(
-                role=user.role,
-                is_active=True
-            ).all()
-            
-            # Combine all documents
-            documents = []
+            grants = document_permissions.resolve(user, [doc.id for doc in documents])
             
-            # Add own documents
-            for doc in own_documents:
-                documents.append({
+            results = []
+            for doc in documents:
+                grant = grants.get(doc.id)
+                if not grant:
+                    continue
+                
+                entry = {
                     'document': doc.to_dict(),
                     'permissions': {
-                        'read': True,
-                        'update': True,
-                        'delete': True,
-                        'share': True
+                        permission: grant[permission] for permission in PERMISSION_TYPES
                     },
-                    'owner': True
-                })
-                
-            # Add documents with explicit permissions
-            for perm in user_permissions:
-                if perm.has_expired():
-                    continue
-                    
-                doc = Document.query.get(perm.document_id)
-                if doc and doc.upload_by != user_id:  # Skip own documents
-                    documents.append({
-                        'document': doc.to_dict(),
-                        'permissions': {
-                            'read': perm.can_read,
-                            'update': perm.can_update,
-                            'delete': perm.can_delete,
-                            'share': perm.can_share
-                        },
-                        'owner': False,
-                        'expires_at': perm.expires_at.isoformat() if perm.expires_at else None
-                    })
-                    
-            # Add documents with role-based permissions
-            for perm in role_permissions:
-                if perm.has_expired():
-                    continue
-                    
-                doc = Document.query.get(perm.document_id)
-                # Skip if document already added (own or explicit permission)
-                if doc and doc.upload_by != user_id and not any(d['document']['id'] == doc.id for d in documents):
-                    documents.append({
-                        'document': doc.to_dict(),
-                        'permissions': {
-                            'read': perm.can_read,
-                            'update': perm.can_update,
-                            'delete': perm.can_delete,
-                            'share': perm.can_share
-                        },
-                        'owner': False,
-                        'role_based': True,
-                        'expires_at': perm.expires_at.isoformat() if perm.expires_at else None
-                    })
-                    
-            return documents
+                    'owner': grant['source'] == 'owner'
+                }
+                if grant['source'] == 'role':
+                    entry['role_based'] = True
+                if not entry['owner']:
+                    entry['expires_at'] = grant['expires_at']
+                results.append(entry)
+            
+            return results
             
         except Exception as e:
             current_app.logger.error(f"Error getting user document permissions: {str(e)}")
-            return []
\ No newline at end of file
+            return []
@@ -1,24 +1,21 @@
 """Email service module."""
 
-import os
-from threading import Thread
-from flask import current_app, render_template
-from flask_mail import Message
+from flask import current_app
 from itsdangerous import URLSafeTimedSerializer
 from itsdangerous.exc import SignatureExpired, BadTimeSignature
 
-from app.extensions import mail
-
-
-def send_async_email(app, msg):
-    """Send email asynchronously."""
-    with app.app_context():
-        mail.send(msg)
+from app.extensions import db
+from app.services.mail_outbox import mail_outbox
 
 
 def send_email(subject, recipients, text_body, html_body=None, sender=None, attachments=None):
     """
-    Send an email.
+    Queue an email for delivery.
+    
+    The message is stored in the mail outbox and sent by the pooled SMTP
+    workers, so this never blocks on the mail server. The outbox rows join
+    the caller's transaction: they are sent once the caller commits the
+    session, and a failure to queue only undoes the queuing itself.
     
     Args:
         subject (str): Email subject
@@ -29,26 +26,19 @@ def send_email(subject, recipients, text_body, html_body=None, sender=None, atta
         attachments (list): List of attachments (tuples of filename, media_type, data)
         
     Returns:
-        bool: True if successful, False otherwise
+        bool: True if the email was queued, False otherwise
     """
     try:
-        app = current_app._get_current_object()
-        sender = sender or app.config['MAIL_DEFAULT_SENDER']
-        
-        msg = Message(subject, sender=sender, recipients=recipients)
-        msg.body = text_body
-        
-        if html_body:
-            msg.html = html_body
-        
-        if attachments:
-            for attachment in attachments:
-                filename, media_type, data = attachment
-                msg.attach(filename, media_type, data)
-        
-        # Send email asynchronously
-        Thread(target=send_async_email, args=(app, msg)).start()
-        
+        with db.session.begin_nested():
+            mail_outbox.enqueue(
+                subject=subject,
+                recipients=recipients,
+                text_body=text_body,
+                html_body=html_body,
+                sender=sender or current_app.config['MAIL_DEFAULT_SENDER'],
+                attachments=attachments,
+                commit=False
+            )
         return True
     except Exception as e:
         current_app.logger.error(f"Email sending error: {str(e)}")
@@ -2,9 +2,26 @@
 
 from datetime import datetime, timezone
 
-from app.models import Evaluation, Question, TestSession, Response, AIFeedback
+from flask import current_app
+from sqlalchemy import func, select
+
+from app.models import Evaluation, TestSet, Question, TestSession, Response, AIFeedback
 from app.extensions import db
+from app.services.regrade import GRADED_FIELDS, RegradeService
+from app.services.portal_stats import PortalStatsService
+from app.services.question_sets import question_sets
+from app.services.scoring import ScoringService, question_cache
 from app.utils import clear_model_cache
+from app.utils.bulk import keyed_entries, upsert
+
+
+def _elapsed(start, end):
+    """Whole seconds between two times; naive values are taken as UTC."""
+    if start is None:
+        return None
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    return int((end - start).total_seconds())
 
 
 class EvaluationService:
@@ -29,8 +46,6 @@ class EvaluationService:
         Returns:
             tuple: (evaluations, total, pages)
         """
-        from app.models import TestSet
-        
         # Build query - use TestSet instead of Evaluation
         evaluation_query = TestSet.query
         
@@ -86,8 +101,6 @@ class EvaluationService:
         Returns:
             TestSet: The created test set or None if creation fails.
         """
-        from app.models import TestSet
-        
         try:
             # Extract questions data if provided
             questions_data = data.pop('questions', [])
@@ -133,6 +146,8 @@ class EvaluationService:
             
             # Clear cache
             clear_model_cache('test_sets')
+            if test_set.status == 'active':
+                question_sets.warm(test_set.id)
             
             # Return test_set object directly - let schema handle serialization
             return test_set
@@ -211,9 +226,41 @@ class EvaluationService:
             
             # Clear cache
             clear_model_cache('evaluations')
-            
+
             return True
-        
+
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    @staticmethod
+    def publish_test_set(test_set_id):
+        """
+        Publish a test set and pre-build its cached questions.
+
+        Args:
+            test_set_id (int): Test set ID.
+
+        Returns:
+            TestSet: The published test set or None if not found.
+        """
+        try:
+            test_set = TestSet.query.get(test_set_id)
+
+            if not test_set:
+                return None
+
+            test_set.status = 'active'
+
+            db.session.commit()
+
+            # Clear cache
+            clear_model_cache('test_sets')
+            question_sets.invalidate(test_set_id)
+            question_sets.warm(test_set_id)
+
+            return test_set
+
         except Exception as e:
             db.session.rollback()
             raise e
@@ -309,6 +356,8 @@ class QuestionService:
             
             # Clear cache
             clear_model_cache('evaluations')
+            question_cache.invalidate(question.test_set_id)
+            question_sets.invalidate(question.test_set_id)
             
             return question
         
@@ -334,6 +383,8 @@ class QuestionService:
             if not question:
                 return None
             
+            graded_before = [getattr(question, field) for field in GRADED_FIELDS]
+            
             # Update attributes
             for key, value in data.items():
                 if hasattr(question, key):
@@ -345,6 +396,13 @@ class QuestionService:
             
             # Clear cache
             clear_model_cache('evaluations')
+            question_cache.invalidate(question.test_set_id)
+            question_sets.invalidate(question.test_set_id)
+            
+            # Stored grades of this question are stale if its key or points changed
+            if [getattr(question, field) for field in GRADED_FIELDS] != graded_before and \
+                    db.session.query(Response.id).filter_by(question_id=question.id).first():
+                RegradeService.enqueue(question.test_set_id, [question.id], reason='question_updated')
             
             return question
         
@@ -373,11 +431,14 @@ class QuestionService:
             # Responses will remain but will be orphaned
             
             # Delete question
+            test_set_id = question.test_set_id
             db.session.delete(question)
             db.session.commit()
             
             # Clear cache
             clear_model_cache('evaluations')
+            question_cache.invalidate(test_set_id)
+            question_sets.invalidate(test_set_id)
             
             return True
         
@@ -544,35 +605,29 @@ class TestSessionService:
             if not session or session.status != 'in_progress':
                 return None
             
-            # Calculate score
-            evaluation = Evaluation.query.get(session.evaluation_id)
-            responses = Response.query.filter_by(session_id=session_id).all()
-            
-            total_score = 0
-            max_score = 0
-            
-            for response in responses:
-                question = Question.query.get(response.question_id)
-                if question:
-                    max_score += question.points
-                    total_score += response.score or 0
+            # Recompute the running totals from the responses in one query
+            total_score, max_score, _ = ScoringService.session_totals(session_id)
+            test_set = TestSet.query.get(session.test_set_id)
             
             # Update session
             session.end_time = datetime.now(timezone.utc)
-            session.time_spent = int((session.end_time - session.start_time).total_seconds())
+            session.time_spent = _elapsed(session.start_time, session.end_time)
             session.status = 'completed'
             session.score = total_score
             session.max_score = max_score
             
             # Check if passed
-            if evaluation.passing_score is not None and max_score > 0:
+            if test_set and test_set.passing_score is not None and max_score > 0:
                 percentage_score = (total_score / max_score) * 100
-                session.passed = percentage_score >= evaluation.passing_score
+                session.passed = percentage_score >= test_set.passing_score
             else:
                 session.passed = None
             
             db.session.commit()
             
+            # Clear cache
+            PortalStatsService.invalidate(session.beneficiary_id)
+            
             return session
         
         except Exception as e:
@@ -657,8 +712,8 @@ class ResponseService:
             if not session or session.status != 'in_progress':
                 return None
             
-            # Check if question exists
-            question = Question.query.get(data['question_id'])
+            # Question metadata comes from the per-test-set cache
+            question = question_cache.get(session.test_set_id, data['question_id'])
             
             if not question:
                 return None
@@ -671,9 +726,11 @@ class ResponseService:
             
             # Create or update response
             now = datetime.now(timezone.utc)
+            previous_score = None
             
             if response:
                 # Update existing response
+                previous_score = response.score or 0
                 response.answer = data['answer']
                 response.end_time = now
                 
@@ -681,7 +738,7 @@ class ResponseService:
                 if data.get('time_spent') is not None:
                     response.time_spent = data['time_spent']
                 elif response.start_time:
-                    response.time_spent = int((now - response.start_time).total_seconds())
+                    response.time_spent = _elapsed(response.start_time, now)
             else:
                 # Create new response
                 response = Response(
@@ -696,17 +753,16 @@ class ResponseService:
                 db.session.add(response)
             
             # Check if answer is correct and calculate score
-            if question.type in ['multiple_choice', 'true_false', 'matching', 'ordering']:
-                # For question types with definitive correct answers
-                response.is_correct = question.check_answer(data['answer'])
-                response.score = question.points if response.is_correct else 0
+            response.is_correct, response.score = ScoringService.grade(question, data['answer'])
+            
+            # Keep the session's running totals current
+            if previous_score is None:
+                ScoringService.apply_delta(session, response.score, question.points)
             else:
-                # For other question types (e.g., text), mark as correct but require human review
-                response.is_correct = True
-                response.score = question.points
+                ScoringService.apply_delta(session, response.score - previous_score)
             
             # Update session's current question if this is the latest question
-            if not session.current_question or session.current_question < question.order or question.order is None:
+            if not session.current_question or question.order is None or session.current_question < question.order:
                 session.current_question = question.order or question.id
                 session.updated_at = now
             
@@ -718,6 +774,135 @@ class ResponseService:
             db.session.rollback()
             raise e
 
+    @staticmethod
+    def normalize_answers(answers):
+        """
+        Validate a batch of answers.
+
+        Args:
+            answers (list): Dicts with ``question_id``, ``answer`` and
+                optionally ``time_spent``
+
+        Returns:
+            dict: question_id -> {'answer', 'time_spent'}, last entry wins
+
+        Raises:
+            ValueError: If an entry is malformed
+        """
+        limit = current_app.config.get('RESPONSE_BATCH_MAX', 500)
+        normalized = {}
+        for question_id, entry in keyed_entries(answers, 'response', 'question_id', limit):
+            if 'answer' not in entry:
+                raise ValueError(f'Missing answer for question {question_id}')
+            time_spent = entry.get('time_spent')
+            if time_spent is not None and (not isinstance(time_spent, int) or time_spent < 0):
+                raise ValueError(f'Invalid time_spent for question {question_id}')
+            normalized[question_id] = {'answer': entry['answer'], 'time_spent': time_spent}
+        return normalized
+
+    @staticmethod
+    def _upsert(session_id, answers, grades, now):
+        """Insert or update every answer in one statement."""
+        rows = [{
+            'session_id': session_id,
+            'question_id': question_id,
+            'answer': entry['answer'],
+            'is_correct': grades[question_id][0],
+            'score': grades[question_id][1],
+            'start_time': now,
+            'end_time': now,
+            'time_spent': entry['time_spent'],
+            'created_at': now,
+            'updated_at': now
+        } for question_id, entry in answers.items()]
+
+        def assignments(table, excluded):
+            return {
+                'answer': excluded.answer,
+                'is_correct': excluded.is_correct,
+                'score': excluded.score,
+                'end_time': excluded.end_time,
+                # Autosaves without timing keep the last reported value
+                'time_spent': func.coalesce(excluded.time_spent, table.c.time_spent),
+                'updated_at': excluded.updated_at
+            }
+
+        def merge(response, row):
+            for key in ('answer', 'is_correct', 'score', 'end_time', 'updated_at'):
+                setattr(response, key, row[key])
+            if row['time_spent'] is not None:
+                response.time_spent = row['time_spent']
+
+        upsert(Response, rows, ('session_id', 'question_id'), assignments, merge)
+
+    @staticmethod
+    def submit_batch(session, answers):
+        """
+        Save and grade many answers of a session at once.
+
+        Answers are checked against the cached question set, graded in one
+        pass and upserted in a single statement; the session totals are then
+        recomputed with one aggregate.
+
+        Args:
+            session (TestSession): An in-progress session
+            answers (dict): Output of ``normalize_answers``
+
+        Returns:
+            dict: Counts of created and updated responses and the session progress
+
+        Raises:
+            LookupError: If some questions are not part of the session's test set
+        """
+        questions = question_cache.questions(session.test_set_id)
+        if any(question_id not in questions for question_id in answers):
+            # Reload once in case questions were added after caching
+            question_cache.invalidate(session.test_set_id)
+            questions = question_cache.questions(session.test_set_id)
+        missing = sorted(set(answers) - set(questions))
+        if missing:
+            raise LookupError(f"Unknown questions: {', '.join(map(str, missing))}")
+
+        existing = set(db.session.scalars(
+            select(Response.question_id).where(
+                Response.session_id == session.id,
+                Response.question_id.in_(list(answers))
+            )
+        ))
+
+        grades = ScoringService.grade_many(questions, {
+            question_id: entry['answer'] for question_id, entry in answers.items()
+        })
+        now = datetime.now(timezone.utc)
+        try:
+            ResponseService._upsert(session.id, answers, grades, now)
+            total_score, max_score, answered = ScoringService.session_totals(session.id)
+            session.score = total_score
+            session.max_score = max_score
+            current_question = session.current_question
+            orders = [questions[question_id].order for question_id in answers
+                      if questions[question_id].order is not None]
+            if orders and (current_question is None or current_question < max(orders)):
+                current_question = session.current_question = max(orders)
+            session.updated_at = now
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        return {
+            'session_id': session.id,
+            'created': len(set(answers) - existing),
+            'updated': len(existing),
+            'progress': {
+                'answered': answered,
+                'total_questions': len(questions),
+                'score': total_score,
+                'max_score': max_score,
+                'current_question': current_question
+            }
+        }
+
 
 class AIFeedbackService:
     """AI feedback service."""
@@ -0,0 +1,401 @@
+"""Answer grading engine.
+
+``compile_answer`` turns a question's correct answer into a normalized
+answer key once (frozensets for choices and matching pairs, tuples for
+orderings, accepted strings, regular expressions or keyword sets for short
+text), so grading an answer is a set or tuple comparison rather than
+re-sorting and comparing raw JSON. Keys return a credit between 0 and 1;
+questions whose ``options`` set ``partial_credit`` award a share of their
+points for partly correct multi-select, matching, ordering and keyword
+answers. Text questions without an answer key return ``None``: they need
+review and score nothing until then.
+
+``GradingService`` grades stored responses in bulk: a whole session, or
+every session of a test set, streamed in chunks and written back with
+executemany updates, followed by one set-based update of session totals.
+"""
+
+import re
+from datetime import datetime
+
+from sqlalchemy import and_, case, func, select, update
+
+from app.extensions import db
+
+_WHITESPACE = re.compile(r'\s+')
+_WORD = re.compile(r'\w+')
+
+_TRUE = frozenset(('true', 't', 'yes', 'y', '1'))
+_FALSE = frozenset(('false', 'f', 'no', 'n', '0'))
+
+
+def _norm(value):
+    """Comparable form of a scalar: trimmed, case-folded text."""
+    if isinstance(value, str):
+        return _WHITESPACE.sub(' ', value.strip()).casefold()
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).casefold()
+
+
+def _bool(value):
+    """True, False or None for anything that is not recognizably a boolean."""
+    if isinstance(value, bool):
+        return value
+    text = _norm(value)
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    return None
+
+
+def _items(value):
+    """Normalized members of a scalar or list answer."""
+    if value is None:
+        return frozenset()
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return frozenset(_norm(item) for item in value)
+    return frozenset((_norm(value),))
+
+
+def _pairs(value):
+    """Normalized (left, right) pairs of a mapping or list of pairs."""
+    if isinstance(value, dict):
+        return frozenset((_norm(left), _norm(right)) for left, right in value.items())
+    pairs = set()
+    for pair in value or ():
+        if isinstance(pair, dict):
+            pair = (pair.get('left'), pair.get('right'))
+        if isinstance(pair, (list, tuple)) and len(pair) == 2:
+            pairs.add((_norm(pair[0]), _norm(pair[1])))
+    return frozenset(pairs)
+
+
+class AnswerKey:
+    """Compiled correct answer; ``credit`` grades one submitted answer."""
+
+    __slots__ = ('partial',)
+    needs_review = False
+
+    def __init__(self, partial=False):
+        self.partial = partial
+
+    def credit(self, answer):
+        """Share of the points earned, from 0 to 1, or None if it needs review."""
+        return 0.0
+
+
+class ReviewKey(AnswerKey):
+    """Open answer without a key: graded by a person."""
+
+    __slots__ = ()
+    needs_review = True
+
+    def credit(self, answer):
+        return None
+
+
+class ChoiceKey(AnswerKey):
+    """Single or multiple choice; multi-select may earn partial credit."""
+
+    __slots__ = ('expected',)
+
+    def __init__(self, correct, partial=False):
+        super().__init__(partial)
+        self.expected = _items(correct)
+
+    def credit(self, answer):
+        chosen = _items(answer)
+        if chosen == self.expected:
+            return 1.0
+        if not self.partial or not self.expected:
+            return 0.0
+        # Wrong picks cancel right ones so choosing everything earns nothing
+        hits = len(chosen & self.expected) - len(chosen - self.expected)
+        return max(hits, 0) / len(self.expected)
+
+
+class BooleanKey(AnswerKey):
+    """True/false."""
+
+    __slots__ = ('expected',)
+
+    def __init__(self, correct, partial=False):
+        super().__init__(partial)
+        self.expected = _bool(correct)
+
+    def credit(self, answer):
+        value = _bool(answer)
+        return 1.0 if value is not None and value == self.expected else 0.0
+
+
+class MatchingKey(AnswerKey):
+    """Pairs of items; partial credit per correct pair."""
+
+    __slots__ = ('expected',)
+
+    def __init__(self, correct, partial=False):
+        super().__init__(partial)
+        self.expected = _pairs(correct)
+
+    def credit(self, answer):
+        given = _pairs(answer)
+        if given == self.expected:
+            return 1.0
+        if not self.partial or not self.expected:
+            return 0.0
+        return len(given & self.expected) / len(self.expected)
+
+
+class OrderingKey(AnswerKey):
+    """Items in sequence; partial credit per item in its place."""
+
+    __slots__ = ('expected',)
+
+    def __init__(self, correct, partial=False):
+        super().__init__(partial)
+        self.expected = tuple(_norm(item) for item in correct or ())
+
+    def credit(self, answer):
+        if not isinstance(answer, (list, tuple)):
+            return 0.0
+        given = tuple(_norm(item) for item in answer)
+        if given == self.expected:
+            return 1.0
+        if not self.partial or not self.expected:
+            return 0.0
+        return sum(1 for a, b in zip(given, self.expected) if a == b) / len(self.expected)
+
+
+class TextKey(AnswerKey):
+    """Short text: accepted answers, a pattern, or keywords.
+
+    ``correct_answer`` may be a string or list of accepted strings, or a
+    mapping with ``accepted``, ``pattern`` (matched against the whole
+    answer, ignoring case) or ``keywords`` and an optional ``min_matches``
+    (all keywords by default).
+    """
+
+    __slots__ = ('accepted', 'pattern', 'keywords', 'min_matches')
+
+    def __init__(self, correct, partial=False):
+        super().__init__(partial)
+        self.accepted = frozenset()
+        self.pattern = None
+        self.keywords = ()
+        self.min_matches = 0
+        if isinstance(correct, dict):
+            self.accepted = _items(correct.get('accepted'))
+            if correct.get('pattern'):
+                self.pattern = re.compile(correct['pattern'], re.IGNORECASE)
+            self.keywords = tuple(sorted(_items(correct.get('keywords'))))
+            self.min_matches = int(correct.get('min_matches') or len(self.keywords))
+        else:
+            self.accepted = _items(correct)
+
+    def credit(self, answer):
+        if answer is None or isinstance(answer, (dict, list)):
+            return 0.0
+        text = _norm(answer)
+        if text in self.accepted:
+            return 1.0
+        if self.pattern is not None and self.pattern.fullmatch(str(answer).strip()):
+            return 1.0
+        if not self.keywords:
+            return 0.0
+
+        words = frozenset(_WORD.findall(text))
+        matched = sum(1 for keyword in self.keywords
+                      if (keyword in text if ' ' in keyword else keyword in words))
+        if matched >= self.min_matches:
+            return 1.0
+        return matched / self.min_matches if self.partial else 0.0
+
+
+_KEYS = {
+    'multiple_choice': ChoiceKey,
+    'true_false': BooleanKey,
+    'matching': MatchingKey,
+    'ordering': OrderingKey,
+    'text': TextKey,
+}
+
+
+def compile_answer(type, correct_answer, options=None):
+    """
+    Compile a question's correct answer into an answer key.
+
+    Args:
+        type (str): Question type
+        correct_answer: The stored correct answer (JSON)
+        options: The stored question options; a mapping may set ``partial_credit``
+
+    Returns:
+        AnswerKey: Key whose ``credit(answer)`` grades one answer
+    """
+    partial = isinstance(options, dict) and bool(options.get('partial_credit'))
+    if type == 'text' and correct_answer in (None, '', [], {}):
+        return ReviewKey()
+    key_class = _KEYS.get(type)
+    if key_class is None:
+        return AnswerKey()
+    return key_class(correct_answer, partial)
+
+
+def grade(key, points, answer):
+    """
+    Grade one answer with a compiled key.
+
+    Returns:
+        tuple: (is_correct, score); ``is_correct`` is None for answers awaiting review
+    """
+    credit = key.credit(answer)
+    if credit is None:
+        return None, 0.0
+    return credit >= 1.0, round((points or 0) * credit, 4)
+
+
+class GradingService:
+    """Bulk grading of stored responses."""
+
+    @staticmethod
+    def grade_responses(test_set_id, session_ids=None, question_ids=None, chunk_size=1000):
+        """
+        Re-grade stored responses of a test set against the current answer keys.
+
+        Responses are read in chunks of ``chunk_size`` by keyset pagination on
+        their ID. Once a chunk has been read in full, the responses in it whose
+        grade changed are written back in one executemany UPDATE, so no cursor
+        is open while writing and memory stays bounded by the chunk.
+
+        Args:
+            test_set_id (int): Test set ID
+            session_ids (list, optional): Restrict to these sessions
+            question_ids (list, optional): Restrict to these questions
+            chunk_size (int): Responses read and written per batch
+
+        Returns:
+            tuple: (responses graded, responses changed, IDs of sessions with changes)
+        """
+        from app.models import Response, TestSession
+        from app.services.scoring import question_cache
+
+        questions = question_cache.questions(test_set_id)
+        query = select(Response.id, Response.session_id, Response.question_id, Response.answer,
+                       Response.is_correct, Response.score) \
+            .join(TestSession, TestSession.id == Response.session_id) \
+            .where(TestSession.test_set_id == test_set_id) \
+            .order_by(Response.id) \
+            .limit(chunk_size)
+        if session_ids is not None:
+            query = query.where(Response.session_id.in_(list(session_ids)))
+        if question_ids is not None:
+            query = query.where(Response.question_id.in_(list(question_ids)))
+
+        graded = changed = 0
+        changed_sessions = set()
+        last_id = None
+        while True:
+            chunk = db.session.execute(
+                query if last_id is None else query.where(Response.id > last_id)
+            ).all()
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+            graded += len(chunk)
+
+            changes = []
+            for row in chunk:
+                question = questions.get(row.question_id)
+                if question is None:
+                    continue
+                is_correct, score = grade(question.key, question.points, row.answer)
+                if is_correct != row.is_correct or score != row.score:
+                    changes.append({'id': row.id, 'is_correct': is_correct, 'score': score})
+                    changed_sessions.add(row.session_id)
+            if changes:
+                db.session.execute(update(Response), changes)
+                changed += len(changes)
+        return graded, changed, sorted(changed_sessions)
+
+    @staticmethod
+    def refresh_session_totals(session_ids):
+        """
+        Recompute score, max score and pass/fail of sessions in one UPDATE.
+
+        ``updated_at`` is bumped so data versions and incremental reports
+        see the new scores.
+
+        Args:
+            session_ids (list): Test session IDs
+        """
+        from app.models import Question, Response, TestSession, TestSet
+
+        if not session_ids:
+            return
+        scored = select(func.coalesce(func.sum(func.coalesce(Response.score, 0)), 0)) \
+            .where(Response.session_id == TestSession.id).scalar_subquery()
+        available = select(func.coalesce(func.sum(func.coalesce(Question.points, 0)), 0)) \
+            .select_from(Response).join(Question, Question.id == Response.question_id) \
+            .where(Response.session_id == TestSession.id).scalar_subquery()
+        passing = select(TestSet.passing_score).where(TestSet.id == TestSession.test_set_id) \
+            .scalar_subquery()
+
+        db.session.execute(
+            update(TestSession)
+            .where(TestSession.id.in_(list(session_ids)))
+            .values(
+                score=scored,
+                max_score=available,
+                # Only completed sessions have a verdict
+                passed=case(
+                    (and_(TestSession.status == 'completed', passing.isnot(None), available > 0),
+                     scored * 100.0 >= passing * available),
+                    else_=TestSession.passed
+                ),
+                updated_at=datetime.utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def grade_session(session_id):
+        """
+        Re-grade one session and refresh its totals.
+
+        Returns:
+            int: Number of responses whose grade changed
+        """
+        from app.models import TestSession
+
+        session = db.session.get(TestSession, session_id)
+        if session is None:
+            return 0
+        try:
+            _, changed, _ = GradingService.grade_responses(session.test_set_id, [session_id])
+            GradingService.refresh_session_totals([session_id])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return changed
+
+    @staticmethod
+    def grade_cohort(test_set_id, chunk_size=1000):
+        """
+        Re-grade every session of a test set and refresh the changed totals.
+
+        Returns:
+            dict: Counts of graded and changed responses and affected sessions
+        """
+        try:
+            graded, changed, session_ids = GradingService.grade_responses(
+                test_set_id, chunk_size=chunk_size)
+            for start in range(0, len(session_ids), chunk_size):
+                GradingService.refresh_session_totals(session_ids[start:start + chunk_size])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return {'graded': graded, 'changed': changed, 'sessions': len(session_ids)}
@@ -0,0 +1,232 @@
+"""Image variant generation service.
+
+Resizing runs in a separate process pool so request workers (and eventlet's
+hub) never block on image decoding. Variants are cached on disk next to the
+content-addressed blobs, keyed by the blob's SHA-256, so identical uploads
+share their thumbnails too.
+"""
+
+import os
+import glob
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger('bdc')
+
+
+# Bump when the rendering changes so clients and caches see new ETags
+VARIANT_VERSION = 1
+
+VARIANTS = {
+    'avatar': {'size': (300, 300), 'quality': 85},
+    'thumbnail': {'size': (150, 150), 'quality': 80},
+    'preview': {'size': (1024, 1024), 'quality': 85}
+}
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+PDF_EXTENSIONS = {'pdf'}
+
+
+def _open_pdf_first_page(source_path):
+    """Rasterize the first page of a PDF, or return None if unsupported."""
+    try:
+        import fitz  # PyMuPDF, optional
+    except ImportError:
+        return None
+
+    from PIL import Image
+
+    with fitz.open(source_path) as pdf:
+        if pdf.page_count == 0:
+            return None
+        pixmap = pdf.load_page(0).get_pixmap()
+        return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+
+def render_variant(source_path, output_path, size, quality, is_pdf=False):
+    """
+    Render one resized JPEG variant of a file.
+
+    Runs inside a pool worker process, so it only takes plain arguments.
+
+    Returns:
+        bool: True if the variant was written
+    """
+    from PIL import Image
+
+    if is_pdf:
+        img = _open_pdf_first_page(source_path)
+        if img is None:
+            return False
+    else:
+        img = Image.open(source_path)
+        img.draft('RGB', size)  # Let JPEG decode at reduced scale
+
+    # Flatten transparency onto white
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGBA')
+        rgb_img = Image.new('RGB', img.size, (255, 255, 255))
+        rgb_img.paste(img, mask=img.split()[-1])
+        img = rgb_img
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    img.thumbnail(size, Image.Resampling.LANCZOS)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    img.save(temp_path, 'JPEG', quality=quality, optimize=True)
+    os.replace(temp_path, output_path)
+    return True
+
+
+class ImageService:
+    """Service for generating and locating cached image variants."""
+
+    VARIANT_DIRECTORY = 'variants'
+
+    def __init__(self, app=None):
+        """Initialize image service."""
+        self.app = app
+        self._executor = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize app configuration."""
+        self.app = app
+        self.upload_folder = app.config.get('UPLOAD_FOLDER', 'app/static/uploads')
+        self.max_workers = app.config.get('IMAGE_WORKERS', 2)
+        self.synchronous = app.config.get('IMAGE_PROCESSING_SYNC', False)
+
+    @property
+    def executor(self):
+        """Process pool, created on first use."""
+        if self._executor is None:
+            # 'spawn' keeps workers independent of eventlet's monkey patching
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    def shutdown(self):
+        """Stop the worker pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    @staticmethod
+    def supports(extension):
+        """Check whether variants can be generated for a file extension."""
+        extension = (extension or '').lower()
+        return extension in IMAGE_EXTENSIONS or extension in PDF_EXTENSIONS
+
+    @staticmethod
+    def etag(sha256, variant):
+        """Strong ETag for a variant; content-derived, so it never changes."""
+        return f"{sha256}-{variant}-v{VARIANT_VERSION}"
+
+    def variant_path(self, sha256, variant):
+        """Return the absolute path of a cached variant."""
+        return os.path.join(
+            self.upload_folder, self.VARIANT_DIRECTORY, sha256[:2],
+            f"{sha256}_{variant}_v{VARIANT_VERSION}.jpg"
+        )
+
+    def remove_variants(self, sha256):
+        """Delete every cached variant of a blob, including older versions."""
+        pattern = os.path.join(self.upload_folder, self.VARIANT_DIRECTORY, sha256[:2], f"{sha256}_*.jpg")
+        for path in glob.glob(pattern):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def get_variant(self, sha256, variant):
+        """Return the path of a variant if it has been generated."""
+        path = self.variant_path(sha256, variant)
+        return path if os.path.exists(path) else None
+
+    def is_pending(self, sha256, variant):
+        """Check whether a variant is being generated."""
+        with self._lock:
+            return (sha256, variant) in self._pending
+
+    def schedule_variants(self, blob, variants=('thumbnail', 'preview')):
+        """
+        Queue generation of missing variants for a stored blob.
+
+        Args:
+            blob (FileBlob): The stored source file
+            variants (iterable): Names from VARIANTS
+
+        Returns:
+            list: Variant names that were queued
+        """
+        if not self.supports(blob.extension):
+            return []
+
+        source_path = os.path.join(self.upload_folder, blob.storage_path)
+        is_pdf = blob.extension.lower() in PDF_EXTENSIONS
+        queued = []
+
+        for variant in variants:
+            spec = VARIANTS[variant]
+            key = (blob.sha256, variant)
+            output_path = self.variant_path(blob.sha256, variant)
+
+            if os.path.exists(output_path):
+                continue
+
+            if self.synchronous:
+                self._render(source_path, output_path, spec, is_pdf, key)
+                queued.append(variant)
+                continue
+
+            with self._lock:
+                if key in self._pending:
+                    continue
+                try:
+                    future = self.executor.submit(
+                        render_variant, source_path, output_path,
+                        spec['size'], spec['quality'], is_pdf
+                    )
+                except Exception as e:
+                    # A broken pool must not fail the upload; render in-process
+                    logger.error(f"Image worker pool unavailable: {str(e)}")
+                    self._executor = None
+                    future = None
+                else:
+                    self._pending[key] = future
+
+            if future is None:
+                self._render(source_path, output_path, spec, is_pdf, key)
+            else:
+                future.add_done_callback(lambda f, key=key: self._finished(key, f))
+            queued.append(variant)
+
+        return queued
+
+    def _render(self, source_path, output_path, spec, is_pdf, key):
+        """Render a variant in-process (tests and IMAGE_PROCESSING_SYNC)."""
+        try:
+            render_variant(source_path, output_path, spec['size'], spec['quality'], is_pdf)
+        except Exception as e:
+            logger.error(f"Error generating image variant {key}: {str(e)}")
+
+    def _finished(self, key, future):
+        """Forget a completed job and log failures."""
+        with self._lock:
+            self._pending.pop(key, None)
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Error generating image variant {key}: {str(error)}")
+
+
+# Global image service instance
+image_service = ImageService()
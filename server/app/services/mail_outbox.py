@@ -0,0 +1,384 @@
+"""Mail outbox: durable queue plus pooled SMTP delivery.
+
+``send_email`` only inserts rows into the ``email_outbox`` table. A fixed
+pool of sender threads claims pending rows in batches and delivers them
+over SMTP connections that stay open between batches, so a tenant-wide
+notification costs one insert per recipient instead of one thread and one
+SMTP handshake per recipient.
+"""
+
+import base64
+import logging
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from email.utils import formataddr
+
+from flask_mail import Message
+from sqlalchemy import and_, or_
+
+from app.extensions import db, mail
+
+logger = logging.getLogger('bdc')
+
+
+MAX_RETRY_DELAY = 6 * 3600  # Never back off longer than six hours
+
+
+class DomainRateLimiter:
+    """Token buckets limiting how fast we send to each recipient domain.
+
+    Large providers throttle or greylist senders that burst; limits are
+    messages per minute and apply per process.
+    """
+
+    def __init__(self, default_rate=60, overrides=None):
+        """Initialize the limiter."""
+        self.default_rate = default_rate
+        self.overrides = {k.lower(): v for k, v in (overrides or {}).items()}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, domain):
+        """
+        Take one token for a domain.
+
+        Returns:
+            float: 0 if the message may be sent now, otherwise seconds to wait
+        """
+        rate = self.overrides.get(domain, self.default_rate)
+        if not rate:
+            return 0
+
+        per_second = rate / 60.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(domain, (float(rate), now))
+            tokens = min(float(rate), tokens + (now - updated) * per_second)
+            if tokens >= 1:
+                self._buckets[domain] = (tokens - 1, now)
+                return 0
+            self._buckets[domain] = (tokens, now)
+            return (1 - tokens) / per_second
+
+
+class SMTPSession:
+    """A lazily opened SMTP connection reused across messages."""
+
+    def __init__(self, idle_timeout=30):
+        """Initialize the session."""
+        self.idle_timeout = idle_timeout
+        self.connection = None
+        self.last_used = 0
+
+    def send(self, message):
+        """Send a message, opening or re-opening the connection as needed."""
+        if self.connection is None:
+            self.connection = mail.connect().__enter__()
+        try:
+            self.connection.send(message)
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped an idle connection; retry once on a fresh one
+            self.reset()
+            self.connection = mail.connect().__enter__()
+            self.connection.send(message)
+        self.last_used = time.monotonic()
+
+    def close_if_idle(self):
+        """Close the connection when it has not been used for a while."""
+        if self.connection is not None and time.monotonic() - self.last_used > self.idle_timeout:
+            self.close()
+
+    def close(self):
+        """Politely close the connection."""
+        if self.connection is not None:
+            try:
+                self.connection.__exit__(None, None, None)
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.connection = None
+
+    def reset(self):
+        """Drop a broken connection without talking to the server."""
+        if self.connection is not None and self.connection.host is not None:
+            try:
+                self.connection.host.close()
+            except OSError:
+                pass
+        self.connection = None
+
+
+class MailOutbox:
+    """Queue emails durably and deliver them with a pool of SMTP workers."""
+
+    def __init__(self, app=None):
+        """Initialize the outbox."""
+        self.app = app
+        self._threads = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._start_lock = threading.Lock()
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize app configuration."""
+        self.app = app
+        self.workers = app.config.get('MAIL_OUTBOX_WORKERS', 4)
+        self.batch_size = app.config.get('MAIL_OUTBOX_BATCH_SIZE', 50)
+        self.poll_interval = app.config.get('MAIL_OUTBOX_POLL_INTERVAL', 5)
+        self.max_attempts = app.config.get('MAIL_OUTBOX_MAX_ATTEMPTS', 5)
+        self.retry_backoff = app.config.get('MAIL_OUTBOX_RETRY_BACKOFF', 60)
+        self.claim_timeout = app.config.get('MAIL_OUTBOX_CLAIM_TIMEOUT', 600)
+        self.idle_timeout = app.config.get('MAIL_CONNECTION_IDLE_TIMEOUT', 30)
+        self.rate_limiter = DomainRateLimiter(
+            app.config.get('MAIL_DOMAIN_RATE_LIMIT', 60),
+            app.config.get('MAIL_DOMAIN_RATE_LIMITS', {})
+        )
+
+    def enqueue(self, subject, recipients, text_body, html_body=None, sender=None,
+                attachments=None, commit=True):
+        """
+        Queue an email, one outbox row per recipient.
+
+        Args:
+            subject (str): Email subject
+            recipients (list): Recipient addresses (str or (name, address) tuples)
+            text_body (str): Plain text body
+            html_body (str): HTML body
+            sender (str): Sender address, defaults to MAIL_DEFAULT_SENDER
+            attachments (list): Tuples of (filename, media_type, data)
+            commit (bool): Commit the session; pass False to join the caller's transaction
+
+        Returns:
+            list: The queued OutboxEmail rows
+        """
+        from app.models.email_outbox import OutboxEmail
+
+        sender = sender or self.app.config['MAIL_DEFAULT_SENDER']
+        encoded_attachments = [
+            {
+                'filename': filename,
+                'content_type': media_type,
+                'data': base64.b64encode(data).decode('ascii')
+            }
+            for filename, media_type, data in attachments or []
+        ] or None
+
+        rows = []
+        for recipient in recipients:
+            if isinstance(recipient, (tuple, list)):
+                address = recipient[1]
+                recipient = formataddr(tuple(recipient))
+            else:
+                address = recipient
+            rows.append(OutboxEmail(
+                recipient=recipient,
+                domain=address.rsplit('@', 1)[-1].strip('> ').lower(),
+                sender=sender,
+                subject=subject,
+                text_body=text_body,
+                html_body=html_body,
+                attachments=encoded_attachments,
+                status='pending',
+                attempts=0,
+                next_attempt_at=datetime.utcnow()
+            ))
+
+        db.session.add_all(rows)
+        if commit:
+            db.session.commit()
+
+        self.start()
+        self.wake()
+        return rows
+
+    def start(self):
+        """Start the sender pool if it is not running."""
+        if not self.workers or self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            for index in range(self.workers):
+                worker_id = f"{uuid.uuid4().hex[:12]}-{index}"
+                thread = threading.Thread(
+                    target=self._worker_loop, args=(worker_id,),
+                    name=f"mail-outbox-{index}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        """Stop the sender pool."""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def wake(self):
+        """Wake idle workers to pick up new mail immediately."""
+        self._wakeup.set()
+
+    def process_pending(self, limit=None):
+        """
+        Deliver due emails in the calling thread.
+
+        Used by the ``flask send-mail`` command and by tests.
+
+        Args:
+            limit (int): Maximum number of emails to process
+
+        Returns:
+            dict: Counts of sent, retried and failed emails
+        """
+        worker_id = f"{uuid.uuid4().hex[:12]}-sync"
+        session = SMTPSession(self.idle_timeout)
+        totals = {'sent': 0, 'retried': 0, 'failed': 0}
+        try:
+            while limit is None or limit > 0:
+                batch = self.batch_size if limit is None else min(self.batch_size, limit)
+                rows = self._claim(worker_id, batch)
+                if not rows:
+                    break
+                for key, count in self._deliver(rows, session).items():
+                    totals[key] += count
+                if limit is not None:
+                    limit -= len(rows)
+        finally:
+            session.close()
+        return totals
+
+    def _worker_loop(self, worker_id):
+        """Claim and deliver batches until stopped."""
+        with self.app.app_context():
+            session = SMTPSession(self.idle_timeout)
+            while not self._stop.is_set():
+                try:
+                    rows = self._claim(worker_id, self.batch_size)
+                    if rows:
+                        self._deliver(rows, session)
+                        continue
+                    session.close_if_idle()
+                except Exception as e:
+                    logger.error(f"Mail outbox worker error: {str(e)}")
+                    db.session.rollback()
+                    session.reset()
+                finally:
+                    db.session.remove()
+
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+            session.close()
+
+    def _due_filter(self, now):
+        """Rows ready to send, including claims abandoned by dead workers."""
+        from app.models.email_outbox import OutboxEmail
+
+        return or_(
+            and_(OutboxEmail.status == 'pending', OutboxEmail.next_attempt_at <= now),
+            and_(OutboxEmail.status == 'sending',
+                 OutboxEmail.claimed_at < now - timedelta(seconds=self.claim_timeout))
+        )
+
+    def _claim(self, worker_id, limit):
+        """Atomically claim up to ``limit`` due emails for a worker."""
+        from app.models.email_outbox import OutboxEmail
+
+        now = datetime.utcnow()
+        ids = [
+            row.id for row in db.session.query(OutboxEmail.id)
+            .filter(self._due_filter(now))
+            .order_by(OutboxEmail.next_attempt_at, OutboxEmail.id)
+            .limit(limit)
+        ]
+        if not ids:
+            return []
+
+        # The status condition makes concurrent claims of the same row lose
+        OutboxEmail.query.filter(
+            OutboxEmail.id.in_(ids), self._due_filter(now)
+        ).update(
+            {'status': 'sending', 'claimed_by': worker_id, 'claimed_at': now},
+            synchronize_session=False
+        )
+        db.session.commit()
+
+        return OutboxEmail.query.filter(
+            OutboxEmail.id.in_(ids),
+            OutboxEmail.claimed_by == worker_id,
+            OutboxEmail.status == 'sending'
+        ).order_by(OutboxEmail.id).all()
+
+    def _deliver(self, rows, session):
+        """Send claimed emails over one connection and record the outcomes."""
+        counts = {'sent': 0, 'retried': 0, 'failed': 0}
+
+        for row in rows:
+            wait = self.rate_limiter.acquire(row.domain)
+            if wait:
+                # Over the domain's rate: put it back without using an attempt
+                row.status = 'pending'
+                row.claimed_by = None
+                row.next_attempt_at = datetime.utcnow() + timedelta(seconds=wait)
+                continue
+
+            try:
+                session.send(self._build_message(row))
+            except smtplib.SMTPRecipientsRefused as e:
+                permanent = all(code >= 500 for code, _ in e.recipients.values())
+                counts[self._record_failure(row, e, permanent)] += 1
+            except smtplib.SMTPResponseException as e:
+                counts[self._record_failure(row, e, e.smtp_code >= 500)] += 1
+            except (smtplib.SMTPException, OSError) as e:
+                session.reset()
+                counts[self._record_failure(row, e, False)] += 1
+            else:
+                row.status = 'sent'
+                row.sent_at = datetime.utcnow()
+                row.attempts += 1
+                row.last_error = None
+                counts['sent'] += 1
+
+        db.session.commit()
+        return counts
+
+    def _record_failure(self, row, error, permanent):
+        """Schedule a retry with exponential backoff or give up."""
+        row.attempts += 1
+        row.last_error = str(error)[:1000]
+        row.claimed_by = None
+
+        if permanent or row.attempts >= self.max_attempts:
+            row.status = 'failed'
+            logger.error(f"Giving up on email {row.id} to {row.recipient}: {row.last_error}")
+            return 'failed'
+
+        delay = min(self.retry_backoff * 2 ** (row.attempts - 1), MAX_RETRY_DELAY)
+        row.status = 'pending'
+        row.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+        logger.warning(f"Email {row.id} to {row.recipient} failed, retrying in {delay}s: {row.last_error}")
+        return 'retried'
+
+    @staticmethod
+    def _build_message(row):
+        """Build a Flask-Mail message from an outbox row."""
+        msg = Message(row.subject, sender=row.sender, recipients=[row.recipient])
+        msg.body = row.text_body
+        if row.html_body:
+            msg.html = row.html_body
+        for attachment in row.attachments or []:
+            msg.attach(
+                attachment['filename'],
+                attachment['content_type'],
+                base64.b64decode(attachment['data'])
+            )
+        return msg
+
+
+# Global mail outbox instance
+mail_outbox = MailOutbox()
@@ -6,6 +6,7 @@ from flask import current_app
 from app.extensions import db
 from app.realtime import emit_to_user, user_is_online, emit_to_role, emit_to_tenant
 from app.services.email_service import send_notification_email
+from app.services.unread_counters import unread_counters
 
 
 class NotificationService:
@@ -52,6 +53,7 @@ class NotificationService:
             
             db.session.add(notification)
             db.session.commit()
+            unread_counters.notification_created(user_id, type)
             
             # Send real-time notification if user is online
             if user_is_online(user_id):
@@ -70,6 +72,7 @@ class NotificationService:
                             'message': message
                         }
                     )
+                    db.session.commit()
             
             return notification
             
@@ -287,11 +290,15 @@ class NotificationService:
             if not notification:
                 return False
             
+            was_unread = notification.read is False
             notification.read = True
             notification.read_at = datetime.now(timezone.utc)
             
             db.session.commit()
             
+            if was_unread:
+                unread_counters.notification_read(user_id, notification.type)
+            
             return True
             
         except Exception as e:
@@ -328,6 +335,7 @@ class NotificationService:
             })
             
             db.session.commit()
+            unread_counters.notifications_cleared(user_id, type)
             
             return count
             
@@ -359,9 +367,14 @@ class NotificationService:
             if not notification:
                 return False
             
+            was_unread = notification.read is False
+            type = notification.type
             db.session.delete(notification)
             db.session.commit()
             
+            if was_unread:
+                unread_counters.notification_read(user_id, type)
+            
             return True
             
         except Exception as e:
@@ -370,7 +383,7 @@ class NotificationService:
             return False
     
     @staticmethod
-    def get_user_notifications(user_id, limit=20, offset=0, unread_only=False, type=None):
+    def get_user_notifications(user_id, limit=20, offset=0, unread_only=False, type=None, projection=None):
         """
         Get notifications for a user.
         
@@ -380,6 +393,8 @@ class NotificationService:
             offset (int): Offset for pagination
             unread_only (bool): Whether to return only unread notifications
             type (str): Notification type to filter by
+            projection (Projection): Projection to serialize with instead of
+                ``Notification.to_dict``
             
         Returns:
             list: List of notifications
@@ -395,9 +410,14 @@ class NotificationService:
             if type:
                 query = query.filter_by(type=type)
             
-            notifications = query.order_by(
+            query = query.order_by(
                 Notification.created_at.desc()
-            ).limit(limit).offset(offset).all()
+            ).limit(limit).offset(offset)
+            
+            if projection is not None:
+                return projection.dump_many(projection.apply(query).all())
+            
+            notifications = query.all()
             
             return [notification.to_dict() for notification in notifications]
             
@@ -408,7 +428,7 @@ class NotificationService:
     @staticmethod
     def get_unread_count(user_id, type=None):
         """
-        Get count of unread notifications for a user.
+        Get count of unread notifications for a user, from the cached counters.
         
         Args:
             user_id (int): The user ID
@@ -418,17 +438,7 @@ class NotificationService:
             int: Number of unread notifications
         """
         try:
-            from app.models.notification import Notification
-            
-            query = Notification.query.filter_by(
-                user_id=user_id,
-                read=False
-            )
-            
-            if type:
-                query = query.filter_by(type=type)
-            
-            return query.count()
+            return unread_counters.unread_notifications(user_id, type)
             
         except Exception as e:
             current_app.logger.error(f"Error getting unread count: {str(e)}")
@@ -0,0 +1,211 @@
+"""PDF rendering service.
+
+Documents are laid out by reportlab in a separate process pool, so request
+workers (and eventlet's hub) are not tied up by rendering. Each pool worker
+builds the stylesheet and loads font metrics once when it starts. Callers
+pass plain data (see ``app.utils.pdf_generator``); rendered files are
+cached on disk under the SHA-256 of the document kind, template version
+and data, so an unchanged report is served from disk without rendering.
+
+``iter_zip`` renders many documents in parallel and streams them into a
+ZIP archive as they finish, keeping only a bounded window in flight.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import multiprocessing
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+logger = logging.getLogger('bdc')
+
+
+def _warm_worker():
+    """Pool initializer: prepare styles and fonts once per worker."""
+    from app.utils.pdf_generator import prepare
+
+    prepare()
+
+
+def render_to_file(kind, data, output_path):
+    """
+    Render a document and write it to a path.
+
+    Runs inside a pool worker process, so it only takes plain arguments and
+    returns the path rather than the document bytes.
+
+    Returns:
+        str: The output path
+    """
+    from app.utils.pdf_generator import render
+
+    content = render(kind, data)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(content)
+    os.replace(temp_path, output_path)
+    return output_path
+
+
+class _ZipStream:
+    """Write-only buffer handed to ZipFile; drained after each member."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class PDFService:
+    """Service for rendering and caching PDF documents."""
+
+    def __init__(self, app=None):
+        """Initialize PDF service."""
+        self.app = app
+        self._executor = None
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize app configuration."""
+        self.app = app
+        self.cache_dir = app.config.get('PDF_CACHE_DIR') or \
+            os.path.join(app.config.get('UPLOAD_FOLDER', 'app/static/uploads'), 'pdf_cache')
+        self.max_workers = app.config.get('PDF_WORKERS', 2)
+        self.synchronous = app.config.get('PDF_RENDER_SYNC', False)
+        self.timeout = app.config.get('PDF_RENDER_TIMEOUT', 120)
+
+    @property
+    def executor(self):
+        """Process pool with warmed workers, created on first use."""
+        if self._executor is None:
+            # 'spawn' keeps workers independent of eventlet's monkey patching
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_warm_worker
+            )
+        return self._executor
+
+    def shutdown(self):
+        """Stop the worker pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def cache_key(self, kind, data):
+        """SHA-256 of the document kind, template version and data."""
+        from app.utils.pdf_generator import TEMPLATE_VERSION
+
+        payload = json.dumps([kind, TEMPLATE_VERSION, data], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def cache_path(self, key):
+        """Return the absolute path of a cached document."""
+        return os.path.join(self.cache_dir, key[:2], f"{key}.pdf")
+
+    def _submit(self, kind, data, output_path):
+        """Render in the pool, or in-process when synchronous or the pool is broken."""
+        if not self.synchronous:
+            try:
+                return self.executor.submit(render_to_file, kind, data, output_path)
+            except Exception as e:
+                logger.error(f"PDF worker pool unavailable: {str(e)}")
+                self._executor = None
+
+        future = Future()
+        try:
+            future.set_result(render_to_file(kind, data, output_path))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def render_file(self, kind, data):
+        """
+        Path of a rendered document, rendering it unless cached.
+
+        Args:
+            kind (str): evaluation, beneficiary or report
+            data (dict): Data from the matching ``*_data`` builder
+
+        Returns:
+            str: Path of the cached PDF
+        """
+        path = self.cache_path(self.cache_key(kind, data))
+        if os.path.exists(path):
+            return path
+        return self._submit(kind, data, path).result(timeout=self.timeout)
+
+    def render(self, kind, data):
+        """Rendered document bytes (see ``render_file``)."""
+        with open(self.render_file(kind, data), 'rb') as f:
+            return f.read()
+
+    def _render_many(self, items):
+        """Yield ``(filename, path or error)`` in input order, rendering a window in parallel."""
+        window = max(self.max_workers * 2, 1)
+        pending = deque()
+
+        def resolve(filename, future):
+            try:
+                return filename, future.result(timeout=self.timeout)
+            except Exception as e:
+                logger.error(f"PDF render failed for {filename}: {str(e)}")
+                return filename, e
+
+        for filename, kind, data in items:
+            path = self.cache_path(self.cache_key(kind, data))
+            if os.path.exists(path):
+                future = Future()
+                future.set_result(path)
+            else:
+                future = self._submit(kind, data, path)
+            pending.append((filename, future))
+            while len(pending) >= window:
+                yield resolve(*pending.popleft())
+
+        while pending:
+            yield resolve(*pending.popleft())
+
+    def iter_zip(self, items):
+        """
+        Render documents and stream them as a ZIP archive.
+
+        Members are stored uncompressed (PDF streams are already compressed).
+        Documents that fail to render are listed in ``errors.txt``.
+
+        Args:
+            items (iterable): ``(filename, kind, data)`` tuples; consumed lazily
+
+        Yields:
+            bytes: Consecutive chunks of the archive
+        """
+        stream = _ZipStream()
+        failed = []
+        with zipfile.ZipFile(stream, 'w', zipfile.ZIP_STORED) as archive:
+            for filename, result in self._render_many(items):
+                if isinstance(result, Exception):
+                    failed.append(f"{filename}: {result}")
+                    continue
+                archive.write(result, filename)
+                yield stream.drain()
+            if failed:
+                archive.writestr('errors.txt', '\n'.join(failed) + '\n')
+        yield stream.drain()
+
+
+pdf_service = PDFService()
@@ -0,0 +1,175 @@
+"""Student portal aggregates.
+
+The portal's dashboard, progress and achievements views all summarize a
+student's enrollments. ``PortalStatsService.get`` computes those summaries
+for every enrollment at once in four queries (enrollments with their
+programs, then session and attendance counts, average test scores and high
+scores, each grouped by program) and caches the result per beneficiary for
+``PORTAL_STATS_CACHE_TTL`` seconds. Recording attendance, enrolling and
+completing or re-grading tests drop the affected students' entries.
+"""
+
+from flask import current_app
+from sqlalchemy import and_, distinct, func, select
+
+from app.extensions import db, cache
+
+# Scores at or above this percentage earn a high score achievement
+HIGH_SCORE = 90
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+class PortalStatsService:
+    """Cached per-student portal aggregates."""
+
+    CACHE_PREFIX = 'portal_stats'
+
+    @staticmethod
+    def _key(beneficiary_id):
+        return f"{PortalStatsService.CACHE_PREFIX}:{beneficiary_id}"
+
+    @staticmethod
+    def get(beneficiary_id):
+        """
+        Portal aggregates of a beneficiary, from the cache when possible.
+
+        Args:
+            beneficiary_id (int): Beneficiary ID
+
+        Returns:
+            dict: ``programs`` (one entry per enrollment with its program,
+            attendance counts and average score), ``high_scores`` and overall
+            ``attendance`` counts
+        """
+        key = PortalStatsService._key(beneficiary_id)
+        try:
+            stats = cache.get(key)
+        except Exception as e:
+            current_app.logger.error(f"Error reading portal stats cache: {str(e)}")
+            stats = None
+        if stats is not None:
+            return stats
+
+        stats = PortalStatsService.compute(beneficiary_id)
+        try:
+            cache.set(key, stats, timeout=current_app.config.get('PORTAL_STATS_CACHE_TTL', 300))
+        except Exception as e:
+            current_app.logger.error(f"Error writing portal stats cache: {str(e)}")
+        return stats
+
+    @staticmethod
+    def compute(beneficiary_id):
+        """Compute a beneficiary's portal aggregates in four queries."""
+        from app.models import (Program, ProgramEnrollment, SessionAttendance, TestSession,
+                                TestSet, TrainingSession)
+
+        enrollments = db.session.execute(
+            select(ProgramEnrollment, Program)
+            .join(Program, Program.id == ProgramEnrollment.program_id)
+            .where(ProgramEnrollment.beneficiary_id == beneficiary_id)
+            .order_by(ProgramEnrollment.enrollment_date, ProgramEnrollment.id)
+        ).all()
+        program_ids = select(ProgramEnrollment.program_id) \
+            .where(ProgramEnrollment.beneficiary_id == beneficiary_id).scalar_subquery()
+
+        # Sessions per program and how many of them the student attended
+        attendance = {
+            program_id: (total, attended)
+            for program_id, total, attended in db.session.execute(
+                select(TrainingSession.program_id,
+                       func.count(distinct(TrainingSession.id)),
+                       func.count(distinct(SessionAttendance.session_id)))
+                .outerjoin(SessionAttendance, and_(
+                    SessionAttendance.session_id == TrainingSession.id,
+                    SessionAttendance.beneficiary_id == beneficiary_id,
+                    SessionAttendance.status == 'present'))
+                .where(TrainingSession.program_id.in_(program_ids))
+                .group_by(TrainingSession.program_id)
+            )
+        }
+
+        # Tests are not linked to programs; a program counts its tenant's tests
+        scores = dict(db.session.execute(
+            select(ProgramEnrollment.program_id, func.avg(TestSession.score))
+            .join(Program, Program.id == ProgramEnrollment.program_id)
+            .join(TestSet, TestSet.tenant_id == Program.tenant_id)
+            .join(TestSession, TestSession.test_set_id == TestSet.id)
+            .where(ProgramEnrollment.beneficiary_id == beneficiary_id,
+                   TestSession.beneficiary_id == beneficiary_id,
+                   TestSession.status == 'completed')
+            .group_by(ProgramEnrollment.program_id)
+        ).all())
+
+        high_scores = db.session.execute(
+            select(TestSession.id, TestSession.score, TestSession.end_time,
+                   TestSet.id, TestSet.title, TestSet.category)
+            .join(TestSet, TestSet.id == TestSession.test_set_id)
+            .where(TestSession.beneficiary_id == beneficiary_id,
+                   TestSession.score >= HIGH_SCORE,
+                   TestSession.status == 'completed')
+            .order_by(TestSession.id)
+        ).all()
+
+        programs = []
+        for enrollment, program in enrollments:
+            total, attended = attendance.get(program.id, (0, 0))
+            programs.append({
+                'program': {
+                    'id': program.id,
+                    'name': program.name,
+                    'code': program.code,
+                    'category': program.category
+                },
+                'enrollment': {
+                    'id': enrollment.id,
+                    'enrollment_date': _iso(enrollment.enrollment_date),
+                    'status': enrollment.status,
+                    'progress': enrollment.progress or 0,
+                    'attendance_rate': enrollment.attendance_rate or 0,
+                    'overall_score': enrollment.overall_score,
+                    'completion_date': _iso(enrollment.completion_date),
+                    'certificate_issued': enrollment.certificate_issued,
+                    'certificate_number': enrollment.certificate_number
+                },
+                'attendance': {'attended': attended, 'total': total},
+                'average_score': round(scores.get(program.id) or 0, 2)
+            })
+
+        return {
+            'programs': programs,
+            'high_scores': [{
+                'session_id': session_id,
+                'score': score,
+                'end_time': _iso(end_time),
+                'test_set': {'id': test_set_id, 'title': title, 'category': category}
+            } for session_id, score, end_time, test_set_id, title, category in high_scores],
+            'attendance': {
+                'attended': sum(entry['attendance']['attended'] for entry in programs),
+                'total': sum(entry['attendance']['total'] for entry in programs)
+            }
+        }
+
+    @staticmethod
+    def invalidate(*beneficiary_ids):
+        """Drop cached aggregates of some beneficiaries."""
+        keys = [PortalStatsService._key(beneficiary_id) for beneficiary_id in beneficiary_ids
+                if beneficiary_id is not None]
+        if not keys:
+            return
+        try:
+            cache.delete_many(*keys)
+        except Exception as e:
+            current_app.logger.error(f"Error invalidating portal stats: {str(e)}")
+
+    @staticmethod
+    def invalidate_test_set(test_set_id):
+        """Drop cached aggregates of every student who completed a test set."""
+        from app.models import TestSession
+
+        PortalStatsService.invalidate(*db.session.scalars(
+            select(distinct(TestSession.beneficiary_id))
+            .where(TestSession.test_set_id == test_set_id, TestSession.status == 'completed')
+        ))
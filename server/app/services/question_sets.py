@@ -0,0 +1,187 @@
+"""Cached question sets for the test-taking client.
+
+Questions do not change while a test set is being taken, and a class
+starting an exam at the same moment would otherwise run the same question
+query once per student. ``question_sets`` builds the whole set once (test
+set settings plus every question without its correct answer or
+explanation) and serves it as a pre-serialized JSON body.
+
+Each test set has a version token in the shared cache; ``invalidate``
+replaces it when questions are edited, so cached bodies and client ETags
+for the old version are never served again. Bodies are cached under
+``(test set, version)`` in the shared cache and in process memory for
+``QUESTION_SET_CACHE_TTL`` seconds, and ``warm`` builds them ahead of time
+when a test set is published.
+"""
+
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from flask import current_app
+
+from app.extensions import db, cache
+
+# ``access`` holds the fields permission checks need; ``data`` and ``body``
+# are what the client receives
+QuestionSet = namedtuple('QuestionSet', 'test_set_id version access data body')
+
+# Question fields sent to the client; never the correct answer or explanation
+CLIENT_FIELDS = ('id', 'text', 'type', 'options', 'category', 'difficulty', 'points', 'order')
+
+
+class QuestionSetCache:
+    """Version-stamped question sets, cached per process and in the shared cache."""
+
+    CACHE_PREFIX = 'question_set'
+
+    def __init__(self):
+        self._versions = {}
+        self._sets = {}
+        self._lock = threading.Lock()
+        # One build per test set at a time in this process
+        self._building = {}
+
+    @staticmethod
+    def _timeout():
+        return current_app.config.get('QUESTION_SET_CACHE_TTL', 3600)
+
+    def _version_key(self, test_set_id):
+        return f"{self.CACHE_PREFIX}:version:{test_set_id}"
+
+    def _set_key(self, test_set_id, version):
+        return f"{self.CACHE_PREFIX}:{test_set_id}:{version}"
+
+    def version(self, test_set_id):
+        """
+        Current version token of a test set's questions.
+
+        The shared cache is authoritative; without an entry this process
+        keeps its own token (starting a new one if it has none).
+
+        Args:
+            test_set_id (int): Test set ID
+
+        Returns:
+            str: Version token
+        """
+        try:
+            version = cache.get(self._version_key(test_set_id))
+        except Exception as e:
+            current_app.logger.error(f"Error reading question set version: {str(e)}")
+            version = None
+        now = time.monotonic()
+
+        with self._lock:
+            if version is None:
+                local = self._versions.get(test_set_id)
+                if local and local[0] > now:
+                    return local[1]
+                version = uuid.uuid4().hex[:12]
+                try:
+                    # Another process may have started a version first
+                    if not cache.add(self._version_key(test_set_id), version, timeout=self._timeout()):
+                        version = cache.get(self._version_key(test_set_id)) or version
+                except Exception as e:
+                    current_app.logger.error(f"Error writing question set version: {str(e)}")
+            self._versions[test_set_id] = (now + self._timeout(), version)
+        return version
+
+    @staticmethod
+    def _load(test_set_id):
+        """Read a test set and its questions in two queries."""
+        from app.models import Question, TestSet
+
+        test_set = db.session.query(
+            TestSet.id, TestSet.tenant_id, TestSet.beneficiary_id, TestSet.status,
+            TestSet.title, TestSet.description, TestSet.instructions, TestSet.type,
+            TestSet.time_limit, TestSet.is_randomized, TestSet.allow_resume, TestSet.show_results
+        ).filter(TestSet.id == test_set_id).first()
+        if test_set is None:
+            return None
+
+        columns = [getattr(Question, field) for field in CLIENT_FIELDS]
+        questions = db.session.query(*columns).filter(Question.test_set_id == test_set_id) \
+            .order_by(Question.order.asc(), Question.id.asc()).all()
+
+        access = {'tenant_id': test_set.tenant_id, 'beneficiary_id': test_set.beneficiary_id,
+                  'status': test_set.status}
+        data = {
+            'id': test_set.id,
+            'title': test_set.title,
+            'description': test_set.description,
+            'instructions': test_set.instructions,
+            'type': test_set.type,
+            'time_limit': test_set.time_limit,
+            'is_randomized': test_set.is_randomized,
+            'allow_resume': test_set.allow_resume,
+            'show_results': test_set.show_results,
+            'questions': [dict(zip(CLIENT_FIELDS, question)) for question in questions]
+        }
+        return access, data
+
+    def get(self, test_set_id):
+        """
+        A test set's questions for the client.
+
+        Args:
+            test_set_id (int): Test set ID
+
+        Returns:
+            QuestionSet: The current version, or None if the test set does not exist
+        """
+        version = self.version(test_set_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sets.get(test_set_id)
+            if entry and entry[0] > now and entry[1].version == version:
+                return entry[1]
+            building = self._building.setdefault(test_set_id, threading.Lock())
+
+        with building:
+            # Built by another thread while this one waited
+            with self._lock:
+                entry = self._sets.get(test_set_id)
+            if entry and entry[0] > now and entry[1].version == version:
+                return entry[1]
+
+            key = self._set_key(test_set_id, version)
+            try:
+                cached = cache.get(key)
+            except Exception as e:
+                current_app.logger.error(f"Error reading question set cache: {str(e)}")
+                cached = None
+            if cached is None:
+                cached = self._load(test_set_id)
+                if cached is None:
+                    return None
+                try:
+                    cache.set(key, cached, timeout=self._timeout())
+                except Exception as e:
+                    current_app.logger.error(f"Error writing question set cache: {str(e)}")
+
+            access, data = cached
+            data = dict(data, version=version)
+            question_set = QuestionSet(test_set_id, version, access, data, current_app.json.dumps(data))
+            with self._lock:
+                self._sets[test_set_id] = (time.monotonic() + self._timeout(), question_set)
+            return question_set
+
+    def warm(self, test_set_id):
+        """Build a test set's cached questions ahead of the first request."""
+        return self.get(test_set_id)
+
+    def invalidate(self, test_set_id):
+        """Start a new version after a test set or its questions change."""
+        version = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._sets.pop(test_set_id, None)
+            self._versions[test_set_id] = (time.monotonic() + self._timeout(), version)
+        try:
+            cache.set(self._version_key(test_set_id), version, timeout=self._timeout())
+        except Exception as e:
+            current_app.logger.error(f"Error invalidating question set cache: {str(e)}")
+
+
+question_sets = QuestionSetCache()
@@ -0,0 +1,195 @@
+"""Recurring availability expansion.
+
+Expands a schedule's weekly ``AvailabilitySlot``s into concrete windows
+day by day, applying ``AvailabilityException``s and subtracting booked
+appointments. Slots and exceptions are indexed by weekday and date and
+appointments by local date up front, so expanding a range costs
+O(days + slots + appointments) instead of scanning every appointment for
+every slot of every day. Days are produced lazily.
+
+Slot and exception times are wall-clock times in the schedule's time zone;
+appointment times are stored in naive UTC and converted on load.
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from flask import current_app
+
+
+@lru_cache(maxsize=256)
+def _parse_time(value):
+    """Parse an ``HH:MM`` string."""
+    hours, minutes = value.split(':')
+    return time(int(hours), int(minutes))
+
+
+def get_zone(name):
+    """Resolve a time zone name, falling back to UTC."""
+    try:
+        return ZoneInfo(name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        current_app.logger.warning(f"Unknown time zone {name!r}, using UTC")
+        return ZoneInfo('UTC')
+
+
+class Window:
+    """A concrete time window on one day."""
+
+    __slots__ = ('start', 'end', 'kind', 'source')
+
+    def __init__(self, start, end, kind, source=None):
+        self.start = start
+        self.end = end
+        self.kind = kind  # 'regular', 'exception' or 'appointment'
+        self.source = source
+
+    def __repr__(self):
+        return f'<Window {self.kind} {self.start.isoformat()}-{self.end.isoformat()}>'
+
+
+class DayPlan:
+    """Availability of one day: available, unavailable and booked windows."""
+
+    __slots__ = ('date', 'available', 'unavailable', 'appointments')
+
+    def __init__(self, date, available, unavailable, appointments):
+        self.date = date
+        self.available = available
+        self.unavailable = unavailable
+        self.appointments = appointments
+
+    def free(self):
+        """Yield the available windows minus unavailable and booked time."""
+        busy = sorted(self.unavailable + self.appointments, key=lambda w: w.start)
+        for window in sorted(self.available, key=lambda w: w.start):
+            cursor = window.start
+            for blocked in busy:
+                if blocked.end <= cursor:
+                    continue
+                if blocked.start >= window.end:
+                    break
+                if blocked.start > cursor:
+                    yield Window(cursor, blocked.start, window.kind, window.source)
+                cursor = max(cursor, blocked.end)
+                if cursor >= window.end:
+                    break
+            if cursor < window.end:
+                yield Window(cursor, window.end, window.kind, window.source)
+
+
+class RecurrenceEngine:
+    """Expand weekly slots into dated windows for one schedule."""
+
+    def __init__(self, slots, exceptions=(), appointments=(), time_zone='UTC'):
+        """
+        Args:
+            slots: AvailabilitySlot rows
+            exceptions: AvailabilityException rows
+            appointments: Appointment rows (naive UTC times)
+            time_zone (str): IANA name the slot times are expressed in
+        """
+        self.zone = get_zone(time_zone)
+
+        self._slots = defaultdict(list)
+        for slot in slots:
+            self._slots[slot.day_of_week].append(slot)
+
+        self._exceptions = defaultdict(list)
+        for exception in exceptions:
+            self._exceptions[exception.date.date()].append(exception)
+
+        self._appointments = defaultdict(list)
+        for appointment in appointments:
+            start = self.localize(appointment.start_time)
+            end = self.localize(appointment.end_time)
+            window = Window(start, end, 'appointment', appointment)
+            day = start.date()
+            while day <= end.date():
+                self._appointments[day].append(window)
+                day += timedelta(days=1)
+
+    @classmethod
+    def for_schedule(cls, schedule, start_date, end_date, appointments=None):
+        """
+        Load a schedule's slots, exceptions and appointments for a range.
+
+        Args:
+            schedule (AvailabilitySchedule): The schedule
+            start_date (datetime): First day of the range
+            end_date (datetime): Last day of the range
+            appointments (list): Already loaded appointments of the
+                schedule's owner, to avoid querying them again
+
+        Returns:
+            RecurrenceEngine: The engine
+        """
+        from app.models.appointment import Appointment
+        from app.models.availability import AvailabilityException, AvailabilitySlot
+
+        first = datetime.combine(start_date.date(), time.min)
+        last = datetime.combine(end_date.date(), time.max)
+
+        slots = AvailabilitySlot.query.filter_by(schedule_id=schedule.id).all()
+        exceptions = AvailabilityException.query.filter(
+            AvailabilityException.user_id == schedule.user_id,
+            AvailabilityException.date >= first,
+            AvailabilityException.date <= last
+        ).order_by(AvailabilityException.id).all()
+
+        if appointments is None:
+            # Pad by a day: the range is in local time, appointments in UTC
+            appointments = Appointment.query.filter(
+                Appointment.trainer_id == schedule.user_id,
+                Appointment.start_time < last + timedelta(days=1),
+                Appointment.end_time > first - timedelta(days=1),
+                Appointment.status != 'cancelled'
+            ).order_by(Appointment.start_time).all()
+        else:
+            appointments = [a for a in appointments if a.status != 'cancelled']
+
+        return cls(slots, exceptions, appointments, schedule.time_zone)
+
+    def localize(self, value):
+        """Convert a naive UTC datetime to the schedule's time zone."""
+        return value.replace(tzinfo=timezone.utc).astimezone(self.zone)
+
+    def _window(self, day, start, end, kind, source):
+        start_at = datetime.combine(day, _parse_time(start), tzinfo=self.zone)
+        end_at = datetime.combine(day, _parse_time(end), tzinfo=self.zone)
+        if end_at <= start_at:
+            end_at += timedelta(days=1)
+        return Window(start_at, end_at, kind, source)
+
+    def day(self, day):
+        """Build the plan for one date."""
+        available, unavailable = [], []
+        for slot in self._slots.get(day.weekday(), ()):
+            target = available if slot.is_available else unavailable
+            target.append(self._window(day, slot.start_time, slot.end_time, 'regular', slot))
+
+        for exception in self._exceptions.get(day, ()):
+            if exception.start_time and exception.end_time:
+                window = self._window(day, exception.start_time, exception.end_time, 'exception', exception)
+                (available if exception.is_available else unavailable).append(window)
+            else:
+                # An all-day exception replaces everything before it
+                window = self._window(day, '00:00', '23:59', 'exception', exception)
+                available, unavailable = ([window], []) if exception.is_available else ([], [window])
+
+        return DayPlan(day, available, unavailable, list(self._appointments.get(day, ())))
+
+    def days(self, start_date, end_date):
+        """Lazily yield a DayPlan for every date from start to end inclusive."""
+        day, last = start_date.date(), end_date.date()
+        while day <= last:
+            yield self.day(day)
+            day += timedelta(days=1)
+
+    def free_windows(self, start_date, end_date):
+        """Lazily yield ``(date, Window)`` for unbooked available time."""
+        for plan in self.days(start_date, end_date):
+            for window in plan.free():
+                yield plan.date, window
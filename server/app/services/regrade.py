@@ -0,0 +1,228 @@
+"""Re-grading of stored responses after answer keys change.
+
+Editing a question's points, type, options or correct answer queues a
+``RegradeJob`` for its test set (pending jobs for the same set are merged).
+Requests only queue jobs and poll their progress; jobs run on the
+scheduler (``regrade-jobs``) or from ``flask regrade-responses``. A job
+finds the affected sessions with one grouped query, then re-grades them in
+chunks of ``REGRADE_CHUNK_SIZE`` sessions, one transaction per chunk:
+changed grades are written back in bulk, session totals and pass/fail are
+recomputed with one UPDATE, and the job's progress, resume point and
+``claimed_at`` heartbeat are committed with them. A running job whose
+heartbeat is older than ``REGRADE_CLAIM_TIMEOUT`` is considered
+interrupted and may be taken over; it continues after its last finished
+chunk.
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, or_, select
+
+from app.extensions import db
+from app.services.grading import GradingService
+from app.services.portal_stats import PortalStatsService
+from app.services.scoring import question_cache
+from app.services.scheduler import scheduler
+
+logger = logging.getLogger('bdc')
+
+# Question attributes that change grades
+GRADED_FIELDS = ('type', 'points', 'correct_answer', 'options')
+
+
+class RegradeService:
+    """Service for queuing and running re-grade jobs."""
+
+    @staticmethod
+    def enqueue(test_set_id, question_ids=None, reason=None, requested_by=None):
+        """
+        Queue a re-grade of a test set, merging with a pending job.
+
+        Args:
+            test_set_id (int): Test set ID
+            question_ids (list, optional): Changed questions; None re-grades all
+            reason (str, optional): Why the job was queued
+            requested_by (int, optional): User ID
+
+        Returns:
+            RegradeJob: The new or merged job
+        """
+        from app.models import RegradeJob
+
+        job = RegradeJob.query.filter_by(test_set_id=test_set_id, status='pending').first()
+        if job is None:
+            job = RegradeJob(test_set_id=test_set_id, question_ids=question_ids, reason=reason,
+                             requested_by=requested_by, status='pending')
+            db.session.add(job)
+        elif job.question_ids is not None:
+            job.question_ids = None if question_ids is None \
+                else sorted(set(job.question_ids) | set(question_ids))
+        db.session.commit()
+
+        if current_app.config.get('REGRADE_SYNC'):
+            RegradeService.run(job)
+        return job
+
+    @staticmethod
+    def affected_sessions(test_set_id, question_ids=None, after=None):
+        """
+        Sessions with responses to re-grade and their response counts.
+
+        Returns:
+            list: (session_id, responses) tuples ordered by session ID
+        """
+        from app.models import Response, TestSession
+
+        query = select(Response.session_id, func.count(Response.id)) \
+            .join(TestSession, TestSession.id == Response.session_id) \
+            .where(TestSession.test_set_id == test_set_id) \
+            .group_by(Response.session_id) \
+            .order_by(Response.session_id)
+        if question_ids is not None:
+            query = query.where(Response.question_id.in_(list(question_ids)))
+        if after is not None:
+            query = query.where(Response.session_id > after)
+        return [tuple(row) for row in db.session.execute(query)]
+
+    @staticmethod
+    def claim(job_id, now):
+        """
+        Claim a job for this process.
+
+        Pending jobs can be claimed, and so can running jobs whose heartbeat
+        is older than ``REGRADE_CLAIM_TIMEOUT`` (their chunks are committed,
+        so they resume cleanly).
+
+        Returns:
+            bool: Whether the claim succeeded
+        """
+        from app.models import RegradeJob
+
+        stale = now - timedelta(seconds=current_app.config.get('REGRADE_CLAIM_TIMEOUT', 600))
+        claimed = RegradeJob.query.filter(
+            RegradeJob.id == job_id,
+            or_(RegradeJob.status == 'pending',
+                (RegradeJob.status == 'running')
+                & or_(RegradeJob.claimed_at.is_(None), RegradeJob.claimed_at < stale))
+        ).update({'status': 'running', 'claimed_by': scheduler.holder, 'claimed_at': now,
+                  'started_at': func.coalesce(RegradeJob.started_at, now)},
+                 synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    @staticmethod
+    def heartbeat(job_id):
+        """
+        Renew this process's claim on a running job.
+
+        Returns:
+            bool: False if another process has taken the job over
+        """
+        from app.models import RegradeJob
+
+        return RegradeJob.query.filter(
+            RegradeJob.id == job_id,
+            RegradeJob.status == 'running',
+            RegradeJob.claimed_by == scheduler.holder
+        ).update({'claimed_at': datetime.utcnow()}, synchronize_session=False) == 1
+
+    @staticmethod
+    def run(job, progress=None, now=None):
+        """
+        Run a job to completion, one transaction per chunk of sessions.
+
+        Args:
+            job (RegradeJob): The job
+            progress (callable, optional): Called with the job after each chunk
+
+        Returns:
+            RegradeJob: The finished job
+        """
+        from app.models import RegradeJob
+
+        now = now or datetime.utcnow()
+        job_id = job.id
+        if job.status != 'running' or job.claimed_by != scheduler.holder:
+            if not RegradeService.claim(job_id, now):
+                return db.session.get(RegradeJob, job_id)
+            job = db.session.get(RegradeJob, job_id)
+
+        chunk_size = current_app.config.get('REGRADE_CHUNK_SIZE', 500)
+        # Grade with the current answer keys, not another worker's cached ones
+        question_cache.invalidate(job.test_set_id)
+        try:
+            sessions = RegradeService.affected_sessions(job.test_set_id, job.question_ids,
+                                                        after=job.last_session_id)
+            if job.last_session_id is None:
+                job.total_responses = sum(count for _, count in sessions)
+                job.processed_responses = job.changed_responses = job.sessions_updated = 0
+                db.session.commit()
+
+            for start in range(0, len(sessions), chunk_size):
+                # Committed with the chunk; stop if the claim was lost meanwhile
+                if not RegradeService.heartbeat(job_id):
+                    db.session.rollback()
+                    logger.warning(f"Regrade job {job_id} was taken over by another worker")
+                    return db.session.get(RegradeJob, job_id)
+                session_ids = [session_id for session_id, _ in sessions[start:start + chunk_size]]
+                graded, changed, changed_sessions = GradingService.grade_responses(
+                    job.test_set_id, session_ids, job.question_ids, chunk_size=chunk_size)
+                # A full re-grade also repairs totals that drifted without grade changes
+                refreshed = session_ids if job.question_ids is None else changed_sessions
+                GradingService.refresh_session_totals(refreshed)
+
+                job.processed_responses = (job.processed_responses or 0) + graded
+                job.changed_responses = (job.changed_responses or 0) + changed
+                job.sessions_updated = (job.sessions_updated or 0) + len(refreshed)
+                job.last_session_id = session_ids[-1]
+                db.session.commit()
+                if progress:
+                    progress(job)
+
+            job.status = 'completed'
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Regrade job {job_id} failed: {str(e)}")
+            job = db.session.get(RegradeJob, job_id)
+            job.status = 'failed'
+            job.error = str(e)
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            return job
+
+        RegradeService.refresh_statistics(job)
+        return job
+
+    @staticmethod
+    def refresh_statistics(job):
+        """Drop cached evaluation, beneficiary and portal views derived from the scores."""
+        from app.utils import clear_model_cache
+
+        if job.changed_responses or job.question_ids is None:
+            clear_model_cache('evaluations')
+            clear_model_cache('beneficiaries')
+            PortalStatsService.invalidate_test_set(job.test_set_id)
+
+    @staticmethod
+    def run_pending(now=None):
+        """
+        Run every claimable job (scheduler entry point).
+
+        Returns:
+            int: Number of jobs run
+        """
+        from app.models import RegradeJob
+
+        job_ids = [job_id for job_id, in db.session.query(RegradeJob.id).filter(
+            RegradeJob.status.in_(('pending', 'running'))
+        ).order_by(RegradeJob.id)]
+        ran = 0
+        for job_id in job_ids:
+            if RegradeService.claim(job_id, now or datetime.utcnow()):
+                RegradeService.run(db.session.get(RegradeJob, job_id), now=now)
+                ran += 1
+        return ran
@@ -0,0 +1,1030 @@
+"""Declarative report query engine.
+
+A report definition names a report type, the fields to show, filters,
+grouping and sorting::
+
+    {'fields': ['name', 'test_score'], 'filters': {'status': 'active'},
+     'groupBy': ['trainer'], 'sortBy': [{'field': 'name', 'direction': 'asc'}],
+     'dateRange': '30days'}
+
+Each report type declares its base model, the joins its fields need and
+how each field and filter maps to SQL. Per-entity measures (average test
+score, enrollment counts, attendance) are pre-aggregated in grouped
+subqueries and left-joined on the entity key, so a definition compiles to
+one SELECT whatever the number of rows, and joins never multiply rows.
+Joins are added only when a selected field or filter uses them.
+
+The same definitions back ``/reports/fields`` and ``/reports/filters`` and
+are used by report runs, exports and downloads. ``preview`` runs the real
+query on a sample under a statement timeout, so checking filters does not
+need a full run.
+
+Each type also lists the tables its rows are computed from, so scheduled
+runs can recompute only the rows whose sources changed since a watermark
+(``changed_since``) and merge them into the previous result.
+"""
+
+import json
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from flask import current_app
+from sqlalchemy import and_, case, distinct, func, literal, or_, select, union
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import aliased
+
+from app.extensions import db
+
+DATE_RANGES = {
+    '7days': timedelta(days=7),
+    '30days': timedelta(days=30),
+    '90days': timedelta(days=90),
+    'year': timedelta(days=365),
+}
+
+ROLLUPS = {'sum': func.sum, 'avg': func.avg, 'min': func.min, 'max': func.max}
+
+
+class ReportDefinitionError(ValueError):
+    """Raised when a report definition cannot be compiled."""
+
+
+# Value formatting
+
+def _text(value):
+    return '' if value is None else value
+
+
+def _number(value):
+    return round(float(value or 0), 2)
+
+
+def _count(value):
+    return int(value or 0)
+
+
+def _percent(value):
+    return f"{float(value or 0):.1f}%"
+
+
+def _date(value):
+    if isinstance(value, str) and value:
+        value = datetime.fromisoformat(value)
+    return value.strftime('%Y-%m-%d') if value else ''
+
+
+def _datetime(value):
+    if isinstance(value, str) and value:
+        value = datetime.fromisoformat(value)
+    return value.strftime('%Y-%m-%d %H:%M') if value else ''
+
+
+def _yes_no(value):
+    return 'Yes' if value else 'No'
+
+
+def _json_safe(value):
+    """Result value as stored in cached results (formatters accept both)."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+# Filter builders
+
+def _present(value):
+    return value not in (None, '', [], {})
+
+
+def _equals(expression):
+    def build(value):
+        if isinstance(value, (list, tuple)):
+            return expression.in_(list(value))
+        return expression == value
+    return build
+
+
+def _among(expression):
+    def build(value):
+        values = value if isinstance(value, (list, tuple)) else [value]
+        try:
+            return expression.in_([int(v) for v in values])
+        except (TypeError, ValueError):
+            raise ReportDefinitionError(f"Expected a list of ids, got {value!r}")
+    return build
+
+
+def _between(expression):
+    def build(value):
+        if not isinstance(value, dict):
+            raise ReportDefinitionError(f"Expected {{'min', 'max'}}, got {value!r}")
+        conditions = []
+        try:
+            if _present(value.get('min')):
+                conditions.append(expression >= float(value['min']))
+            if _present(value.get('max')):
+                conditions.append(expression <= float(value['max']))
+        except (TypeError, ValueError):
+            raise ReportDefinitionError(f"Invalid range {value!r}")
+        return and_(*conditions) if conditions else None
+    return build
+
+
+def _parse_date(value, end=False):
+    if isinstance(value, datetime):
+        return value
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        raise ReportDefinitionError(f"Invalid date {value!r}")
+    if end and len(str(value)) <= 10:
+        parsed = datetime.combine(parsed.date(), datetime.max.time())
+    return parsed
+
+
+def _dates(expression):
+    def build(value):
+        if not isinstance(value, dict):
+            raise ReportDefinitionError(f"Expected {{'from', 'to'}}, got {value!r}")
+        conditions = []
+        if _present(value.get('from')):
+            conditions.append(expression >= _parse_date(value['from']))
+        if _present(value.get('to')):
+            conditions.append(expression <= _parse_date(value['to'], end=True))
+        return and_(*conditions) if conditions else None
+    return build
+
+
+class Field:
+    """A report column: a SQL expression, its label and formatting."""
+
+    def __init__(self, id, name, description, expression, format=_text, rollup=None):
+        """
+        Args:
+            id (str): Field id used in definitions
+            name (str): Column label
+            description (str): Help text
+            expression (callable): ``expression(joins)`` returning a SQL expression
+            format (callable): Converts a result value for output
+            rollup (str): Aggregate used when grouping; None marks a dimension
+        """
+        self.id = id
+        self.name = name
+        self.description = description
+        self.expression = expression
+        self.format = format
+        self.rollup = rollup
+
+    def to_dict(self):
+        """Field catalog entry."""
+        return {'id': self.id, 'name': self.name, 'description': self.description}
+
+
+class Filter:
+    """A report filter: a condition built from a submitted value."""
+
+    def __init__(self, id, name, type, condition, options=None, public=True):
+        """
+        Args:
+            id (str): Filter id used in definitions
+            name (str): Display name
+            type (str): select, multiselect, range or date
+            condition (callable): ``condition(joins)`` returning a builder
+                that maps a value to a SQL condition
+            options: Options shown by the client
+            public (bool): Whether the filter is listed in the catalog
+        """
+        self.id = id
+        self.name = name
+        self.type = type
+        self.condition = condition
+        self.options = options if options is not None else ([] if type in ('select', 'multiselect') else {})
+        self.public = public
+
+    def to_dict(self):
+        """Filter catalog entry."""
+        options = [dict(option) for option in self.options] if isinstance(self.options, list) \
+            else dict(self.options)
+        return {'id': self.id, 'name': self.name, 'type': self.type, 'options': options}
+
+
+class ReportType:
+    """Base model, joins, fields and filters of one kind of report."""
+
+    def __init__(self, name, model, joins, fields, filters, default_fields, tenant,
+                 where=None, date_column=None, default_filters=None, changes=None):
+        """
+        Args:
+            name (str): Report type
+            model: Base model; one output row per instance unless grouped
+            joins (dict): ``name -> builder(joins)`` returning ``(target, onclause)``
+            fields (list): Field definitions
+            filters (list): Filter definitions
+            default_fields (list): Field ids used when a definition has none
+            tenant (callable): ``tenant(joins, tenant_id)`` returning a condition
+            where (callable): ``where(joins)`` returning a condition always applied
+            date_column (callable): ``date_column(joins)`` the ``dateRange`` applies to
+            default_filters (dict): Filter values used unless overridden
+            changes (callable): ``changes(since)`` returning SELECTs of base
+                ids whose row or source rows were updated after ``since``
+        """
+        self.name = name
+        self.model = model
+        self.joins = joins
+        self.fields = {field.id: field for field in fields}
+        self.filters = {filter.id: filter for filter in filters}
+        self.default_fields = default_fields
+        self.tenant = tenant
+        self.where = where
+        self.date_column = date_column
+        self.default_filters = default_filters or {}
+        self.changes = changes
+
+
+class _Joins:
+    """Joins referenced while compiling, in dependency order."""
+
+    def __init__(self, report_type, tenant_id=None):
+        self._type = report_type
+        self.tenant_id = tenant_id
+        self._targets = {}
+        self.order = []
+
+    def __getitem__(self, name):
+        if name not in self._targets:
+            target, onclause = self._type.joins[name](self)
+            self._targets[name] = target
+            self.order.append((target, onclause))
+        return self._targets[name]
+
+
+def _full_name(user):
+    return user.first_name + literal(' ') + user.last_name
+
+
+def _beneficiary_report():
+    from app.models.beneficiary import Beneficiary
+    from app.models.program import ProgramEnrollment
+    from app.models.test import TestSession
+    from app.models.user import User
+
+    def user(j):
+        alias = aliased(User, name='beneficiary_user')
+        return alias, alias.id == Beneficiary.user_id
+
+    def trainer(j):
+        alias = aliased(User, name='trainer')
+        return alias, alias.id == Beneficiary.trainer_id
+
+    def scores(j):
+        subquery = (
+            select(TestSession.beneficiary_id, func.avg(TestSession.score).label('score'))
+            .where(TestSession.status == 'completed')
+            .group_by(TestSession.beneficiary_id)
+            .subquery('scores')
+        )
+        return subquery, subquery.c.beneficiary_id == Beneficiary.id
+
+    def enrollments(j):
+        subquery = (
+            select(ProgramEnrollment.beneficiary_id, func.avg(ProgramEnrollment.progress).label('progress'))
+            .group_by(ProgramEnrollment.beneficiary_id)
+            .subquery('enrollments')
+        )
+        return subquery, subquery.c.beneficiary_id == Beneficiary.id
+
+    def test_score(j):
+        return func.coalesce(j['scores'].c.score, 0)
+
+    def changes(since):
+        return [
+            select(Beneficiary.id).where(Beneficiary.updated_at > since),
+            select(Beneficiary.id)
+            .join(User, or_(User.id == Beneficiary.user_id, User.id == Beneficiary.trainer_id))
+            .where(User.updated_at > since),
+            select(TestSession.beneficiary_id).where(TestSession.updated_at > since),
+            select(ProgramEnrollment.beneficiary_id).where(ProgramEnrollment.updated_at > since),
+        ]
+
+    return ReportType(
+        'beneficiary', Beneficiary,
+        joins={'user': user, 'trainer': trainer, 'scores': scores, 'enrollments': enrollments},
+        fields=[
+            Field('name', 'Full Name', 'Beneficiary full name', lambda j: _full_name(j['user'])),
+            Field('email', 'Email', 'Beneficiary email address', lambda j: j['user'].email),
+            Field('status', 'Status', 'Current beneficiary status', lambda j: Beneficiary.status),
+            Field('trainer', 'Assigned Trainer', 'Trainer assigned to beneficiary',
+                  lambda j: _full_name(j['trainer'])),
+            Field('created_date', 'Created Date', 'Date beneficiary was added',
+                  lambda j: Beneficiary.created_at, _date),
+            Field('test_score', 'Average Test Score', 'Average score across all tests',
+                  test_score, _number, 'avg'),
+            Field('progress', 'Progress', 'Overall progress percentage',
+                  lambda j: func.coalesce(j['enrollments'].c.progress, 0), _percent, 'avg'),
+            Field('department', 'Department', 'Department classification', lambda j: Beneficiary.category),
+            Field('notes', 'Notes', 'Additional notes and comments', lambda j: Beneficiary.notes),
+        ],
+        filters=[
+            Filter('status', 'Status', 'select', lambda j: _equals(Beneficiary.status), [
+                {'value': 'active', 'label': 'Active'},
+                {'value': 'inactive', 'label': 'Inactive'},
+                {'value': 'completed', 'label': 'Completed'},
+                {'value': 'pending', 'label': 'Pending'}
+            ]),
+            Filter('trainer', 'Trainer', 'multiselect', lambda j: _among(Beneficiary.trainer_id)),
+            Filter('test_score_range', 'Test Score Range', 'range',
+                   lambda j: _between(test_score(j)), {'min': 0, 'max': 100}),
+            Filter('created_date', 'Created Date', 'date', lambda j: _dates(Beneficiary.created_at)),
+            Filter('ids', 'Beneficiaries', 'multiselect', lambda j: _among(Beneficiary.id), public=False),
+        ],
+        default_fields=['name', 'email', 'status', 'test_score', 'created_date'],
+        tenant=lambda j, tenant_id: Beneficiary.tenant_id == tenant_id,
+        changes=changes,
+    )
+
+
+def _program_report():
+    from app.models.program import Program, ProgramEnrollment, SessionAttendance, TrainingSession
+
+    def enrollments(j):
+        subquery = (
+            select(
+                ProgramEnrollment.program_id,
+                func.count().label('total'),
+                func.sum(case((ProgramEnrollment.status == 'enrolled', 1), else_=0)).label('active'),
+                func.sum(case((ProgramEnrollment.status == 'completed', 1), else_=0)).label('completed'),
+            )
+            .group_by(ProgramEnrollment.program_id)
+            .subquery('enrollments')
+        )
+        return subquery, subquery.c.program_id == Program.id
+
+    def attendance(j):
+        subquery = (
+            select(
+                TrainingSession.program_id,
+                func.count(SessionAttendance.id).label('records'),
+                func.sum(case((SessionAttendance.status == 'present', 1), else_=0)).label('present'),
+            )
+            .join(SessionAttendance, SessionAttendance.session_id == TrainingSession.id)
+            .group_by(TrainingSession.program_id)
+            .subquery('attendance')
+        )
+        return subquery, subquery.c.program_id == Program.id
+
+    def enrollment_count(j):
+        return func.coalesce(j['enrollments'].c.total, 0)
+
+    def rate(part, whole):
+        return func.coalesce(part * 100.0 / func.nullif(whole, 0), 0)
+
+    def changes(since):
+        return [
+            select(Program.id).where(Program.updated_at > since),
+            select(ProgramEnrollment.program_id).where(ProgramEnrollment.updated_at > since),
+            select(TrainingSession.program_id).where(TrainingSession.updated_at > since),
+            select(TrainingSession.program_id)
+            .join(SessionAttendance, SessionAttendance.session_id == TrainingSession.id)
+            .where(SessionAttendance.updated_at > since),
+        ]
+
+    def overlapping(j):
+        def build(value):
+            if not isinstance(value, dict):
+                raise ReportDefinitionError(f"Expected {{'from', 'to'}}, got {value!r}")
+            conditions = []
+            if _present(value.get('from')):
+                start = _parse_date(value['from']).date()
+                conditions.append(or_(Program.end_date.is_(None), Program.end_date >= start))
+            if _present(value.get('to')):
+                end = _parse_date(value['to']).date()
+                conditions.append(or_(Program.start_date.is_(None), Program.start_date <= end))
+            return and_(*conditions) if conditions else None
+        return build
+
+    return ReportType(
+        'program', Program,
+        joins={'enrollments': enrollments, 'attendance': attendance},
+        fields=[
+            Field('name', 'Program Name', 'Name of the training program', lambda j: Program.name),
+            Field('code', 'Program Code', 'Unique program identifier', lambda j: Program.code),
+            Field('status', 'Status', 'Current program status', lambda j: Program.status),
+            Field('start_date', 'Start Date', 'Program start date', lambda j: Program.start_date, _date),
+            Field('end_date', 'End Date', 'Program end date', lambda j: Program.end_date, _date),
+            Field('enrollment_count', 'Enrollment Count', 'Number of enrolled beneficiaries',
+                  enrollment_count, _count, 'sum'),
+            Field('active_count', 'Active Enrollments', 'Beneficiaries currently enrolled',
+                  lambda j: func.coalesce(j['enrollments'].c.active, 0), _count, 'sum'),
+            Field('completed_count', 'Completed Enrollments', 'Beneficiaries who completed the program',
+                  lambda j: func.coalesce(j['enrollments'].c.completed, 0), _count, 'sum'),
+            Field('completion_rate', 'Completion Rate', 'Program completion percentage',
+                  lambda j: rate(j['enrollments'].c.completed, j['enrollments'].c.total), _percent, 'avg'),
+            Field('attendance_rate', 'Attendance Rate', 'Average attendance rate',
+                  lambda j: rate(j['attendance'].c.present, j['attendance'].c.records), _percent, 'avg'),
+            Field('description', 'Description', 'Program description', lambda j: Program.description),
+        ],
+        filters=[
+            Filter('status', 'Status', 'select', lambda j: _equals(Program.status), [
+                {'value': 'active', 'label': 'Active'},
+                {'value': 'completed', 'label': 'Completed'},
+                {'value': 'upcoming', 'label': 'Upcoming'},
+                {'value': 'cancelled', 'label': 'Cancelled'}
+            ]),
+            Filter('enrollment_range', 'Enrollment Count', 'range',
+                   lambda j: _between(enrollment_count(j)), {'min': 0, 'max': 100}),
+            Filter('date_range', 'Date Range', 'date', overlapping),
+            Filter('ids', 'Programs', 'multiselect', lambda j: _among(Program.id), public=False),
+        ],
+        default_fields=['name', 'code', 'status', 'enrollment_count', 'active_count', 'completed_count',
+                        'completion_rate', 'attendance_rate', 'start_date', 'end_date'],
+        tenant=lambda j, tenant_id: Program.tenant_id == tenant_id,
+        changes=changes,
+    )
+
+
+def _trainer_report():
+    from app.models.beneficiary import Beneficiary
+    from app.models.program import Program, SessionAttendance, TrainingSession
+    from app.models.user import User, user_tenant
+
+    def beneficiaries(j):
+        query = select(Beneficiary.trainer_id, func.count().label('beneficiaries')).where(
+            Beneficiary.trainer_id.isnot(None))
+        if j.tenant_id is not None:
+            query = query.where(Beneficiary.tenant_id == j.tenant_id)
+        subquery = query.group_by(Beneficiary.trainer_id).subquery('trainer_beneficiaries')
+        return subquery, subquery.c.trainer_id == User.id
+
+    def sessions(j):
+        query = (
+            select(
+                TrainingSession.trainer_id,
+                func.count(distinct(TrainingSession.program_id)).label('programs'),
+                func.avg(SessionAttendance.rating).label('rating'),
+            )
+            .outerjoin(SessionAttendance, SessionAttendance.session_id == TrainingSession.id)
+        )
+        if j.tenant_id is not None:
+            query = query.join(Program, Program.id == TrainingSession.program_id).where(
+                Program.tenant_id == j.tenant_id)
+        subquery = query.group_by(TrainingSession.trainer_id).subquery('trainer_sessions')
+        return subquery, subquery.c.trainer_id == User.id
+
+    def beneficiary_count(j):
+        return func.coalesce(j['beneficiaries'].c.beneficiaries, 0)
+
+    def tenant(j, tenant_id):
+        members = select(user_tenant.c.user_id).where(user_tenant.c.tenant_id == tenant_id)
+        return or_(User.tenant_id == tenant_id, User.id.in_(members))
+
+    def active_status(j):
+        return lambda value: User.is_active.is_(value == 'active')
+
+    def changes(since):
+        return [
+            select(User.id).where(User.updated_at > since),
+            select(Beneficiary.trainer_id).where(Beneficiary.updated_at > since),
+            select(TrainingSession.trainer_id).where(TrainingSession.updated_at > since),
+            select(TrainingSession.trainer_id)
+            .join(SessionAttendance, SessionAttendance.session_id == TrainingSession.id)
+            .where(SessionAttendance.updated_at > since),
+        ]
+
+    def programs(j):
+        def build(value):
+            values = value if isinstance(value, (list, tuple)) else [value]
+            try:
+                ids = [int(v) for v in values]
+            except (TypeError, ValueError):
+                raise ReportDefinitionError(f"Expected a list of ids, got {value!r}")
+            return User.id.in_(select(TrainingSession.trainer_id).where(TrainingSession.program_id.in_(ids)))
+        return build
+
+    return ReportType(
+        'trainer', User,
+        joins={'beneficiaries': beneficiaries, 'sessions': sessions},
+        fields=[
+            Field('name', 'Trainer Name', 'Full name of the trainer', lambda j: _full_name(User)),
+            Field('email', 'Email', 'Trainer email address', lambda j: User.email),
+            Field('beneficiary_count', 'Beneficiary Count', 'Number of assigned beneficiaries',
+                  beneficiary_count, _count, 'sum'),
+            Field('active_status', 'Active Status', 'Whether trainer is active', lambda j: User.is_active, _yes_no),
+            Field('last_login', 'Last Login', 'Last login timestamp', lambda j: User.last_login, _datetime),
+            Field('programs', 'Assigned Programs', 'Number of programs the trainer runs sessions in',
+                  lambda j: func.coalesce(j['sessions'].c.programs, 0), _count, 'sum'),
+            Field('performance_rating', 'Performance Rating', 'Average session rating',
+                  lambda j: func.coalesce(j['sessions'].c.rating, 0), _number, 'avg'),
+        ],
+        filters=[
+            Filter('active_status', 'Active Status', 'select', active_status, [
+                {'value': 'active', 'label': 'Active'},
+                {'value': 'inactive', 'label': 'Inactive'}
+            ]),
+            Filter('beneficiary_count', 'Beneficiary Count', 'range',
+                   lambda j: _between(beneficiary_count(j)), {'min': 0, 'max': 50}),
+            Filter('programs', 'Programs', 'multiselect', programs),
+            Filter('ids', 'Trainers', 'multiselect', lambda j: _among(User.id), public=False),
+        ],
+        default_fields=['name', 'email', 'beneficiary_count', 'active_status', 'last_login'],
+        tenant=tenant,
+        where=lambda j: User.role == 'trainer',
+        changes=changes,
+    )
+
+
+def _performance_report():
+    from app.models.beneficiary import Beneficiary
+    from app.models.test import TestSession, TestSet
+    from app.models.user import User
+
+    def beneficiary(j):
+        return Beneficiary, Beneficiary.id == TestSession.beneficiary_id
+
+    def user(j):
+        alias = aliased(User, name='beneficiary_user')
+        return alias, alias.id == j['beneficiary'].user_id
+
+    def test_set(j):
+        return TestSet, TestSet.id == TestSession.test_set_id
+
+    def changes(since):
+        return [
+            select(TestSession.id).where(TestSession.updated_at > since),
+            select(TestSession.id)
+            .join(Beneficiary, Beneficiary.id == TestSession.beneficiary_id)
+            .join(User, User.id == Beneficiary.user_id)
+            .where(or_(Beneficiary.updated_at > since, User.updated_at > since)),
+            select(TestSession.id).join(TestSet, TestSet.id == TestSession.test_set_id)
+            .where(TestSet.updated_at > since),
+        ]
+
+    return ReportType(
+        'performance', TestSession,
+        joins={'beneficiary': beneficiary, 'user': user, 'test_set': test_set},
+        fields=[
+            Field('date', 'Date', 'Test completion date', lambda j: TestSession.end_time, _datetime),
+            Field('beneficiary_name', 'Beneficiary Name', 'Full name of the beneficiary',
+                  lambda j: _full_name(j['user'])),
+            Field('test_name', 'Test Name', 'Name of the test', lambda j: j['test_set'].title),
+            Field('score', 'Score', 'Test score', lambda j: TestSession.score, _number, 'avg'),
+            Field('duration', 'Duration', 'Time taken to complete, in seconds',
+                  lambda j: TestSession.time_spent, _count, 'avg'),
+            Field('status', 'Status', 'Test completion status', lambda j: TestSession.status),
+        ],
+        filters=[
+            Filter('test_name', 'Test Name', 'multiselect', lambda j: _among(TestSession.test_set_id)),
+            Filter('score_range', 'Score Range', 'range', lambda j: _between(TestSession.score),
+                   {'min': 0, 'max': 100}),
+            Filter('status', 'Status', 'select', lambda j: _equals(TestSession.status), [
+                {'value': 'completed', 'label': 'Completed'},
+                {'value': 'in_progress', 'label': 'In Progress'},
+                {'value': 'abandoned', 'label': 'Abandoned'}
+            ]),
+            Filter('date_range', 'Date Range', 'date', lambda j: _dates(TestSession.end_time)),
+            Filter('ids', 'Beneficiaries', 'multiselect', lambda j: _among(TestSession.beneficiary_id),
+                   public=False),
+        ],
+        default_fields=['date', 'beneficiary_name', 'test_name', 'score', 'duration', 'status'],
+        tenant=lambda j, tenant_id: j['beneficiary'].tenant_id == tenant_id,
+        date_column=lambda j: TestSession.end_time,
+        default_filters={'status': 'completed'},
+        changes=changes,
+    )
+
+
+_REPORT_TYPES = {}
+
+_BUILDERS = {
+    'beneficiary': _beneficiary_report,
+    'program': _program_report,
+    'trainer': _trainer_report,
+    'performance': _performance_report,
+}
+
+# Top-level parameters accepted before definitions had a ``filters`` object
+_LEGACY_FILTERS = {
+    'beneficiary_ids': 'ids',
+    'program_ids': 'ids',
+    'trainer_ids': 'ids',
+    'status': 'status',
+}
+
+
+class PreviewTimeout(Exception):
+    """Raised inside ``statement_timeout`` when the database cancels a statement."""
+
+
+def _is_timeout(error):
+    """Whether a database error is a cancelled statement."""
+    orig = getattr(error, 'orig', None)
+    return getattr(orig, 'pgcode', None) == '57014' or 'interrupted' in str(orig).lower()
+
+
+@contextmanager
+def statement_timeout(milliseconds):
+    """
+    Cancel statements on the session's connection that run past a deadline.
+
+    PostgreSQL uses ``SET LOCAL statement_timeout``; SQLite uses a progress
+    handler that interrupts the running statement. Other dialects run
+    without a limit.
+
+    Raises:
+        PreviewTimeout: If a statement was cancelled; the session is rolled back
+    """
+    connection = db.session.connection()
+    dialect = connection.dialect.name
+    milliseconds = max(int(milliseconds), 1)
+    raw = connection.connection.driver_connection
+
+    if dialect == 'postgresql':
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {milliseconds}")
+    elif dialect == 'sqlite':
+        deadline = time.monotonic() + milliseconds / 1000
+        raw.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+
+    try:
+        yield
+        if dialect == 'postgresql':
+            connection.exec_driver_sql("SET LOCAL statement_timeout TO DEFAULT")
+    except OperationalError as e:
+        if not _is_timeout(e):
+            raise
+        db.session.rollback()
+        raise PreviewTimeout(str(e.orig))
+    finally:
+        if dialect == 'sqlite':
+            raw.set_progress_handler(None, 0)
+
+
+def _planner_estimate(statement):
+    """Row estimate from the PostgreSQL planner, or None elsewhere."""
+    connection = db.session.connection()
+    if connection.dialect.name != 'postgresql':
+        return None
+    compiled = statement.compile(dialect=connection.dialect)
+    plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled.string}", compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class OutputColumn(namedtuple('OutputColumn', 'key label format rollup')):
+    """A result column: SQL label, output label, formatter and rollup."""
+
+    __slots__ = ()
+
+
+class CompiledReport:
+    """A compiled definition: the statement and its output columns."""
+
+    def __init__(self, statement, columns, keyed=False):
+        """
+        Args:
+            statement: The SELECT to execute
+            columns (list): OutputColumn per result column
+            keyed (bool): Whether the statement ends with the base row id
+        """
+        self.statement = statement
+        self.columns = columns
+        self.keyed = keyed
+
+    @property
+    def labels(self):
+        """Column labels in output order."""
+        return [column.label for column in self.columns]
+
+    def format_row(self, row, by_key=False):
+        """Convert a result row to an output dict keyed by label (or field id)."""
+        return {
+            column.key if by_key else column.label: column.format(value)
+            for column, value in zip(self.columns, row)
+        }
+
+    def raw_row(self, row):
+        """Split a keyed result row into its key and JSON-safe column values."""
+        return row[-1], [_json_safe(value) for value in row[:len(self.columns)]]
+
+
+class ReportEngine:
+    """Compile report definitions to SQL and stream their rows."""
+
+    @staticmethod
+    def supports(report_type):
+        """Whether the engine can build reports of a type."""
+        return report_type in _BUILDERS
+
+    @staticmethod
+    def get_type(report_type):
+        """
+        Definition of a report type.
+
+        Raises:
+            ReportDefinitionError: If the type is not supported
+        """
+        if report_type not in _BUILDERS:
+            raise ReportDefinitionError(f"Unsupported report type: {report_type}")
+        if report_type not in _REPORT_TYPES:
+            _REPORT_TYPES[report_type] = _BUILDERS[report_type]()
+        return _REPORT_TYPES[report_type]
+
+    @staticmethod
+    def field_catalog(report_type):
+        """Fields a report type offers, for ``/reports/fields``."""
+        return [field.to_dict() for field in ReportEngine.get_type(report_type).fields.values()]
+
+    @staticmethod
+    def filter_catalog(report_type):
+        """Filters a report type offers, for ``/reports/filters``."""
+        return [f.to_dict() for f in ReportEngine.get_type(report_type).filters.values() if f.public]
+
+    @staticmethod
+    def definition(report_type, parameters):
+        """
+        Normalize stored report parameters into a definition.
+
+        Accepts the report builder's payload (``fields``, ``filters``,
+        ``groupBy``, ``sortBy``, ``dateRange``) as well as the older flat
+        parameters (``beneficiary_ids``, ``status``, ``start_date``...).
+
+        Args:
+            report_type (str): Report type
+            parameters (dict): Stored or submitted parameters
+
+        Returns:
+            dict: Definition for ``compile``
+        """
+        parameters = parameters or {}
+        filters = dict(parameters.get('filters') or {})
+        for key, filter_id in _LEGACY_FILTERS.items():
+            if _present(parameters.get(key)) and filter_id not in filters:
+                filters[filter_id] = parameters[key]
+        if report_type == 'performance' and 'date_range' not in filters and \
+                (parameters.get('start_date') or parameters.get('end_date')):
+            filters['date_range'] = {'from': parameters.get('start_date'), 'to': parameters.get('end_date')}
+
+        return {
+            'type': report_type,
+            'fields': list(parameters.get('fields') or []),
+            'filters': filters,
+            'group_by': list(parameters.get('groupBy') or parameters.get('group_by') or []),
+            'sort_by': list(parameters.get('sortBy') or parameters.get('sort_by') or []),
+            'date_range': parameters.get('dateRange') or parameters.get('date_range'),
+        }
+
+    @staticmethod
+    def compile(definition, tenant_id=None, keyed=False, only=None):
+        """
+        Compile a definition to a single SELECT.
+
+        Args:
+            definition (dict): Output of ``definition``
+            tenant_id (int): Restrict rows to a tenant; None for all tenants
+            keyed (bool): Append the base row id to each row (ungrouped only)
+            only: SELECT of base ids to restrict rows to
+
+        Returns:
+            CompiledReport: Statement and output columns
+
+        Raises:
+            ReportDefinitionError: If a field, filter or sort is unknown or invalid
+        """
+        report_type = ReportEngine.get_type(definition['type'])
+        joins = _Joins(report_type, tenant_id)
+
+        def field(field_id):
+            if field_id not in report_type.fields:
+                raise ReportDefinitionError(f"Unknown {report_type.name} field: {field_id}")
+            return report_type.fields[field_id]
+
+        selected = [field(field_id) for field_id in definition.get('fields') or report_type.default_fields]
+        grouped = [field(field_id) for field_id in definition.get('group_by') or []]
+        for group in grouped:
+            if group.rollup:
+                raise ReportDefinitionError(f"Cannot group by measure: {group.id}")
+        if keyed and grouped:
+            raise ReportDefinitionError("Grouped reports have no row keys")
+
+        # Output columns; grouped reports keep group keys and rolled-up measures
+        columns, output = {}, []
+        if grouped:
+            for group in grouped:
+                columns[group.id] = group.expression(joins)
+                output.append(OutputColumn(group.id, group.name, group.format, None))
+            for item in selected:
+                if item.rollup and item.id not in columns:
+                    columns[item.id] = ROLLUPS[item.rollup](item.expression(joins))
+                    output.append(OutputColumn(item.id, item.name, item.format, item.rollup))
+            columns['row_count'] = func.count()
+            output.append(OutputColumn('row_count', 'Count', _count, 'sum'))
+        else:
+            for item in selected:
+                if item.id not in columns:
+                    columns[item.id] = item.expression(joins)
+                    output.append(OutputColumn(item.id, item.name, item.format, item.rollup))
+
+        conditions = []
+        if report_type.where:
+            conditions.append(report_type.where(joins))
+        if tenant_id is not None:
+            conditions.append(report_type.tenant(joins, tenant_id))
+        if only is not None:
+            conditions.append(report_type.model.id.in_(only))
+
+        values = dict(report_type.default_filters)
+        values.update(definition.get('filters') or {})
+        for filter_id, value in values.items():
+            if not _present(value):
+                continue
+            if filter_id not in report_type.filters:
+                raise ReportDefinitionError(f"Unknown {report_type.name} filter: {filter_id}")
+            condition = report_type.filters[filter_id].condition(joins)(value)
+            if condition is not None:
+                conditions.append(condition)
+
+        date_range = definition.get('date_range')
+        if report_type.date_column and date_range in DATE_RANGES:
+            conditions.append(report_type.date_column(joins) >= datetime.utcnow() - DATE_RANGES[date_range])
+
+        order_by = []
+        for sort in definition.get('sort_by') or []:
+            field_id = sort.get('field') if isinstance(sort, dict) else sort
+            direction = sort.get('direction', 'asc') if isinstance(sort, dict) else 'asc'
+            if field_id in columns:
+                expression = columns[field_id]
+            elif not grouped:
+                expression = field(field_id).expression(joins)
+            else:
+                raise ReportDefinitionError(f"Cannot sort a grouped report by {field_id}")
+            order_by.append(expression.desc() if direction == 'desc' else expression.asc())
+
+        if keyed:
+            columns['_key'] = report_type.model.id
+        statement = select(*[expression.label(key) for key, expression in columns.items()]) \
+            .select_from(report_type.model)
+        for target, onclause in joins.order:
+            statement = statement.outerjoin(target, onclause)
+        if conditions:
+            statement = statement.where(*conditions)
+        if grouped:
+            statement = statement.group_by(*[columns[group.id] for group in grouped])
+            order_by = order_by or [columns[group.id] for group in grouped]
+        else:
+            order_by.append(report_type.model.id)
+
+        return CompiledReport(statement.order_by(*order_by), output, keyed)
+
+    @staticmethod
+    def incremental(definition):
+        """
+        Whether a definition's result can be refreshed row by row.
+
+        Grouped rows mix many base rows, relative date ranges move rows in
+        and out as time passes, and sorting by unselected fields cannot be
+        redone on the cached values, so those need a full run.
+        """
+        report_type = ReportEngine.get_type(definition['type'])
+        if report_type.changes is None or definition.get('group_by'):
+            return False
+        if report_type.date_column and definition.get('date_range') in DATE_RANGES:
+            return False
+        selected = set(definition.get('fields') or report_type.default_fields)
+        for sort in definition.get('sort_by') or []:
+            if (sort.get('field') if isinstance(sort, dict) else sort) not in selected:
+                return False
+        return True
+
+    @staticmethod
+    def changed_since(definition, since):
+        """
+        SELECT of base ids whose row or source rows were updated after a time.
+
+        Args:
+            definition (dict): Output of ``definition``
+            since (datetime): Watermark (naive UTC)
+        """
+        report_type = ReportEngine.get_type(definition['type'])
+        changed = union(*report_type.changes(since)).subquery('changed')
+        return select(list(changed.c)[0])
+
+    @staticmethod
+    def stream(definition, tenant_id=None, batch_size=None):
+        """
+        Execute a definition, yielding output rows as they are fetched.
+
+        Rows are fetched in batches (server-side cursor on PostgreSQL), so
+        large reports are written out without being held in memory.
+
+        Args:
+            definition (dict): Output of ``definition``
+            tenant_id (int): Restrict rows to a tenant
+            batch_size (int): Rows per fetch; defaults to ``REPORT_STREAM_BATCH_SIZE``
+
+        Returns:
+            tuple: (labels, iterator of row dicts)
+        """
+        compiled = ReportEngine.compile(definition, tenant_id)
+        batch_size = batch_size or current_app.config.get('REPORT_STREAM_BATCH_SIZE', 1000)
+
+        def rows():
+            result = db.session.execute(compiled.statement, execution_options={'yield_per': batch_size})
+            try:
+                for row in result:
+                    yield compiled.format_row(row)
+            finally:
+                result.close()
+
+        return compiled.labels, rows()
+
+    @staticmethod
+    def rows(report_type, parameters, tenant_id=None):
+        """
+        Run a report and return all output rows.
+
+        Args:
+            report_type (str): Report type
+            parameters (dict): Stored report parameters
+            tenant_id (int): Restrict rows to a tenant
+
+        Returns:
+            list: Row dicts keyed by column label
+        """
+        _, rows = ReportEngine.stream(ReportEngine.definition(report_type, parameters), tenant_id)
+        return list(rows)
+
+    @staticmethod
+    def preview(definition, tenant_id=None, limit=None):
+        """
+        Run a definition on a sample within a fixed time budget.
+
+        The first ``limit`` rows come from the real query with ``LIMIT``.
+        The total and the summary metrics (each measure's rollup) come from
+        one aggregate over at most ``REPORT_PREVIEW_COUNT_CAP`` rows; when
+        the cap is reached the total is the planner's estimate (PostgreSQL)
+        or the cap, flagged as estimated. Both statements share the
+        ``REPORT_PREVIEW_TIMEOUT_MS`` budget; whatever does not finish in
+        time is left out and ``timed_out`` is set.
+
+        Args:
+            definition (dict): Output of ``definition``
+            tenant_id (int): Restrict rows to a tenant
+            limit (int): Sample rows; defaults to ``REPORT_PREVIEW_ROWS``
+
+        Returns:
+            dict: columns, rows, total, total_estimated, summary, timed_out, elapsed_ms
+        """
+        compiled = ReportEngine.compile(definition, tenant_id)
+        config = current_app.config
+        limit = min(int(limit or config.get('REPORT_PREVIEW_ROWS', 50)), config.get('REPORT_PREVIEW_MAX_ROWS', 500))
+        cap = config.get('REPORT_PREVIEW_COUNT_CAP', 10000)
+        started = time.monotonic()
+        deadline = started + config.get('REPORT_PREVIEW_TIMEOUT_MS', 3000) / 1000
+
+        def remaining_ms():
+            return (deadline - time.monotonic()) * 1000
+
+        result = {
+            'columns': [{'id': column.key, 'name': column.label} for column in compiled.columns],
+            'rows': [],
+            'total': None,
+            'total_estimated': False,
+            'summary': [],
+            'timed_out': False,
+        }
+
+        try:
+            with statement_timeout(remaining_ms()):
+                rows = db.session.execute(compiled.statement.limit(limit)).all()
+            result['rows'] = [compiled.format_row(row, by_key=True) for row in rows]
+
+            if len(rows) < limit:
+                result['total'] = len(rows)
+            measures = [column for column in compiled.columns if column.rollup]
+            if remaining_ms() <= 0:
+                raise PreviewTimeout('Preview budget spent on the sample rows')
+
+            # Count and summarize a capped sample, without the ORDER BY
+            sample = compiled.statement.order_by(None).limit(cap).subquery('sample')
+            aggregates = [func.count()] + [ROLLUPS[column.rollup](sample.c[column.key]) for column in measures]
+            with statement_timeout(remaining_ms()):
+                counted, *values = db.session.execute(select(*aggregates).select_from(sample)).one()
+
+            if counted >= cap:
+                result['total'] = max(_planner_estimate(compiled.statement) or cap, cap)
+                result['total_estimated'] = True
+            else:
+                result['total'] = counted
+            result['summary'] = [
+                {'id': column.key, 'name': column.label, 'value': column.format(value)}
+                for column, value in zip(measures, values)
+            ]
+        except PreviewTimeout:
+            result['timed_out'] = True
+
+        result['elapsed_ms'] = int((time.monotonic() - started) * 1000)
+        return result
@@ -0,0 +1,77 @@
+"""Report file writers.
+
+Write report rows (dicts keyed by column label) to CSV, Excel or PDF.
+CSV and Excel consume the rows as they are produced, so a streamed report
+is never held in memory; PDF layout needs every row up front.
+"""
+
+import csv
+import os
+
+FORMATS = ('pdf', 'xlsx', 'csv')
+
+
+def write_csv(file_path, labels, rows):
+    """Write rows to a CSV file."""
+    with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
+        if labels:
+            writer = csv.DictWriter(csvfile, fieldnames=labels)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+
+
+def write_xlsx(file_path, labels, rows, title):
+    """Write rows to an Excel workbook."""
+    from openpyxl import Workbook
+
+    # Write-only mode streams rows to disk instead of keeping cells in memory
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=title[:31])  # Excel sheet name limit
+    if labels:
+        ws.append(labels)
+        for row in rows:
+            ws.append([row.get(label, '') for label in labels])
+    wb.save(file_path)
+
+
+def write_pdf(file_path, rows, report, generated_by=None):
+    """Write rows to a PDF rendered from the report template."""
+    from app.services.pdf_service import pdf_service
+
+    if generated_by is None and report.created_by:
+        generated_by = f"{report.created_by.first_name} {report.created_by.last_name}"
+
+    pdf_data = pdf_service.render('report', {
+        'title': report.name,
+        'description': report.description,
+        'generated_by': generated_by or 'System',
+        'data': list(rows),
+        'report_type': report.type
+    })
+    with open(file_path, 'wb') as pdf_file:
+        pdf_file.write(pdf_data)
+
+
+def write_report(file_path, format, labels, rows, report):
+    """
+    Write report rows in a format.
+
+    Args:
+        file_path (str): Destination; its directory is created if needed
+        format (str): pdf, xlsx or csv (anything else is written as CSV)
+        labels (list): Column labels
+        rows (iterable): Row dicts keyed by label
+        report (Report): The report, for titles and metadata
+
+    Returns:
+        str: The file path
+    """
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    if format == 'pdf':
+        write_pdf(file_path, rows, report)
+    elif format == 'xlsx':
+        write_xlsx(file_path, labels, rows, report.name)
+    else:
+        write_csv(file_path, labels, rows)
+    return file_path
@@ -0,0 +1,392 @@
+"""Scheduled report runs.
+
+The scheduler calls ``ReportRunner.run_due`` on every tick. Due schedules
+are claimed with a conditional UPDATE, so a schedule runs once even if a
+previous leader is still finishing. Each run is stored as a ``ReportRun``
+with a version number and its own artifact under ``REPORT_ARTIFACT_DIR``.
+
+Ungrouped reports keep their raw rows, keyed by base row id, next to the
+artifact. The next run recomputes only rows whose sources were updated
+after the previous watermark (``ReportEngine.changed_since``), drops rows
+that were deleted or no longer match, and merges the rest from the cached
+result. Changed definitions, missing caches and every
+``REPORT_FULL_REFRESH_EVERY``-th run fall back to a full run, which also
+repairs changes the watermarks cannot see (deleted child rows, child rows
+moved between parents).
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, or_, select
+
+from app.extensions import db
+from app.services.recurrence import get_zone
+from app.services.report_engine import ReportEngine
+from app.services.report_files import FORMATS, write_report
+from app.services.scheduler import CronExpression, scheduler
+
+logger = logging.getLogger('bdc')
+
+_MEDIA_TYPES = {
+    'pdf': 'application/pdf',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+}
+
+
+def _definition_hash(definition):
+    """Stable digest of a definition; cached rows are reused only if it matches."""
+    return hashlib.sha256(json.dumps(definition, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _sort_value(value):
+    # NULLs sort last ascending and first descending, as in PostgreSQL
+    return (value is None, value)
+
+
+class ReportRunner:
+    """Run scheduled reports and store versioned results."""
+
+    @staticmethod
+    def schedule_cron(schedule):
+        """
+        Cron expression of a schedule.
+
+        Uses ``schedule.cron`` when set; otherwise derives one from the
+        frequency, time and day fields. Schedules without a time run at
+        ``REPORT_SCHEDULE_DEFAULT_TIME``. ``day_of_week`` counts from
+        Sunday = 0, as cron does.
+        """
+        if schedule.cron:
+            return schedule.cron
+
+        at = schedule.schedule_time
+        if at is None:
+            at = datetime.strptime(current_app.config.get('REPORT_SCHEDULE_DEFAULT_TIME', '02:00'), '%H:%M').time()
+
+        if schedule.frequency == 'weekly':
+            day_of_week = schedule.day_of_week if schedule.day_of_week is not None else 0
+            return f"{at.minute} {at.hour} * * {day_of_week}"
+        if schedule.frequency == 'monthly':
+            return f"{at.minute} {at.hour} {schedule.day_of_month or 1} * *"
+        return f"{at.minute} {at.hour} * * *"
+
+    @staticmethod
+    def next_run(schedule, after=None):
+        """
+        Next run time of a schedule after a moment.
+
+        Returns:
+            datetime: Naive UTC time
+
+        Raises:
+            ValueError: If the schedule's cron expression is invalid
+        """
+        zone = get_zone(current_app.config.get('REPORT_SCHEDULE_TIMEZONE', 'UTC'))
+        cron = CronExpression(ReportRunner.schedule_cron(schedule))
+        return cron.next_after(after or datetime.utcnow(), zone)
+
+    @staticmethod
+    def run_due(now=None):
+        """
+        Run every active schedule whose ``next_run`` has passed.
+
+        Schedules without a ``next_run`` are only given one, so a new
+        schedule first runs at its next slot rather than immediately.
+
+        Args:
+            now (datetime): Tick time (naive UTC)
+
+        Returns:
+            int: Number of schedules run
+        """
+        from app.models.report import ReportSchedule
+
+        now = now or datetime.utcnow()
+
+        for schedule in ReportSchedule.query.filter(ReportSchedule.is_active == True,  # noqa: E712
+                                                    ReportSchedule.next_run.is_(None),
+                                                    ReportSchedule.status != 'error'):
+            try:
+                schedule.next_run = ReportRunner.next_run(schedule, now)
+            except ValueError as e:
+                schedule.status = 'error'
+                schedule.last_error = str(e)
+        db.session.commit()
+
+        stale = now - timedelta(seconds=current_app.config.get('REPORT_CLAIM_TIMEOUT', 3600))
+        due = db.session.execute(
+            select(ReportSchedule.id)
+            .where(ReportSchedule.is_active == True,  # noqa: E712
+                   ReportSchedule.next_run <= now,
+                   or_(ReportSchedule.claimed_by.is_(None), ReportSchedule.claimed_at < stale))
+            .order_by(ReportSchedule.next_run)
+        ).scalars().all()
+
+        ran = 0
+        for schedule_id in due:
+            if ReportRunner.claim(schedule_id, now):
+                ReportRunner.run_schedule(ReportSchedule.query.get(schedule_id), now)
+                ran += 1
+        return ran
+
+    @staticmethod
+    def claim(schedule_id, now):
+        """
+        Claim a due schedule for this worker.
+
+        Returns:
+            bool: Whether the claim succeeded
+        """
+        from app.models.report import ReportSchedule
+
+        stale = now - timedelta(seconds=current_app.config.get('REPORT_CLAIM_TIMEOUT', 3600))
+        claimed = ReportSchedule.query.filter(
+            ReportSchedule.id == schedule_id,
+            ReportSchedule.next_run <= now,
+            or_(ReportSchedule.claimed_by.is_(None), ReportSchedule.claimed_at < stale)
+        ).update({'claimed_by': scheduler.holder, 'claimed_at': now}, synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    @staticmethod
+    def run_schedule(schedule, now=None):
+        """
+        Run a claimed schedule, notify its owner and recipients, and release it.
+
+        Returns:
+            ReportRun: The run, or None if it failed
+        """
+        from app.models.report import ReportSchedule
+
+        now = now or datetime.utcnow()
+        schedule_id = schedule.id
+        run = None
+        try:
+            run = ReportRunner.run_report(schedule.report, schedule=schedule, now=now)
+            error = run.error
+        except Exception as e:
+            db.session.rollback()
+            error = str(e)
+
+        schedule = ReportSchedule.query.get(schedule_id)
+        if error:
+            logger.error(f"Scheduled report {schedule.report_id} failed: {error}")
+            schedule.status = 'error'
+            schedule.last_error = error
+        else:
+            schedule.status = 'active'
+            schedule.last_error = None
+        schedule.last_run = now
+        try:
+            schedule.next_run = ReportRunner.next_run(schedule, now)
+        except ValueError as e:
+            schedule.next_run = None
+            schedule.status = 'error'
+            schedule.last_error = str(e)
+        schedule.claimed_by = None
+        schedule.claimed_at = None
+        db.session.commit()
+
+        if not error:
+            ReportRunner.notify(run, schedule)
+        return None if error else run
+
+    @staticmethod
+    def run_report(report, schedule=None, now=None):
+        """
+        Produce the next version of a report.
+
+        Args:
+            report (Report): The report
+            schedule (ReportSchedule): Schedule the run belongs to, if any
+            now (datetime): Watermark; changes up to this time are included
+
+        Returns:
+            ReportRun: The completed or failed run
+        """
+        from app.models.report import ReportRun
+
+        now = now or datetime.utcnow()
+        config = current_app.config
+        definition = ReportEngine.definition(report.type, report.parameters)
+        digest = _definition_hash(definition)
+        format = report.format if report.format in FORMATS else 'csv'
+
+        previous = report.runs.filter_by(status='completed').first()
+        version = (db.session.query(func.max(ReportRun.version)).filter_by(report_id=report.id).scalar() or 0) + 1
+        run = ReportRun(report_id=report.id, schedule_id=schedule.id if schedule else None, version=version,
+                        status='running', format=format, definition_hash=digest, watermark=now,
+                        started_at=datetime.utcnow())
+        db.session.add(run)
+        report.status = 'generating'
+        db.session.commit()
+
+        directory = os.path.join(config.get('REPORT_ARTIFACT_DIR', 'report_runs'), str(report.id))
+        try:
+            if ReportEngine.incremental(definition):
+                reuse = (
+                    previous is not None
+                    and previous.definition_hash == digest
+                    and previous.result_path and os.path.exists(previous.result_path)
+                    and version % config.get('REPORT_FULL_REFRESH_EVERY', 7) != 0
+                )
+                if reuse:
+                    since = previous.watermark - timedelta(seconds=config.get('REPORT_WATERMARK_OVERLAP', 300))
+                    compiled, rows, changed = ReportRunner._refresh(definition, report.tenant_id, previous, since)
+                    run.mode = 'incremental'
+                else:
+                    compiled, rows = ReportRunner._compute(definition, report.tenant_id)
+                    changed = len(rows)
+                    run.mode = 'full'
+
+                run.result_path = os.path.join(directory, f'v{version}.json.gz')
+                ReportRunner._save(run.result_path, rows)
+                labels = compiled.labels
+                output = [compiled.format_row(values) for values in ReportRunner._ordered(definition, compiled, rows)]
+                run.row_count = len(output)
+            else:
+                # Grouped reports are recomputed in full and streamed to the file
+                labels, output = ReportEngine.stream(definition, report.tenant_id)
+                output = list(output) if format == 'pdf' else output
+                run.mode = 'full'
+                changed = None
+
+            run.file_path = write_report(os.path.join(directory, f'v{version}.{format}'), format, labels,
+                                         ReportRunner._counted(run, output), report)
+            run.file_size = os.path.getsize(run.file_path)
+            run.changed_rows = run.row_count if changed is None else changed
+            run.status = 'completed'
+
+            report.file_path = run.file_path
+            report.file_size = run.file_size
+            report.last_generated = now
+            report.run_count = (report.run_count or 0) + 1
+            report.status = 'completed'
+        except Exception as e:
+            db.session.rollback()
+            run = ReportRun.query.get(run.id)
+            run.status = 'failed'
+            run.error = str(e)
+            run.report.status = 'failed'
+            logger.error(f"Report {report.id} v{version} failed: {str(e)}")
+
+        run.finished_at = datetime.utcnow()
+        db.session.commit()
+        return run
+
+    @staticmethod
+    def _compute(definition, tenant_id, only=None):
+        """Run a keyed definition and return ``(compiled, {key: values})``."""
+        compiled = ReportEngine.compile(definition, tenant_id, keyed=True, only=only)
+        batch_size = current_app.config.get('REPORT_STREAM_BATCH_SIZE', 1000)
+        result = db.session.execute(compiled.statement, execution_options={'yield_per': batch_size})
+        try:
+            rows = dict(compiled.raw_row(row) for row in result)
+        finally:
+            result.close()
+        return compiled, rows
+
+    @staticmethod
+    def _refresh(definition, tenant_id, previous, since):
+        """
+        Merge rows changed since a watermark into a previous result.
+
+        Returns:
+            tuple: (compiled, {key: values}, number of changed keys)
+        """
+        changes = ReportEngine.changed_since(definition, since)
+        compiled, fresh = ReportRunner._compute(definition, tenant_id, only=changes)
+        changed = set(db.session.execute(changes).scalars())
+
+        rows = ReportRunner._load(previous.result_path)
+        for key in changed:
+            rows.pop(key, None)  # dropped unless it still matches
+        rows.update(fresh)
+
+        # Base rows deleted since the previous run
+        model = ReportEngine.get_type(definition['type']).model
+        keys = list(rows)
+        batch_size = current_app.config.get('REPORT_STREAM_BATCH_SIZE', 1000)
+        existing = set()
+        for start in range(0, len(keys), batch_size):
+            chunk = keys[start:start + batch_size]
+            existing.update(db.session.execute(select(model.id).where(model.id.in_(chunk))).scalars())
+        for key in keys:
+            if key not in existing:
+                del rows[key]
+                changed.add(key)
+
+        return compiled, rows, len(changed)
+
+    @staticmethod
+    def _ordered(definition, compiled, rows):
+        """Row values in the definition's sort order, ties broken by key."""
+        positions = {column.key: index for index, column in enumerate(compiled.columns)}
+        items = sorted(rows.items())
+        for sort in reversed(definition.get('sort_by') or []):
+            field_id = sort.get('field') if isinstance(sort, dict) else sort
+            direction = sort.get('direction', 'asc') if isinstance(sort, dict) else 'asc'
+            position = positions[field_id]
+            items.sort(key=lambda item: _sort_value(item[1][position]), reverse=direction == 'desc')
+        return [values for _, values in items]
+
+    @staticmethod
+    def _counted(run, rows):
+        """Pass rows through, counting them into ``run.row_count``."""
+        count = 0
+        for row in rows:
+            count += 1
+            yield row
+        run.row_count = count
+
+    @staticmethod
+    def _save(path, rows):
+        """Write cached raw rows as gzipped JSON ``[[key, values], ...]``."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump([[key, values] for key, values in rows.items()], f)
+
+    @staticmethod
+    def _load(path):
+        """Read cached raw rows written by ``_save``."""
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return {key: values for key, values in json.load(f)}
+
+    @staticmethod
+    def notify(run, schedule):
+        """Notify the report owner in-app and email the schedule's recipients."""
+        from app.services.email_service import send_email
+        from app.services.notification_service import NotificationService
+
+        report = run.report
+        changes = '' if run.mode == 'full' else f", {run.changed_rows} changed"
+        message = f"Version {run.version} of '{report.name}' is ready ({run.row_count} rows{changes})."
+
+        NotificationService.create_notification(
+            user_id=report.created_by_id,
+            type='report',
+            title='Scheduled report ready',
+            message=message,
+            data={'run_id': run.id, 'version': run.version},
+            related_id=report.id,
+            related_type='report',
+            tenant_id=report.tenant_id
+        )
+
+        recipients = [address for address in schedule.recipients or [] if address]
+        if recipients:
+            attachments = None
+            if run.file_size and run.file_size <= current_app.config.get('REPORT_EMAIL_ATTACHMENT_MAX', 5 * 1024 * 1024):
+                with open(run.file_path, 'rb') as f:
+                    attachments = [(f"{report.name}_v{run.version}.{run.format}",
+                                    _MEDIA_TYPES.get(run.format, 'application/octet-stream'), f.read())]
+            send_email(subject=f"Scheduled report: {report.name}", recipients=recipients,
+                       text_body=message, attachments=attachments)
+            db.session.commit()
@@ -0,0 +1,292 @@
+"""In-process job scheduler with leader election.
+
+Every worker process may start the scheduler, but only one runs jobs at a
+time: on each tick a worker tries to take or renew a row in
+``scheduler_leases`` with a conditional UPDATE, and only the holder of an
+unexpired lease runs the registered jobs. If the leader dies its lease
+expires after ``SCHEDULER_LEASE_TTL`` seconds and another worker takes
+over. Jobs decide for themselves what is due (scheduled reports keep their
+own ``next_run``), so a tick is cheap when nothing is.
+
+``CronExpression`` parses standard five-field cron expressions
+(``minute hour day-of-month month day-of-week``) and the ``@daily`` style
+aliases.
+"""
+
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+
+logger = logging.getLogger('bdc')
+
+_ALIASES = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+
+_NAMES = {
+    3: {name: index + 1 for index, name in enumerate(
+        ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'])},
+    4: {name: index for index, name in enumerate(['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'])},
+}
+
+_BOUNDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+class CronExpression:
+    """A parsed cron expression that can compute its next fire time."""
+
+    def __init__(self, expression):
+        """
+        Parse an expression.
+
+        Args:
+            expression (str): Five cron fields or an alias such as ``@daily``
+
+        Raises:
+            ValueError: If the expression is malformed
+        """
+        self.expression = expression.strip()
+        fields = _ALIASES.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+
+        parsed = [self._parse_field(field, index) for index, field in enumerate(fields)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {day % 7 for day in weekdays}  # 7 is also Sunday
+        # Vixie cron: when both day fields are restricted, either may match
+        self.days_restricted = fields[2] != '*'
+        self.weekdays_restricted = fields[4] != '*'
+
+    @staticmethod
+    def _value(text, index):
+        text = text.lower()
+        if text in _NAMES.get(index, {}):
+            return _NAMES[index][text]
+        return int(text)
+
+    @classmethod
+    def _parse_field(cls, field, index):
+        low, high = _BOUNDS[index]
+        values = set()
+        try:
+            for part in field.split(','):
+                step = 1
+                if '/' in part:
+                    part, step = part.split('/')
+                    step = int(step)
+                if part == '*':
+                    start, end = low, high
+                elif '-' in part:
+                    start, end = (cls._value(bound, index) for bound in part.split('-'))
+                else:
+                    start = cls._value(part, index)
+                    end = high if step > 1 else start
+                if step < 1 or not low <= start <= end <= high:
+                    raise ValueError
+                values.update(range(start, end + 1, step))
+        except ValueError:
+            raise ValueError(f"Invalid cron field {field!r}")
+        return values
+
+    def _day_matches(self, day):
+        in_days = day.day in self.days
+        in_weekdays = (day.weekday() + 1) % 7 in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return in_days or in_weekdays
+        return in_days and in_weekdays
+
+    def next_after(self, moment, zone=None):
+        """
+        First fire time strictly after a moment.
+
+        Args:
+            moment (datetime): Naive UTC time
+            zone (tzinfo): Zone the expression's wall-clock fields are in
+
+        Returns:
+            datetime: Naive UTC fire time
+
+        Raises:
+            ValueError: If the expression never fires (e.g. ``0 0 31 2 *``)
+        """
+        if zone is not None:
+            moment = moment.replace(tzinfo=timezone.utc).astimezone(zone).replace(tzinfo=None)
+
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                year, month = divmod(candidate.month, 12)
+                candidate = datetime(candidate.year + year, month + 1, 1)
+                continue
+            if not self._day_matches(candidate):
+                candidate = datetime(candidate.year, candidate.month, candidate.day) + timedelta(days=1)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+                continue
+            if candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+                continue
+            if zone is None:
+                return candidate
+            return candidate.replace(tzinfo=zone).astimezone(timezone.utc).replace(tzinfo=None)
+        raise ValueError(f"Cron expression never fires: {self.expression!r}")
+
+    def __repr__(self):
+        return f'<CronExpression {self.expression!r}>'
+
+
+class Scheduler:
+    """Runs registered jobs on an interval in whichever worker holds the lease."""
+
+    def __init__(self, app=None):
+        """Initialize the scheduler."""
+        self.app = app
+        self.jobs = {}
+        self._holder = None
+        self._pid = None
+        self.is_leader = False
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize app configuration."""
+        self.app = app
+        self.lease_name = app.config.get('SCHEDULER_LEASE_NAME', 'scheduler')
+        self.interval = app.config.get('SCHEDULER_INTERVAL', 30)
+        self.lease_ttl = app.config.get('SCHEDULER_LEASE_TTL', 90)
+
+    @property
+    def holder(self):
+        """Lease holder id, unique per process (regenerated after a fork)."""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._holder = f"{socket.gethostname()[:40]}-{self._pid}-{uuid.uuid4().hex[:8]}"
+            self.is_leader = False
+        return self._holder
+
+    def register(self, name, job):
+        """
+        Register a job run on every tick by the leader.
+
+        Args:
+            name (str): Job name; registering a name again replaces the job
+            job (callable): Called with the tick time (naive UTC)
+        """
+        self.jobs[name] = job
+
+    def acquire_lease(self, now=None):
+        """
+        Take or renew the leader lease.
+
+        Returns:
+            bool: Whether this worker is the leader
+        """
+        from app.models.scheduler import SchedulerLease
+
+        now = now or datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.lease_ttl)
+
+        # Only the current holder, or anyone once the lease has expired, may update it
+        taken = SchedulerLease.query.filter(
+            SchedulerLease.name == self.lease_name,
+            or_(SchedulerLease.holder == self.holder, SchedulerLease.expires_at < now)
+        ).update({'holder': self.holder, 'expires_at': expires_at}, synchronize_session=False)
+
+        if not taken:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(SchedulerLease(name=self.lease_name, holder=self.holder,
+                                                  acquired_at=now, expires_at=expires_at))
+                taken = 1
+            except IntegrityError:
+                taken = 0
+        db.session.commit()
+
+        if bool(taken) != self.is_leader:
+            logger.info(f"Scheduler {self.holder} {'acquired' if taken else 'lost'} the lease")
+        self.is_leader = bool(taken)
+        return self.is_leader
+
+    def release_lease(self):
+        """Give up the lease so another worker can take over immediately."""
+        from app.models.scheduler import SchedulerLease
+
+        SchedulerLease.query.filter_by(name=self.lease_name, holder=self.holder).delete()
+        db.session.commit()
+        self.is_leader = False
+
+    def tick(self, now=None):
+        """
+        Run all jobs once if this worker is the leader.
+
+        Returns:
+            bool: Whether jobs ran
+        """
+        now = now or datetime.utcnow()
+        if not self.acquire_lease(now):
+            return False
+
+        for name, job in list(self.jobs.items()):
+            try:
+                job(now)
+            except Exception as e:
+                logger.error(f"Scheduled job {name} failed: {str(e)}")
+                db.session.rollback()
+        return True
+
+    def start(self):
+        """Start the scheduler thread if it is not running."""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stop the scheduler thread and release the lease."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        if self.is_leader:
+            with self.app.app_context():
+                self.release_lease()
+
+    def _loop(self):
+        """Tick until stopped."""
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    self.tick()
+                except Exception as e:
+                    logger.error(f"Scheduler tick failed: {str(e)}")
+                    db.session.rollback()
+                    self.is_leader = False
+                finally:
+                    db.session.remove()
+            self._stop.wait(self.interval)
+
+
+scheduler = Scheduler()
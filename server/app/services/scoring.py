@@ -0,0 +1,171 @@
+"""Test session scoring.
+
+Question metadata that scoring needs (points, type, correct answer and its
+compiled answer key) does not change while a test is being taken, so
+``question_cache`` keeps it in process memory per test set instead of
+loading each question on every answer. Entries expire after
+``QUESTION_CACHE_TTL`` seconds and are dropped when ``QuestionService``
+edits a question; other workers pick up edits when their entry expires.
+
+Sessions keep running ``score``/``max_score`` totals while in progress
+(``apply_delta``), and ``session_totals`` recomputes them authoritatively
+with one aggregate over responses joined to questions when a session is
+completed.
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import func
+
+from app.extensions import db
+from app.services.grading import compile_answer, grade
+
+# ``key`` is the compiled answer key (see ``app.services.grading``)
+QuestionMeta = namedtuple('QuestionMeta', 'id test_set_id type points correct_answer order key')
+
+
+class QuestionCache:
+    """Per-process cache of question metadata keyed by test set."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _load(test_set_id):
+        from app.models import Question
+
+        rows = db.session.query(
+            Question.id, Question.test_set_id, Question.type, Question.points,
+            Question.correct_answer, Question.order, Question.options
+        ).filter(Question.test_set_id == test_set_id).all()
+        return {row.id: QuestionMeta(row.id, row.test_set_id, row.type, row.points or 0,
+                                     row.correct_answer, row.order,
+                                     compile_answer(row.type, row.correct_answer, row.options))
+                for row in rows}
+
+    def questions(self, test_set_id):
+        """
+        Metadata of every question in a test set.
+
+        Args:
+            test_set_id (int): Test set ID
+
+        Returns:
+            dict: Question ID -> QuestionMeta
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(test_set_id)
+        if entry and entry[0] > now:
+            return entry[1]
+
+        questions = self._load(test_set_id)
+        ttl = current_app.config.get('QUESTION_CACHE_TTL', 300)
+        with self._lock:
+            self._entries[test_set_id] = (now + ttl, questions)
+        return questions
+
+    def get(self, test_set_id, question_id):
+        """
+        Metadata of one question, or None if it is not part of the test set.
+
+        A miss reloads the set once, so questions added since it was cached
+        are found.
+        """
+        question = self.questions(test_set_id).get(question_id)
+        if question is None:
+            self.invalidate(test_set_id)
+            question = self.questions(test_set_id).get(question_id)
+        return question
+
+    def invalidate(self, test_set_id=None):
+        """Drop one test set, or every entry when no ID is given."""
+        with self._lock:
+            if test_set_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(test_set_id, None)
+
+
+question_cache = QuestionCache()
+
+
+class ScoringService:
+    """Scoring of answers and test sessions."""
+
+    @staticmethod
+    def grade(question, answer):
+        """
+        Grade an answer against question metadata.
+
+        Args:
+            question (QuestionMeta): The question
+            answer: The submitted answer
+
+        Returns:
+            tuple: (is_correct, score); ``is_correct`` is None for answers awaiting review
+        """
+        return grade(question.key, question.points, answer)
+
+    @staticmethod
+    def grade_many(questions, answers):
+        """
+        Grade a batch of answers in one pass.
+
+        Args:
+            questions (dict): Question ID -> QuestionMeta
+            answers (dict): Question ID -> submitted answer
+
+        Returns:
+            dict: Question ID -> (is_correct, score)
+        """
+        return {question_id: grade(questions[question_id].key, questions[question_id].points, answer)
+                for question_id, answer in answers.items()}
+
+    @staticmethod
+    def apply_delta(session, score_delta, max_delta=0):
+        """
+        Add to a session's running totals.
+
+        The totals are assigned as SQL expressions, so concurrent answers to
+        the same session cannot overwrite each other's increments.
+
+        Args:
+            session (TestSession): The session
+            score_delta (float): Change in scored points
+            max_delta (float): Change in available points
+        """
+        from app.models import TestSession
+
+        if score_delta:
+            session.score = func.coalesce(TestSession.score, 0) + score_delta
+        if max_delta:
+            session.max_score = func.coalesce(TestSession.max_score, 0) + max_delta
+
+    @staticmethod
+    def session_totals(session_id):
+        """
+        Scored and available points of a session in one query.
+
+        Only answered questions count towards the maximum.
+
+        Args:
+            session_id (int): Test session ID
+
+        Returns:
+            tuple: (total_score, max_score, answered)
+        """
+        from app.models import Question, Response
+
+        total, maximum, answered = db.session.query(
+            func.coalesce(func.sum(func.coalesce(Response.score, 0)), 0),
+            func.coalesce(func.sum(func.coalesce(Question.points, 0)), 0),
+            func.count(Response.id)
+        ).select_from(Response).join(Question, Question.id == Response.question_id).filter(
+            Response.session_id == session_id
+        ).one()
+        return float(total), float(maximum), answered
@@ -2,10 +2,54 @@
 
 import os
 import uuid
+import hashlib
+import logging
 from datetime import datetime
 from werkzeug.utils import secure_filename
-from PIL import Image
-import magic
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models.file_blob import FileBlob, UploadSession
+from app.services.image_service import image_service
+
+logger = logging.getLogger('bdc')
+
+# File operations that wait for the transaction that made them safe
+_ON_COMMIT = 'storage_on_commit'
+_ON_ROLLBACK = 'storage_on_rollback'
+
+
+def _defer(session, key, action):
+    session.info.setdefault(key, []).append(action)
+
+
+def _run(actions):
+    for action in actions or ():
+        try:
+            action()
+        except OSError as e:
+            logger.error(f"Deferred file operation failed: {str(e)}")
+
+
+def _after_commit(session):
+    session.info.pop(_ON_ROLLBACK, None)
+    _run(session.info.pop(_ON_COMMIT, None))
+
+
+def _after_soft_rollback(session, previous_transaction):
+    # Savepoint rollbacks leave the outer transaction's file operations pending
+    if previous_transaction.parent is not None:
+        return
+    session.info.pop(_ON_COMMIT, None)
+    _run(session.info.pop(_ON_ROLLBACK, None))
+
+
+def _unlink(path):
+    if os.path.exists(path):
+        os.remove(path)
+
 
 class StorageService:
     """Service for handling file storage operations."""
@@ -19,6 +63,14 @@ class StorageService:
     MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB
     MAX_DOCUMENT_SIZE = 10 * 1024 * 1024  # 10MB
     MAX_VIDEO_SIZE = 100 * 1024 * 1024  # 100MB
+    MAX_CHUNKED_UPLOAD_SIZE = 200 * 1024 * 1024  # 200MB, resumable uploads only
+    
+    # Uploads are streamed to disk in blocks of this size
+    CHUNK_SIZE = 64 * 1024
+    
+    # Content-addressed blobs and in-progress uploads, relative to upload_folder
+    BLOB_DIRECTORY = 'blobs'
+    TEMP_DIRECTORY = 'tmp'
     
     def __init__(self, app=None):
         """Initialize storage service."""
@@ -31,6 +83,9 @@ class StorageService:
         self.app = app
         self.upload_folder = app.config.get('UPLOAD_FOLDER', 'app/static/uploads')
         self.create_upload_directories()
+        if not event.contains(Session, 'after_commit', _after_commit):
+            event.listen(Session, 'after_commit', _after_commit)
+            event.listen(Session, 'after_soft_rollback', _after_soft_rollback)
     
     def create_upload_directories(self):
         """Create necessary upload directories."""
@@ -39,7 +94,9 @@ class StorageService:
             'documents',
             'reports',
             'evaluations',
-            'attachments'
+            'attachments',
+            self.BLOB_DIRECTORY,
+            self.TEMP_DIRECTORY
         ]
         
         for directory in directories:
@@ -64,13 +121,21 @@ class StorageService:
     
     def validate_file_size(self, file_size, file_type='document'):
         """Validate file size based on type."""
-        if file_type == 'image':
-            return file_size <= self.MAX_IMAGE_SIZE
-        elif file_type == 'document':
-            return file_size <= self.MAX_DOCUMENT_SIZE
-        elif file_type == 'video':
-            return file_size <= self.MAX_VIDEO_SIZE
-        return False
+        max_size = self.max_file_size(file_type)
+        return max_size is not None and file_size <= max_size
+    
+    def max_file_size(self, file_type='document'):
+        """Return the maximum size in bytes for a file type, or None if unknown."""
+        return {
+            'image': self.MAX_IMAGE_SIZE,
+            'document': self.MAX_DOCUMENT_SIZE,
+            'video': self.MAX_VIDEO_SIZE
+        }.get(file_type)
+    
+    def get_extension(self, filename):
+        """Return the lowercase extension of a filename without the dot."""
+        _, ext = os.path.splitext(secure_filename(filename))
+        return ext[1:].lower() if ext else None
     
     def generate_unique_filename(self, original_filename):
         """Generate unique filename to avoid collisions."""
@@ -81,6 +146,67 @@ class StorageService:
         name, ext = os.path.splitext(secure_name)
         return f"{name}_{timestamp}_{random_string}{ext}"
     
+    def write_stream(self, stream, destination, max_size, mode='wb', digest=None):
+        """
+        Copy a stream to disk in fixed-size chunks.
+        
+        The size limit is enforced while reading, so oversized uploads are
+        rejected without being written out in full.
+        
+        Args:
+            stream: File-like object to read from
+            destination (str): Absolute path of the file to write
+            max_size (int): Maximum number of bytes to accept
+            mode (str): 'wb' to create the file, 'ab' to append
+            digest: Optional hashlib object updated with every chunk
+            
+        Returns:
+            tuple: (bytes_written, error)
+        """
+        written = 0
+        try:
+            with open(destination, mode) as target:
+                while True:
+                    chunk = stream.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if written > max_size:
+                        break
+                    if digest is not None:
+                        digest.update(chunk)
+                    target.write(chunk)
+        except OSError as e:
+            return written, f'Error writing file: {str(e)}'
+        
+        if written > max_size:
+            if mode == 'wb':
+                os.remove(destination)
+            return written, 'File size too large'
+        
+        return written, None
+    
+    def hash_stream(self, stream, destination, max_size):
+        """
+        Copy a stream to disk in chunks while computing its SHA-256.
+        
+        Returns:
+            tuple: ((sha256, size), error)
+        """
+        digest = hashlib.sha256()
+        size, error = self.write_stream(stream, destination, max_size, digest=digest)
+        if error:
+            return None, error
+        return (digest.hexdigest(), size), None
+    
+    def hash_file(self, path):
+        """Compute the SHA-256 of a file on disk, reading it in chunks."""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as source:
+            for chunk in iter(lambda: source.read(self.CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
     def save_file(self, file, directory, file_type='document'):
         """Save uploaded file to specified directory."""
         if not file:
@@ -94,60 +220,333 @@ class StorageService:
         if not self.allowed_file(file.filename, file_type):
             return None, f'Invalid file type for {file_type}'
             
-        # Check file size
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)
-        
-        if not self.validate_file_size(file_size, file_type):
-            return None, 'File size too large'
+        max_size = self.max_file_size(file_type)
+        if max_size is None:
+            return None, f'Invalid file type for {file_type}'
             
         # Generate unique filename
         filename = self.generate_unique_filename(file.filename)
         
-        # Save file
+        # Stream file to disk, enforcing the size limit as we go
         file_path = os.path.join(self.upload_folder, directory, filename)
-        file.save(file_path)
+        _, error = self.write_stream(file.stream, file_path, max_size)
+        if error:
+            return None, error
         
         # Generate relative URL
         relative_path = f"/static/uploads/{directory}/{filename}"
         
         return relative_path, None
     
-    def save_profile_picture(self, file, user_id):
-        """Save and optimize profile picture."""
-        if not file:
-            return None, 'No file provided'
+    def blob_path(self, sha256, extension=None, token=None):
+        """
+        Return the storage path of a blob, relative to the upload folder.
+        
+        Each blob row gets its own file (``token`` distinguishes them), so
+        deleting the file of a released blob can never remove the file of a
+        blob stored again with the same content.
+        """
+        name = f"{sha256}-{token}" if token else sha256
+        filename = f"{name}.{extension}" if extension else name
+        return os.path.join(self.BLOB_DIRECTORY, sha256[:2], sha256[2:4], filename)
+    
+    def _add_reference(self, sha256):
+        """Increment a blob's reference count; None if no blob has this hash."""
+        blob = FileBlob.query.filter_by(sha256=sha256).first()
+        if blob is None:
+            return None
+        updated = FileBlob.query.filter_by(id=blob.id).update({
+            FileBlob.ref_count: FileBlob.ref_count + 1,
+            FileBlob.last_referenced_at: datetime.utcnow()
+        }, synchronize_session=False)
+        if not updated:
+            # Released and deleted by another transaction in the meantime
+            return None
+        db.session.refresh(blob)
+        return blob
+    
+    def acquire_blob(self, temp_path, sha256, size, extension=None):
+        """
+        Register a reference to content that was written to ``temp_path``.
+        
+        If a blob with the same hash already exists its reference count is
+        incremented and the temporary file is discarded; otherwise a blob row
+        is inserted and the file is moved into content-addressed storage. The
+        caller commits the session; if it rolls back instead, the new file is
+        removed again.
+        
+        Returns:
+            FileBlob: The blob now holding the content
+        """
+        blob = self._add_reference(sha256)
+        if blob is None:
+            storage_path = self.blob_path(sha256, extension, uuid.uuid4().hex[:8])
+            try:
+                with db.session.begin_nested():
+                    blob = FileBlob(
+                        sha256=sha256,
+                        size=size,
+                        storage_path=storage_path,
+                        extension=extension,
+                        ref_count=1
+                    )
+                    db.session.add(blob)
+            except IntegrityError:
+                # Another request stored the same content concurrently
+                blob = self._add_reference(sha256)
+                if blob is None:
+                    raise
+            else:
+                full_path = os.path.join(self.upload_folder, storage_path)
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                os.replace(temp_path, full_path)
+                # The path is unique to this row, so nothing else can be using it
+                _defer(db.session, _ON_ROLLBACK, lambda: _unlink(full_path))
+                return blob
+        
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return blob
+    
+    def release_blob(self, sha256):
+        """
+        Drop one reference to a blob, deleting it once nothing refers to it.
+        
+        The row is deleted with a conditional ``DELETE ... WHERE ref_count =
+        0``, so a concurrent ``acquire_blob`` that re-referenced it wins, and
+        the file and its image variants are removed only after the caller
+        commits the deletion.
+        
+        Returns:
+            bool: True if the blob was deleted
+        """
+        blob = FileBlob.query.filter_by(sha256=sha256).first()
+        if not blob:
+            return False
+        
+        FileBlob.query.filter_by(id=blob.id).update({
+            FileBlob.ref_count: FileBlob.ref_count - 1
+        }, synchronize_session=False)
+        deleted = FileBlob.query.filter(
+            FileBlob.id == blob.id,
+            FileBlob.ref_count <= 0
+        ).delete(synchronize_session=False)
+        
+        if not deleted:
+            db.session.refresh(blob)
+            return False
+        
+        full_path = os.path.join(self.upload_folder, blob.storage_path)
+        db.session.expunge(blob)
+
+        def remove():
+            _unlink(full_path)
+            image_service.remove_variants(sha256)
+        _defer(db.session, _ON_COMMIT, remove)
+        return True
+    
+    def store_upload(self, file, file_type='document', max_size=None):
+        """
+        Stream an uploaded file into content-addressed storage.
+        
+        Identical content is stored once; each call adds a reference.
+        
+        Args:
+            file (FileStorage): Uploaded file
+            file_type (str): 'image', 'document', 'video' or 'any'
+            max_size (int): Override the size limit for the file type
             
-        # Validate image file
-        result, error = self.save_file(file, 'profile_pictures', 'image')
+        Returns:
+            tuple: (FileBlob, error)
+        """
+        if not file or file.filename == '':
+            return None, 'No file provided'
+        
+        if not self.allowed_file(file.filename, file_type):
+            return None, f'Invalid file type for {file_type}'
+        
+        if max_size is None:
+            max_size = self.max_file_size(file_type) or self.MAX_VIDEO_SIZE
+        
+        temp_path = os.path.join(self.upload_folder, self.TEMP_DIRECTORY, f"{uuid.uuid4()}.upload")
+        result, error = self.hash_stream(file.stream, temp_path, max_size)
         if error:
             return None, error
-            
-        # Optimize image
+        
+        sha256, size = result
         try:
-            file_path = os.path.join(self.app.root_path, result.lstrip('/'))
-            
-            # Open and optimize image
-            img = Image.open(file_path)
-            
-            # Convert to RGB if necessary
-            if img.mode in ('RGBA', 'LA'):
-                rgb_img = Image.new('RGB', img.size, (255, 255, 255))
-                rgb_img.paste(img, mask=img.split()[-1])
-                img = rgb_img
-            
-            # Resize image if too large
-            max_size = (300, 300)
-            img.thumbnail(max_size, Image.Resampling.LANCZOS)
-            
-            # Save optimized image
-            img.save(file_path, 'JPEG', quality=85, optimize=True)
+            blob = self.acquire_blob(temp_path, sha256, size, self.get_extension(file.filename))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return blob, None
+    
+    def upload_part_path(self, upload_id):
+        """Return the absolute path of a chunked upload's partial file."""
+        return os.path.join(self.upload_folder, self.TEMP_DIRECTORY, f"{upload_id}.part")
+    
+    def start_chunked_upload(self, user_id, filename, total_size, file_type='document'):
+        """
+        Begin a resumable chunked upload.
+        
+        Returns:
+            tuple: (UploadSession, error)
+        """
+        if not filename or not self.allowed_file(filename, file_type):
+            return None, f'Invalid file type for {file_type}'
+        
+        if total_size is None or total_size <= 0:
+            return None, 'Invalid file size'
+        
+        if total_size > self.MAX_CHUNKED_UPLOAD_SIZE:
+            return None, 'File size too large'
+        
+        upload = UploadSession(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            filename=secure_filename(filename),
+            file_type=file_type,
+            total_size=total_size,
+            received_size=0,
+            status='pending'
+        )
+        open(self.upload_part_path(upload.id), 'wb').close()
+        
+        db.session.add(upload)
+        db.session.commit()
+        
+        return upload, None
+    
+    def append_chunk(self, upload, offset, stream):
+        """
+        Append a chunk to a pending upload.
+        
+        ``offset`` must equal the number of bytes already received, so a
+        client that lost a response can ask for the upload status and resume
+        from ``received_size``.
+        
+        Returns:
+            tuple: (UploadSession, error)
+        """
+        if upload.status != 'pending':
+            return None, 'Upload is not pending'
+        
+        part_path = self.upload_part_path(upload.id)
+        if not os.path.exists(part_path):
+            return None, 'Upload data not found'
+        
+        # The file on disk is the source of truth if a previous request
+        # failed between writing and committing
+        received = os.path.getsize(part_path)
+        if offset != received:
+            return None, f'Offset mismatch, expected {received}'
+        
+        remaining = upload.total_size - received
+        written, error = self.write_stream(stream, part_path, remaining, mode='ab')
+        if error:
+            # Drop whatever part of the oversized chunk was appended
+            with open(part_path, 'r+b') as part:
+                part.truncate(received)
+            return None, 'Chunk exceeds declared file size' if written > remaining else error
+        
+        upload.received_size = received + written
+        db.session.commit()
+        
+        return upload, None
+    
+    def complete_chunked_upload(self, upload):
+        """
+        Finish a chunked upload and move its content into blob storage.
+        The caller commits the session.
+        
+        Returns:
+            tuple: (FileBlob, error)
+        """
+        if upload.status != 'pending':
+            return None, 'Upload is not pending'
+        
+        part_path = self.upload_part_path(upload.id)
+        if not os.path.exists(part_path):
+            return None, 'Upload data not found'
+        
+        size = os.path.getsize(part_path)
+        if size != upload.total_size:
+            return None, f'Upload incomplete, received {size} of {upload.total_size} bytes'
+        
+        sha256 = self.hash_file(part_path)
+        blob = self.acquire_blob(part_path, sha256, size, self.get_extension(upload.filename))
+        
+        upload.received_size = size
+        upload.content_hash = sha256
+        upload.status = 'completed'
+        
+        return blob, None
+    
+    def abort_chunked_upload(self, upload):
+        """Cancel a pending upload and remove its partial data."""
+        part_path = self.upload_part_path(upload.id)
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        
+        upload.status = 'aborted'
+        db.session.commit()
+    
+    def save_profile_picture(self, file, user_id, previous_url=None):
+        """
+        Store a profile picture and queue its resized variants.
+        
+        Decoding and resizing run in the image worker pool rather than in the
+        request; the returned public URL serves the avatar variant once it is
+        ready. The caller commits the session.
+        
+        Args:
+            file (FileStorage): Uploaded image
+            user_id (int): Owner of the picture
+            previous_url (str): URL of the picture being replaced, if any
             
-            return result, None
+        Returns:
+            tuple: (avatar_url, error)
+        """
+        from PIL import Image
+        
+        if not file:
+            return None, 'No file provided'
+        
+        # Reject files that do not decode before anything is stored or rendered
+        try:
+            with Image.open(file.stream) as image:
+                image.verify()
+        except Exception:
+            return None, 'File is not a valid image'
+        finally:
+            file.stream.seek(0)
             
-        except Exception as e:
-            return None, f'Error processing image: {str(e)}'
+        blob, error = self.store_upload(file, 'image')
+        if error:
+            return None, error
+        
+        image_service.schedule_variants(blob, ('avatar', 'thumbnail'))
+        
+        previous_hash = self.blob_hash_from_url(previous_url)
+        if previous_hash and previous_hash != blob.sha256:
+            self.release_blob(previous_hash)
+        
+        return self.avatar_url(blob.sha256), None
+    
+    def variant_url(self, sha256, variant):
+        """Return the API URL serving a variant of a blob."""
+        return f"/api/files/{sha256}/{variant}"
+    
+    def avatar_url(self, sha256, variant='avatar'):
+        """Return the public URL of a profile picture variant (usable in ``<img>``)."""
+        return f"/api/avatars/{sha256}/{variant}"
+    
+    def blob_hash_from_url(self, url):
+        """Extract the blob hash from a URL built by variant_url or avatar_url, if any."""
+        if not url or not url.startswith(('/api/files/', '/api/avatars/')):
+            return None
+        parts = url.split('/')
+        return parts[3] if len(parts) > 3 and len(parts[3]) == 64 else None
     
     def save_document(self, file, category='general'):
         """Save document file."""
@@ -158,6 +557,10 @@ class StorageService:
         
         return self.save_file(file, directory, 'document')
     
+    def blob_full_path(self, blob):
+        """Return the absolute path of a blob on disk."""
+        return os.path.join(self.upload_folder, blob.storage_path)
+    
     def delete_file(self, file_path):
         """Delete file from storage."""
         try:
@@ -193,6 +596,7 @@ class StorageService:
             stats = os.stat(full_path)
             
             # Get MIME type
+            import magic
             mime = magic.Magic(mime=True)
             mime_type = mime.from_file(full_path)
             
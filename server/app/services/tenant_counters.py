@@ -0,0 +1,403 @@
+"""Denormalized per-tenant counters.
+
+``tenant_counters`` holds user, staff, trainer, beneficiary, program and
+storage totals per tenant so tenant lists, dashboards and quota checks
+read one row instead of loading or counting every member. Counters are
+kept current by session events: ``before_flush`` turns the attribute
+history of users, beneficiaries, programs and documents into deltas and
+``after_flush_postexec`` applies them as ``SET x = x + n`` updates in the
+same transaction. Bulk SQL bypasses the events; ``reconcile`` recomputes
+the counters from the source tables and is meant to run periodically
+(``flask reconcile-tenant-counters``).
+"""
+
+from collections import Counter, defaultdict
+from datetime import datetime
+from functools import lru_cache
+
+from flask import current_app
+from sqlalchemy import case, event, func, inspect, or_, select, union, update
+from sqlalchemy.orm import RelationshipProperty, Session, attributes
+
+from app.extensions import db
+
+STAFF_ROLES = ('super_admin', 'tenant_admin', 'trainer')
+
+COUNTER_FIELDS = ('user_count', 'staff_count', 'trainer_count', 'beneficiary_count',
+                  'active_beneficiary_count', 'program_count', 'storage_bytes')
+
+# Quota name -> (counter field, Tenant limit column)
+QUOTAS = {
+    'users': ('staff_count', 'max_users'),
+    'beneficiaries': ('active_beneficiary_count', 'max_beneficiaries'),
+}
+
+_DELTAS = 'tenant_counter_deltas'
+_NEW_TENANTS = 'tenant_counter_new_tenants'
+_DELETED_TENANTS = 'tenant_counter_deleted_tenants'
+
+
+class QuotaExceeded(ValueError):
+    """Raised when an insert would take a tenant over its plan limit."""
+
+    def __init__(self, quota, limit):
+        super().__init__(f"Tenant {quota} limit of {limit} reached")
+        self.quota = quota
+        self.limit = limit
+
+
+def _user_contribution(session, get):
+    tenants = {t.id or t for t in get('tenants') or ()}
+    if get('tenant_id'):
+        tenants.add(get('tenant_id'))
+    role = get('role')
+
+    counts = Counter()
+    for tenant in tenants:
+        counts[(tenant, 'user_count')] += 1
+        if role in STAFF_ROLES:
+            counts[(tenant, 'staff_count')] += 1
+        if role == 'trainer':
+            counts[(tenant, 'trainer_count')] += 1
+    return counts
+
+
+def _beneficiary_contribution(session, get):
+    tenant_id = get('tenant_id')
+    if not tenant_id:
+        return Counter()
+    counts = Counter({(tenant_id, 'beneficiary_count'): 1})
+    # Unset defaults on pending rows count as active
+    if get('is_active') is not False and (get('status') or 'active') == 'active':
+        counts[(tenant_id, 'active_beneficiary_count')] = 1
+    return counts
+
+
+def _program_contribution(session, get):
+    tenant_id = get('tenant_id')
+    return Counter({(tenant_id, 'program_count'): 1}) if tenant_id else Counter()
+
+
+def _document_contribution(session, get):
+    from app.models.beneficiary import Beneficiary
+    from app.models.user import User
+
+    # A document belongs to its beneficiary's tenant, else its uploader's
+    owner = None
+    if get('beneficiary_id'):
+        owner = session.get(Beneficiary, get('beneficiary_id'))
+    if owner is None and get('upload_by'):
+        owner = session.get(User, get('upload_by'))
+    tenant_id = owner.tenant_id if owner is not None else None
+    if not tenant_id or not get('file_size'):
+        return Counter()
+    return Counter({(tenant_id, 'storage_bytes'): get('file_size')})
+
+
+@lru_cache(maxsize=None)
+def _tracked():
+    """Model class -> (tracked attributes, contribution function)."""
+    from app.models.beneficiary import Beneficiary
+    from app.models.document import Document
+    from app.models.program import Program
+    from app.models.user import User
+
+    return {
+        User: (('tenants', 'tenant_id', 'role'), _user_contribution),
+        Beneficiary: (('tenant_id', 'is_active', 'status'), _beneficiary_contribution),
+        Program: (('tenant_id',), _program_contribution),
+        Document: (('beneficiary_id', 'upload_by', 'file_size'), _document_contribution),
+    }
+
+
+def _state_getter(obj, side):
+    """Read attributes as they were before (``old``) or will be after (``new``) a flush."""
+    mapper = inspect(obj).mapper
+
+    def get(key):
+        history = attributes.get_history(obj, key)
+        changed = history.deleted if side == 'old' else history.added
+        if isinstance(mapper.attrs[key], RelationshipProperty):
+            return list(history.unchanged) + list(changed)
+        values = list(changed) or list(history.unchanged)
+        return values[0] if values else None
+    return get
+
+
+def _has_changes(obj, keys):
+    return any(attributes.get_history(obj, key, passive=attributes.PASSIVE_NO_INITIALIZE).has_changes()
+               for key in keys)
+
+
+def _before_flush(session, flush_context, instances):
+    """Compute counter deltas from the pending changes."""
+    from app.models.tenant import Tenant
+
+    tracked = _tracked()
+    deltas = Counter()
+    with session.no_autoflush:
+        for obj in session.new:
+            if type(obj) in tracked:
+                deltas.update(tracked[type(obj)][1](session, _state_getter(obj, 'new')))
+        for obj in session.dirty:
+            if type(obj) not in tracked:
+                continue
+            keys, contribution = tracked[type(obj)]
+            if not _has_changes(obj, keys):
+                continue
+            deltas.update(contribution(session, _state_getter(obj, 'new')))
+            deltas.subtract(contribution(session, _state_getter(obj, 'old')))
+        for obj in session.deleted:
+            if type(obj) in tracked:
+                deltas.subtract(tracked[type(obj)][1](session, _state_getter(obj, 'old')))
+
+    session.info[_DELTAS] = {key: value for key, value in deltas.items() if value}
+    session.info[_NEW_TENANTS] = [obj for obj in session.new if isinstance(obj, Tenant)]
+    session.info[_DELETED_TENANTS] = [obj.id for obj in session.deleted if isinstance(obj, Tenant)]
+
+
+def _after_flush_postexec(session, flush_context):
+    """Create counters for new tenants and apply the deltas of the flush."""
+    from app.models.tenant import TenantCounter
+
+    deltas = session.info.pop(_DELTAS, None)
+    new_tenants = session.info.pop(_NEW_TENANTS, None)
+    deleted_tenants = session.info.pop(_DELETED_TENANTS, None)
+    table = TenantCounter.__table__
+    connection = session.connection()
+
+    if deleted_tenants:
+        connection.execute(table.delete().where(table.c.tenant_id.in_(deleted_tenants)))
+
+    if new_tenants:
+        connection.execute(table.insert(), [
+            {'tenant_id': tenant.id, **{field: 0 for field in COUNTER_FIELDS}}
+            for tenant in new_tenants
+        ])
+
+    if not deltas:
+        return
+
+    by_tenant = defaultdict(dict)
+    for (tenant, field), value in deltas.items():
+        # Tenants inserted in the same flush were keyed by instance
+        tenant_id = tenant if isinstance(tenant, int) else tenant.id
+        by_tenant[tenant_id][field] = by_tenant[tenant_id].get(field, 0) + value
+
+    mapper = inspect(TenantCounter)
+    for tenant_id, fields in by_tenant.items():
+        connection.execute(
+            update(table)
+            .where(table.c.tenant_id == tenant_id)
+            .values({field: table.c[field] + value for field, value in fields.items()})
+        )
+        loaded = session.identity_map.get(mapper.identity_key_from_primary_key((tenant_id,)))
+        if loaded is not None:
+            session.expire(loaded)
+
+
+def _discard(session, *args):
+    for key in (_DELTAS, _NEW_TENANTS, _DELETED_TENANTS):
+        session.info.pop(key, None)
+
+
+def _track_old_values():
+    """Make column sets on tracked models record the value they replace."""
+    for model, (keys, _) in _tracked().items():
+        for key in keys:
+            attribute = getattr(model, key)
+            if not isinstance(attribute.property, RelationshipProperty):
+                event.listen(attribute, 'set', _noop_set, active_history=True)
+
+
+def _noop_set(target, value, oldvalue, initiator):
+    return value
+
+
+def init_tenant_counters(app):
+    """Maintain tenant counters on flush when ``TENANT_COUNTERS`` is set."""
+    if not app.config.get('TENANT_COUNTERS', True):
+        return
+    if event.contains(Session, 'before_flush', _before_flush):
+        return
+
+    _track_old_values()
+    event.listen(Session, 'before_flush', _before_flush)
+    event.listen(Session, 'after_flush_postexec', _after_flush_postexec)
+    event.listen(Session, 'after_rollback', _discard)
+
+
+class TenantCounterService:
+    """Service for reading, enforcing and reconciling tenant counters."""
+
+    @staticmethod
+    def get_counters(tenant_ids):
+        """
+        Load counters for several tenants.
+
+        Args:
+            tenant_ids (list): Tenant ids
+
+        Returns:
+            dict: tenant_id -> TenantCounter
+        """
+        from app.models.tenant import TenantCounter
+
+        if not tenant_ids:
+            return {}
+        rows = TenantCounter.query.filter(TenantCounter.tenant_id.in_(list(tenant_ids))).all()
+        return {row.tenant_id: row for row in rows}
+
+    @staticmethod
+    def counters_dict(counter):
+        """Serialize a counter row, or zeros when a tenant has none yet."""
+        if counter is None:
+            return {**{field: 0 for field in COUNTER_FIELDS}, 'reconciled_at': None}
+        return counter.to_dict()
+
+    @staticmethod
+    def check_quota(tenant_id, quota, adding=1):
+        """
+        Verify a tenant can take ``adding`` more users or beneficiaries.
+
+        The counter row is locked until the caller's transaction ends so
+        concurrent inserts cannot both pass the check.
+
+        Args:
+            tenant_id (int): Tenant ID
+            quota (str): Key in ``QUOTAS``
+            adding (int): Number of rows about to be added
+
+        Raises:
+            QuotaExceeded: If the limit would be exceeded
+        """
+        from app.models.tenant import Tenant
+
+        field, limit_column = QUOTAS[quota]
+        limit = db.session.scalar(select(getattr(Tenant, limit_column)).where(Tenant.id == tenant_id))
+        if not limit:
+            return
+        current = db.session.scalar(TenantCounterService.locked_counter(tenant_id, field))
+        if (current or 0) + adding > limit:
+            raise QuotaExceeded(quota, limit)
+
+    @staticmethod
+    def locked_counter(tenant_id, field):
+        """
+        SELECT of one counter that locks the tenant's counter row.
+
+        Only the counter row is locked: PostgreSQL rejects ``FOR UPDATE``
+        on the nullable side of an outer join. Every tenant has a row, as
+        it is inserted with the tenant and backfilled by ``reconcile``.
+
+        Args:
+            tenant_id (int): Tenant ID
+            field (str): Counter column
+
+        Returns:
+            Select: Statement returning the counter value
+        """
+        from app.models.tenant import TenantCounter
+
+        return select(getattr(TenantCounter, field))\
+            .where(TenantCounter.tenant_id == tenant_id)\
+            .with_for_update()
+
+    @staticmethod
+    def compute(tenant_ids=None):
+        """
+        Count everything from the source tables with grouped queries.
+
+        Args:
+            tenant_ids (list): Restrict to these tenants; all when None
+
+        Returns:
+            dict: tenant_id -> {field: value}
+        """
+        from app.models.beneficiary import Beneficiary
+        from app.models.document import Document
+        from app.models.program import Program
+        from app.models.tenant import Tenant
+        from app.models.user import User, user_tenant
+
+        def restrict(query, column):
+            return query.where(column.in_(tenant_ids)) if tenant_ids is not None else query
+
+        tenants = select(Tenant.id)
+        totals = {tenant_id: dict.fromkeys(COUNTER_FIELDS, 0)
+                  for tenant_id in db.session.scalars(restrict(tenants, Tenant.id))}
+
+        membership = union(
+            select(user_tenant.c.user_id, user_tenant.c.tenant_id),
+            select(User.id, User.tenant_id).where(User.tenant_id.isnot(None))
+        ).subquery()
+        members = select(
+            membership.c.tenant_id,
+            func.count(),
+            func.sum(case((User.role.in_(STAFF_ROLES), 1), else_=0)),
+            func.sum(case((User.role == 'trainer', 1), else_=0))
+        ).join(User, User.id == membership.c.user_id).group_by(membership.c.tenant_id)
+        for tenant_id, users, staff, trainers in db.session.execute(restrict(members, membership.c.tenant_id)):
+            if tenant_id in totals:
+                totals[tenant_id].update(user_count=users, staff_count=staff or 0, trainer_count=trainers or 0)
+
+        active = or_(Beneficiary.is_active.is_(None), Beneficiary.is_active.is_(True))
+        beneficiaries = select(
+            Beneficiary.tenant_id,
+            func.count(),
+            func.sum(case((active & (func.coalesce(Beneficiary.status, 'active') == 'active'), 1), else_=0))
+        ).group_by(Beneficiary.tenant_id)
+        for tenant_id, count, active_count in db.session.execute(restrict(beneficiaries, Beneficiary.tenant_id)):
+            if tenant_id in totals:
+                totals[tenant_id].update(beneficiary_count=count, active_beneficiary_count=active_count or 0)
+
+        programs = select(Program.tenant_id, func.count()).group_by(Program.tenant_id)
+        for tenant_id, count in db.session.execute(restrict(programs, Program.tenant_id)):
+            if tenant_id in totals:
+                totals[tenant_id]['program_count'] = count
+
+        owner = func.coalesce(Beneficiary.tenant_id, User.tenant_id)
+        storage = select(owner, func.sum(Document.file_size))\
+            .outerjoin(Beneficiary, Beneficiary.id == Document.beneficiary_id)\
+            .outerjoin(User, User.id == Document.upload_by)\
+            .group_by(owner)
+        for tenant_id, size in db.session.execute(restrict(storage, owner)):
+            if tenant_id in totals:
+                totals[tenant_id]['storage_bytes'] = int(size or 0)
+
+        return totals
+
+    @staticmethod
+    def reconcile(tenant_ids=None):
+        """
+        Rewrite counters that drifted from the source tables.
+
+        Args:
+            tenant_ids (list): Restrict to these tenants; all when None
+
+        Returns:
+            list: Ids of tenants whose counters were missing or wrong
+        """
+        from app.models.tenant import TenantCounter
+
+        totals = TenantCounterService.compute(tenant_ids)
+        existing = TenantCounterService.get_counters(totals)
+        now = datetime.utcnow()
+        drifted = []
+
+        for tenant_id, values in totals.items():
+            counter = existing.get(tenant_id)
+            if counter is None:
+                counter = TenantCounter(tenant_id=tenant_id)
+                db.session.add(counter)
+                drifted.append(tenant_id)
+            elif any(getattr(counter, field) != value for field, value in values.items()):
+                drifted.append(tenant_id)
+            for field, value in values.items():
+                setattr(counter, field, value)
+            counter.reconciled_at = now
+
+        db.session.commit()
+        if drifted:
+            current_app.logger.warning(f"Reconciled drifted tenant counters: {drifted}")
+        return drifted
@@ -0,0 +1,421 @@
+"""Cached unread counters for notifications and message threads.
+
+Each user has two hashes: unread notifications by type and unread
+messages by thread, each with a ``_total`` field. Writers adjust them
+after committing (create, read, mark-all, delete, new message, thread
+read) and push the new counts to the user's Socket.IO room, so badges
+update without polling. Increments only apply to hashes that already
+exist; a missing hash is loaded from the database on first read, which
+keeps the cache correct after expiry or eviction. Each hash has a version
+that writers bump when they find it missing, and a load is only stored if
+the version is unchanged since before the database was read, so a write
+committed while a reader is counting is never lost. ``reconcile`` rebuilds
+cached hashes from the database to repair drift; the scheduler runs it
+every ``UNREAD_COUNTERS_RECONCILE_INTERVAL`` seconds
+(``unread-counters``), and ``flask reconcile-unread-counters`` on demand.
+
+The ``redis`` backend is shared by all workers. The ``memory`` backend
+is per process and only suitable for tests and single-process setups.
+"""
+
+import threading
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from app.extensions import db
+
+TOTAL = '_total'
+
+# KEYS[2] is the hash's version, bumped by writes that find the hash missing
+_INCR_IF_EXISTS = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('INCR', KEYS[2])
+    redis.call('EXPIRE', KEYS[2], ARGV[1])
+    return 0
+end
+for i = 2, #ARGV, 2 do
+    if redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1]) < 0 then
+        redis.call('HSET', KEYS[1], ARGV[i], 0)
+    end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+_CLEAR_IF_EXISTS = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('INCR', KEYS[2])
+    redis.call('EXPIRE', KEYS[2], ARGV[1])
+    return 0
+end
+if ARGV[2] == '' then
+    redis.call('DEL', KEYS[1])
+    redis.call('HSET', KEYS[1], '_total', 0)
+else
+    local value = tonumber(redis.call('HGET', KEYS[1], ARGV[2]) or '0')
+    redis.call('HSET', KEYS[1], ARGV[2], 0)
+    if redis.call('HINCRBY', KEYS[1], '_total', -value) < 0 then
+        redis.call('HSET', KEYS[1], '_total', 0)
+    end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+_LOAD_IF_MISSING = """
+if redis.call('EXISTS', KEYS[1]) == 1 then return 0 end
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[2] then return 0 end
+redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+def _version_key(key):
+    return f'{key}:v'
+
+
+class RedisBackend:
+    """Counter hashes in Redis, changed through Lua scripts."""
+
+    def __init__(self, url, ttl):
+        import redis
+
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.ttl = ttl
+        self._incr = self.client.register_script(_INCR_IF_EXISTS)
+        self._clear = self.client.register_script(_CLEAR_IF_EXISTS)
+        self._load = self.client.register_script(_LOAD_IF_MISSING)
+
+    def get(self, key):
+        values = self.client.hgetall(key)
+        return {field: int(value) for field, value in values.items()} if values else None
+
+    def version(self, key):
+        return self.client.get(_version_key(key)) or ''
+
+    def load(self, key, mapping, version):
+        args = [self.ttl, version]
+        for field, value in mapping.items():
+            args.extend((field, value))
+        self._load(keys=[key, _version_key(key)], args=args)
+
+    def replace(self, key, mapping):
+        pipe = self.client.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def incr(self, key, amounts):
+        args = [self.ttl]
+        for field, amount in amounts.items():
+            args.extend((field, amount))
+        self._incr(keys=[key, _version_key(key)], args=args)
+
+    def clear(self, key, field=None):
+        self._clear(keys=[key, _version_key(key)], args=[self.ttl, field or ''])
+
+    def keys(self, prefix):
+        return list(self.client.scan_iter(match=f'{prefix}*', count=500))
+
+
+class MemoryBackend:
+    """Counter hashes in a process-local dict with the same semantics."""
+
+    def __init__(self):
+        self._data = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            values = self._data.get(key)
+            return dict(values) if values is not None else None
+
+    def version(self, key):
+        with self._lock:
+            return self._versions.get(key, '')
+
+    def load(self, key, mapping, version):
+        with self._lock:
+            if key not in self._data and self._versions.get(key, '') == version:
+                self._data[key] = dict(mapping)
+
+    def replace(self, key, mapping):
+        with self._lock:
+            self._data[key] = dict(mapping)
+
+    def incr(self, key, amounts):
+        with self._lock:
+            values = self._data.get(key)
+            if values is None:
+                self._bump(key)
+                return
+            for field, amount in amounts.items():
+                values[field] = max(values.get(field, 0) + amount, 0)
+
+    def clear(self, key, field=None):
+        with self._lock:
+            values = self._data.get(key)
+            if values is None:
+                self._bump(key)
+                return
+            if field is None:
+                self._data[key] = {TOTAL: 0}
+            else:
+                values[TOTAL] = max(values.get(TOTAL, 0) - values.get(field, 0), 0)
+                values[field] = 0
+
+    def keys(self, prefix):
+        with self._lock:
+            return [key for key in self._data if key.startswith(prefix)]
+
+    def _bump(self, key):
+        self._versions[key] = str(int(self._versions.get(key) or 0) + 1)
+
+
+class UnreadCounters:
+    """Per-user unread counters with database fallback and realtime push."""
+
+    def __init__(self, app=None):
+        """Initialize the counters."""
+        self.backend = None
+        self.prefix = 'unread'
+        self.reconcile_interval = None
+        self._next_reconcile = None
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Initialize app configuration."""
+        self.prefix = app.config.get('UNREAD_COUNTERS_PREFIX', 'unread')
+        self.reconcile_interval = app.config.get('UNREAD_COUNTERS_RECONCILE_INTERVAL', 3600)
+        self._next_reconcile = None
+        self.backend = None
+        if not app.config.get('UNREAD_COUNTERS', True):
+            return
+
+        kind = app.config.get('UNREAD_COUNTERS_BACKEND', 'redis')
+        if kind == 'memory':
+            self.backend = MemoryBackend()
+            return
+        try:
+            self.backend = RedisBackend(
+                app.config.get('UNREAD_COUNTERS_URL') or app.config.get('REDIS_URL'),
+                app.config.get('UNREAD_COUNTERS_TTL', 7 * 24 * 3600)
+            )
+        except ImportError:
+            app.logger.warning('redis is not installed; unread counts are read from the database')
+
+    # Keys and database counts
+
+    def _key(self, kind, user_id):
+        return f'{self.prefix}:{kind}:{int(user_id)}'
+
+    @staticmethod
+    def _notification_counts_from_db(user_ids):
+        from app.models.notification import Notification
+
+        counts = {user_id: {TOTAL: 0} for user_id in user_ids}
+        rows = db.session.execute(
+            select(Notification.user_id, Notification.type, func.count())
+            .where(Notification.user_id.in_(user_ids), Notification.read.is_(False))
+            .group_by(Notification.user_id, Notification.type)
+        )
+        for user_id, type, count in rows:
+            counts[user_id][type or 'info'] = count
+            counts[user_id][TOTAL] += count
+        return counts
+
+    @staticmethod
+    def _thread_counts_from_db(user_ids):
+        from app.models.notification import Message, ReadReceipt, ThreadParticipant
+
+        counts = {user_id: {TOTAL: 0} for user_id in user_ids}
+        receipt = select(ReadReceipt.id).where(
+            ReadReceipt.message_id == Message.id,
+            ReadReceipt.user_id == ThreadParticipant.user_id
+        ).exists()
+        rows = db.session.execute(
+            select(ThreadParticipant.user_id, Message.thread_id, func.count())
+            .join(Message, Message.thread_id == ThreadParticipant.thread_id)
+            .where(
+                ThreadParticipant.user_id.in_(user_ids),
+                Message.sender_id != ThreadParticipant.user_id,
+                ~receipt
+            )
+            .group_by(ThreadParticipant.user_id, Message.thread_id)
+        )
+        for user_id, thread_id, count in rows:
+            counts[user_id][str(thread_id)] = count
+            counts[user_id][TOTAL] += count
+        return counts
+
+    def _read(self, kind, user_id):
+        """Cached hash for a user, loaded from the database on a miss."""
+        user_id = int(user_id)
+        loader = self._notification_counts_from_db if kind == 'n' else self._thread_counts_from_db
+        if self.backend is None:
+            return loader([user_id])[user_id]
+
+        key = self._key(kind, user_id)
+        try:
+            values = self.backend.get(key)
+            if values is not None:
+                return values
+            # Taken before counting, so a write committed meanwhile voids the load
+            version = self.backend.version(key)
+            values = loader([user_id])[user_id]
+            self.backend.load(key, values, version)
+            return values
+        except Exception as e:
+            current_app.logger.warning(f"Unread counters unavailable: {e}")
+            return loader([user_id])[user_id]
+
+    def _write(self, operation, *args):
+        if self.backend is None:
+            return False
+        try:
+            getattr(self.backend, operation)(*args)
+            return True
+        except Exception as e:
+            current_app.logger.warning(f"Unread counter update failed: {e}")
+            return False
+
+    # Reads
+
+    def notification_counts(self, user_id):
+        """
+        Unread notifications of a user.
+
+        Returns:
+            dict: {'total': int, 'by_type': {type: int}}
+        """
+        values = self._read('n', user_id)
+        return {
+            'total': values.get(TOTAL, 0),
+            'by_type': {field: value for field, value in values.items() if field != TOTAL and value}
+        }
+
+    def unread_notifications(self, user_id, type=None):
+        """Number of unread notifications, optionally of one type."""
+        values = self._read('n', user_id)
+        return values.get(type, 0) if type else values.get(TOTAL, 0)
+
+    def thread_counts(self, user_id):
+        """
+        Unread messages of a user.
+
+        Returns:
+            dict: {'total': int, 'threads': {thread_id: int}}
+        """
+        values = self._read('t', user_id)
+        return {
+            'total': values.get(TOTAL, 0),
+            'threads': {int(field): value for field, value in values.items() if field != TOTAL and value}
+        }
+
+    # Writes (call after the change is committed)
+
+    def notification_created(self, user_id, type):
+        """Count a new unread notification."""
+        self._write('incr', self._key('n', user_id), {type or 'info': 1, TOTAL: 1})
+        self.push(user_id)
+
+    def notification_read(self, user_id, type, count=1):
+        """Uncount notifications that were read or deleted while unread."""
+        self._write('incr', self._key('n', user_id), {type or 'info': -count, TOTAL: -count})
+        self.push(user_id)
+
+    def notifications_cleared(self, user_id, type=None):
+        """Zero a user's unread notifications, or those of one type."""
+        self._write('clear', self._key('n', user_id), type)
+        self.push(user_id)
+
+    def message_posted(self, thread_id, recipient_ids):
+        """Count a new message for every recipient."""
+        for user_id in recipient_ids:
+            self._write('incr', self._key('t', user_id), {str(thread_id): 1, TOTAL: 1})
+            self.push(user_id)
+
+    def thread_read(self, user_id, thread_id, count):
+        """Uncount messages of a thread the user has just read."""
+        if not count:
+            return
+        self._write('incr', self._key('t', user_id), {str(thread_id): -count, TOTAL: -count})
+        self.push(user_id)
+
+    def push(self, user_id):
+        """Send a user's current counts to their Socket.IO room."""
+        from app.realtime import emit_to_user, user_is_online
+
+        try:
+            if not user_is_online(user_id):
+                return
+            emit_to_user(user_id, 'unread_counts', {
+                'notifications': self.notification_counts(user_id),
+                'messages': self.thread_counts(user_id)
+            })
+        except Exception as e:
+            current_app.logger.warning(f"Unread counts not pushed: {e}")
+
+    # Reconciliation
+
+    def reconcile(self, user_ids=None, batch_size=500):
+        """
+        Rebuild cached counters from the database.
+
+        Args:
+            user_ids (list): Users to rebuild; all cached users when None
+            batch_size (int): Users counted per query
+
+        Returns:
+            list: Ids of users whose cached counts were wrong
+        """
+        if self.backend is None:
+            return []
+
+        if user_ids is None:
+            user_ids = set()
+            for kind in ('n', 't'):
+                prefix = f'{self.prefix}:{kind}:'
+                user_ids.update(int(key[len(prefix):]) for key in self.backend.keys(prefix)
+                                if key[len(prefix):].isdigit())
+        user_ids = sorted(int(user_id) for user_id in user_ids)
+
+        drifted = set()
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            for kind, counts in (('n', self._notification_counts_from_db(batch)),
+                                 ('t', self._thread_counts_from_db(batch))):
+                for user_id, values in counts.items():
+                    key = self._key(kind, user_id)
+                    cached = self.backend.get(key)
+                    if cached is not None and {f: v for f, v in cached.items() if v} != \
+                            {f: v for f, v in values.items() if v}:
+                        drifted.add(user_id)
+                    self.backend.replace(key, values)
+
+        if drifted:
+            current_app.logger.warning(f"Reconciled drifted unread counters for {len(drifted)} users")
+        return sorted(drifted)
+
+    def reconcile_due(self, now):
+        """
+        Reconcile all cached users once the reconcile interval has passed (scheduler entry point).
+
+        Returns:
+            list: Ids of users whose cached counts were wrong
+        """
+        if self.backend is None or not self.reconcile_interval:
+            return []
+        if self._next_reconcile is not None and now < self._next_reconcile:
+            return []
+        self._next_reconcile = now + timedelta(seconds=self.reconcile_interval)
+        return self.reconcile()
+
+
+unread_counters = UnreadCounters()
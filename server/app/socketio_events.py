@@ -6,8 +6,10 @@ from flask import request
 from app.extensions import socketio
 from app.models.user import User
 from app.models.notification import Notification, MessageThread, Message
+from app.services.unread_counters import unread_counters
 from app import db
 import json
+from datetime import datetime
 
 # Store connected users
 connected_users = {}
@@ -118,6 +120,10 @@ def handle_send_message(data):
         
         # Emit to thread participants
         thread = MessageThread.query.get(data['thread_id'])
+        unread_counters.message_posted(thread.id, [
+            participant.user_id for participant in thread.participants
+            if participant.user_id != int(sender_id)
+        ])
         for participant in thread.participants:
             if participant.user_id in connected_users:
                 emit('new_message', {
@@ -172,12 +178,19 @@ def handle_mark_read(data):
         
         # Mark notifications as read
         if 'notification_ids' in data:
-            Notification.query.filter(
+            unread = Notification.query.filter(
                 Notification.id.in_(data['notification_ids']),
-                Notification.recipient_id == user_id
-            ).update({'is_read': True})
+                Notification.user_id == user_id,
+                Notification.read.is_(False)
+            )
+            by_type = dict(unread.with_entities(Notification.type, db.func.count())
+                           .group_by(Notification.type).all())
+            unread.update({'read': True, 'read_at': datetime.utcnow()}, synchronize_session=False)
             db.session.commit()
             
+            for type, count in by_type.items():
+                unread_counters.notification_read(user_id, type, count)
+            
             emit('notifications_read', {
                 'notification_ids': data['notification_ids']
             })
@@ -1,5 +1,7 @@
 """Utilities package."""
 
+import importlib
+
 from app.utils.logger import configure_logger, get_logger
 from app.utils.cache import (
     cache_response, 
@@ -8,16 +10,29 @@ from app.utils.cache import (
     clear_model_cache,
     generate_cache_key
 )
-from app.utils.pdf_generator import (
-    PDFGenerator,
-    generate_evaluation_report,
-    generate_beneficiary_report
-)
-from app.utils.ai import (
-    configure_openai,
-    analyze_evaluation_responses,
-    generate_report_content
-)
+
+# PDF and AI helpers pull in reportlab and openai, which are expensive to
+# import and only needed by a handful of endpoints. They are resolved on
+# first attribute access instead of when the package is imported.
+_LAZY_EXPORTS = {
+    'PDFGenerator': 'app.utils.pdf_generator',
+    'generate_evaluation_report': 'app.utils.pdf_generator',
+    'generate_beneficiary_report': 'app.utils.pdf_generator',
+    'configure_openai': 'app.utils.ai',
+    'analyze_evaluation_responses': 'app.utils.ai',
+    'generate_report_content': 'app.utils.ai'
+}
+
+
+def __getattr__(name):
+    """Import heavy helpers on first use."""
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
 
 __all__ = [
     'configure_logger',
@@ -33,4 +48,4 @@ __all__ = [
     'configure_openai',
     'analyze_evaluation_responses',
     'generate_report_content'
-]
\ No newline at end of file
+]
@@ -0,0 +1,88 @@
+"""Helpers for bulk write endpoints.
+
+``keyed_entries`` validates a list payload keyed by an id field, and
+``upsert`` writes many rows in one ``INSERT ... ON CONFLICT DO UPDATE``
+on PostgreSQL and SQLite, falling back to the ORM in one flush elsewhere.
+"""
+
+from app.extensions import db
+
+
+def keyed_entries(entries, noun, key, limit):
+    """
+    Validate a bulk payload and yield its entries by id.
+
+    Args:
+        entries (list): Dicts sent by the client
+        noun (str): Entry name used in error messages
+        key (str): Field holding each entry's integer id
+        limit (int): Maximum number of entries
+
+    Yields:
+        tuple: (id, entry)
+
+    Raises:
+        ValueError: If the payload or an entry is malformed
+    """
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f'{noun}s must be a non-empty list')
+    if len(entries) > limit:
+        raise ValueError(f'At most {limit} {noun}s per request')
+
+    for entry in entries:
+        if not isinstance(entry, dict):
+            raise ValueError(f'Each {noun} must be an object')
+        try:
+            entry_id = int(entry.get(key))
+        except (TypeError, ValueError):
+            raise ValueError(f'Each {noun} needs a {key}')
+        yield entry_id, entry
+
+
+def _native_insert():
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def upsert(model, rows, keys, assignments, merge):
+    """
+    Insert rows, updating those whose ``keys`` already exist.
+
+    Args:
+        model: Mapped class
+        rows (list): Column dicts
+        keys (tuple): Columns of the unique constraint rows conflict on
+        assignments (callable): ``(table, excluded)`` -> ``SET`` clauses of the
+            native upsert
+        merge (callable): ``(record, row)`` applying a row to an existing
+            record when the database has no native upsert
+    """
+    insert = _native_insert()
+    if insert is None:
+        # No native upsert: fall back to the ORM, still in one flush
+        query = model.query
+        for key in keys:
+            query = query.filter(getattr(model, key).in_({row[key] for row in rows}))
+        existing = {tuple(getattr(record, key) for key in keys): record for record in query}
+        for row in rows:
+            record = existing.get(tuple(row[key] for key in keys))
+            if record is None:
+                db.session.add(model(**row))
+            else:
+                merge(record, row)
+        db.session.flush()
+        return
+
+    table = model.__table__
+    statement = insert(table).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c[key] for key in keys],
+        set_=assignments(table, statement.excluded)
+    )
+    db.session.execute(statement)
@@ -0,0 +1,131 @@
+"""Local SMTP sink for development and tests.
+
+Speaks just enough SMTP for ``smtplib`` (EHLO/HELO, MAIL, RCPT, DATA,
+RSET, NOOP, QUIT), keeps every message in memory and never relays
+anything. Point MAIL_SERVER/MAIL_PORT at it with MAIL_USE_TLS disabled.
+"""
+
+import socketserver
+import threading
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Handle one SMTP client connection."""
+
+    def reply(self, line):
+        """Send one response line."""
+        self.wfile.write(f"{line}\r\n".encode('ascii'))
+
+    def handle(self):
+        """Run the SMTP conversation."""
+        server = self.server.debug_server
+        server._connection_opened()
+        self.reply('220 bdc-debug-smtp ready')
+        mail_from, rcpt_tos = None, []
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+
+            if verb == 'EHLO':
+                self.wfile.write(b'250-bdc-debug-smtp\r\n250 8BITMIME\r\n')
+            elif verb == 'HELO':
+                self.reply('250 bdc-debug-smtp')
+            elif verb == 'MAIL':
+                mail_from, rcpt_tos = command.split(':', 1)[1].strip(), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                address = command.split(':', 1)[1].strip()
+                if server.reject_domains and address.strip('<>').rsplit('@', 1)[-1] in server.reject_domains:
+                    self.reply('550 Mailbox unavailable')
+                    continue
+                rcpt_tos.append(address)
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for raw in self.rfile:
+                    if raw in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(raw[1:] if raw.startswith(b'..') else raw)
+                server._message_received(mail_from, rcpt_tos, b''.join(data))
+                mail_from, rcpt_tos = None, []
+                self.reply('250 OK: queued')
+            elif verb == 'RSET':
+                mail_from, rcpt_tos = None, []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class DebugSMTPServer:
+    """In-memory SMTP server.
+
+    Example:
+        with DebugSMTPServer() as smtp:
+            app.config.update(MAIL_SERVER=smtp.host, MAIL_PORT=smtp.port)
+            ...
+            assert len(smtp.messages) == 1
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, reject_domains=None):
+        """Initialize the server; port 0 picks a free port."""
+        self.host = host
+        self.port = port
+        self.reject_domains = set(reject_domains or [])
+        self.messages = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """Start serving in a background thread."""
+        self._server = _ThreadingServer((self.host, self.port), _SMTPHandler)
+        self._server.debug_server = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        """Start the server for a ``with`` block."""
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        """Stop the server at the end of a ``with`` block."""
+        self.stop()
+
+    def _connection_opened(self):
+        """Count client connections (one per SMTP handshake)."""
+        with self._lock:
+            self.connections += 1
+
+    def _message_received(self, mail_from, rcpt_tos, data):
+        """Store a delivered message."""
+        with self._lock:
+            self.messages.append({
+                'mail_from': mail_from,
+                'rcpt_tos': rcpt_tos,
+                'data': data
+            })
@@ -0,0 +1,65 @@
+"""Eager-loading profiles for serialization-heavy endpoints.
+
+A profile lists the relationship paths an endpoint's serializer touches so
+they are loaded with the page instead of one lazy query per row. Scalar
+relationships are joined into the main query; collections are fetched
+with one ``SELECT ... IN`` per path.
+"""
+
+from sqlalchemy.orm import joinedload, selectinload
+
+
+# Profile name -> (model name, relationship paths)
+LOADING_PROFILES = {
+    'appointment_list': ('Appointment', ('beneficiary.user', 'trainer')),
+    'beneficiary_list': ('Beneficiary', ('user', 'trainer', 'tenant')),
+    'document_list': ('Document', ('uploader',)),
+    'notification_list': ('Notification', ('sender',)),
+}
+
+
+def _model_class(name):
+    """Look up a mapped model class by name."""
+    from app.extensions import db
+
+    for mapper in db.Model.registry.mappers:
+        if mapper.class_.__name__ == name:
+            return mapper.class_
+    raise ValueError(f"Unknown model {name}")
+
+
+def _path_option(model, path):
+    """Build the loader option for a dotted relationship path."""
+    option = None
+    for name in path.split('.'):
+        relationship = model.__mapper__.relationships.get(name)
+        if relationship is None:
+            raise ValueError(f"{model.__name__} has no relationship {name}")
+        if relationship.lazy == 'dynamic':
+            raise ValueError(f"{model.__name__}.{name} is dynamic and cannot be eager loaded")
+
+        loader = selectinload if relationship.uselist else joinedload
+        attribute = getattr(model, name)
+        option = loader(attribute) if option is None else getattr(option, loader.__name__)(attribute)
+        model = relationship.mapper.class_
+    return option
+
+
+def loading_options(profile):
+    """
+    Build the loader options for a named profile.
+
+    Args:
+        profile (str): Key in ``LOADING_PROFILES``
+
+    Returns:
+        list: Options to pass to ``Query.options``
+    """
+    model_name, paths = LOADING_PROFILES[profile]
+    model = _model_class(model_name)
+    return [_path_option(model, path) for path in paths]
+
+
+def with_profile(query, profile):
+    """Apply a named loading profile to a query."""
+    return query.options(*loading_options(profile))
@@ -2,9 +2,7 @@
 Notification utilities for BDC application
 """
 import logging
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from datetime import datetime
 from typing import Optional, List, Dict, Any
 from flask import current_app
 import requests
@@ -16,53 +14,36 @@ def send_email(to: str, subject: str, body: str,
                html_body: Optional[str] = None,
                from_email: Optional[str] = None,
                attachments: Optional[List[Dict[str, Any]]] = None):
-    """Send email notification"""
+    """Queue email notification in the mail outbox"""
+    from app.extensions import db
+    from app.services.mail_outbox import mail_outbox
+    
     try:
-        # Get email configuration
-        smtp_host = current_app.config.get('SMTP_HOST', 'localhost')
-        smtp_port = current_app.config.get('SMTP_PORT', 587)
-        smtp_user = current_app.config.get('SMTP_USER')
-        smtp_password = current_app.config.get('SMTP_PASSWORD')
-        smtp_use_tls = current_app.config.get('SMTP_USE_TLS', True)
-        
         from_email = from_email or current_app.config.get('MAIL_FROM', 'noreply@bdc.com')
         
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = from_email
-        msg['To'] = to
-        
-        # Add text part
-        text_part = MIMEText(body, 'plain')
-        msg.attach(text_part)
-        
-        # Add HTML part if provided
-        if html_body:
-            html_part = MIMEText(html_body, 'html')
-            msg.attach(html_part)
-        
-        # Add attachments if provided
-        if attachments:
-            for attachment in attachments:
-                # TODO: Implement attachment handling
-                pass
+        with db.session.begin_nested():
+            mail_outbox.enqueue(
+                subject=subject,
+                recipients=[to],
+                text_body=body,
+                html_body=html_body,
+                sender=from_email,
+                attachments=[
+                    (
+                        attachment['filename'],
+                        attachment.get('content_type', 'application/octet-stream'),
+                        attachment['data']
+                    )
+                    for attachment in attachments or []
+                ],
+                commit=False
+            )
         
-        # Send email
-        with smtplib.SMTP(smtp_host, smtp_port) as server:
-            if smtp_use_tls:
-                server.starttls()
-            
-            if smtp_user and smtp_password:
-                server.login(smtp_user, smtp_password)
-            
-            server.send_message(msg)
-            
-        logger.info(f"Email sent successfully to {to}")
+        logger.info(f"Email queued for {to}")
         return True
         
     except Exception as e:
-        logger.error(f"Failed to send email to {to}: {str(e)}")
+        logger.error(f"Failed to queue email to {to}: {str(e)}")
         return False
 
 
@@ -1,15 +1,66 @@
-"""PDF Generator utility using ReportLab."""
+"""PDF Generator utility using ReportLab.
+
+Documents are rendered from plain data (``evaluation_report_data`` and
+``beneficiary_report_data`` collect it from the models), so rendering can
+run in another process and be cached by its input. The stylesheet and font
+metrics are prepared once per process and shared by every document.
+"""
 
 import os
 import datetime
 from io import BytesIO
+from xml.sax.saxutils import escape
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
+from reportlab.pdfbase import pdfmetrics
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.pdfgen import canvas
-from flask import current_app
+
+# Bump when the layout changes so cached PDFs are rendered again
+TEMPLATE_VERSION = 1
+
+FONTS = ('Helvetica', 'Helvetica-Bold', 'Helvetica-Oblique')
+
+_styles = None
+
+
+def _build_styles():
+    """Sample stylesheet with the document's heading and body sizes."""
+    styles = getSampleStyleSheet()
+    custom = {
+        'Heading1': {'fontSize': 16, 'spaceAfter': 12},
+        'Heading2': {'fontSize': 14, 'spaceAfter': 10, 'spaceBefore': 10},
+        'Heading3': {'fontSize': 12, 'spaceAfter': 8, 'spaceBefore': 8},
+        'Normal': {'fontSize': 10, 'spaceAfter': 6},
+        'Italic': {'fontSize': 10, 'spaceAfter': 6},
+    }
+    for name, attributes in custom.items():
+        # The sample sheet already defines these names, so replace rather than add
+        styles.byName[name] = ParagraphStyle(name=name, parent=styles[name], **attributes)
+    styles.add(ParagraphStyle(
+        name='Bold',
+        parent=styles['Normal'],
+        fontSize=10,
+        fontName='Helvetica-Bold',
+        spaceAfter=6
+    ))
+    return styles
+
+
+def get_styles():
+    """Paragraph styles, built once per process."""
+    global _styles
+    if _styles is None:
+        _styles = _build_styles()
+    return _styles
+
+
+def prepare():
+    """Build the stylesheet and load font metrics (run once per render worker)."""
+    get_styles()
+    for font in FONTS:
+        pdfmetrics.getFont(font)
 
 
 class PDFGenerator:
@@ -30,51 +81,8 @@ class PDFGenerator:
             title=title,
             author=author
         )
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
+        self.styles = get_styles()
         self.elements = []
-        
-    def _setup_custom_styles(self):
-        """Set up custom paragraph styles."""
-        self.styles.add(ParagraphStyle(
-            name='Heading1',
-            parent=self.styles['Heading1'],
-            fontSize=16,
-            spaceAfter=12
-        ))
-        self.styles.add(ParagraphStyle(
-            name='Heading2',
-            parent=self.styles['Heading2'],
-            fontSize=14,
-            spaceAfter=10,
-            spaceBefore=10
-        ))
-        self.styles.add(ParagraphStyle(
-            name='Heading3',
-            parent=self.styles['Heading3'],
-            fontSize=12,
-            spaceAfter=8,
-            spaceBefore=8
-        ))
-        self.styles.add(ParagraphStyle(
-            name='Normal',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            spaceAfter=6
-        ))
-        self.styles.add(ParagraphStyle(
-            name='Italic',
-            parent=self.styles['Italic'],
-            fontSize=10,
-            spaceAfter=6
-        ))
-        self.styles.add(ParagraphStyle(
-            name='Bold',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            fontName='Helvetica-Bold',
-            spaceAfter=6
-        ))
     
     def add_title(self, text):
         """Add title to the document."""
@@ -167,125 +175,205 @@ class PDFGenerator:
         return pdf_content
 
 
-def generate_evaluation_report(evaluation, user, beneficiary):
-    """Generate a report PDF for an evaluation."""
-    pdf = PDFGenerator(f"Evaluation Report - {beneficiary.first_name} {beneficiary.last_name}")
+def _date(value):
+    return value.strftime('%Y-%m-%d') if value else None
+
+
+def _text(value):
+    """Escape user text for a Paragraph (which parses markup)."""
+    return escape(str(value)) if value is not None else ''
+
+
+def _responses(responses):
+    """Normalize stored evaluation responses to question/answer/score dicts."""
+    if isinstance(responses, dict):
+        return [{'question': str(question), 'answer': answer, 'score': None}
+                for question, answer in responses.items()]
+    items = []
+    for response in responses or []:
+        if isinstance(response, dict):
+            items.append({
+                'question': response.get('question') or response.get('question_text')
+                or response.get('question_id'),
+                'answer': response.get('answer') if 'answer' in response else response.get('response'),
+                'score': response.get('score'),
+            })
+        else:
+            items.append({'question': None, 'answer': response, 'score': None})
+    return items
+
+
+def _person(user):
+    return {'name': f"{user.first_name} {user.last_name}", 'email': user.email} if user else None
+
+
+def evaluation_report_data(evaluation, user, beneficiary):
+    """Collect the data an evaluation report is rendered from."""
+    return {
+        'beneficiary': {
+            'name': f"{beneficiary.first_name} {beneficiary.last_name}",
+            'email': beneficiary.user.email if beneficiary.user else None,
+            'status': beneficiary.status,
+        },
+        'evaluation': {
+            'title': evaluation.test.title if evaluation.test else f"Evaluation {evaluation.id}",
+            'date': _date(evaluation.completed_at or evaluation.created_at),
+            'status': evaluation.status,
+            'score': evaluation.score,
+            'responses': _responses(evaluation.responses),
+            'feedback': evaluation.feedback,
+            'strengths': evaluation.strengths,
+            'weaknesses': evaluation.weaknesses,
+            'recommendations': evaluation.recommendations,
+        },
+        'generated_by': _person(user)['name'],
+    }
+
+
+def beneficiary_report_data(beneficiary, evaluations, user):
+    """Collect the data a beneficiary progress report is rendered from."""
+    return {
+        'beneficiary': {
+            'name': f"{beneficiary.first_name} {beneficiary.last_name}",
+            'email': beneficiary.user.email if beneficiary.user else None,
+            'status': beneficiary.status,
+        },
+        'trainer': _person(beneficiary.trainer),
+        'evaluations': [
+            {
+                'title': evaluation.test.title if evaluation.test else f"Evaluation {evaluation.id}",
+                'date': _date(evaluation.completed_at or evaluation.created_at),
+                'status': evaluation.status,
+                'score': evaluation.score,
+            }
+            for evaluation in evaluations
+        ],
+        'generated_by': _person(user)['name'],
+    }
+
+
+def _add_beneficiary(pdf, beneficiary):
+    pdf.add_subtitle("Beneficiary Information")
+    pdf.add_paragraph(f"<b>Name:</b> {_text(beneficiary['name'])}")
+    pdf.add_paragraph(f"<b>Email:</b> {_text(beneficiary['email'])}")
+    pdf.add_paragraph(f"<b>Status:</b> {_text(beneficiary['status'])}")
+    pdf.add_spacer()
+
+
+def _add_signature(pdf, generated_by):
+    pdf.add_spacer()
+    pdf.add_paragraph(f"Report generated by: {_text(generated_by)}")
+    pdf.add_paragraph(f"Date: {datetime.datetime.now().strftime('%Y-%m-%d')}")
+
+
+def render_evaluation_report(data):
+    """Render an evaluation report from ``evaluation_report_data``."""
+    beneficiary, evaluation = data['beneficiary'], data['evaluation']
+    pdf = PDFGenerator(f"Evaluation Report - {beneficiary['name']}")
     
     # Add title
-    pdf.add_title(f"Evaluation Report")
+    pdf.add_title("Evaluation Report")
     
     # Add beneficiary information
-    pdf.add_subtitle("Beneficiary Information")
-    pdf.add_paragraph(f"<b>Name:</b> {beneficiary.first_name} {beneficiary.last_name}")
-    pdf.add_paragraph(f"<b>Email:</b> {beneficiary.email}")
-    pdf.add_paragraph(f"<b>Status:</b> {beneficiary.status}")
-    pdf.add_spacer()
+    _add_beneficiary(pdf, beneficiary)
     
     # Add evaluation details
     pdf.add_subtitle("Evaluation Details")
-    pdf.add_paragraph(f"<b>Title:</b> {evaluation.title}")
-    pdf.add_paragraph(f"<b>Date:</b> {evaluation.date_created.strftime('%Y-%m-%d')}")
-    pdf.add_paragraph(f"<b>Status:</b> {evaluation.status}")
-    if evaluation.score:
-        pdf.add_paragraph(f"<b>Score:</b> {evaluation.score}%")
+    pdf.add_paragraph(f"<b>Title:</b> {_text(evaluation['title'])}")
+    if evaluation['date']:
+        pdf.add_paragraph(f"<b>Date:</b> {evaluation['date']}")
+    pdf.add_paragraph(f"<b>Status:</b> {_text(evaluation['status'])}")
+    if evaluation['score']:
+        pdf.add_paragraph(f"<b>Score:</b> {evaluation['score']}%")
     pdf.add_spacer()
     
-    # Add question and answers
-    pdf.add_subtitle("Responses")
-    
     # Display each question and answer
-    for i, question in enumerate(evaluation.questions):
-        pdf.add_heading(f"Question {i+1}: {question.text}")
-        if hasattr(question, 'answer') and question.answer:
-            pdf.add_paragraph(f"<b>Answer:</b> {question.answer.text}")
-            if hasattr(question.answer, 'score') and question.answer.score is not None:
-                pdf.add_paragraph(f"<b>Score:</b> {question.answer.score}")
+    pdf.add_subtitle("Responses")
+    for i, response in enumerate(evaluation['responses']):
+        question = f": {_text(response['question'])}" if response['question'] else ''
+        pdf.add_heading(f"Question {i+1}{question}")
+        if response['answer'] not in (None, ''):
+            pdf.add_paragraph(f"<b>Answer:</b> {_text(response['answer'])}")
+            if response['score'] is not None:
+                pdf.add_paragraph(f"<b>Score:</b> {response['score']}")
         else:
             pdf.add_italic_text("No answer provided")
         pdf.add_spacer()
+    if not evaluation['responses']:
+        pdf.add_italic_text("No responses recorded")
     
-    # Add summary and recommendations if available
-    if hasattr(evaluation, 'summary') and evaluation.summary:
-        pdf.add_subtitle("Summary")
-        pdf.add_paragraph(evaluation.summary)
-        pdf.add_spacer()
-    
-    if hasattr(evaluation, 'recommendations') and evaluation.recommendations:
-        pdf.add_subtitle("Recommendations")
-        pdf.add_paragraph(evaluation.recommendations)
+    # Add feedback and recommendations if available
+    for key, title in (('feedback', 'Feedback'), ('strengths', 'Strengths'),
+                       ('weaknesses', 'Areas for Improvement'), ('recommendations', 'Recommendations')):
+        if evaluation.get(key):
+            pdf.add_subtitle(title)
+            pdf.add_paragraph(_text(evaluation[key]))
     
-    # Add signature
-    pdf.add_spacer()
-    pdf.add_paragraph(f"Report generated by: {user.first_name} {user.last_name}")
-    pdf.add_paragraph(f"Date: {datetime.datetime.now().strftime('%Y-%m-%d')}")
+    _add_signature(pdf, data['generated_by'])
     
     # Build the PDF
     return pdf.build()
 
 
-def generate_beneficiary_report(beneficiary, evaluations, user):
-    """Generate a comprehensive report for a beneficiary."""
-    pdf = PDFGenerator(f"Beneficiary Report - {beneficiary.first_name} {beneficiary.last_name}")
+def render_beneficiary_report(data):
+    """Render a beneficiary progress report from ``beneficiary_report_data``."""
+    beneficiary = data['beneficiary']
+    pdf = PDFGenerator(f"Beneficiary Report - {beneficiary['name']}")
     
     # Add title
-    pdf.add_title(f"Beneficiary Progress Report")
+    pdf.add_title("Beneficiary Progress Report")
     
     # Add beneficiary information
-    pdf.add_subtitle("Beneficiary Information")
-    pdf.add_paragraph(f"<b>Name:</b> {beneficiary.first_name} {beneficiary.last_name}")
-    pdf.add_paragraph(f"<b>Email:</b> {beneficiary.email}")
-    pdf.add_paragraph(f"<b>Status:</b> {beneficiary.status}")
-    pdf.add_spacer()
+    _add_beneficiary(pdf, beneficiary)
     
     # Add trainer information if available
-    if hasattr(beneficiary, 'trainer') and beneficiary.trainer:
+    if data.get('trainer'):
         pdf.add_subtitle("Trainer Information")
-        pdf.add_paragraph(f"<b>Name:</b> {beneficiary.trainer.first_name} {beneficiary.trainer.last_name}")
-        pdf.add_paragraph(f"<b>Email:</b> {beneficiary.trainer.email}")
+        pdf.add_paragraph(f"<b>Name:</b> {_text(data['trainer']['name'])}")
+        pdf.add_paragraph(f"<b>Email:</b> {_text(data['trainer']['email'])}")
         pdf.add_spacer()
     
     # Add evaluations summary
     pdf.add_subtitle("Evaluations Summary")
     
+    evaluations = data['evaluations']
     if evaluations:
         # Create table data
-        data = [['Title', 'Date', 'Status', 'Score']]
-        for eval in evaluations:
-            data.append([
-                eval.title,
-                eval.date_created.strftime('%Y-%m-%d'),
-                eval.status,
-                f"{eval.score}%" if eval.score else "N/A"
+        table = [['Title', 'Date', 'Status', 'Score']]
+        for evaluation in evaluations:
+            table.append([
+                evaluation['title'],
+                evaluation['date'] or '',
+                evaluation['status'],
+                f"{evaluation['score']}%" if evaluation['score'] else "N/A"
             ])
-        pdf.add_table(data)
+        pdf.add_table(table)
         
         # Add overall progress
-        completed_evals = [e for e in evaluations if e.status == 'completed']
-        if completed_evals:
-            avg_score = sum(e.score for e in completed_evals if e.score) / len(completed_evals)
-            pdf.add_paragraph(f"<b>Overall Progress:</b> {len(completed_evals)}/{len(evaluations)} evaluations completed")
+        completed = [e for e in evaluations if e['status'] == 'completed']
+        if completed:
+            avg_score = sum(e['score'] for e in completed if e['score']) / len(completed)
+            pdf.add_paragraph(f"<b>Overall Progress:</b> {len(completed)}/{len(evaluations)} evaluations completed")
             pdf.add_paragraph(f"<b>Average Score:</b> {avg_score:.1f}%")
     else:
         pdf.add_paragraph("No evaluations available.")
     
-    # Add summary and recommendations if available
-    if hasattr(beneficiary, 'summary') and beneficiary.summary:
-        pdf.add_subtitle("Summary")
-        pdf.add_paragraph(beneficiary.summary)
-    
-    if hasattr(beneficiary, 'recommendations') and beneficiary.recommendations:
-        pdf.add_subtitle("Recommendations")
-        pdf.add_paragraph(beneficiary.recommendations)
-    
-    # Add signature
-    pdf.add_spacer()
-    pdf.add_paragraph(f"Report generated by: {user.first_name} {user.last_name}")
-    pdf.add_paragraph(f"Date: {datetime.datetime.now().strftime('%Y-%m-%d')}")
+    _add_signature(pdf, data['generated_by'])
     
     # Build the PDF
     return pdf.build()
 
 
+def generate_evaluation_report(evaluation, user, beneficiary):
+    """Generate a report PDF for an evaluation."""
+    return render_evaluation_report(evaluation_report_data(evaluation, user, beneficiary))
+
+
+def generate_beneficiary_report(beneficiary, evaluations, user):
+    """Generate a comprehensive report for a beneficiary."""
+    return render_beneficiary_report(beneficiary_report_data(beneficiary, evaluations, user))
+
+
 def generate_report_pdf(template_data):
     """Generate a report PDF from template data."""
     pdf = PDFGenerator(template_data.get('title', 'Report'))
@@ -348,4 +436,16 @@ def generate_report_pdf(template_data):
     pdf.add_paragraph(f"<i>Total Records: {len(data)}</i>")
     
     # Build the PDF
-    return pdf.build()
\ No newline at end of file
+    return pdf.build()
+
+
+RENDERERS = {
+    'evaluation': render_evaluation_report,
+    'beneficiary': render_beneficiary_report,
+    'report': generate_report_pdf,
+}
+
+
+def render(kind, data):
+    """Render a document of a kind from its data."""
+    return RENDERERS[kind](data)
@@ -0,0 +1,107 @@
+"""Role and tenant scoping for list queries.
+
+``scope_for(user, Model)`` restricts a query to the rows a user may see,
+expressed as SQL (subqueries on indexed columns) rather than Python lists
+of ids, so the database does the work however many beneficiaries a
+trainer has:
+
+* super admins see everything
+* tenant admins see rows belonging to their tenants, including documents
+  not attached to a beneficiary that were uploaded by their tenants' users
+* trainers see their assigned beneficiaries and rows attached to them
+* students see their own beneficiary record and rows attached to it
+"""
+
+from sqlalchemy import false, or_, select
+
+
+def tenant_ids_for(user):
+    """Subquery of the tenant ids a user belongs to."""
+    from app.models.user import user_tenant
+
+    return select(user_tenant.c.tenant_id).where(user_tenant.c.user_id == user.id)
+
+
+def tenant_condition(user, column):
+    """Condition matching ``column`` against the user's tenants."""
+    conditions = [column.in_(tenant_ids_for(user))]
+    if user.tenant_id:
+        conditions.append(column == user.tenant_id)
+    return or_(*conditions)
+
+
+def tenant_user_ids(user):
+    """Subquery of the ids of users whose primary tenant is one of the user's tenants."""
+    from app.models.user import User
+
+    return select(User.id).where(tenant_condition(user, User.tenant_id))
+
+
+def beneficiary_condition(user):
+    """Condition selecting the beneficiaries a user may see, or None for all."""
+    from app.models.beneficiary import Beneficiary
+
+    if user.role == 'super_admin':
+        return None
+    if user.role == 'tenant_admin':
+        return tenant_condition(user, Beneficiary.tenant_id)
+    if user.role == 'trainer':
+        return Beneficiary.trainer_id == user.id
+    if user.role == 'student':
+        return Beneficiary.user_id == user.id
+    return false()
+
+
+def visible_beneficiary_ids(user):
+    """Subquery of beneficiary ids visible to a user, or None for all."""
+    from app.models.beneficiary import Beneficiary
+
+    condition = beneficiary_condition(user)
+    if condition is None:
+        return None
+    return select(Beneficiary.id).where(condition)
+
+
+def scope_for(user, model, query=None):
+    """
+    Restrict a query to the rows of ``model`` that ``user`` may see.
+
+    Args:
+        user (User): The current user
+        model: A model class with a beneficiary_id or tenant_id column,
+            or Beneficiary itself
+        query: Query to restrict; defaults to ``model.query``
+
+    Returns:
+        Query: The scoped query
+
+    Raises:
+        ValueError: If no scoping rule applies to the model
+    """
+    from app.models.beneficiary import Beneficiary
+
+    if query is None:
+        query = model.query
+
+    if user.role == 'super_admin':
+        return query
+
+    if model is Beneficiary:
+        return query.filter(beneficiary_condition(user))
+
+    # Rows owned by a trainer (e.g. appointments) are scoped to that trainer
+    if user.role == 'trainer' and hasattr(model, 'trainer_id'):
+        return query.filter(model.trainer_id == user.id)
+
+    if hasattr(model, 'beneficiary_id'):
+        condition = model.beneficiary_id.in_(visible_beneficiary_ids(user))
+        if user.role == 'tenant_admin' and hasattr(model, 'upload_by'):
+            # Unattached uploads belong to the uploader's tenant
+            condition = or_(condition, model.beneficiary_id.is_(None)
+                            & model.upload_by.in_(tenant_user_ids(user)))
+        return query.filter(condition)
+
+    if hasattr(model, 'tenant_id'):
+        return query.filter(tenant_condition(user, model.tenant_id))
+
+    raise ValueError(f"No scoping rule for {model.__name__}")
@@ -0,0 +1,186 @@
+"""Fast serialization for list endpoints.
+
+A ``Projection`` compiles a model's output fields once: column values are
+read with a single ``attrgetter`` and computed fields are plain callables.
+Projections made only of columns serialize straight from ``Row`` tuples of
+a column query, skipping ORM instances altogether. Responses are encoded
+with orjson when it is installed.
+"""
+
+import operator
+from datetime import date, datetime, time
+
+from flask import abort, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy.engine import Row
+
+try:
+    import orjson
+except ImportError:  # Falls back to the stdlib encoder
+    orjson = None
+
+
+class Projection:
+    """Compiled field projection for a model."""
+
+    def __init__(self, model, fields=None, exclude=(), computed=None, profile=None):
+        """
+        Args:
+            model: Mapped model class
+            fields (tuple): Column attributes to include; defaults to all
+            exclude (tuple): Column attributes to leave out
+            computed (dict): Output name -> callable taking the instance
+            profile (str): Loading profile for the computed fields
+        """
+        self.model = model
+        self._fields = tuple(fields) if fields is not None else None
+        self._exclude = set(exclude)
+        self.computed = dict(computed or {})
+        self.profile = profile
+        self._subsets = {}
+        self._compiled = False
+
+    def _compile(self):
+        """Resolve columns on first use, once all mappers are configured."""
+        if self._compiled:
+            return
+        if self._fields is None:
+            self._fields = tuple(
+                prop.key for prop in self.model.__mapper__.column_attrs
+                if prop.key not in self._exclude
+            )
+        self.columns = [getattr(self.model, name) for name in self._fields]
+        if len(self._fields) > 1:
+            self._getter = operator.attrgetter(*self._fields)
+        elif self._fields:
+            getter = operator.attrgetter(self._fields[0])
+            self._getter = lambda obj: (getter(obj),)
+        else:
+            self._getter = lambda obj: ()
+        self._compiled = True
+
+    @property
+    def fields(self):
+        """Column fields in output order."""
+        self._compile()
+        return self._fields
+
+    @property
+    def names(self):
+        """All output names, columns first."""
+        return self.fields + tuple(self.computed)
+
+    @property
+    def row_compatible(self):
+        """Whether the projection can be served from a column query."""
+        return not self.computed
+
+    def only(self, names):
+        """
+        Return the projection restricted to ``names``.
+
+        Raises:
+            ValueError: If a name is not part of the projection
+        """
+        key = frozenset(names)
+        if key not in self._subsets:
+            unknown = key - set(self.names)
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+            subset = Projection(
+                self.model,
+                fields=[name for name in self.fields if name in key],
+                computed={name: f for name, f in self.computed.items() if name in key},
+                profile=self.profile
+            )
+            self._subsets[key] = subset
+        return self._subsets[key]
+
+    def apply(self, query):
+        """Select only the projected columns, or eager load computed fields."""
+        self._compile()
+        if self.row_compatible:
+            return query.with_entities(*self.columns)
+        if self.profile:
+            from app.utils.loading import with_profile
+            return with_profile(query, self.profile)
+        return query
+
+    def dump(self, obj):
+        """Serialize one instance or row."""
+        self._compile()
+        if isinstance(obj, Row):
+            return dict(zip(self._fields, obj))
+        data = dict(zip(self._fields, self._getter(obj)))
+        for name, func in self.computed.items():
+            data[name] = func(obj)
+        return data
+
+    def dump_many(self, items):
+        """Serialize a list of instances or rows."""
+        self._compile()
+        if items and isinstance(items[0], Row):
+            fields = self._fields
+            return [dict(zip(fields, row)) for row in items]
+        return [self.dump(obj) for obj in items]
+
+
+def sparse(projection, param='fields'):
+    """
+    Narrow a projection to the fields named in the query string.
+
+    ``?fields=id,title`` returns only those keys; without the parameter the
+    full projection is used. Unknown fields abort with 400.
+    """
+    value = request.args.get(param)
+    if not value:
+        return projection
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    if not names:
+        return projection
+    try:
+        return projection.only(names)
+    except ValueError as e:
+        abort(400, description=str(e))
+
+
+class JSONProvider(DefaultJSONProvider):
+    """JSON provider encoding with orjson when it is installed."""
+
+    @staticmethod
+    def default(o):
+        """Encode values the encoders do not handle natively."""
+        if isinstance(o, (datetime, date, time)):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+    def _options(self, sort_keys, indent):
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        """Serialize data as JSON."""
+        if orjson is None or set(kwargs) - {'sort_keys', 'indent'}:
+            return super().dumps(obj, **kwargs)
+        option = self._options(kwargs.get('sort_keys', self.sort_keys), kwargs.get('indent'))
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        """Deserialize data as JSON."""
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        """Serialize the arguments as JSON and wrap them in a response."""
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        body = orjson.dumps(obj, default=self.default,
+                            option=self._options(self.sort_keys, indent) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -17,6 +17,10 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False  # Set to True to see SQL queries
 
+    # Startup: create tables and seed default users in create_app.
+    # Prefer `flask init-db` / `flask seed-db`; this is for local development.
+    AUTO_INIT_DB = os.getenv('AUTO_INIT_DB', 'False').lower() == 'true'
+
     # Redis
     REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 
@@ -56,6 +60,17 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'doc', 'docx', 'xls', 'xlsx'}
 
+    # Image variants (thumbnails, previews) are rendered in a process pool
+    IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+    IMAGE_PROCESSING_SYNC = False
+
+    # PDF documents are rendered in a process pool and cached by their input data
+    PDF_WORKERS = int(os.getenv('PDF_WORKERS', 2))
+    PDF_RENDER_SYNC = False
+    PDF_RENDER_TIMEOUT = 120  # seconds a request waits for one document
+    PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR')  # defaults to UPLOAD_FOLDER/pdf_cache
+    PDF_BULK_BATCH_SIZE = 100  # beneficiaries loaded per query in bulk ZIP downloads
+
     # OpenAI API
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
     OPENAI_ORGANIZATION = os.getenv('OPENAI_ORGANIZATION', '')
@@ -68,6 +83,71 @@ class Config:
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD', '')
     MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', 'noreply@bdc.com')
 
+    # Mail outbox: queued emails are delivered by pooled SMTP workers
+    MAIL_OUTBOX_WORKERS = int(os.getenv('MAIL_OUTBOX_WORKERS', 4))
+    MAIL_OUTBOX_BATCH_SIZE = 50
+    MAIL_OUTBOX_MAX_ATTEMPTS = 5
+    MAIL_OUTBOX_RETRY_BACKOFF = 60  # seconds, doubled per attempt
+    MAIL_DOMAIN_RATE_LIMIT = int(os.getenv('MAIL_DOMAIN_RATE_LIMIT', 60))  # per minute
+
+    # Query guard: flag requests executing more SQL statements than their budget
+    SQL_QUERY_GUARD = False
+    SQL_QUERY_GUARD_RAISE = False
+    SQL_QUERY_BUDGET = int(os.getenv('SQL_QUERY_BUDGET', 30))
+
+    # HTTP: conditional GETs on read APIs and compressed responses
+    CONDITIONAL_REQUESTS = True
+    COMPRESS_RESPONSES = True
+    COMPRESS_MIN_SIZE = 1024  # bytes
+    COMPRESS_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 4
+    COMPRESS_MIMETYPES = {'application/json', 'text/html', 'text/plain', 'text/csv'}
+
+    # Unread counters: per-user notification/message counts cached in Redis
+    UNREAD_COUNTERS = True
+    UNREAD_COUNTERS_BACKEND = 'redis'  # 'redis' or 'memory' (single process only)
+    UNREAD_COUNTERS_URL = os.getenv('UNREAD_COUNTERS_URL')  # defaults to REDIS_URL
+    UNREAD_COUNTERS_TTL = 7 * 24 * 3600  # seconds; expired users reload from the database
+    UNREAD_COUNTERS_RECONCILE_INTERVAL = 3600  # seconds between scheduled rebuilds; 0 disables
+
+    # Tenant counters: maintain per-tenant totals on flush
+    TENANT_COUNTERS = True
+
+    # Bulk attendance: largest roster accepted per request
+    ATTENDANCE_BULK_MAX = 500
+
+    # Student portal: per-student enrollment, attendance and score aggregates
+    PORTAL_STATS_CACHE_TTL = 300  # seconds; attendance and test completion invalidate
+
+    # Test sessions: question points/types/answers cached per test set while tests are taken
+    QUESTION_CACHE_TTL = 300  # seconds; edits in this process invalidate immediately
+    QUESTION_SET_CACHE_TTL = 3600  # client question sets; edits start a new version
+    RESPONSE_BATCH_MAX = 500  # answers accepted per batch submission
+    REGRADE_CHUNK_SIZE = 500  # sessions re-graded per transaction
+    REGRADE_SYNC = False  # run jobs in the request that queues them (tests only)
+    REGRADE_CLAIM_TIMEOUT = 600  # seconds without a chunk heartbeat before a running job may be taken over
+
+    # Reports: rows are streamed from the database in batches
+    REPORT_STREAM_BATCH_SIZE = 1000
+    REPORT_PREVIEW_ROWS = 50
+    REPORT_PREVIEW_MAX_ROWS = 500
+    REPORT_PREVIEW_COUNT_CAP = 10000  # rows counted exactly before falling back to an estimate
+    REPORT_PREVIEW_TIMEOUT_MS = int(os.getenv('REPORT_PREVIEW_TIMEOUT_MS', 3000))  # shared by all preview queries
+
+    # Scheduler: one worker (the lease holder) runs periodic jobs such as scheduled reports
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'False').lower() == 'true'
+    SCHEDULER_INTERVAL = 30  # seconds between ticks
+    SCHEDULER_LEASE_TTL = 90  # seconds before another worker may take over
+
+    # Scheduled reports: versioned artifacts, refreshed incrementally between full runs
+    REPORT_ARTIFACT_DIR = os.path.join(BASE_DIR, 'report_runs')
+    REPORT_SCHEDULE_TIMEZONE = os.getenv('REPORT_SCHEDULE_TIMEZONE', 'UTC')
+    REPORT_SCHEDULE_DEFAULT_TIME = '02:00'  # off-peak time for schedules without one
+    REPORT_CLAIM_TIMEOUT = 3600  # seconds before a stuck run may be picked up again
+    REPORT_WATERMARK_OVERLAP = 300  # seconds re-scanned before the last watermark
+    REPORT_FULL_REFRESH_EVERY = 7  # every Nth run recomputes everything
+    REPORT_EMAIL_ATTACHMENT_MAX = 5 * 1024 * 1024  # larger files are linked, not attached
+
 
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -75,6 +155,8 @@ class DevelopmentConfig(Config):
     TESTING = False
     SESSION_COOKIE_SECURE = False
     CORS_ORIGINS = ['http://localhost:5173', 'http://127.0.0.1:5173']
+    AUTO_INIT_DB = os.getenv('AUTO_INIT_DB', 'True').lower() == 'true'
+    SQL_QUERY_GUARD = True  # Logs requests over budget
 
 
 class TestingConfig(Config):
@@ -86,6 +168,12 @@ class TestingConfig(Config):
     CACHE_TYPE = "null"
     CACHE_NO_NULL_WARNING = True
     SESSION_COOKIE_SECURE = False
+    IMAGE_PROCESSING_SYNC = True
+    PDF_RENDER_SYNC = True
+    MAIL_OUTBOX_WORKERS = 0  # Tests drain the outbox with mail_outbox.process_pending()
+    SQL_QUERY_GUARD = True
+    SQL_QUERY_GUARD_RAISE = True  # N+1 regressions fail the test that triggers them
+    UNREAD_COUNTERS_BACKEND = 'memory'
 
 
 class ProductionConfig(Config):
@@ -0,0 +1,48 @@
+"""Add email outbox
+
+Revision ID: 7e3b9c0d5a21
+Revises: 4c1d2e7f9a10
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e3b9c0d5a21'
+down_revision = '4c1d2e7f9a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'email_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('recipient', sa.String(length=255), nullable=False),
+        sa.Column('domain', sa.String(length=255), nullable=False),
+        sa.Column('sender', sa.String(length=255), nullable=False),
+        sa.Column('subject', sa.String(length=255), nullable=False),
+        sa.Column('text_body', sa.Text(), nullable=True),
+        sa.Column('html_body', sa.Text(), nullable=True),
+        sa.Column('attachments', sa.JSON(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('claimed_by', sa.String(length=64), nullable=True),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_email_outbox_domain'), 'email_outbox', ['domain'], unique=False)
+    op.create_index('ix_email_outbox_status_next_attempt', 'email_outbox',
+                    ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_email_outbox_status_next_attempt', table_name='email_outbox')
+    op.drop_index(op.f('ix_email_outbox_domain'), table_name='email_outbox')
+    op.drop_table('email_outbox')
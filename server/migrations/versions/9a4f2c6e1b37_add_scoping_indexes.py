@@ -0,0 +1,38 @@
+"""Add indexes for role-scoped list queries
+
+Revision ID: 9a4f2c6e1b37
+Revises: 7e3b9c0d5a21
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4f2c6e1b37'
+down_revision = '7e3b9c0d5a21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_beneficiaries_user_id'), 'beneficiaries', ['user_id'], unique=False)
+    op.create_index(op.f('ix_beneficiaries_trainer_id'), 'beneficiaries', ['trainer_id'], unique=False)
+    op.create_index('ix_beneficiaries_tenant_id_created_at', 'beneficiaries',
+                    ['tenant_id', 'created_at'], unique=False)
+    op.create_index('ix_documents_beneficiary_id_created_at', 'documents',
+                    ['beneficiary_id', 'created_at'], unique=False)
+    op.create_index(op.f('ix_appointments_beneficiary_id'), 'appointments', ['beneficiary_id'], unique=False)
+    op.create_index('ix_appointments_trainer_id_start_time', 'appointments',
+                    ['trainer_id', 'start_time'], unique=False)
+    op.create_index(op.f('ix_test_sessions_beneficiary_id'), 'test_sessions', ['beneficiary_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_test_sessions_beneficiary_id'), table_name='test_sessions')
+    op.drop_index('ix_appointments_trainer_id_start_time', table_name='appointments')
+    op.drop_index(op.f('ix_appointments_beneficiary_id'), table_name='appointments')
+    op.drop_index('ix_documents_beneficiary_id_created_at', table_name='documents')
+    op.drop_index('ix_beneficiaries_tenant_id_created_at', table_name='beneficiaries')
+    op.drop_index(op.f('ix_beneficiaries_trainer_id'), table_name='beneficiaries')
+    op.drop_index(op.f('ix_beneficiaries_user_id'), table_name='beneficiaries')
@@ -0,0 +1,51 @@
+"""Add regrade jobs
+
+Revision ID: a9c1e3f5b7d2
+Revises: f4b2d8e6a1c3
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c1e3f5b7d2'
+down_revision = 'f4b2d8e6a1c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('regrade_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('test_set_id', sa.Integer(), nullable=False),
+    sa.Column('question_ids', sa.JSON(), nullable=True),
+    sa.Column('reason', sa.String(length=50), nullable=True),
+    sa.Column('requested_by', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('claimed_by', sa.String(length=100), nullable=True),
+    sa.Column('total_responses', sa.Integer(), nullable=True),
+    sa.Column('processed_responses', sa.Integer(), nullable=True),
+    sa.Column('changed_responses', sa.Integer(), nullable=True),
+    sa.Column('sessions_updated', sa.Integer(), nullable=True),
+    sa.Column('last_session_id', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['test_set_id'], ['test_sets.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['requested_by'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('regrade_jobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_regrade_jobs_test_set_id'), ['test_set_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_regrade_jobs_status'), ['status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('regrade_jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_regrade_jobs_status'))
+        batch_op.drop_index(batch_op.f('ix_regrade_jobs_test_set_id'))
+
+    op.drop_table('regrade_jobs')
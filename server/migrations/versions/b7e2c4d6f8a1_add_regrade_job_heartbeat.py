@@ -0,0 +1,26 @@
+"""Add regrade job heartbeat
+
+Revision ID: b7e2c4d6f8a1
+Revises: a9c1e3f5b7d2
+Create Date: 2026-10-18 23:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2c4d6f8a1'
+down_revision = 'a9c1e3f5b7d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('regrade_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('regrade_jobs', schema=None) as batch_op:
+        batch_op.drop_column('claimed_at')
@@ -0,0 +1,33 @@
+"""Make session attendance unique per session and beneficiary
+
+Revision ID: c5d8e1f3a742
+Revises: 9a4f2c6e1b37
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d8e1f3a742'
+down_revision = '9a4f2c6e1b37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep the newest record of any duplicates left by the old endpoint
+    op.execute("""
+        DELETE FROM session_attendance
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM session_attendance GROUP BY session_id, beneficiary_id
+        )
+    """)
+    with op.batch_alter_table('session_attendance', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_session_attendance_session_beneficiary',
+                                          ['session_id', 'beneficiary_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('session_attendance', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_session_attendance_session_beneficiary', type_='unique')
@@ -0,0 +1,68 @@
+"""Add denormalized tenant counters
+
+Revision ID: d2a7f4b9e813
+Revises: c5d8e1f3a742
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a7f4b9e813'
+down_revision = 'c5d8e1f3a742'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('tenant_counters',
+    sa.Column('tenant_id', sa.Integer(), nullable=False),
+    sa.Column('user_count', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('staff_count', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('trainer_count', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('beneficiary_count', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('active_beneficiary_count', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('program_count', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('storage_bytes', sa.BigInteger(), nullable=False, server_default='0'),
+    sa.Column('reconciled_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('tenant_id')
+    )
+
+    # Backfill; `flask reconcile-tenant-counters` recomputes the same numbers
+    op.execute("""
+        INSERT INTO tenant_counters (tenant_id, user_count, staff_count, trainer_count,
+                                     beneficiary_count, active_beneficiary_count,
+                                     program_count, storage_bytes, reconciled_at)
+        SELECT t.id,
+               (SELECT COUNT(*) FROM users u JOIN (
+                    SELECT user_id, tenant_id FROM user_tenant
+                    UNION SELECT id, tenant_id FROM users WHERE tenant_id IS NOT NULL
+                ) m ON m.user_id = u.id WHERE m.tenant_id = t.id),
+               (SELECT COUNT(*) FROM users u JOIN (
+                    SELECT user_id, tenant_id FROM user_tenant
+                    UNION SELECT id, tenant_id FROM users WHERE tenant_id IS NOT NULL
+                ) m ON m.user_id = u.id
+                WHERE m.tenant_id = t.id AND u.role IN ('super_admin', 'tenant_admin', 'trainer')),
+               (SELECT COUNT(*) FROM users u JOIN (
+                    SELECT user_id, tenant_id FROM user_tenant
+                    UNION SELECT id, tenant_id FROM users WHERE tenant_id IS NOT NULL
+                ) m ON m.user_id = u.id WHERE m.tenant_id = t.id AND u.role = 'trainer'),
+               (SELECT COUNT(*) FROM beneficiaries b WHERE b.tenant_id = t.id),
+               (SELECT COUNT(*) FROM beneficiaries b WHERE b.tenant_id = t.id
+                    AND (b.is_active IS NULL OR b.is_active = TRUE)
+                    AND COALESCE(b.status, 'active') = 'active'),
+               (SELECT COUNT(*) FROM programs p WHERE p.tenant_id = t.id),
+               (SELECT COALESCE(SUM(d.file_size), 0) FROM documents d
+                    LEFT JOIN beneficiaries b ON b.id = d.beneficiary_id
+                    LEFT JOIN users u ON u.id = d.upload_by
+                    WHERE COALESCE(b.tenant_id, u.tenant_id) = t.id),
+               CURRENT_TIMESTAMP
+        FROM tenants t
+    """)
+
+
+def downgrade():
+    op.drop_table('tenant_counters')
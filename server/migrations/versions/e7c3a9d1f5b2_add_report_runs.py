@@ -0,0 +1,69 @@
+"""Add report runs, schedule claims and scheduler leases
+
+Revision ID: e7c3a9d1f5b2
+Revises: d2a7f4b9e813
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7c3a9d1f5b2'
+down_revision = 'd2a7f4b9e813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('report_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('report_id', sa.Integer(), nullable=False),
+    sa.Column('schedule_id', sa.Integer(), nullable=True),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('mode', sa.String(length=20), nullable=True),
+    sa.Column('format', sa.String(length=20), nullable=True),
+    sa.Column('file_path', sa.String(length=500), nullable=True),
+    sa.Column('file_size', sa.Integer(), nullable=True),
+    sa.Column('result_path', sa.String(length=500), nullable=True),
+    sa.Column('definition_hash', sa.String(length=64), nullable=True),
+    sa.Column('row_count', sa.Integer(), nullable=True),
+    sa.Column('changed_rows', sa.Integer(), nullable=True),
+    sa.Column('watermark', sa.DateTime(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['report_id'], ['reports.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['schedule_id'], ['report_schedules.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('report_id', 'version', name='uq_report_runs_report_version')
+    )
+
+    op.create_table('scheduler_leases',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('holder', sa.String(length=64), nullable=False),
+    sa.Column('acquired_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+    with op.batch_alter_table('report_schedules', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('cron', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('last_error', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('claimed_by', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('claimed_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_report_schedules_active_next_run', ['is_active', 'next_run'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('report_schedules', schema=None) as batch_op:
+        batch_op.drop_index('ix_report_schedules_active_next_run')
+        batch_op.drop_column('claimed_at')
+        batch_op.drop_column('claimed_by')
+        batch_op.drop_column('last_error')
+        batch_op.drop_column('cron')
+
+    op.drop_table('scheduler_leases')
+    op.drop_table('report_runs')
@@ -0,0 +1,33 @@
+"""Make responses unique per session and question
+
+Revision ID: f4b2d8e6a1c3
+Revises: e7c3a9d1f5b2
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b2d8e6a1c3'
+down_revision = 'e7c3a9d1f5b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep the newest answer of any duplicates
+    op.execute("""
+        DELETE FROM responses
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM responses GROUP BY session_id, question_id
+        )
+    """)
+    with op.batch_alter_table('responses', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_responses_session_question',
+                                          ['session_id', 'question_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('responses', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_responses_session_question', type_='unique')
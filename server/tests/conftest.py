@@ -1,6 +1,7 @@
 import pytest
 import os
 import tempfile
+import uuid
 from datetime import datetime, timedelta
 from app import create_app
 from models import db, User, Tenant, Beneficiary, Program, Test, TestQuestion
@@ -41,6 +42,39 @@ def runner(test_app):
     """A test runner for the app's Click commands."""
     return test_app.test_cli_runner()
 
+@pytest.fixture
+def make_tenant(test_app):
+    """Factory for tenants with a unique slug; flushed, the caller commits."""
+    from app.extensions import db
+    from app.models import Tenant
+
+    def make(**kwargs):
+        values = {'name': 'T', 'slug': f't-{uuid.uuid4().hex[:8]}', 'email': 't@example.com'}
+        values.update(kwargs)
+        tenant = Tenant(**values)
+        db.session.add(tenant)
+        db.session.flush()
+        return tenant
+    return make
+
+@pytest.fixture
+def make_user(test_app):
+    """Factory for active users with a unique email; flushed, the caller commits."""
+    from app.extensions import db
+    from app.models import User
+
+    def make(role, tenant=None, **kwargs):
+        values = {'email': f'{role}_{uuid.uuid4().hex[:8]}@example.com', 'first_name': 'Test',
+                  'last_name': role.title(), 'role': role, 'is_active': True,
+                  'tenant_id': tenant.id if tenant is not None else None}
+        values.update(kwargs)
+        user = User(**values)
+        user.password = 'Password123!'
+        db.session.add(user)
+        db.session.flush()
+        return user
+    return make
+
 @pytest.fixture(scope='function')
 def db_session(test_app):
     """Create a clean database session for each test function."""
@@ -0,0 +1,168 @@
+"""Tests for bulk attendance recording."""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app.extensions import db
+from app.models import Beneficiary
+from app.models.program import Program, ProgramEnrollment, TrainingSession, SessionAttendance
+from app.services.attendance_service import AttendanceService
+from app.utils import bulk
+
+
+@pytest.fixture
+def roster(test_app, make_tenant, make_user):
+    """A program with two held sessions, a trainer and three enrolled beneficiaries."""
+    with test_app.app_context():
+        tenant = make_tenant()
+        trainer = make_user('trainer', tenant)
+
+        program = Program(name='Program', code=f'P-{uuid.uuid4().hex[:8]}', status='active',
+                          tenant_id=tenant.id, created_by_id=trainer.id)
+        db.session.add(program)
+        db.session.flush()
+
+        sessions = []
+        for days_ago in (2, 1):
+            session = TrainingSession(program_id=program.id, trainer_id=trainer.id, title='Session',
+                                      session_date=datetime.utcnow() - timedelta(days=days_ago))
+            db.session.add(session)
+            sessions.append(session)
+
+        beneficiary_ids = []
+        for _ in range(3):
+            student = make_user('student', tenant)
+            beneficiary = Beneficiary(user_id=student.id, tenant_id=tenant.id, trainer_id=trainer.id)
+            db.session.add(beneficiary)
+            db.session.flush()
+            db.session.add(ProgramEnrollment(program_id=program.id, beneficiary_id=beneficiary.id))
+            beneficiary_ids.append(beneficiary.id)
+
+        db.session.commit()
+        token = create_access_token(identity=str(trainer.id))
+        yield {
+            'headers': {'Authorization': f'Bearer {token}'},
+            'program_id': program.id,
+            'session_ids': [s.id for s in sessions],
+            'beneficiary_ids': beneficiary_ids
+        }
+
+
+def rates(program_id):
+    """Attendance rate per beneficiary."""
+    return {
+        e.beneficiary_id: e.attendance_rate
+        for e in ProgramEnrollment.query.filter_by(program_id=program_id)
+    }
+
+
+class TestBulkAttendance:
+    """Test the bulk attendance endpoint."""
+
+    def test_upserts_roster_and_updates_rates(self, test_app, roster):
+        """Test a roster is inserted, then updated in place on a second call."""
+        client = test_app.test_client()
+        first, second = roster['session_ids']
+        a, b, c = roster['beneficiary_ids']
+
+        response = client.post(f'/api/sessions/{first}/attendance/bulk', headers=roster['headers'],
+                               json={'status': 'present', 'records': [
+                                   {'beneficiary_id': a}, {'beneficiary_id': b},
+                                   {'beneficiary_id': c, 'status': 'absent'}]})
+        assert response.status_code == 200
+        assert response.get_json()['created'] == 3
+
+        response = client.post(f'/api/sessions/{second}/attendance/bulk', headers=roster['headers'],
+                               json={'records': [{'beneficiary_id': a, 'status': 'present'},
+                                                 {'beneficiary_id': c, 'status': 'present'}]})
+        assert response.status_code == 200
+
+        response = client.post(f'/api/sessions/{first}/attendance/bulk', headers=roster['headers'],
+                               json={'records': [{'beneficiary_id': c, 'status': 'present'}]})
+        body = response.get_json()
+        assert body['created'] == 0
+        assert body['updated'] == 1
+
+        with test_app.app_context():
+            assert SessionAttendance.query.filter_by(session_id=first).count() == 3
+            record = SessionAttendance.query.filter_by(session_id=first, beneficiary_id=c).one()
+            assert record.status == 'present'
+            assert record.check_in_time is not None
+            assert rates(roster['program_id']) == {a: 100.0, b: 50.0, c: 100.0}
+
+    def test_orm_fallback_without_native_upsert(self, test_app, roster, monkeypatch):
+        """Test databases without ON CONFLICT get the same rows through the ORM."""
+        monkeypatch.setattr(bulk, '_native_insert', lambda: None)
+        a, b, _ = roster['beneficiary_ids']
+        with test_app.app_context():
+            session = db.session.get(TrainingSession, roster['session_ids'][0])
+            AttendanceService.record_bulk(session, {a: 'present', b: 'absent'})
+            first_check_in = SessionAttendance.query.filter_by(beneficiary_id=a).one().check_in_time
+
+            result = AttendanceService.record_bulk(session, {a: 'present', b: 'present'})
+            assert (result['created'], result['updated']) == (0, 2)
+            records = {record.beneficiary_id: record
+                       for record in SessionAttendance.query.filter_by(session_id=session.id)}
+            assert {key: record.status for key, record in records.items()} == {a: 'present', b: 'present'}
+            assert records[a].check_in_time == first_check_in
+            assert records[b].check_in_time is not None
+
+    def test_rejects_unknown_beneficiaries(self, test_app, roster):
+        """Test nothing is written when a beneficiary does not exist."""
+        client = test_app.test_client()
+        session_id = roster['session_ids'][0]
+
+        response = client.post(f'/api/sessions/{session_id}/attendance/bulk', headers=roster['headers'],
+                               json={'records': [{'beneficiary_id': roster['beneficiary_ids'][0],
+                                                  'status': 'present'},
+                                                 {'beneficiary_id': 999999, 'status': 'present'}]})
+        assert response.status_code == 404
+        with test_app.app_context():
+            assert SessionAttendance.query.filter_by(session_id=session_id).count() == 0
+
+    def test_rejects_beneficiaries_not_enrolled(self, test_app, roster, make_tenant, make_user):
+        """Test beneficiaries outside the program cannot be marked."""
+        with test_app.app_context():
+            tenant = make_tenant()
+            student = make_user('student', tenant)
+            outsider = Beneficiary(user_id=student.id, tenant_id=tenant.id)
+            db.session.add(outsider)
+            db.session.commit()
+            outsider_id = outsider.id
+
+        client = test_app.test_client()
+        session_id = roster['session_ids'][0]
+        response = client.post(f'/api/sessions/{session_id}/attendance/bulk', headers=roster['headers'],
+                               json={'records': [{'beneficiary_id': outsider_id, 'status': 'present'}]})
+        assert response.status_code == 404
+        with test_app.app_context():
+            assert SessionAttendance.query.filter_by(beneficiary_id=outsider_id).count() == 0
+
+    def test_rejects_other_tenants_sessions(self, test_app, roster, make_tenant, make_user):
+        """Test a trainer cannot write attendance for another tenant's session."""
+        with test_app.app_context():
+            trainer = make_user('trainer', make_tenant())
+            db.session.commit()
+            token = create_access_token(identity=str(trainer.id))
+
+        client = test_app.test_client()
+        session_id = roster['session_ids'][0]
+        response = client.post(f'/api/sessions/{session_id}/attendance/bulk',
+                               headers={'Authorization': f'Bearer {token}'},
+                               json={'records': [{'beneficiary_id': roster['beneficiary_ids'][0],
+                                                  'status': 'present'}]})
+        assert response.status_code == 403
+        with test_app.app_context():
+            assert SessionAttendance.query.filter_by(session_id=session_id).count() == 0
+
+    def test_rejects_invalid_status(self, test_app, roster):
+        """Test an unknown status is a 400."""
+        client = test_app.test_client()
+        response = client.post(f"/api/sessions/{roster['session_ids'][0]}/attendance/bulk",
+                               headers=roster['headers'],
+                               json={'records': [{'beneficiary_id': roster['beneficiary_ids'][0],
+                                                  'status': 'late'}]})
+        assert response.status_code == 400
@@ -0,0 +1,50 @@
+"""Tests for CLI commands."""
+
+import sys
+from unittest.mock import patch, MagicMock
+
+from app.cli import profile_imports
+
+
+def test_init_db_command(runner):
+    """Test init-db creates the schema."""
+    result = runner.invoke(args=['init-db'])
+    assert result.exit_code == 0
+    assert 'Database schema created' in result.output
+
+
+def test_seed_db_command_is_idempotent(runner, test_app):
+    """Test seed-db can run repeatedly without duplicating users."""
+    from app.models.user import User
+
+    runner.invoke(args=['init-db'])
+    first = runner.invoke(args=['seed-db'])
+    second = runner.invoke(args=['seed-db'])
+
+    assert first.exit_code == 0
+    assert second.exit_code == 0
+    with test_app.app_context():
+        assert User.query.filter_by(email='admin@bdc.com').count() == 1
+
+
+def test_create_app_does_not_seed(test_app):
+    """Test the application factory leaves the database untouched by default."""
+    assert not test_app.config.get('AUTO_INIT_DB')
+
+
+def test_profile_imports_parses_importtime(test_app):
+    """Test importtime output is aggregated per module."""
+    stderr = '\n'.join([
+        'import time: self [us] | cumulative | imported package',
+        'import time:       100 |        100 |     json.decoder',
+        'import time:       200 |        300 |   json',
+        'import time:        50 |        400 | app'
+    ])
+
+    with test_app.app_context():
+        with patch('app.cli.subprocess.run', return_value=MagicMock(stderr=stderr)) as mock_run:
+            rows, total_us = profile_imports('import app', limit=2)
+
+    assert mock_run.call_args[0][0][:3] == [sys.executable, '-X', 'importtime']
+    assert rows == [('app', 50, 400), ('json', 200, 300)]
+    assert total_us == 400
@@ -0,0 +1,194 @@
+"""Tests for document permission resolution."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from flask import g
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models import Beneficiary, Document
+from app.models.document_permission import DocumentPermission
+from app.services.document_permission_service import document_permissions
+from app.services.document_service import DocumentService
+
+
+def make_document(owner, beneficiary=None, title='Doc'):
+    """Create a document owned by a user."""
+    document = Document(
+        title=title,
+        file_path='x.pdf',
+        file_type='pdf',
+        file_size=1,
+        upload_by=owner.id,
+        beneficiary_id=beneficiary.id if beneficiary else None
+    )
+    db.session.add(document)
+    return document
+
+
+@pytest.fixture
+def ctx(test_app, make_tenant, make_user):
+    """Provide an app context with an owner, a trainer and a student."""
+    with test_app.test_request_context():
+        owner = make_user('tenant_admin')
+        trainer = make_user('trainer')
+        student = make_user('student')
+        tenant = make_tenant()
+        beneficiary = Beneficiary(user_id=student.id, tenant_id=tenant.id, trainer_id=trainer.id)
+        db.session.add(beneficiary)
+        db.session.commit()
+        yield {'owner': owner, 'trainer': trainer, 'student': student, 'beneficiary': beneficiary}
+        db.session.rollback()
+
+
+@pytest.fixture
+def query_counter(test_app):
+    """Count SQL statements executed."""
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with test_app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count)
+        yield statements
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+
+class TestDocumentPermissionResolver:
+    """Test batched permission resolution."""
+
+    def test_batch_resolves_in_two_queries(self, ctx, query_counter):
+        """Test resolving many documents costs two queries, then none."""
+        owner, student = ctx['owner'], ctx['student']
+        documents = [make_document(owner, title=f'Doc {i}') for i in range(20)]
+        db.session.flush()
+        for document in documents[:5]:
+            db.session.add(DocumentPermission(document_id=document.id, user_id=student.id, can_read=True))
+        db.session.commit()
+        ids = [document.id for document in documents]
+
+        query_counter.clear()
+        grants = document_permissions.resolve(student, ids)
+        assert len(query_counter) == 2
+
+        assert sum(grant['read'] for grant in grants.values()) == 5
+        assert document_permissions.resolve(student, ids) == grants
+        assert len(query_counter) == 2  # Memoized for the request
+
+    def test_owner_trainer_and_role_rules(self, ctx):
+        """Test ownership, assigned trainers and role grants."""
+        owner, trainer, student = ctx['owner'], ctx['trainer'], ctx['student']
+        own = make_document(student)
+        assigned = make_document(owner, beneficiary=ctx['beneficiary'])
+        by_role = make_document(owner)
+        db.session.flush()
+        db.session.add(DocumentPermission(document_id=by_role.id, role='student', can_read=True))
+        db.session.commit()
+
+        student_grants = document_permissions.resolve(student, [own.id, assigned.id, by_role.id])
+        assert student_grants[own.id]['source'] == 'owner'
+        assert student_grants[assigned.id]['read'] is False
+        assert student_grants[by_role.id]['source'] == 'role'
+
+        assert document_permissions.check(trainer, assigned.id, 'delete') is True
+
+    def test_user_grant_overrides_role_grant(self, ctx):
+        """Test an expired user grant denies access despite a role grant."""
+        owner, student = ctx['owner'], ctx['student']
+        document = make_document(owner)
+        db.session.flush()
+        db.session.add_all([
+            DocumentPermission(document_id=document.id, role='student', can_read=True),
+            DocumentPermission(document_id=document.id, user_id=student.id, can_read=True,
+                               expires_at=datetime.utcnow() - timedelta(days=1))
+        ])
+        db.session.commit()
+
+        assert document_permissions.check(student, document.id) is False
+        assert document.id not in [
+            d.id for d in document_permissions.filter_query(Document.query, student).all()
+        ]
+
+    def test_grant_and_revoke_invalidate(self, ctx):
+        """Test grant/revoke take effect within the same request."""
+        owner, student = ctx['owner'], ctx['student']
+        document = make_document(owner)
+        db.session.commit()
+
+        assert DocumentService.check_permission(document.id, student.id) is False
+        DocumentService.grant_permission(document.id, user_id=student.id)
+        assert DocumentService.check_permission(document.id, student.id) is True
+        DocumentService.revoke_permission(document.id, user_id=student.id)
+        assert DocumentService.check_permission(document.id, student.id) is False
+
+    def test_trainer_reassignment_invalidates(self, ctx, monkeypatch, make_user):
+        """Test a cached trainer grant is dropped once the beneficiary is reassigned."""
+        from cachelib import SimpleCache
+        from app.services import document_permission_service
+
+        monkeypatch.setattr(document_permission_service, 'cache', SimpleCache())
+        owner, trainer, beneficiary = ctx['owner'], ctx['trainer'], ctx['beneficiary']
+        document = make_document(owner, beneficiary=beneficiary)
+        successor = make_user('trainer')
+        db.session.commit()
+
+        assert document_permissions.check(trainer, document.id) is True
+        g.pop('_document_permissions', None)
+        assert document_permissions.check(trainer, document.id) is True  # From the cache
+
+        beneficiary.trainer_id = successor.id
+        db.session.commit()
+        g.pop('_document_permissions', None)
+        assert document_permissions.check(trainer, document.id) is False
+        assert document_permissions.check(successor, document.id) is True
+
+    def test_moving_or_deleting_document_invalidates(self, ctx, monkeypatch):
+        """Test cached grants are dropped when a document changes beneficiary or is deleted."""
+        from cachelib import SimpleCache
+        from app.services import document_permission_service
+        from app.services.beneficiary_service import DocumentService as BeneficiaryDocumentService
+
+        monkeypatch.setattr(document_permission_service, 'cache', SimpleCache())
+        owner, trainer = ctx['owner'], ctx['trainer']
+        moved = make_document(owner, beneficiary=ctx['beneficiary'])
+        deleted = make_document(owner, beneficiary=ctx['beneficiary'])
+        db.session.commit()
+        moved_id, deleted_id = moved.id, deleted.id
+
+        assert document_permissions.resolve(trainer, [moved_id, deleted_id]).keys() == {moved_id, deleted_id}
+        g.pop('_document_permissions', None)
+
+        BeneficiaryDocumentService.update_document(moved_id, {'beneficiary_id': None})
+        assert BeneficiaryDocumentService.delete_document(deleted_id) is True
+        g.pop('_document_permissions', None)
+        assert document_permissions.check(trainer, moved_id) is False
+        assert document_permissions.resolve(trainer, [deleted_id]) == {}
+
+    def test_sql_filter_matches_resolver(self, ctx):
+        """Test the SQL filter selects exactly the readable documents."""
+        owner, trainer = ctx['owner'], ctx['trainer']
+        documents = [
+            make_document(owner, beneficiary=ctx['beneficiary']),
+            make_document(owner),
+            make_document(owner),
+            make_document(trainer)
+        ]
+        db.session.flush()
+        db.session.add_all([
+            DocumentPermission(document_id=documents[1].id, user_id=trainer.id, can_read=True),
+            DocumentPermission(document_id=documents[2].id, user_id=trainer.id, can_read=False)
+        ])
+        db.session.commit()
+        ids = [document.id for document in documents]
+
+        filtered = {
+            d.id for d in document_permissions.filter_query(
+                Document.query.filter(Document.id.in_(ids)), trainer
+            )
+        }
+        g.pop('_document_permissions', None)
+        resolved = {d for d, grant in document_permissions.resolve(trainer, ids).items() if grant['read']}
+
+        assert filtered == resolved == {documents[0].id, documents[1].id, documents[3].id}
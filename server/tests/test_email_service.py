@@ -3,10 +3,8 @@
 import pytest
 import os
 from unittest.mock import patch, MagicMock, call
-from threading import Thread
 from flask import current_app
 from app.services.email_service import (
-    send_async_email,
     send_email,
     generate_email_token,
     verify_email_token,
@@ -14,7 +12,6 @@ from app.services.email_service import (
     send_welcome_email,
     send_notification_email
 )
-from app.extensions import mail
 from app.models import User
 from itsdangerous import URLSafeTimedSerializer
 from itsdangerous.exc import SignatureExpired, BadTimeSignature
@@ -31,26 +28,12 @@ def mock_user():
     return user
 
 
-class TestSendAsyncEmail:
-    """Test send_async_email function."""
-    
-    @patch('app.services.email_service.mail.send')
-    def test_send_async_email_success(self, mock_mail_send, app):
-        """Test successful async email sending."""
-        msg = MagicMock()
-        
-        send_async_email(app, msg)
-        
-        mock_mail_send.assert_called_once_with(msg)
-
-
 class TestSendEmail:
     """Test send_email function."""
     
-    @patch('app.services.email_service.Thread')
-    @patch('app.services.email_service.Message')
-    def test_send_email_basic(self, mock_message, mock_thread, app):
-        """Test basic email sending."""
+    @patch('app.services.email_service.mail_outbox')
+    def test_send_email_basic(self, mock_outbox, app):
+        """Test basic email queueing."""
         with app.app_context():
             result = send_email(
                 subject='Test Subject',
@@ -59,23 +42,19 @@ class TestSendEmail:
             )
             
             assert result is True
-            
-            # Check Message was created correctly
-            mock_message.assert_called_once_with(
-                'Test Subject',
+            mock_outbox.enqueue.assert_called_once_with(
+                subject='Test Subject',
+                recipients=['recipient@example.com'],
+                text_body='Test body',
+                html_body=None,
                 sender=app.config['MAIL_DEFAULT_SENDER'],
-                recipients=['recipient@example.com']
+                attachments=None,
+                commit=False
             )
-            
-            # Check that async thread was started
-            mock_thread.assert_called_once()
-            thread_instance = mock_thread.return_value
-            thread_instance.start.assert_called_once()
     
-    @patch('app.services.email_service.Thread')
-    @patch('app.services.email_service.Message')
-    def test_send_email_with_html_body(self, mock_message, mock_thread, app):
-        """Test email sending with HTML body."""
+    @patch('app.services.email_service.mail_outbox')
+    def test_send_email_with_html_body(self, mock_outbox, app):
+        """Test email queueing with HTML body."""
         with app.app_context():
             result = send_email(
                 subject='Test Subject',
@@ -85,13 +64,11 @@ class TestSendEmail:
             )
             
             assert result is True
-            msg_instance = mock_message.return_value
-            assert msg_instance.html == '<p>Test HTML</p>'
+            assert mock_outbox.enqueue.call_args[1]['html_body'] == '<p>Test HTML</p>'
     
-    @patch('app.services.email_service.Thread')
-    @patch('app.services.email_service.Message')
-    def test_send_email_with_custom_sender(self, mock_message, mock_thread, app):
-        """Test email sending with custom sender."""
+    @patch('app.services.email_service.mail_outbox')
+    def test_send_email_with_custom_sender(self, mock_outbox, app):
+        """Test email queueing with custom sender."""
         with app.app_context():
             result = send_email(
                 subject='Test Subject',
@@ -101,16 +78,11 @@ class TestSendEmail:
             )
             
             assert result is True
-            mock_message.assert_called_once_with(
-                'Test Subject',
-                sender='custom@example.com',
-                recipients=['recipient@example.com']
-            )
+            assert mock_outbox.enqueue.call_args[1]['sender'] == 'custom@example.com'
     
-    @patch('app.services.email_service.Thread')
-    @patch('app.services.email_service.Message')
-    def test_send_email_with_attachments(self, mock_message, mock_thread, app):
-        """Test email sending with attachments."""
+    @patch('app.services.email_service.mail_outbox')
+    def test_send_email_with_attachments(self, mock_outbox, app):
+        """Test email queueing with attachments."""
         with app.app_context():
             attachments = [
                 ('test.pdf', 'application/pdf', b'PDF content'),
@@ -125,19 +97,13 @@ class TestSendEmail:
             )
             
             assert result is True
-            msg_instance = mock_message.return_value
-            # Verify attach was called for each attachment
-            assert msg_instance.attach.call_count == 2
-            msg_instance.attach.assert_any_call('test.pdf', 'application/pdf', b'PDF content')
-            msg_instance.attach.assert_any_call('test.csv', 'text/csv', b'CSV content')
+            assert mock_outbox.enqueue.call_args[1]['attachments'] == attachments
     
-    @patch('app.services.email_service.Thread')
-    @patch('app.services.email_service.Message')
-    def test_send_email_exception_handling(self, mock_message, mock_thread, app):
-        """Test email sending with exception."""
+    @patch('app.services.email_service.mail_outbox')
+    def test_send_email_exception_handling(self, mock_outbox, app):
+        """Test email queueing with exception."""
         with app.app_context():
-            # Make Message constructor raise an exception
-            mock_message.side_effect = Exception('Email error')
+            mock_outbox.enqueue.side_effect = Exception('Email error')
             
             with patch.object(current_app.logger, 'error') as mock_logger:
                 result = send_email(
@@ -148,6 +114,23 @@ class TestSendEmail:
                 
                 assert result is False
                 mock_logger.assert_called_once_with("Email sending error: Email error")
+    
+    @patch('app.services.email_service.mail_outbox')
+    def test_send_email_keeps_caller_transaction(self, mock_outbox, test_app):
+        """Test queueing neither commits nor discards the caller's pending work."""
+        from app.extensions import db
+        from app.models import Tenant
+        
+        with test_app.app_context():
+            tenant = Tenant(name='Pending', slug='pending-mail', email='pending@example.com')
+            db.session.add(tenant)
+            mock_outbox.enqueue.side_effect = Exception('Email error')
+            
+            assert send_email('Subject', ['recipient@example.com'], 'Body') is False
+            assert Tenant.query.filter_by(slug='pending-mail').first() is tenant
+            
+            db.session.rollback()
+            assert Tenant.query.filter_by(slug='pending-mail').first() is None
 
 
 class TestEmailTokens:
@@ -0,0 +1,69 @@
+"""Tests for file variant and avatar endpoints."""
+
+import uuid
+
+import pytest
+from flask_jwt_extended import create_access_token
+from PIL import Image
+
+from app.extensions import db
+from app.models import User
+from app.models.document import Document
+from app.models.file_blob import FileBlob
+from app.services.image_service import image_service
+from app.services.storage_service import storage_service
+
+
+@pytest.fixture
+def stored_image(test_app, tmp_path, monkeypatch, make_user):
+    """An image blob with an owner and a user who cannot read it."""
+    monkeypatch.setattr(image_service, 'upload_folder', str(tmp_path))
+    monkeypatch.setattr(image_service, 'synchronous', True)
+    sha256 = uuid.uuid4().hex * 2
+    Image.new('RGB', (400, 300), (0, 128, 255)).save(tmp_path / 'source.png', 'PNG')
+
+    with test_app.app_context():
+        users = {name: make_user('trainer').id for name in ('owner', 'other')}
+        db.session.add(FileBlob(sha256=sha256, size=1, storage_path='source.png',
+                                extension='png', ref_count=1))
+        db.session.add(Document(title='Photo', file_path='source.png', file_type='png', file_size=1,
+                                content_hash=sha256, upload_by=users['owner']))
+        db.session.commit()
+        tokens = {name: create_access_token(identity=str(user_id)) for name, user_id in users.items()}
+    return {'sha256': sha256, 'tokens': tokens, **users}
+
+
+def get(client, url, token=None):
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    return client.get(url, headers=headers)
+
+
+def test_variant_requires_document_access(test_app, stored_image):
+    """Test only users who can read a referencing document get its previews."""
+    client = test_app.test_client()
+    url = f"/api/files/{stored_image['sha256']}/thumbnail"
+
+    response = get(client, url, stored_image['tokens']['owner'])
+    assert response.status_code == 200
+    assert 'private' in response.headers['Cache-Control']
+    assert 'public' not in response.headers['Cache-Control']
+
+    assert get(client, url, stored_image['tokens']['other']).status_code == 404
+
+
+def test_avatar_route_is_public(test_app, stored_image):
+    """Test profile pictures load without a token, other files do not."""
+    client = test_app.test_client()
+    sha256 = stored_image['sha256']
+    assert get(client, storage_service.avatar_url(sha256)).status_code == 404
+
+    with test_app.app_context():
+        db.session.get(User, stored_image['other']).profile_picture = storage_service.avatar_url(sha256)
+        db.session.commit()
+
+    response = get(client, storage_service.avatar_url(sha256))
+    assert response.status_code == 200
+    assert 'public' in response.headers['Cache-Control']
+    assert get(client, storage_service.avatar_url(sha256, 'preview')).status_code == 404
+    # Profile pictures stay visible to signed-in users through the files route
+    assert get(client, f"/api/files/{sha256}/avatar", stored_image['tokens']['owner']).status_code == 200
@@ -0,0 +1,117 @@
+"""Tests for the answer grading engine."""
+
+import pytest
+
+from app.extensions import db
+from app.models import Beneficiary, TestSet, Question, TestSession, Response
+from app.services.grading import GradingService, compile_answer, grade
+from app.services.scoring import question_cache
+
+
+class TestAnswerKeys:
+    """Test compiled keys grade normalized answers."""
+
+    def test_choice(self):
+        """Test order, case and type differences do not matter."""
+        key = compile_answer('multiple_choice', ['A', 'c'])
+        assert key.credit(['c', 'a']) == 1.0
+        assert key.credit(['a']) == 0.0
+        assert compile_answer('multiple_choice', 2).credit('2') == 1.0
+        assert compile_answer('multiple_choice', 'b').credit(['b']) == 1.0
+
+        partial = compile_answer('multiple_choice', ['a', 'b', 'c', 'd'], {'partial_credit': True})
+        assert partial.credit(['a', 'b']) == 0.5
+        assert partial.credit(['a', 'b', 'e']) == 0.25
+        assert partial.credit(['a', 'e', 'f']) == 0.0
+
+    def test_true_false(self):
+        """Test boolean spellings are recognized."""
+        key = compile_answer('true_false', True)
+        assert [key.credit(value) for value in (True, 'true', 'Yes', 1, False, 'maybe', None)] == \
+            [1.0, 1.0, 1.0, 1.0, 0.0, 0.0, 0.0]
+        assert compile_answer('true_false', 'false').credit(False) == 1.0
+
+    def test_matching_and_ordering(self):
+        """Test pairs and sequences, with partial credit when enabled."""
+        matching = compile_answer('matching', {'France': 'Paris', 'Italy': 'Rome'})
+        assert matching.credit([['italy', 'rome'], ['france', 'paris']]) == 1.0
+        assert matching.credit({'France': 'Rome', 'Italy': 'Rome'}) == 0.0
+        partial = compile_answer('matching', {'France': 'Paris', 'Italy': 'Rome'}, {'partial_credit': True})
+        assert partial.credit([{'left': 'France', 'right': 'Paris'}]) == 0.5
+
+        ordering = compile_answer('ordering', ['one', 'two', 'three', 'four'], {'partial_credit': True})
+        assert ordering.credit(['One', 'two', 'three', 'four']) == 1.0
+        assert ordering.credit(['one', 'two', 'four', 'three']) == 0.5
+        assert compile_answer('ordering', [1, 2]).credit([2, 1]) == 0.0
+
+    def test_text(self):
+        """Test accepted answers, patterns, keywords and unkeyed review."""
+        assert compile_answer('text', ['Paris', 'paris, france']).credit('  PARIS ') == 1.0
+        assert compile_answer('text', {'pattern': r'h2o|water'}).credit('Water') == 1.0
+        keywords = compile_answer('text', {'keywords': ['supply', 'demand', 'market price']},
+                                  {'partial_credit': True})
+        assert keywords.credit('Supply and demand set the market price.') == 1.0
+        assert keywords.credit('Demand rises') == pytest.approx(1 / 3)
+        assert compile_answer('text', {'keywords': ['a', 'b', 'c'], 'min_matches': 2}).credit('a c') == 1.0
+
+        review = compile_answer('text', None)
+        assert review.needs_review and grade(review, 5, 'essay') == (None, 0.0)
+        assert grade(keywords, 3, 'demand') == (False, 1.0)
+
+
+@pytest.fixture
+def cohort(test_app, make_tenant, make_user):
+    """Five completed sessions answering one question each way."""
+    with test_app.app_context():
+        tenant = make_tenant()
+        trainer = make_user('trainer', tenant)
+        test_set = TestSet(tenant_id=tenant.id, creator_id=trainer.id, title='Quiz', passing_score=50)
+        db.session.add(test_set)
+        db.session.flush()
+        questions = [Question(test_set_id=test_set.id, text='Capital?', type='multiple_choice',
+                              correct_answer='a', points=2.0, order=0),
+                     Question(test_set_id=test_set.id, text='Sky blue?', type='true_false',
+                              correct_answer=True, points=2.0, order=1)]
+        db.session.add_all(questions)
+        sessions = []
+        for index in range(5):
+            student = make_user('student', tenant)
+            beneficiary = Beneficiary(user_id=student.id, tenant_id=tenant.id)
+            db.session.add(beneficiary)
+            db.session.flush()
+            session = TestSession(test_set_id=test_set.id, beneficiary_id=beneficiary.id, status='completed')
+            db.session.add(session)
+            db.session.flush()
+            # Stored grades are stale: everything marked wrong
+            db.session.add_all([
+                Response(session_id=session.id, question_id=questions[0].id,
+                         answer='a' if index < 3 else 'b', is_correct=False, score=0),
+                Response(session_id=session.id, question_id=questions[1].id,
+                         answer=True, is_correct=False, score=0)])
+            sessions.append(session)
+        db.session.commit()
+        yield {'test_set_id': test_set.id, 'session_ids': [session.id for session in sessions]}
+        question_cache.invalidate()
+
+
+class TestBulkGrading:
+    """Test stored responses are re-graded in bulk."""
+
+    def test_grade_session(self, test_app, cohort):
+        """Test one session is re-graded and its totals refreshed."""
+        with test_app.app_context():
+            session_id = cohort['session_ids'][0]
+            assert GradingService.grade_session(session_id) == 2
+            session = db.session.get(TestSession, session_id)
+            assert (session.score, session.max_score, session.passed) == (4.0, 4.0, True)
+            assert GradingService.grade_session(session_id) == 0
+
+    def test_grade_cohort(self, test_app, cohort):
+        """Test every session of the test set is re-graded in chunks."""
+        with test_app.app_context():
+            summary = GradingService.grade_cohort(cohort['test_set_id'], chunk_size=3)
+            assert summary == {'graded': 10, 'changed': 8, 'sessions': 5}
+            sessions = TestSession.query.filter(TestSession.id.in_(cohort['session_ids'])) \
+                .order_by(TestSession.id).all()
+            assert [(s.score, s.passed) for s in sessions] == \
+                [(4.0, True)] * 3 + [(2.0, True)] * 2
@@ -0,0 +1,87 @@
+"""Tests for conditional GETs and response compression."""
+
+import gzip
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app.extensions import db
+from app.models import Beneficiary, Appointment
+from datetime import datetime, timedelta
+
+
+@pytest.fixture
+def student(test_app, make_tenant, make_user):
+    """A student with a beneficiary profile and an auth header."""
+    with test_app.app_context():
+        tenant = make_tenant()
+        user = make_user('student', tenant)
+        beneficiary = Beneficiary(user_id=user.id, tenant_id=tenant.id, trainer_id=user.id)
+        db.session.add(beneficiary)
+        db.session.commit()
+        token = create_access_token(identity=str(user.id))
+        yield {'headers': {'Authorization': f'Bearer {token}'},
+               'beneficiary_id': beneficiary.id, 'user_id': user.id}
+
+
+class TestConditionalRequests:
+    """Test ETag validation on portal endpoints."""
+
+    def test_unchanged_data_returns_304(self, test_app, student):
+        """Test a repeated poll with the ETag is answered with 304."""
+        client = test_app.test_client()
+        first = client.get('/api/dashboard', headers=student['headers'])
+        assert first.status_code == 200
+        etag = first.headers['ETag']
+        assert etag.startswith('W/')
+
+        second = client.get('/api/dashboard',
+                            headers={**student['headers'], 'If-None-Match': etag})
+
+        assert second.status_code == 304
+        assert second.headers['ETag'] == etag
+        assert not second.data
+
+    def test_changed_data_returns_200(self, test_app, student):
+        """Test a new row changes the ETag."""
+        client = test_app.test_client()
+        etag = client.get('/api/dashboard', headers=student['headers']).headers['ETag']
+
+        with test_app.app_context():
+            start = datetime.utcnow() + timedelta(days=1)
+            db.session.add(Appointment(beneficiary_id=student['beneficiary_id'],
+                                       trainer_id=student['user_id'], title='Session',
+                                       start_time=start, end_time=start + timedelta(hours=1)))
+            db.session.commit()
+
+        response = client.get('/api/dashboard',
+                              headers={**student['headers'], 'If-None-Match': etag})
+
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+
+class TestCompression:
+    """Test response compression."""
+
+    def test_large_json_is_gzipped(self, test_app):
+        """Test responses over the threshold are compressed when accepted."""
+        with test_app.test_request_context('/', headers={'Accept-Encoding': 'gzip'}):
+            from flask import jsonify
+            from app.middleware.http_cache import _compress
+
+            response = _compress(jsonify({'items': ['x' * 50] * 100}))
+
+            assert response.headers['Content-Encoding'] == 'gzip'
+            assert b'"items"' in gzip.decompress(response.get_data())
+            assert 'Accept-Encoding' in response.headers['Vary']
+
+    def test_small_json_is_not_compressed(self, test_app):
+        """Test responses under the threshold are sent as is."""
+        with test_app.test_request_context('/', headers={'Accept-Encoding': 'gzip'}):
+            from flask import jsonify
+            from app.middleware.http_cache import _compress
+
+            response = _compress(jsonify({'ok': True}))
+
+            assert 'Content-Encoding' not in response.headers
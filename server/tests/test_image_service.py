@@ -0,0 +1,62 @@
+"""Tests for image service."""
+
+import pytest
+from PIL import Image
+
+from app.services.image_service import ImageService, render_variant, VARIANTS
+
+
+@pytest.fixture
+def image_service(test_app, tmp_path):
+    """Create an image service rendering in-process."""
+    test_app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    test_app.config['IMAGE_PROCESSING_SYNC'] = True
+    return ImageService(test_app)
+
+
+@pytest.fixture
+def source_image(tmp_path):
+    """Write a large transparent PNG."""
+    path = tmp_path / 'source.png'
+    Image.new('RGBA', (1600, 1200), (255, 0, 0, 128)).save(path, 'PNG')
+    return path
+
+
+class FakeBlob:
+    """Minimal stand-in for a stored FileBlob."""
+
+    def __init__(self, storage_path, extension, sha256='ab' * 32):
+        self.storage_path = storage_path
+        self.extension = extension
+        self.sha256 = sha256
+
+
+def test_render_variant_fits_size(source_image, tmp_path):
+    """Test variants keep aspect ratio within the requested box."""
+    output = tmp_path / 'out' / 'thumb.jpg'
+    assert render_variant(str(source_image), str(output), (150, 150), 80)
+
+    with Image.open(output) as img:
+        assert img.size == (150, 113)
+        assert img.mode == 'RGB'
+
+
+def test_schedule_variants_caches_by_hash(image_service, source_image):
+    """Test variants are written once per content hash."""
+    blob = FakeBlob('source.png', 'png')
+
+    assert image_service.schedule_variants(blob, ('avatar', 'thumbnail')) == ['avatar', 'thumbnail']
+    assert image_service.get_variant(blob.sha256, 'avatar') is not None
+    assert image_service.schedule_variants(blob, ('avatar',)) == []
+
+
+def test_unsupported_extension_is_skipped(image_service):
+    """Test non-image documents get no variants."""
+    assert image_service.schedule_variants(FakeBlob('doc.docx', 'docx')) == []
+
+
+def test_etag_is_content_derived():
+    """Test ETags depend only on the hash and variant."""
+    assert ImageService.etag('f' * 64, 'preview') == ImageService.etag('f' * 64, 'preview')
+    assert ImageService.etag('f' * 64, 'preview') != ImageService.etag('f' * 64, 'avatar')
+    assert set(VARIANTS) == {'avatar', 'thumbnail', 'preview'}
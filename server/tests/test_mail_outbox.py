@@ -0,0 +1,128 @@
+"""Tests for the mail outbox."""
+
+from datetime import datetime
+
+import pytest
+
+from app.extensions import db, mail
+from app.models import OutboxEmail
+from app.services.mail_outbox import MailOutbox, DomainRateLimiter
+from app.utils.debug_smtp import DebugSMTPServer
+
+
+@pytest.fixture
+def smtp_server():
+    """Run a local SMTP sink that rejects one domain."""
+    with DebugSMTPServer(reject_domains={'rejected.test'}) as server:
+        yield server
+
+
+@pytest.fixture
+def outbox(test_app, smtp_server):
+    """Create an outbox delivering to the debug SMTP server."""
+    test_app.config.update(
+        MAIL_SERVER=smtp_server.host,
+        MAIL_PORT=smtp_server.port,
+        MAIL_USE_TLS=False,
+        MAIL_USE_SSL=False,
+        MAIL_USERNAME='',
+        MAIL_PASSWORD='',
+        MAIL_SUPPRESS_SEND=False,
+        MAIL_OUTBOX_WORKERS=0
+    )
+    mail.init_app(test_app)
+    service = MailOutbox(test_app)
+    with test_app.app_context():
+        # Rows queued by other tests would share the SMTP connections
+        OutboxEmail.query.delete()
+        db.session.commit()
+        yield service
+        OutboxEmail.query.delete()
+        db.session.commit()
+    test_app.config['MAIL_SUPPRESS_SEND'] = True
+    mail.init_app(test_app)
+
+
+class TestMailOutbox:
+    """Test queueing and pooled delivery."""
+
+    def test_enqueue_creates_row_per_recipient(self, outbox):
+        """Test each recipient gets its own durable row."""
+        recipients = ['a@example.com', 'b@other.test']
+        rows = outbox.enqueue('Hello', recipients, 'Body')
+
+        assert len(rows) == 2
+        assert {row.domain for row in rows} == {'example.com', 'other.test'}
+        pending = OutboxEmail.query.filter_by(status='pending').filter(OutboxEmail.recipient.in_(recipients))
+        assert pending.count() == 2
+
+    def test_batch_reuses_one_connection(self, outbox, smtp_server):
+        """Test a batch is delivered over a single SMTP connection."""
+        recipients = [f'user{i}@example.com' for i in range(10)]
+        outbox.enqueue('Hello', recipients, 'Body')
+
+        outbox.process_pending()
+
+        delivered = [message for message in smtp_server.messages
+                     if message['rcpt_tos'][0].strip('<>') in recipients]
+        assert len(delivered) == 10
+        assert smtp_server.connections == 1
+        sent = OutboxEmail.query.filter_by(status='sent').filter(OutboxEmail.recipient.in_(recipients))
+        assert sent.count() == 10
+
+    def test_attachments_are_delivered(self, outbox, smtp_server):
+        """Test attachments survive the round trip through the queue."""
+        outbox.enqueue('Report', ['a@example.com'], 'See attached',
+                       attachments=[('report.csv', 'text/csv', b'a,b\n1,2\n')])
+
+        outbox.process_pending()
+
+        assert b'report.csv' in smtp_server.messages[0]['data']
+
+    def test_permanent_rejection_fails_without_retry(self, outbox):
+        """Test 5xx recipient rejections are not retried."""
+        outbox.enqueue('Hello', ['nobody@rejected.test'], 'Body')
+
+        totals = outbox.process_pending()
+
+        row = OutboxEmail.query.one()
+        assert totals['failed'] == 1
+        assert row.status == 'failed'
+        assert row.attempts == 1
+
+    def test_connection_error_schedules_retry(self, outbox, smtp_server):
+        """Test transient failures back off instead of failing."""
+        outbox.enqueue('Hello', ['a@example.com'], 'Body')
+        smtp_server.stop()
+
+        totals = outbox.process_pending()
+
+        row = OutboxEmail.query.one()
+        assert totals['retried'] == 1
+        assert row.status == 'pending'
+        assert row.next_attempt_at > datetime.utcnow()
+
+    def test_domain_rate_limit_defers_messages(self, outbox, smtp_server):
+        """Test messages over a domain's rate wait without using an attempt."""
+        outbox.rate_limiter = DomainRateLimiter(default_rate=2)
+        outbox.enqueue('Hello', [f'user{i}@example.com' for i in range(5)], 'Body')
+
+        totals = outbox.process_pending()
+
+        assert totals['sent'] == 2
+        deferred = OutboxEmail.query.filter_by(status='pending').all()
+        assert len(deferred) == 3
+        assert all(row.attempts == 0 for row in deferred)
+
+
+class TestDomainRateLimiter:
+    """Test the per-domain token bucket."""
+
+    def test_overrides_apply_per_domain(self):
+        """Test a domain override is independent of the default rate."""
+        limiter = DomainRateLimiter(default_rate=1, overrides={'Example.com': 3})
+
+        assert [limiter.acquire('example.com') for _ in range(3)] == [0, 0, 0]
+        assert limiter.acquire('example.com') > 0
+        assert limiter.acquire('other.test') == 0
+        assert limiter.acquire('other.test') > 0
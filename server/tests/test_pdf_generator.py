@@ -366,20 +366,14 @@ class TestEvaluationReport:
         """Test generating evaluation report."""
         # Mock objects
         mock_evaluation = Mock()
-        mock_evaluation.title = "Test Evaluation"
-        mock_evaluation.date_created = datetime.datetime(2023, 1, 1)
+        mock_evaluation.test.title = "Test Evaluation"
+        mock_evaluation.completed_at = datetime.datetime(2023, 1, 1)
         mock_evaluation.status = "completed"
         mock_evaluation.score = 85
-        
-        mock_question = Mock()
-        mock_question.text = "Question 1?"
-        mock_answer = Mock()
-        mock_answer.text = "Answer 1"
-        mock_answer.score = 10
-        mock_question.answer = mock_answer
-        
-        mock_evaluation.questions = [mock_question]
-        mock_evaluation.summary = "Test summary"
+        mock_evaluation.responses = [{'question': "Question 1?", 'answer': "Answer 1", 'score': 10}]
+        mock_evaluation.feedback = "Test feedback"
+        mock_evaluation.strengths = None
+        mock_evaluation.weaknesses = None
         mock_evaluation.recommendations = "Test recommendations"
         
         mock_user = Mock()
@@ -389,7 +383,7 @@ class TestEvaluationReport:
         mock_beneficiary = Mock()
         mock_beneficiary.first_name = "Jane"
         mock_beneficiary.last_name = "Smith"
-        mock_beneficiary.email = "jane@example.com"
+        mock_beneficiary.user.email = "jane@example.com"
         mock_beneficiary.status = "active"
         
         # Mock PDF generator instance
@@ -409,7 +403,8 @@ class TestEvaluationReport:
         mock_pdf.add_subtitle.assert_any_call("Evaluation Details")
         mock_pdf.add_subtitle.assert_any_call("Responses")
         mock_pdf.add_heading.assert_called_with("Question 1: Question 1?")
-        mock_pdf.add_subtitle.assert_any_call("Summary")
+        mock_pdf.add_paragraph.assert_any_call("<b>Answer:</b> Answer 1")
+        mock_pdf.add_subtitle.assert_any_call("Feedback")
         mock_pdf.add_subtitle.assert_any_call("Recommendations")
         
         assert result == b"PDF content"
@@ -441,14 +436,14 @@ class TestBeneficiaryReport:
         
         # Mock evaluations
         mock_eval1 = Mock()
-        mock_eval1.title = "Evaluation 1"
-        mock_eval1.date_created = datetime.datetime(2023, 1, 1)
+        mock_eval1.test.title = "Evaluation 1"
+        mock_eval1.completed_at = datetime.datetime(2023, 1, 1)
         mock_eval1.status = "completed"
         mock_eval1.score = 80
         
         mock_eval2 = Mock()
-        mock_eval2.title = "Evaluation 2"
-        mock_eval2.date_created = datetime.datetime(2023, 1, 15)
+        mock_eval2.test.title = "Evaluation 2"
+        mock_eval2.completed_at = datetime.datetime(2023, 1, 15)
         mock_eval2.status = "completed"
         mock_eval2.score = 90
         
@@ -0,0 +1,136 @@
+"""Tests for the PDF rendering service."""
+
+import io
+import zipfile
+from unittest.mock import patch
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app.extensions import db
+from app.models import Beneficiary
+from app.models.evaluation import Evaluation
+from app.models.test import Test
+from app.services.pdf_service import PDFService, pdf_service
+from app.utils.pdf_generator import get_styles, render
+
+
+def report_data(rows=1):
+    """Template data for a small tabular report."""
+    return {'title': 'Scores', 'description': None, 'generated_by': 'Admin', 'report_type': 'beneficiary',
+            'data': [{'Name': f'Person {i}', 'Score': i} for i in range(rows)]}
+
+
+@pytest.fixture
+def service(test_app, tmp_path):
+    """A synchronous service caching into a temporary directory."""
+    service = PDFService(test_app)
+    service.cache_dir = str(tmp_path)
+    service.synchronous = True
+    return service
+
+
+class TestRendering:
+    """Test documents render from plain data with shared styles."""
+
+    def test_styles_are_built_once(self):
+        """Test the stylesheet is shared and keeps the custom sizes."""
+        assert get_styles() is get_styles()
+        assert get_styles()['Heading1'].fontSize == 16
+        assert get_styles()['Bold'].fontName == 'Helvetica-Bold'
+
+    def test_render_kinds(self):
+        """Test every document kind renders a PDF."""
+        beneficiary = {'name': 'Jane <Smith>', 'email': 'jane@example.com', 'status': 'active'}
+        evaluation = {'title': 'Quiz', 'date': '2024-01-01', 'status': 'completed', 'score': 80,
+                      'responses': [{'question': 'Q?', 'answer': 'A & B', 'score': 1}],
+                      'feedback': 'Good', 'strengths': None, 'weaknesses': None, 'recommendations': None}
+        documents = [
+            render('report', report_data(3)),
+            render('evaluation', {'beneficiary': beneficiary, 'evaluation': evaluation, 'generated_by': 'A'}),
+            render('beneficiary', {'beneficiary': beneficiary, 'trainer': None, 'generated_by': 'A',
+                                   'evaluations': [dict(evaluation, responses=None)]}),
+        ]
+        assert all(document.startswith(b'%PDF') for document in documents)
+
+
+class TestCache:
+    """Test rendered documents are cached by their input."""
+
+    def test_cache_key(self, service):
+        """Test keys depend on the data, not on key order."""
+        assert service.cache_key('report', {'a': 1, 'b': 2}) == service.cache_key('report', {'b': 2, 'a': 1})
+        assert service.cache_key('report', {'a': 1}) != service.cache_key('report', {'a': 2})
+        assert service.cache_key('report', {'a': 1}) != service.cache_key('beneficiary', {'a': 1})
+
+    def test_unchanged_data_is_served_from_disk(self, service):
+        """Test the second request for the same data does not render."""
+        with patch('app.utils.pdf_generator.render', wraps=render) as renderer:
+            first = service.render_file('report', report_data())
+            second = service.render_file('report', report_data())
+            assert renderer.call_count == 1
+            service.render_file('report', report_data(2))
+            assert renderer.call_count == 2
+        assert first == second
+        with open(first, 'rb') as f:
+            assert f.read().startswith(b'%PDF')
+
+    def test_process_pool(self, test_app, tmp_path):
+        """Test documents render in warmed worker processes."""
+        service = PDFService(test_app)
+        service.cache_dir = str(tmp_path)
+        service.synchronous = False
+        service.max_workers = 1
+        try:
+            with open(service.render_file('report', report_data()), 'rb') as f:
+                assert f.read().startswith(b'%PDF')
+        finally:
+            service.shutdown()
+
+
+class TestBulkZip:
+    """Test many documents stream into one archive."""
+
+    def test_zip_stream(self, service):
+        """Test members keep their order and failures are listed."""
+        items = [(f'report_{i}.pdf', 'report', report_data(i)) for i in range(5)]
+        items.insert(2, ('broken.pdf', 'report', {'data': 'not rows'}))
+        chunks = list(service.iter_zip(iter(items)))
+        assert len(chunks) > 1
+
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+        assert archive.namelist() == [f'report_{i}.pdf' for i in range(5)] + ['errors.txt']
+        assert archive.read('report_4.pdf').startswith(b'%PDF')
+        assert archive.read('errors.txt').decode().startswith('broken.pdf: ')
+
+    def test_bulk_endpoint(self, test_app, tmp_path, make_tenant, make_user):
+        """Test the endpoint zips a report per visible beneficiary."""
+        cache_dir, synchronous = pdf_service.cache_dir, pdf_service.synchronous
+        pdf_service.cache_dir, pdf_service.synchronous = str(tmp_path), True
+        try:
+            with test_app.app_context():
+                tenant = make_tenant()
+                users = [make_user(role, tenant) for role in ('tenant_admin', 'trainer', 'student', 'student')]
+                admin, trainer = users[:2]
+                beneficiaries = [Beneficiary(user_id=user.id, tenant_id=tenant.id, trainer_id=trainer.id)
+                                 for user in users[2:]]
+                db.session.add_all(beneficiaries)
+                test = Test(title='Quiz', type='assessment', tenant_id=tenant.id, created_by=admin.id)
+                db.session.add(test)
+                db.session.flush()
+                db.session.add(Evaluation(beneficiary_id=beneficiaries[0].id, test_id=test.id,
+                                          trainer_id=trainer.id, score=90, status='completed'))
+                db.session.commit()
+                ids = [beneficiary.id for beneficiary in beneficiaries]
+                token = create_access_token(identity=str(trainer.id))
+
+            response = test_app.test_client().post('/api/documents/beneficiary-reports/bulk',
+                                                   headers={'Authorization': f'Bearer {token}'},
+                                                   json={'beneficiary_ids': ids})
+            assert response.status_code == 200
+            assert response.mimetype == 'application/zip'
+            archive = zipfile.ZipFile(io.BytesIO(response.get_data()))
+            assert archive.namelist() == [f'beneficiary_report_{id}.pdf' for id in ids]
+            assert all(archive.read(name).startswith(b'%PDF') for name in archive.namelist())
+        finally:
+            pdf_service.cache_dir, pdf_service.synchronous = cache_dir, synchronous
@@ -0,0 +1,122 @@
+"""Tests for student portal aggregates."""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from cachelib import SimpleCache
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models import Beneficiary, TestSet, TestSession
+from app.models.program import Program, ProgramEnrollment, TrainingSession
+from app.services import portal_stats
+from app.services.attendance_service import AttendanceService
+from app.services.portal_stats import PortalStatsService
+
+
+@pytest.fixture
+def student(test_app, make_tenant, make_user):
+    """A student enrolled in programs with held sessions and completed tests."""
+    with test_app.app_context():
+        tenant = make_tenant()
+        users = {role: make_user(role, tenant).id for role in ('trainer', 'student')}
+        beneficiary = Beneficiary(user_id=users['student'], tenant_id=tenant.id)
+        db.session.add(beneficiary)
+        db.session.flush()
+
+        sessions = {}
+        for name in ('Welding', 'Safety'):
+            program = Program(name=name, code=f'P-{uuid.uuid4().hex[:8]}', category='trade',
+                              status='active', tenant_id=tenant.id, created_by_id=users['trainer'])
+            db.session.add(program)
+            db.session.flush()
+            db.session.add(ProgramEnrollment(program_id=program.id, beneficiary_id=beneficiary.id,
+                                             status='completed' if name == 'Safety' else 'enrolled',
+                                             progress=50.0))
+            sessions[name] = []
+            for days_ago in (2, 1):
+                session = TrainingSession(program_id=program.id, trainer_id=users['trainer'], title=name,
+                                          session_date=datetime.utcnow() - timedelta(days=days_ago))
+                db.session.add(session)
+                db.session.flush()
+                sessions[name].append(session.id)
+
+        test_set = TestSet(tenant_id=tenant.id, creator_id=users['trainer'], title='Quiz', status='active')
+        db.session.add(test_set)
+        db.session.flush()
+        for score in (80.0, 100.0):
+            db.session.add(TestSession(test_set_id=test_set.id, beneficiary_id=beneficiary.id,
+                                       status='completed', score=score, max_score=100.0))
+        db.session.commit()
+        yield {'beneficiary_id': beneficiary.id, 'sessions': sessions, **users}
+
+
+def count_statements(fn, *args):
+    """Result of a call and the number of statements it executed."""
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        result = fn(*args)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return result, len(statements)
+
+
+class TestPortalStats:
+    """Test portal aggregates are grouped per program and cached per student."""
+
+    def test_grouped_aggregates(self, test_app, student):
+        """Test every program is summarized in four queries."""
+        with test_app.app_context():
+            session_id = student['sessions']['Welding'][0]
+            AttendanceService.record_bulk(db.session.get(TrainingSession, session_id),
+                                          {student['beneficiary_id']: 'present'})
+
+            stats, statements = count_statements(PortalStatsService.compute, student['beneficiary_id'])
+            assert statements == 4
+            summary = {entry['program']['name']: (entry['attendance'], entry['average_score'])
+                       for entry in stats['programs']}
+            assert summary == {'Welding': ({'attended': 1, 'total': 2}, 90.0),
+                               'Safety': ({'attended': 0, 'total': 2}, 90.0)}
+            assert [entry['score'] for entry in stats['high_scores']] == [100.0]
+            assert stats['attendance'] == {'attended': 1, 'total': 4}
+
+    def test_cached_until_attendance(self, test_app, student, monkeypatch):
+        """Test recording attendance drops the cached aggregates."""
+        monkeypatch.setattr(portal_stats, 'cache', SimpleCache())
+        with test_app.app_context():
+            beneficiary_id = student['beneficiary_id']
+            before = PortalStatsService.get(beneficiary_id)
+            assert count_statements(PortalStatsService.get, beneficiary_id) == (before, 0)
+
+            session_id = student['sessions']['Safety'][1]
+            AttendanceService.record_bulk(db.session.get(TrainingSession, session_id),
+                                          {beneficiary_id: 'present'})
+            assert PortalStatsService.get(beneficiary_id)['attendance'] == {'attended': 1, 'total': 4}
+
+    def test_endpoints(self, test_app, student):
+        """Test the progress, dashboard and achievements views."""
+        with test_app.app_context():
+            token = create_access_token(identity=str(student['student']))
+        client = test_app.test_client()
+        headers = {'Authorization': f'Bearer {token}'}
+
+        response = client.get('/api/progress', headers=headers)
+        assert response.status_code == 200
+        progress = response.get_json()
+        assert [entry['attendance']['total'] for entry in progress['progress']] == [2, 2]
+        assert progress['summary']['completed_programs'] == 1
+
+        stats = client.get('/api/dashboard', headers=headers).get_json()['stats']
+        assert (stats['enrolled_programs'], stats['completed_programs']) == (1, 1)
+
+        achievements = client.get('/api/achievements', headers=headers).get_json()
+        assert achievements['stats']['completed_programs'] == 1
+        assert achievements['stats']['high_scores'] == 1
+        assert client.get('/api/calendar', headers=headers).status_code == 200
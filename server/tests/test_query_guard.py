@@ -0,0 +1,65 @@
+"""Tests for eager-loading profiles and the query budget guard."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app.extensions import db
+from app.middleware.query_guard import QueryBudgetExceeded
+from app.models import Beneficiary
+from app.models.appointment import Appointment
+from app.utils.loading import loading_options
+
+
+@pytest.fixture
+def trainer_page(test_app, make_tenant, make_user):
+    """A trainer with fifty appointments, each with its own beneficiary."""
+    with test_app.app_context():
+        tenant = make_tenant()
+        trainer = make_user('trainer', tenant)
+        start = datetime.utcnow() + timedelta(days=1)
+        for i in range(50):
+            student = make_user('student', tenant)
+            beneficiary = Beneficiary(user_id=student.id, tenant_id=tenant.id, trainer_id=trainer.id)
+            db.session.add(beneficiary)
+            db.session.flush()
+            db.session.add(Appointment(beneficiary_id=beneficiary.id, trainer_id=trainer.id,
+                                       title=f'Session {i}', start_time=start + timedelta(hours=i),
+                                       end_time=start + timedelta(hours=i, minutes=45)))
+        db.session.commit()
+        token = create_access_token(identity=str(trainer.id))
+        yield {'Authorization': f'Bearer {token}'}
+
+
+class TestLoadingProfiles:
+    """Test eager loading keeps list endpoints within budget."""
+
+    def test_appointment_page_within_budget(self, test_app, trainer_page):
+        """Test a 50-row appointments page does not issue a query per row."""
+        response = test_app.test_client().get('/api/appointments?per_page=50', headers=trainer_page)
+
+        assert response.status_code == 200
+        appointments = response.get_json()['appointments']
+        assert len(appointments) == 50
+        assert appointments[0]['beneficiary']['first_name'] == 'Test'
+        assert int(response.headers['X-Query-Count']) <= 8
+
+    def test_guard_fails_requests_over_budget(self, test_app, trainer_page):
+        """Test the guard raises when a view exceeds its declared budget."""
+        view = test_app.view_functions['appointments.get_appointments']
+        budget = view.query_budget
+        view.query_budget = 1
+        try:
+            with pytest.raises(QueryBudgetExceeded):
+                test_app.test_client().get('/api/appointments', headers=trainer_page)
+        finally:
+            view.query_budget = budget
+
+    def test_dynamic_relationships_are_rejected(self, test_app, monkeypatch):
+        """Test profiles cannot name relationships that cannot be eager loaded."""
+        from app.utils import loading
+        monkeypatch.setitem(loading.LOADING_PROFILES, 'broken', ('Beneficiary', ('appointments',)))
+
+        with test_app.app_context(), pytest.raises(ValueError):
+            loading_options('broken')
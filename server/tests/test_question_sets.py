@@ -0,0 +1,74 @@
+"""Tests for cached client question sets."""
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app.extensions import db
+from app.models import TestSet, Question
+from app.services.evaluation_service import QuestionService
+from app.services.question_sets import QuestionSetCache, question_sets
+
+
+@pytest.fixture
+def quiz(test_app, make_tenant, make_user):
+    """A draft test set with two questions, a trainer and a student."""
+    with test_app.app_context():
+        tenant = make_tenant()
+        users = {role: make_user(role, tenant).id for role in ('trainer', 'student')}
+        test_set = TestSet(tenant_id=tenant.id, creator_id=users['trainer'], title='Quiz', status='draft')
+        db.session.add(test_set)
+        db.session.flush()
+        second = Question(test_set_id=test_set.id, text='Sky blue?', type='true_false',
+                          correct_answer=True, explanation='Rayleigh', points=1.0, order=1)
+        first = Question(test_set_id=test_set.id, text='2 + 2?', type='multiple_choice',
+                         options=['3', '4'], correct_answer='4', points=2.0, order=0)
+        db.session.add_all([second, first])
+        db.session.commit()
+        yield {'test_set_id': test_set.id, 'question_id': first.id, **users}
+
+
+class TestQuestionSets:
+    """Test question sets are built once per version and served without answers."""
+
+    def test_cached_until_edited(self, test_app, quiz, monkeypatch):
+        """Test one build per version, with answers stripped."""
+        loads = []
+        load = QuestionSetCache._load
+        monkeypatch.setattr(QuestionSetCache, '_load',
+                            staticmethod(lambda test_set_id: loads.append(test_set_id) or load(test_set_id)))
+        with test_app.app_context():
+            question_set = question_sets.get(quiz['test_set_id'])
+            assert question_sets.get(quiz['test_set_id']) is question_set
+            assert len(loads) == 1
+            assert [q['text'] for q in question_set.data['questions']] == ['2 + 2?', 'Sky blue?']
+            assert 'correct_answer' not in question_set.body and 'Rayleigh' not in question_set.body
+
+            QuestionService.update_question(quiz['question_id'], {'text': 'What is 2 + 2?'})
+            edited = question_sets.get(quiz['test_set_id'])
+            assert edited.version != question_set.version
+            assert edited.data['questions'][0]['text'] == 'What is 2 + 2?'
+            assert len(loads) == 2
+
+    def test_endpoint_revalidates(self, test_app, quiz):
+        """Test students get published sets and a 304 until the questions change."""
+        with test_app.app_context():
+            trainer = {'Authorization': f"Bearer {create_access_token(identity=str(quiz['trainer']))}"}
+            student = {'Authorization': f"Bearer {create_access_token(identity=str(quiz['student']))}"}
+        client = test_app.test_client()
+        url = f"/api/evaluations/test-sets/{quiz['test_set_id']}/questions"
+
+        assert client.get(url, headers=student).status_code == 403
+        response = client.post(f"/api/evaluations/test-sets/{quiz['test_set_id']}/publish", headers=trainer)
+        assert (response.status_code, response.get_json()['status']) == (200, 'active')
+
+        response = client.get(url, headers=student)
+        assert response.status_code == 200
+        assert len(response.get_json()['questions']) == 2
+        etag = response.headers['ETag']
+        assert client.get(url, headers={**student, 'If-None-Match': etag}).status_code == 304
+
+        with test_app.app_context():
+            QuestionService.update_question(quiz['question_id'], {'points': 3.0})
+        response = client.get(url, headers={**student, 'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.get_json()['questions'][0]['points'] == 3.0
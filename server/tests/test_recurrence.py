@@ -0,0 +1,120 @@
+"""Tests for recurring availability expansion."""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from flask_jwt_extended import create_access_token
+
+from app.extensions import db
+from app.models import Beneficiary, Appointment
+from app.models.availability import AvailabilitySchedule, AvailabilitySlot
+from app.services.recurrence import RecurrenceEngine
+
+MONDAY = datetime(2026, 10, 19)
+
+
+def slot(day, start, end, available=True, id=1):
+    return SimpleNamespace(id=id, day_of_week=day, start_time=start, end_time=end, is_available=available)
+
+
+def appointment(start, end, id=1, status='scheduled'):
+    return SimpleNamespace(id=id, start_time=start, end_time=end, status=status, title='A')
+
+
+def exception(date, start=None, end=None, available=False, id=1):
+    return SimpleNamespace(id=id, date=date, start_time=start, end_time=end, is_available=available,
+                           title='Exception', description=None)
+
+
+def hours(windows):
+    return [(w.start.strftime('%H:%M'), w.end.strftime('%H:%M')) for w in windows]
+
+
+class TestRecurrenceEngine:
+    """Test slot expansion."""
+
+    def test_expands_weekly_slots_lazily(self, test_app):
+        """Test slots repeat on their weekday and days are generated on demand."""
+        with test_app.app_context():
+            engine = RecurrenceEngine([slot(0, '09:00', '12:00')])
+
+            days = engine.days(MONDAY, MONDAY + timedelta(days=365))
+            first = next(days)
+            plans = [first] + [next(days) for _ in range(7)]
+
+            assert hours(first.available) == [('09:00', '12:00')]
+            assert [len(p.available) for p in plans] == [1, 0, 0, 0, 0, 0, 0, 1]
+
+    def test_free_windows_subtract_appointments_and_exceptions(self, test_app):
+        """Test booked and blocked time is cut out of available slots."""
+        with test_app.app_context():
+            engine = RecurrenceEngine(
+                [slot(0, '09:00', '17:00')],
+                exceptions=[exception(MONDAY, '15:00', '16:00')],
+                appointments=[appointment(MONDAY.replace(hour=10), MONDAY.replace(hour=11)),
+                              appointment(MONDAY.replace(hour=10, minute=30), MONDAY.replace(hour=12))]
+            )
+
+            free = [window for _, window in engine.free_windows(MONDAY, MONDAY)]
+
+            assert hours(free) == [('09:00', '10:00'), ('12:00', '15:00'), ('16:00', '17:00')]
+
+    def test_all_day_exception_replaces_slots(self, test_app):
+        """Test an all-day blocking exception removes the day's slots."""
+        with test_app.app_context():
+            engine = RecurrenceEngine([slot(0, '09:00', '17:00')], exceptions=[exception(MONDAY)])
+
+            plan = engine.day(MONDAY.date())
+
+            assert plan.available == []
+            assert hours(plan.unavailable) == [('00:00', '23:59')]
+
+    def test_appointments_are_converted_to_schedule_time(self, test_app):
+        """Test UTC appointments land on the schedule's local wall clock."""
+        with test_app.app_context():
+            # 07:00 UTC is 09:00 in Istanbul (UTC+3)
+            engine = RecurrenceEngine(
+                [slot(0, '09:00', '12:00')],
+                appointments=[appointment(MONDAY.replace(hour=6), MONDAY.replace(hour=7))],
+                time_zone='Europe/Istanbul'
+            )
+
+            free = [window for _, window in engine.free_windows(MONDAY, MONDAY)]
+
+            assert hours(free) == [('10:00', '12:00')]
+            assert free[0].start.utcoffset() == timedelta(hours=3)
+
+
+class TestCalendarEvents:
+    """Test the calendar endpoint uses the engine."""
+
+    def test_trainer_calendar_splits_booked_slots(self, test_app, make_tenant, make_user):
+        """Test availability events exclude booked time."""
+        with test_app.app_context():
+            tenant = make_tenant()
+            trainer = make_user('trainer', tenant)
+            student = make_user('student', tenant)
+            beneficiary = Beneficiary(user_id=student.id, tenant_id=tenant.id, trainer_id=trainer.id)
+            schedule = AvailabilitySchedule(user_id=trainer.id, is_active=True, time_zone='UTC')
+            db.session.add_all([beneficiary, schedule])
+            db.session.flush()
+            db.session.add(AvailabilitySlot(schedule_id=schedule.id, day_of_week=0,
+                                            start_time='09:00', end_time='12:00'))
+            db.session.add(Appointment(beneficiary_id=beneficiary.id, trainer_id=trainer.id,
+                                       title='Session', start_time=MONDAY.replace(hour=10),
+                                       end_time=MONDAY.replace(hour=11)))
+            db.session.commit()
+            headers = {'Authorization': f'Bearer {create_access_token(identity=str(trainer.id))}'}
+
+        # Called directly: the URL is also claimed by the Google Calendar listing
+        view = test_app.view_functions['calendar.get_calendar_events']
+        with test_app.test_request_context('/api/calendar/events?start=2026-10-19&end=2026-10-19',
+                                           headers=headers):
+            response, status = view()
+
+        assert status == 200
+        events = response.get_json()['events']
+        assert [e['type'] for e in events].count('appointment') == 1
+        available = sorted((e['start'], e['end']) for e in events if e['type'] == 'availability')
+        assert available == [('2026-10-19T09:00:00', '2026-10-19T10:00:00'),
+                             ('2026-10-19T11:00:00', '2026-10-19T12:00:00')]
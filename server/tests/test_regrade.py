@@ -0,0 +1,147 @@
+"""Tests for re-grade jobs."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app.extensions import db
+from app.models import Beneficiary, TestSet, Question, TestSession, Response, RegradeJob
+from app.services.evaluation_service import QuestionService
+from app.services.regrade import RegradeService
+from app.services.scoring import question_cache
+
+
+@pytest.fixture
+def graded(test_app, make_tenant, make_user):
+    """Six completed sessions, graded against a key that is about to change."""
+    test_app.config['REGRADE_CHUNK_SIZE'] = 4
+    with test_app.app_context():
+        tenant = make_tenant()
+        trainer = make_user('trainer', tenant)
+        test_set = TestSet(tenant_id=tenant.id, creator_id=trainer.id, title='Quiz', passing_score=75)
+        db.session.add(test_set)
+        db.session.flush()
+        wrong_key = Question(test_set_id=test_set.id, text='2 + 2?', type='multiple_choice',
+                             correct_answer='a', points=1.0, order=0)
+        other = Question(test_set_id=test_set.id, text='Sky blue?', type='true_false',
+                         correct_answer=True, points=1.0, order=1)
+        db.session.add_all([wrong_key, other])
+        db.session.flush()
+        session_ids = []
+        for index in range(6):
+            student = make_user('student', tenant)
+            beneficiary = Beneficiary(user_id=student.id, tenant_id=tenant.id)
+            db.session.add(beneficiary)
+            db.session.flush()
+            # Everyone answered 'b', which the old key marked wrong
+            session = TestSession(test_set_id=test_set.id, beneficiary_id=beneficiary.id,
+                                  status='completed', score=1.0, max_score=2.0, passed=False)
+            db.session.add(session)
+            db.session.flush()
+            db.session.add_all([
+                Response(session_id=session.id, question_id=wrong_key.id, answer='b', is_correct=False, score=0),
+                Response(session_id=session.id, question_id=other.id, answer=True, is_correct=True, score=1.0)])
+            session_ids.append(session.id)
+        db.session.commit()
+        yield {'test_set_id': test_set.id, 'question_id': wrong_key.id, 'session_ids': session_ids,
+               'trainer_id': trainer.id}
+        question_cache.invalidate()
+    test_app.config['REGRADE_CHUNK_SIZE'] = 500
+
+
+class TestRegradeJobs:
+    """Test answer key changes re-grade stored responses."""
+
+    def test_key_change_queues_and_runs(self, test_app, graded):
+        """Test editing the key queues one job that fixes every session."""
+        with test_app.app_context():
+            QuestionService.update_question(graded['question_id'], {'correct_answer': 'b'})
+            QuestionService.update_question(graded['question_id'], {'points': 2.0})
+            QuestionService.update_question(graded['question_id'], {'text': 'What is 2 + 2?'})
+            jobs = RegradeJob.query.filter_by(test_set_id=graded['test_set_id']).all()
+            assert [(job.status, job.question_ids) for job in jobs] == [('pending', [graded['question_id']])]
+
+            assert RegradeService.run_pending() == 1
+            job = db.session.get(RegradeJob, jobs[0].id)
+            assert (job.status, job.total_responses, job.processed_responses, job.changed_responses,
+                    job.sessions_updated) == ('completed', 6, 6, 6, 6)
+            assert job.to_dict()['progress'] == 100.0
+
+            sessions = TestSession.query.filter(TestSession.id.in_(graded['session_ids'])).all()
+            assert {(s.score, s.max_score, s.passed) for s in sessions} == {(3.0, 3.0, True)}
+            assert RegradeService.run_pending() == 0
+
+    def test_chunks_resume(self, test_app, graded):
+        """Test progress is committed per chunk and a resumed job skips finished sessions."""
+        with test_app.app_context():
+            Question.query.filter_by(id=graded['question_id']).update({'correct_answer': 'b'})
+            db.session.commit()
+            job = RegradeService.enqueue(graded['test_set_id'], reason='manual')
+            # An earlier run finished the first chunk before stopping
+            job.status, job.claimed_by = 'running', 'crashed-worker'
+            job.total_responses, job.processed_responses = 12, 8
+            job.last_session_id = graded['session_ids'][3]
+            db.session.commit()
+
+            progress = []
+            job = RegradeService.run(job, progress=lambda job: progress.append(job.processed_responses))
+            assert progress == [12]
+            assert (job.status, job.changed_responses) == ('completed', 2)
+            passed = [s.passed for s in TestSession.query.filter(TestSession.id.in_(graded['session_ids']))
+                      .order_by(TestSession.id)]
+            assert passed == [False] * 4 + [True] * 2
+
+    def test_live_claim_is_not_taken_over(self, test_app, graded):
+        """Test a running job is only claimable once its heartbeat is stale."""
+        with test_app.app_context():
+            job = RegradeService.enqueue(graded['test_set_id'], reason='manual')
+            job.status, job.claimed_by, job.claimed_at = 'running', 'live-worker', datetime.utcnow()
+            db.session.commit()
+
+            assert RegradeService.run_pending() == 0
+            assert not RegradeService.heartbeat(job.id)
+
+            job = db.session.get(RegradeJob, job.id)
+            job.claimed_at = datetime.utcnow() - timedelta(seconds=test_app.config['REGRADE_CLAIM_TIMEOUT'] + 1)
+            db.session.commit()
+            assert RegradeService.run_pending() == 1
+            assert db.session.get(RegradeJob, job.id).status == 'completed'
+
+    def test_lost_claim_stops_run(self, test_app, graded):
+        """Test a worker whose job was taken over stops before the next chunk."""
+        with test_app.app_context():
+            job = RegradeService.enqueue(graded['test_set_id'], reason='manual')
+            assert RegradeService.claim(job.id, datetime.utcnow())
+            RegradeJob.query.filter_by(id=job.id).update({'claimed_by': 'new-leader'})
+            db.session.commit()
+
+            job = RegradeService.run(db.session.get(RegradeJob, job.id))
+            assert (job.status, job.claimed_by, job.processed_responses) == ('running', 'new-leader', 0)
+
+    def test_sync_runs_inline(self, test_app, graded):
+        """Test REGRADE_SYNC runs queued jobs in the request that queues them."""
+        test_app.config['REGRADE_SYNC'] = True
+        try:
+            with test_app.app_context():
+                job = RegradeService.enqueue(graded['test_set_id'], reason='manual')
+                assert (job.status, job.processed_responses) == ('completed', 12)
+        finally:
+            test_app.config['REGRADE_SYNC'] = False
+
+    def test_endpoints(self, test_app, graded):
+        """Test staff queue a re-grade and poll its progress."""
+        with test_app.app_context():
+            token = create_access_token(identity=str(graded['trainer_id']))
+        client = test_app.test_client()
+        headers = {'Authorization': f'Bearer {token}'}
+
+        response = client.post(f"/api/evaluations/test-sets/{graded['test_set_id']}/regrade", headers=headers)
+        assert response.status_code == 202
+        job_id = response.get_json()['id']
+
+        with test_app.app_context():
+            RegradeService.run_pending()
+        response = client.get(f'/api/evaluations/regrade-jobs/{job_id}', headers=headers)
+        assert response.status_code == 200
+        assert (response.get_json()['status'], response.get_json()['sessions_updated']) == ('completed', 6)
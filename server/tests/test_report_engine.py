@@ -0,0 +1,257 @@
+"""Tests for the declarative report engine."""
+
+import csv
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, text
+
+from app.extensions import db
+from app.models import Beneficiary
+from app.models.program import Program, ProgramEnrollment, TrainingSession, SessionAttendance
+from app.models.report import Report
+from app.models.test import TestSet, TestSession
+from app.services.report_engine import PreviewTimeout, ReportDefinitionError, ReportEngine, statement_timeout
+
+
+@pytest.fixture
+def tenant_data(test_app, make_tenant, make_user):
+    """Two trainers, three beneficiaries with scores, and a program with attendance."""
+    with test_app.app_context():
+        tenant = make_tenant()
+        admin = make_user('tenant_admin', tenant)
+        ada, bob = make_user('trainer', tenant, first_name='Ada'), make_user('trainer', tenant, first_name='Bob')
+
+        beneficiaries = []
+        for trainer, status in ((ada, 'active'), (ada, 'active'), (bob, 'inactive')):
+            student = make_user('student', tenant)
+            beneficiary = Beneficiary(user_id=student.id, tenant_id=tenant.id, trainer_id=trainer.id,
+                                      status=status)
+            db.session.add(beneficiary)
+            beneficiaries.append(beneficiary)
+        db.session.flush()
+
+        test_set = TestSet(tenant_id=tenant.id, creator_id=ada.id, title='Quiz')
+        db.session.add(test_set)
+        db.session.flush()
+        for beneficiary, scores in zip(beneficiaries, ([80, 90], [60], [])):
+            for score in scores:
+                db.session.add(TestSession(test_set_id=test_set.id, beneficiary_id=beneficiary.id,
+                                           status='completed', score=score, end_time=datetime.utcnow()))
+        db.session.add(TestSession(test_set_id=test_set.id, beneficiary_id=beneficiaries[1].id,
+                                   status='in_progress', score=0))
+
+        program = Program(name='Program', code=f'P-{uuid.uuid4().hex[:8]}', status='active',
+                          tenant_id=tenant.id, created_by_id=admin.id)
+        db.session.add(program)
+        db.session.flush()
+        for beneficiary, status in zip(beneficiaries, ('enrolled', 'completed', 'enrolled')):
+            db.session.add(ProgramEnrollment(program_id=program.id, beneficiary_id=beneficiary.id,
+                                             status=status))
+        for days_ago in (2, 1):
+            session = TrainingSession(program_id=program.id, trainer_id=ada.id, title='S',
+                                      session_date=datetime.utcnow() - timedelta(days=days_ago))
+            db.session.add(session)
+            db.session.flush()
+            for beneficiary, status in zip(beneficiaries, ('present', 'present', 'absent')):
+                db.session.add(SessionAttendance(session_id=session.id, beneficiary_id=beneficiary.id,
+                                                 status=status, rating=4))
+        db.session.commit()
+
+        yield {'tenant_id': tenant.id, 'admin_id': admin.id, 'ada_id': ada.id}
+
+
+def run(report_type, parameters, tenant_id):
+    """Rows of a report and the number of statements executed."""
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        rows = ReportEngine.rows(report_type, parameters, tenant_id)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return rows, len(statements)
+
+
+class TestReportEngine:
+    """Test definitions compile to one aggregate query."""
+
+    def test_beneficiary_report(self, test_app, tenant_data):
+        """Test per-beneficiary averages come from one statement."""
+        with test_app.app_context():
+            rows, statements = run('beneficiary', {'fields': ['trainer', 'status', 'test_score']},
+                                   tenant_data['tenant_id'])
+            assert statements == 1
+            assert rows == [
+                {'Assigned Trainer': 'Ada Trainer', 'Status': 'active', 'Average Test Score': 85.0},
+                {'Assigned Trainer': 'Ada Trainer', 'Status': 'active', 'Average Test Score': 60.0},
+                {'Assigned Trainer': 'Bob Trainer', 'Status': 'inactive', 'Average Test Score': 0.0},
+            ]
+
+    def test_filters_and_grouping(self, test_app, tenant_data):
+        """Test filters on dimensions and measures, and grouped rollups."""
+        with test_app.app_context():
+            tenant_id = tenant_data['tenant_id']
+            rows, _ = run('beneficiary', {'fields': ['test_score'],
+                                          'filters': {'status': 'active', 'test_score_range': {'min': 70}}},
+                          tenant_id)
+            assert rows == [{'Average Test Score': 85.0}]
+
+            rows, statements = run('beneficiary', {'fields': ['test_score'], 'groupBy': ['trainer']},
+                                   tenant_id)
+            assert statements == 1
+            assert rows == [
+                {'Assigned Trainer': 'Ada Trainer', 'Average Test Score': 72.5, 'Count': 2},
+                {'Assigned Trainer': 'Bob Trainer', 'Average Test Score': 0.0, 'Count': 1},
+            ]
+
+    def test_program_and_trainer_reports(self, test_app, tenant_data):
+        """Test enrollment and attendance aggregates across sessions."""
+        with test_app.app_context():
+            tenant_id = tenant_data['tenant_id']
+            rows, statements = run('program', {}, tenant_id)
+            assert statements == 1
+            assert len(rows) == 1
+            assert rows[0]['Enrollment Count'] == 3
+            assert rows[0]['Completed Enrollments'] == 1
+            assert rows[0]['Completion Rate'] == '33.3%'
+            assert rows[0]['Attendance Rate'] == '66.7%'
+
+            rows, _ = run('trainer', {'fields': ['name', 'beneficiary_count', 'programs', 'performance_rating'],
+                                      'sortBy': [{'field': 'beneficiary_count', 'direction': 'desc'}]},
+                          tenant_id)
+            assert rows == [
+                {'Trainer Name': 'Ada Trainer', 'Beneficiary Count': 2, 'Assigned Programs': 1,
+                 'Performance Rating': 4.0},
+                {'Trainer Name': 'Bob Trainer', 'Beneficiary Count': 1, 'Assigned Programs': 0,
+                 'Performance Rating': 0.0},
+            ]
+
+    def test_trainer_report_counts_only_tenant_rows(self, test_app, tenant_data, make_tenant, make_user):
+        """Test a trainer's beneficiaries and sessions in other tenants are not counted."""
+        with test_app.app_context():
+            other = make_tenant(name='O')
+            admin = make_user('tenant_admin', other)
+            student = make_user('student', other)
+            beneficiary = Beneficiary(user_id=student.id, tenant_id=other.id, trainer_id=tenant_data['ada_id'])
+            program = Program(name='Other', code=f'P-{uuid.uuid4().hex[:8]}', status='active',
+                              tenant_id=other.id, created_by_id=admin.id)
+            db.session.add_all([beneficiary, program])
+            db.session.flush()
+            session = TrainingSession(program_id=program.id, trainer_id=tenant_data['ada_id'], title='S',
+                                      session_date=datetime.utcnow())
+            db.session.add(session)
+            db.session.flush()
+            db.session.add(SessionAttendance(session_id=session.id, beneficiary_id=beneficiary.id,
+                                             status='present', rating=1))
+            db.session.commit()
+
+            rows, _ = run('trainer', {'fields': ['name', 'beneficiary_count', 'programs', 'performance_rating']},
+                          tenant_data['tenant_id'])
+            ada = next(row for row in rows if row['Trainer Name'] == 'Ada Trainer')
+            assert (ada['Beneficiary Count'], ada['Assigned Programs'], ada['Performance Rating']) == (2, 1, 4.0)
+
+    def test_performance_defaults_to_completed(self, test_app, tenant_data):
+        """Test the performance report lists completed sessions in the date range."""
+        with test_app.app_context():
+            rows, _ = run('performance', {'dateRange': '7days'}, tenant_data['tenant_id'])
+            assert sorted(row['Score'] for row in rows) == [60.0, 80.0, 90.0]
+            assert {row['Test Name'] for row in rows} == {'Quiz'}
+
+    def test_tenant_isolation_and_errors(self, test_app, tenant_data, make_tenant):
+        """Test rows of other tenants are excluded and bad definitions raise."""
+        with test_app.app_context():
+            other = make_tenant(name='O')
+            db.session.commit()
+            assert ReportEngine.rows('beneficiary', {}, other.id) == []
+
+            with pytest.raises(ReportDefinitionError):
+                ReportEngine.rows('beneficiary', {'fields': ['salary']})
+            with pytest.raises(ReportDefinitionError):
+                ReportEngine.rows('beneficiary', {'groupBy': ['test_score']})
+            with pytest.raises(ReportDefinitionError):
+                ReportEngine.rows('analytics', {})
+
+
+
+class TestReportPreview:
+    """Test previews sample the real query within a budget."""
+
+    def test_sample_total_and_summary(self, test_app, tenant_data):
+        """Test a limited sample with an exact total and summary aggregates."""
+        with test_app.app_context():
+            definition = ReportEngine.definition('beneficiary', {'fields': ['name', 'test_score']})
+            preview = ReportEngine.preview(definition, tenant_data['tenant_id'], limit=2)
+            assert len(preview['rows']) == 2
+            assert set(preview['rows'][0]) == {'name', 'test_score'}
+            assert preview['total'] == 3 and not preview['total_estimated']
+            assert preview['summary'] == [{'id': 'test_score', 'name': 'Average Test Score', 'value': 48.33}]
+            assert not preview['timed_out']
+
+    def test_capped_count_is_estimated(self, test_app, tenant_data):
+        """Test totals past the count cap are flagged as estimates."""
+        test_app.config['REPORT_PREVIEW_COUNT_CAP'] = 2
+        try:
+            with test_app.app_context():
+                preview = ReportEngine.preview(ReportEngine.definition('beneficiary', {}),
+                                               tenant_data['tenant_id'], limit=1)
+        finally:
+            test_app.config['REPORT_PREVIEW_COUNT_CAP'] = 10000
+        assert preview['total'] == 2
+        assert preview['total_estimated']
+
+    def test_statement_timeout_interrupts(self, test_app):
+        """Test a long statement is cancelled at the deadline."""
+        endless = text('WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000000) '
+                       'SELECT count(*) FROM c')
+        with test_app.app_context():
+            with pytest.raises(PreviewTimeout):
+                with statement_timeout(50):
+                    db.session.execute(endless)
+            assert db.session.execute(text('SELECT 1')).scalar() == 1
+
+    def test_preview_endpoint(self, test_app, tenant_data):
+        """Test the endpoint returns summary and table sections."""
+        with test_app.app_context():
+            token = create_access_token(identity=str(tenant_data['admin_id']))
+        response = test_app.test_client().post('/api/reports/preview', headers={'Authorization': f'Bearer {token}'},
+                                               json={'type': 'program', 'fields': ['name', 'enrollment_count']})
+        assert response.status_code == 200
+        summary, table = response.get_json()['sections']
+        assert summary['metrics'][0] == {'id': 'total', 'name': 'Total Rows', 'value': '1'}
+        assert table['data'] == [{'name': 'Program', 'enrollment_count': 3}]
+
+class TestReportEndpoints:
+    """Test report runs go through the engine."""
+
+    def test_run_writes_csv(self, test_app, tenant_data, tmp_path, monkeypatch):
+        """Test running a saved report writes the engine's rows."""
+        monkeypatch.chdir(tmp_path)
+        with test_app.app_context():
+            report = Report(name='Programs', type='program', format='csv',
+                            parameters={'fields': ['name', 'enrollment_count']},
+                            created_by_id=tenant_data['admin_id'], tenant_id=tenant_data['tenant_id'])
+            db.session.add(report)
+            db.session.commit()
+            report_id = report.id
+            token = create_access_token(identity=str(tenant_data['admin_id']))
+
+        response = test_app.test_client().post(f'/api/reports/{report_id}/run',
+                                               headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200
+        with open(response.get_json()['file_path'], newline='', encoding='utf-8') as f:
+            assert list(csv.DictReader(f)) == [{'Program Name': 'Program', 'Enrollment Count': '3'}]
+
+    def test_fields_come_from_the_engine(self, test_app, tenant_data):
+        """Test the field catalog matches the engine's definitions."""
+        with test_app.app_context():
+            token = create_access_token(identity=str(tenant_data['admin_id']))
+        response = test_app.test_client().get('/api/reports/fields/program',
+                                              headers={'Authorization': f'Bearer {token}'})
+        assert [field['id'] for field in response.get_json()] == \
+            [field['id'] for field in ReportEngine.field_catalog('program')]
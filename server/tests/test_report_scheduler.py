@@ -0,0 +1,186 @@
+"""Tests for the scheduler and scheduled report runs."""
+
+import csv
+import uuid
+from datetime import datetime, timedelta, time
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.extensions import db
+from app.models import Beneficiary
+from app.models.notification import Notification
+from app.models.report import Report, ReportSchedule, ReportRun
+from app.models.test import TestSet, TestSession
+from app.services.report_runner import ReportRunner
+from app.services.scheduler import CronExpression, Scheduler
+
+
+class TestCronExpression:
+    """Test cron parsing and next fire times."""
+
+    def test_fields_and_aliases(self):
+        """Test steps, ranges, names and aliases."""
+        cron = CronExpression('*/15 9-17 * jan-mar mon-fri')
+        assert cron.minutes == {0, 15, 30, 45}
+        assert cron.hours == set(range(9, 18))
+        assert cron.months == {1, 2, 3}
+        assert cron.weekdays == {1, 2, 3, 4, 5}
+        assert CronExpression('@daily').next_after(datetime(2024, 5, 1, 12, 0)) == datetime(2024, 5, 2)
+
+        for invalid in ('* * *', '61 * * * *', '*/0 * * * *', '0 0 * * fri-mon'):
+            with pytest.raises(ValueError):
+                CronExpression(invalid)
+
+    def test_next_after(self):
+        """Test weekday, day-of-month and time zone handling."""
+        # 2024-05-01 is a Wednesday
+        assert CronExpression('30 2 * * 1').next_after(datetime(2024, 5, 1, 3, 0)) == datetime(2024, 5, 6, 2, 30)
+        assert CronExpression('0 0 31 * *').next_after(datetime(2024, 4, 15)) == datetime(2024, 5, 31)
+        # Either day field may match when both are restricted
+        assert CronExpression('0 0 15 * 5').next_after(datetime(2024, 5, 1)) == datetime(2024, 5, 3)
+        # 02:00 in Istanbul (UTC+3) is 23:00 UTC the day before
+        assert CronExpression('0 2 * * *').next_after(datetime(2024, 5, 1, 0, 0), ZoneInfo('Europe/Istanbul')) \
+            == datetime(2024, 5, 1, 23, 0)
+        with pytest.raises(ValueError):
+            CronExpression('0 0 30 2 *').next_after(datetime(2024, 1, 1))
+
+
+class TestSchedulerLease:
+    """Test only one scheduler runs jobs at a time."""
+
+    def test_single_leader(self, test_app):
+        """Test the lease is exclusive until released or expired."""
+        with test_app.app_context():
+            first, second = Scheduler(test_app), Scheduler(test_app)
+            first.lease_name = second.lease_name = f'lease-{uuid.uuid4().hex[:8]}'
+            runs = []
+            first.register('job', lambda now: runs.append('first'))
+            second.register('job', lambda now: runs.append('second'))
+            assert first.holder != second.holder
+
+            now = datetime.utcnow()
+            assert first.tick(now)
+            assert not second.tick(now)
+            assert first.tick(now + timedelta(seconds=10))
+            assert runs == ['first', 'first']
+
+            # The lease expires if the leader stops renewing it
+            expired = now + timedelta(seconds=10 + first.lease_ttl + 1)
+            assert second.tick(expired)
+            assert not first.acquire_lease(expired)
+
+            second.release_lease()
+            assert first.acquire_lease(expired)
+
+
+def read_csv(path):
+    """Rows of a CSV artifact."""
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+class TestScheduledReports:
+    """Test scheduled runs are versioned and refreshed incrementally."""
+
+    @pytest.fixture
+    def scheduled(self, test_app, tmp_path, make_tenant, make_user):
+        """A beneficiary report on a daily schedule with three beneficiaries."""
+        test_app.config['REPORT_ARTIFACT_DIR'] = str(tmp_path)
+        with test_app.app_context():
+            tenant = make_tenant()
+            admin = make_user('tenant_admin', tenant)
+            test_set = TestSet(tenant_id=tenant.id, creator_id=admin.id, title='Quiz')
+            db.session.add(test_set)
+            beneficiaries = []
+            for status in ('active', 'active', 'active'):
+                beneficiary = Beneficiary(user_id=make_user('student', tenant).id, tenant_id=tenant.id,
+                                          status=status)
+                db.session.add(beneficiary)
+                beneficiaries.append(beneficiary)
+            db.session.flush()
+
+            report = Report(name='Scores', type='beneficiary', format='csv', created_by_id=admin.id,
+                            tenant_id=tenant.id, parameters={
+                                'fields': ['status', 'test_score'],
+                                'filters': {'status': 'active'},
+                                'sortBy': [{'field': 'test_score', 'direction': 'desc'}]})
+            db.session.add(report)
+            db.session.flush()
+            schedule = ReportSchedule(report_id=report.id, frequency='daily', schedule_time=time(2, 0),
+                                      recipients=[])
+            db.session.add(schedule)
+            db.session.commit()
+            yield {'report_id': report.id, 'schedule_id': schedule.id, 'admin_id': admin.id,
+                   'test_set_id': test_set.id, 'beneficiary_ids': [b.id for b in beneficiaries]}
+            ReportSchedule.query.filter_by(id=schedule.id).update({'is_active': False})
+            db.session.commit()
+
+    def test_incremental_refresh(self, test_app, scheduled):
+        """Test the second run recomputes only changed rows and merges the rest."""
+        with test_app.app_context():
+            first_id, second_id, _ = scheduled['beneficiary_ids']
+            # Start after the fixture's writes so only later updates count as changes
+            now = datetime.utcnow().replace(microsecond=0) + timedelta(hours=1)
+
+            # A new schedule is only given its next slot
+            assert ReportRunner.run_due(now) == 0
+            schedule = ReportSchedule.query.get(scheduled['schedule_id'])
+            assert schedule.next_run == ReportRunner.next_run(schedule, now)
+            assert schedule.next_run.time() == time(2, 0)
+
+            schedule.next_run = now - timedelta(minutes=1)
+            db.session.commit()
+            assert ReportRunner.run_due(now) == 1
+            first = ReportRun.query.filter_by(report_id=scheduled['report_id'], version=1).one()
+            assert (first.status, first.mode, first.row_count) == ('completed', 'full', 3)
+            assert read_csv(first.file_path) == [{'Status': 'active', 'Average Test Score': '0.0'}] * 3
+
+            # One beneficiary scores, the other stops matching the filter
+            later = now + timedelta(hours=1)
+            db.session.add(TestSession(test_set_id=scheduled['test_set_id'], beneficiary_id=first_id,
+                                       status='completed', score=75, updated_at=later))
+            Beneficiary.query.filter_by(id=second_id).update({'status': 'inactive', 'updated_at': later})
+            schedule = ReportSchedule.query.get(scheduled['schedule_id'])
+            schedule.next_run = later
+            db.session.commit()
+
+            assert ReportRunner.run_due(later + timedelta(minutes=1)) == 1
+            second = ReportRun.query.filter_by(report_id=scheduled['report_id'], version=2).one()
+            assert (second.status, second.mode, second.row_count, second.changed_rows) == \
+                ('completed', 'incremental', 2, 2)
+            assert read_csv(second.file_path) == [{'Status': 'active', 'Average Test Score': '75.0'},
+                                                  {'Status': 'active', 'Average Test Score': '0.0'}]
+            assert read_csv(first.file_path) != read_csv(second.file_path)
+
+            report = Report.query.get(scheduled['report_id'])
+            assert (report.file_path, report.run_count, report.status) == (second.file_path, 2, 'completed')
+            schedule = ReportSchedule.query.get(scheduled['schedule_id'])
+            assert schedule.claimed_by is None and schedule.last_error is None
+            assert schedule.next_run > later
+
+            notifications = Notification.query.filter_by(user_id=scheduled['admin_id'], type='report').all()
+            assert len(notifications) == 2
+            assert notifications[-1].related_id == report.id
+
+    def test_changed_definition_runs_full(self, test_app, scheduled):
+        """Test cached rows are not reused after the definition changes."""
+        with test_app.app_context():
+            report = Report.query.get(scheduled['report_id'])
+            assert ReportRunner.run_report(report).mode == 'full'
+            assert ReportRunner.run_report(report).mode == 'incremental'
+
+            report.parameters = dict(report.parameters, fields=['status'])
+            db.session.commit()
+            run = ReportRunner.run_report(report)
+            assert (run.version, run.mode, run.row_count) == (3, 'full', 3)
+
+    def test_schedule_cron(self, test_app):
+        """Test cron expressions derived from schedule fields."""
+        with test_app.app_context():
+            weekly = ReportSchedule(frequency='weekly', day_of_week=1, schedule_time=time(6, 30))
+            monthly = ReportSchedule(frequency='monthly', day_of_month=15)
+            custom = ReportSchedule(frequency='daily', cron='0 */6 * * *')
+            assert ReportRunner.schedule_cron(weekly) == '30 6 * * 1'
+            assert ReportRunner.schedule_cron(monthly) == '0 2 15 * *'
+            assert ReportRunner.schedule_cron(custom) == '0 */6 * * *'
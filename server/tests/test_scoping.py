@@ -0,0 +1,104 @@
+"""Tests for role and tenant scoping of list queries."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.extensions import db
+from app.models import Tenant, Beneficiary, Document
+from app.models.appointment import Appointment
+from app.utils.scoping import scope_for
+
+
+@pytest.fixture
+def world(test_app, make_tenant, make_user):
+    """Two tenants, each with a trainer and two beneficiaries with documents."""
+    with test_app.app_context():
+        data = {'tenants': [], 'trainers': [], 'students': [], 'beneficiaries': []}
+        for _ in range(2):
+            tenant = make_tenant()
+            trainer = make_user('trainer', tenant)
+            data['tenants'].append(tenant)
+            data['trainers'].append(trainer)
+            for _ in range(2):
+                student = make_user('student', tenant)
+                beneficiary = Beneficiary(user_id=student.id, tenant_id=tenant.id,
+                                          trainer_id=trainer.id)
+                db.session.add(beneficiary)
+                db.session.flush()
+                db.session.add(Document(title='Doc', file_path='x.pdf', file_type='pdf',
+                                        file_size=1, upload_by=trainer.id,
+                                        beneficiary_id=beneficiary.id))
+                start = datetime.utcnow() + timedelta(days=1)
+                db.session.add(Appointment(beneficiary_id=beneficiary.id, trainer_id=trainer.id,
+                                           title='Session', start_time=start,
+                                           end_time=start + timedelta(hours=1)))
+                data['students'].append(student)
+                data['beneficiaries'].append(beneficiary)
+        db.session.commit()
+        yield data
+        db.session.rollback()
+
+
+def ids(query):
+    return {row.id for row in query.all()}
+
+
+class TestScopeFor:
+    """Test scope_for restricts queries in SQL."""
+
+    def test_student_sees_own_rows(self, world):
+        """Test a student only sees rows attached to their beneficiary."""
+        student, beneficiary = world['students'][0], world['beneficiaries'][0]
+
+        assert ids(scope_for(student, Beneficiary)) == {beneficiary.id}
+        documents = scope_for(student, Document).all()
+        assert {d.beneficiary_id for d in documents} == {beneficiary.id}
+
+    def test_trainer_sees_assigned_rows(self, world):
+        """Test a trainer sees their beneficiaries and appointments only."""
+        trainer = world['trainers'][0]
+        assigned = {b.id for b in world['beneficiaries'][:2]}
+
+        assert ids(scope_for(trainer, Beneficiary)) == assigned
+        assert {d.beneficiary_id for d in scope_for(trainer, Document)} == assigned
+        assert {a.trainer_id for a in scope_for(trainer, Appointment)} == {trainer.id}
+
+    def test_tenant_admin_sees_own_tenants(self, world, make_user):
+        """Test tenant admins see their primary and linked tenants."""
+        first, second = world['tenants']
+        admin = make_user('tenant_admin', first)
+        db.session.commit()
+
+        assert ids(scope_for(admin, Beneficiary)) == {b.id for b in world['beneficiaries'][:2]}
+
+        admin.tenants.append(second)
+        db.session.commit()
+        assert ids(scope_for(admin, Beneficiary)) == {b.id for b in world['beneficiaries']}
+
+    def test_tenant_admin_sees_unattached_documents(self, world, make_user):
+        """Test documents without a beneficiary are scoped by the uploader's tenant."""
+        first, second = world['tenants']
+        admin = make_user('tenant_admin', first)
+        own, other = (Document(title='Policy', file_path='p.pdf', file_type='pdf', file_size=1,
+                               upload_by=trainer.id) for trainer in world['trainers'])
+        db.session.add_all([own, other])
+        db.session.commit()
+
+        documents = ids(scope_for(admin, Document))
+        assert own.id in documents and other.id not in documents
+        assert len(documents) == 3
+        assert own.id not in ids(scope_for(world['trainers'][0], Document))
+
+    def test_scoping_is_a_single_query(self, world):
+        """Test the filter is a subquery rather than a list of ids."""
+        trainer = world['trainers'][0]
+
+        sql = str(scope_for(trainer, Document).statement.compile())
+
+        assert 'SELECT beneficiaries.id' in sql
+
+    def test_unknown_model_is_rejected(self, world):
+        """Test models without a scoping column raise."""
+        with pytest.raises(ValueError):
+            scope_for(world['trainers'][0], Tenant)
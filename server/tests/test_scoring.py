@@ -0,0 +1,170 @@
+"""Tests for test session scoring."""
+
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models import Beneficiary, TestSet, Question, TestSession
+from app.services.evaluation_service import QuestionService, ResponseService, TestSessionService
+from app.services.grading import compile_answer
+from app.services.scoring import QuestionMeta, ScoringService, question_cache
+
+
+@pytest.fixture
+def exam(test_app, make_tenant, make_user):
+    """A test set with ten one-point questions and an in-progress session."""
+    with test_app.app_context():
+        tenant = make_tenant()
+        users = [make_user(role, tenant) for role in ('trainer', 'student')]
+        beneficiary = Beneficiary(user_id=users[1].id, tenant_id=tenant.id)
+        test_set = TestSet(tenant_id=tenant.id, creator_id=users[0].id, title='Exam', passing_score=70)
+        db.session.add_all([beneficiary, test_set])
+        db.session.flush()
+        questions = [Question(test_set_id=test_set.id, text=f'Q{i}', type='true_false',
+                              correct_answer=True, points=1.0, order=i) for i in range(10)]
+        db.session.add_all(questions)
+        session = TestSession(test_set_id=test_set.id, beneficiary_id=beneficiary.id, status='in_progress')
+        db.session.add(session)
+        db.session.commit()
+        yield {'test_set_id': test_set.id, 'session_id': session.id, 'student_id': users[1].id,
+               'question_ids': [question.id for question in questions]}
+        question_cache.invalidate()
+
+
+def count_statements(fn, *args):
+    """Result of a call and the number of statements it executed."""
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        result = fn(*args)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return result, len(statements)
+
+
+def answer(session_id, question_id, value):
+    """Submit one answer."""
+    return ResponseService.submit_response({'session_id': session_id, 'question_id': question_id,
+                                            'answer': value})
+
+
+class TestQuestionCache:
+    """Test question metadata is cached per test set."""
+
+    def test_cached_until_edited(self, test_app, exam):
+        """Test lookups hit memory and edits invalidate the set."""
+        with test_app.app_context():
+            first_id = exam['question_ids'][0]
+            question_cache.questions(exam['test_set_id'])
+            question, statements = count_statements(question_cache.get, exam['test_set_id'], first_id)
+            assert statements == 0
+            assert (question.type, question.points, question.correct_answer) == ('true_false', 1.0, True)
+
+            QuestionService.update_question(first_id, {'points': 5.0})
+            assert question_cache.get(exam['test_set_id'], first_id).points == 5.0
+
+            # Questions of other test sets are not found
+            assert question_cache.get(exam['test_set_id'] + 1000, first_id) is None
+
+
+class TestSessionScoring:
+    """Test running totals and single-query completion."""
+
+    def test_running_totals(self, test_app, exam):
+        """Test new and changed answers adjust the session totals."""
+        with test_app.app_context():
+            first_id, second_id = exam['question_ids'][:2]
+            assert answer(exam['session_id'], first_id, True).score == 1.0
+            assert answer(exam['session_id'], second_id, False).score == 0
+            session = db.session.get(TestSession, exam['session_id'])
+            assert (session.score, session.max_score) == (1.0, 2.0)
+
+            # Correcting an answer moves the score, not the maximum
+            answer(exam['session_id'], second_id, True)
+            session = db.session.get(TestSession, exam['session_id'])
+            assert (session.score, session.max_score) == (2.0, 2.0)
+
+    def test_complete_in_constant_queries(self, test_app, exam):
+        """Test completion cost does not grow with the number of answers."""
+        with test_app.app_context():
+            for index, question_id in enumerate(exam['question_ids']):
+                answer(exam['session_id'], question_id, index < 8)
+            db.session.expire_all()
+
+            session, statements = count_statements(TestSessionService.complete_session, exam['session_id'])
+            assert statements <= 5
+            assert (session.status, session.score, session.max_score, session.passed) == \
+                ('completed', 8.0, 10.0, True)
+            assert session.time_spent is not None
+            assert ScoringService.session_totals(exam['session_id']) == (8.0, 10.0, 10)
+
+    def test_grade(self):
+        """Test answers are graded with the question's compiled key."""
+        choices = QuestionMeta(1, 1, 'multiple_choice', 2.0, ['a', 'c'], 0,
+                               compile_answer('multiple_choice', ['a', 'c']))
+        assert ScoringService.grade(choices, ['c', 'a']) == (True, 2.0)
+        assert ScoringService.grade(choices, 'a') == (False, 0)
+        essay = QuestionMeta(2, 1, 'text', 3.0, None, 1, compile_answer('text', None))
+        assert ScoringService.grade(essay, 'anything') == (None, 0)
+
+
+class TestBatchSubmission:
+    """Test many answers are saved and graded in one request."""
+
+    def test_submit_batch(self, test_app, exam):
+        """Test answers are upserted and the progress recomputed."""
+        with test_app.app_context():
+            ids = exam['question_ids']
+            answers = ResponseService.normalize_answers(
+                [{'question_id': ids[0], 'answer': True, 'time_spent': 5},
+                 {'question_id': ids[1], 'answer': False}])
+            session = db.session.get(TestSession, exam['session_id'])
+            result = ResponseService.submit_batch(session, answers)
+            assert (result['created'], result['updated']) == (2, 0)
+            assert result['progress'] == {'answered': 2, 'total_questions': 10, 'score': 1.0,
+                                          'max_score': 2.0, 'current_question': 1}
+
+            # Autosave overwrites answers and keeps reported timings
+            session = db.session.get(TestSession, exam['session_id'])
+            result, statements = count_statements(ResponseService.submit_batch, session, {
+                ids[0]: {'answer': False, 'time_spent': None},
+                ids[1]: {'answer': True, 'time_spent': None},
+                ids[2]: {'answer': True, 'time_spent': 3}})
+            assert statements <= 6
+            assert (result['created'], result['updated']) == (1, 2)
+            assert result['progress']['score'] == 2.0
+            responses = {r.question_id: r for r in ResponseService.get_responses(exam['session_id'])}
+            assert len(responses) == 3
+            assert (responses[ids[0]].is_correct, responses[ids[0]].time_spent) == (False, 5)
+
+            with pytest.raises(LookupError):
+                ResponseService.submit_batch(session, {ids[0] + 1000: {'answer': True, 'time_spent': None}})
+            for invalid in ([], [{'answer': True}], [{'question_id': ids[0]}]):
+                with pytest.raises(ValueError):
+                    ResponseService.normalize_answers(invalid)
+
+    def test_endpoint(self, test_app, exam):
+        """Test the owner saves and completes; others are refused."""
+        with test_app.app_context():
+            token = create_access_token(identity=str(exam['student_id']))
+        client = test_app.test_client()
+        url = f"/api/evaluations/sessions/{exam['session_id']}"
+        body = {'responses': [{'question_id': id, 'answer': True} for id in exam['question_ids'][:7]]}
+
+        response = client.put(f'{url}/responses', json=body, headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200
+        assert response.get_json()['progress']['answered'] == 7
+
+        response = client.post(f'{url}/submit', json=dict(body, complete_session=True),
+                               headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200
+        assert response.get_json()['session']['passed'] is True
+
+        response = client.put(f'{url}/responses', json=body, headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 409
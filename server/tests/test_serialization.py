@@ -0,0 +1,103 @@
+"""Tests for compiled projections and the JSON provider."""
+
+import json
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app.extensions import db
+from app.models import User, Document
+from app.schemas.projections import DOCUMENT
+from app.utils.serialization import Projection
+
+
+@pytest.fixture
+def uploader(test_app):
+    """A user with three documents."""
+    with test_app.app_context():
+        user = User(
+            email=f'admin_{uuid.uuid4().hex[:8]}@example.com',
+            first_name='Ada',
+            last_name='Admin',
+            role='super_admin',
+            is_active=True
+        )
+        user.password = 'Password123!'
+        db.session.add(user)
+        db.session.flush()
+        for i in range(3):
+            db.session.add(Document(title=f'Doc {i}', file_path='x.pdf', file_type='pdf',
+                                    file_size=i, upload_by=user.id))
+        db.session.commit()
+        yield user
+
+
+class TestProjection:
+    """Test compiled projections."""
+
+    def test_matches_to_dict(self, test_app, uploader):
+        """Test the projection produces the same payload as to_dict once encoded."""
+        with test_app.app_context():
+            document = Document.query.filter_by(upload_by=uploader.id).first()
+
+            encoded = json.loads(test_app.json.dumps(DOCUMENT.dump(document)))
+
+            assert encoded == document.to_dict()
+
+    def test_column_projection_reads_rows(self, test_app, uploader):
+        """Test column-only projections are served from a column query."""
+        with test_app.app_context():
+            projection = DOCUMENT.only(['id', 'title'])
+            query = projection.apply(Document.query.filter_by(upload_by=uploader.id))
+
+            rows = query.order_by(Document.id).all()
+
+            assert not isinstance(rows[0], Document)
+            assert projection.dump_many(rows) == [
+                {'id': row.id, 'title': row.title} for row in rows
+            ]
+
+    def test_unknown_fields_are_rejected(self):
+        """Test asking for a field outside the projection raises."""
+        with pytest.raises(ValueError):
+            DOCUMENT.only(['id', 'password_hash'])
+
+    def test_exclude_drops_columns(self, test_app):
+        """Test excluded columns never appear in the output."""
+        with test_app.app_context():
+            assert 'password_hash' not in Projection(User, exclude=('password_hash',)).fields
+
+
+class TestSparseFieldsets:
+    """Test ?fields= on list endpoints."""
+
+    def test_documents_sparse_fields(self, test_app, uploader):
+        """Test the documents list returns only the requested keys."""
+        with test_app.app_context():
+            headers = {'Authorization': f'Bearer {create_access_token(identity=str(uploader.id))}'}
+        client = test_app.test_client()
+
+        response = client.get('/api/documents?fields=id,title,uploader_name', headers=headers)
+
+        assert response.status_code == 200
+        documents = response.get_json()['documents']
+        assert documents and all(set(d) == {'id', 'title', 'uploader_name'} for d in documents)
+        assert documents[0]['uploader_name'] == 'Ada Admin'
+
+        response = client.get('/api/documents?fields=id,nope', headers=headers)
+        assert response.status_code == 400
+
+
+class TestJSONProvider:
+    """Test the JSON provider."""
+
+    def test_encodes_dates_and_decimals(self, test_app):
+        """Test datetimes are ISO 8601 and decimals survive encoding."""
+        when = datetime(2026, 10, 18, 9, 30, 15, 250)
+
+        data = json.loads(test_app.json.dumps({'at': when, 'amount': Decimal('1.50'), 1: 'x'}))
+
+        assert data == {'at': when.isoformat(), 'amount': '1.50', '1': 'x'}
@@ -0,0 +1,193 @@
+"""Tests for storage service."""
+
+import io
+import os
+import hashlib
+
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from app.extensions import db
+from app.models import FileBlob, Beneficiary, Document
+from app.services import beneficiary_service
+from app.services.beneficiary_service import BeneficiaryService
+from app.services.image_service import image_service
+from app.services.storage_service import StorageService
+
+
+@pytest.fixture
+def storage(test_app, tmp_path):
+    """Create a storage service writing to a temporary folder."""
+    test_app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    service = StorageService(test_app)
+    with test_app.app_context():
+        yield service
+        db.session.rollback()
+
+
+def make_upload(content, filename='report.pdf'):
+    """Create an uploaded file object."""
+    return FileStorage(stream=io.BytesIO(content), filename=filename)
+
+
+def png_bytes():
+    """Encode a small PNG."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (40, 30), (0, 128, 255)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class TestStreamingWrites:
+    """Test chunked writes with size enforcement."""
+
+    def test_write_stream_enforces_limit(self, storage, tmp_path):
+        """Test oversized streams are rejected and removed."""
+        destination = str(tmp_path / 'out.bin')
+        written, error = storage.write_stream(io.BytesIO(b'x' * 100), destination, max_size=50)
+
+        assert error == 'File size too large'
+        assert not os.path.exists(destination)
+
+    def test_hash_stream_matches_sha256(self, storage, tmp_path):
+        """Test the streamed hash matches hashlib."""
+        content = os.urandom(storage.CHUNK_SIZE * 3 + 17)
+        result, error = storage.hash_stream(io.BytesIO(content), str(tmp_path / 'out.bin'), len(content))
+
+        assert error is None
+        assert result == (hashlib.sha256(content).hexdigest(), len(content))
+
+
+class TestContentAddressedStorage:
+    """Test deduplication and reference counting."""
+
+    def test_identical_uploads_share_blob(self, storage):
+        """Test the same content is stored once with two references."""
+        first, _ = storage.store_upload(make_upload(b'same content'))
+        second, _ = storage.store_upload(make_upload(b'same content', 'copy.pdf'))
+
+        assert first.id == second.id
+        assert second.ref_count == 2
+        assert FileBlob.query.filter_by(sha256=first.sha256).count() == 1
+
+    def test_release_blob_deletes_last_reference(self, storage):
+        """Test the file is removed once the release of the last reference commits."""
+        blob, _ = storage.store_upload(make_upload(b'unique content'))
+        storage.store_upload(make_upload(b'unique content'))
+        db.session.commit()
+        path = storage.blob_full_path(blob)
+
+        assert storage.release_blob(blob.sha256) is False
+        assert storage.release_blob(blob.sha256) is True
+        assert os.path.exists(path)
+        db.session.commit()
+        assert not os.path.exists(path)
+        assert FileBlob.query.filter_by(sha256=blob.sha256).first() is None
+
+    def test_release_blob_removes_image_variants(self, storage, tmp_path, monkeypatch):
+        """Test an image's cached variants are deleted with its last reference."""
+        monkeypatch.setattr(image_service, 'upload_folder', str(tmp_path))
+        monkeypatch.setattr(image_service, 'synchronous', True)
+        blob, _ = storage.store_upload(make_upload(png_bytes(), 'photo.png'), 'image')
+        db.session.commit()
+        image_service.schedule_variants(blob, ('avatar', 'thumbnail'))
+        variants = [image_service.variant_path(blob.sha256, variant) for variant in ('avatar', 'thumbnail')]
+        assert all(os.path.exists(path) for path in variants)
+
+        assert storage.release_blob(blob.sha256) is True
+        db.session.commit()
+        assert not any(os.path.exists(path) for path in variants)
+
+    def test_profile_picture_must_decode(self, storage):
+        """Test a file with an image extension that is not an image is not stored."""
+        url, error = storage.save_profile_picture(make_upload(b'not an image', 'avatar.png'), user_id=1)
+
+        assert (url, error) == (None, 'File is not a valid image')
+        assert FileBlob.query.filter_by(sha256=hashlib.sha256(b'not an image').hexdigest()).first() is None
+
+    def test_rollback_keeps_disk_and_database_in_step(self, storage):
+        """Test rolled back releases keep the file and rolled back uploads remove it."""
+        blob, _ = storage.store_upload(make_upload(b'kept content'))
+        db.session.commit()
+        path = storage.blob_full_path(blob)
+
+        assert storage.release_blob(blob.sha256) is True
+        db.session.rollback()
+        assert os.path.exists(path)
+        assert FileBlob.query.filter_by(sha256=blob.sha256).one().ref_count == 1
+
+        new_blob, _ = storage.store_upload(make_upload(b'discarded content'))
+        new_path = storage.blob_full_path(new_blob)
+        assert os.path.exists(new_path)
+        db.session.rollback()
+        assert not os.path.exists(new_path)
+
+    def test_content_stored_again_gets_its_own_file(self, storage):
+        """Test a blob re-created after deletion does not share the old file."""
+        blob, _ = storage.store_upload(make_upload(b'recycled content'))
+        db.session.commit()
+        old_path = storage.blob_full_path(blob)
+        storage.release_blob(blob.sha256)
+
+        again, _ = storage.store_upload(make_upload(b'recycled content'))
+        db.session.commit()
+        assert storage.blob_full_path(again) != old_path
+        assert os.path.exists(storage.blob_full_path(again))
+        assert not os.path.exists(old_path)
+
+    def test_deleting_beneficiary_releases_shared_blobs(self, storage, monkeypatch, make_tenant, make_user):
+        """Test a beneficiary's documents drop their references without deleting shared files."""
+        monkeypatch.setattr(beneficiary_service, 'storage_service', storage)
+        tenant = make_tenant()
+        user = make_user('student', tenant)
+        beneficiary = Beneficiary(user_id=user.id, tenant_id=tenant.id)
+        db.session.add(beneficiary)
+        db.session.flush()
+
+        blob, _ = storage.store_upload(make_upload(b'shared handout'))
+        storage.store_upload(make_upload(b'shared handout'))
+        for owner in (beneficiary.id, None):
+            db.session.add(Document(title='Handout', file_path=f'/uploads/{blob.storage_path}',
+                                    file_type='pdf', file_size=blob.size, content_hash=blob.sha256,
+                                    upload_by=user.id, beneficiary_id=owner))
+        db.session.commit()
+
+        assert BeneficiaryService.delete_beneficiary(beneficiary.id) is True
+        assert os.path.exists(storage.blob_full_path(blob))
+        assert FileBlob.query.filter_by(sha256=blob.sha256).one().ref_count == 1
+
+
+class TestChunkedUploads:
+    """Test resumable chunked uploads."""
+
+    @pytest.fixture
+    def uploader(self, storage, make_tenant, make_user):
+        """A user to own the uploads."""
+        user = make_user('trainer', make_tenant())
+        db.session.commit()
+        return user
+
+    def test_chunked_upload_round_trip(self, storage, uploader):
+        """Test chunks are appended in order and completed into a blob."""
+        content = b'0123456789' * 10
+        upload, error = storage.start_chunked_upload(uploader.id, 'big.pdf', len(content))
+        assert error is None
+
+        storage.append_chunk(upload, 0, io.BytesIO(content[:40]))
+        _, error = storage.append_chunk(upload, 0, io.BytesIO(content[40:]))
+        assert error == 'Offset mismatch, expected 40'
+
+        storage.append_chunk(upload, 40, io.BytesIO(content[40:]))
+        blob, error = storage.complete_chunked_upload(upload)
+
+        assert error is None
+        assert blob.sha256 == hashlib.sha256(content).hexdigest()
+        assert upload.status == 'completed'
+
+    def test_chunk_beyond_declared_size_is_rejected(self, storage, uploader):
+        """Test a chunk cannot grow the upload past its declared size."""
+        upload, _ = storage.start_chunked_upload(uploader.id, 'big.pdf', 10)
+        _, error = storage.append_chunk(upload, 0, io.BytesIO(b'x' * 11))
+
+        assert error == 'Chunk exceeds declared file size'
+        assert os.path.getsize(storage.upload_part_path(upload.id)) == 0
@@ -0,0 +1,138 @@
+"""Tests for denormalized tenant counters."""
+
+import uuid
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy.dialects import postgresql
+
+from app.extensions import db
+from app.models import TenantCounter, Beneficiary, Document, Program
+from app.services.tenant_counters import QuotaExceeded, TenantCounterService
+
+
+def counters(tenant_id):
+    """Current counter values of a tenant."""
+    counter = db.session.get(TenantCounter, tenant_id)
+    return {field: getattr(counter, field) for field in TenantCounterService.compute([tenant_id])[tenant_id]}
+
+
+class TestTenantCounters:
+    """Test counters follow inserts, updates and deletes."""
+
+    def test_counters_track_changes(self, test_app, make_tenant, make_user):
+        """Test counters match a full recount after each change."""
+        with test_app.app_context():
+            tenant = make_tenant()
+            db.session.commit()
+            tid = tenant.id
+            assert counters(tid)['user_count'] == 0
+
+            trainer = make_user('trainer', tenant)
+            student = make_user('student')
+            student.tenants.append(tenant)
+            db.session.commit()
+
+            beneficiary = Beneficiary(user_id=student.id, tenant_id=tid, trainer_id=trainer.id)
+            db.session.add(beneficiary)
+            db.session.add(Program(name='P', code=f'P-{uuid.uuid4().hex[:8]}', tenant_id=tid,
+                                   created_by_id=trainer.id))
+            db.session.commit()
+            db.session.add(Document(title='Doc', file_path='x.pdf', file_type='pdf', file_size=1500,
+                                    upload_by=trainer.id, beneficiary_id=beneficiary.id))
+            db.session.commit()
+
+            expected = TenantCounterService.compute([tid])[tid]
+            assert counters(tid) == expected
+            assert expected == {'user_count': 2, 'staff_count': 1, 'trainer_count': 1,
+                                'beneficiary_count': 1, 'active_beneficiary_count': 1,
+                                'program_count': 1, 'storage_bytes': 1500}
+
+            # Updates on expired instances still see the replaced value
+            student.role = 'trainer'
+            beneficiary.status = 'archived'
+            db.session.commit()
+            assert counters(tid) == TenantCounterService.compute([tid])[tid]
+            assert counters(tid)['trainer_count'] == 2
+            assert counters(tid)['active_beneficiary_count'] == 0
+
+            db.session.delete(Document.query.filter_by(beneficiary_id=beneficiary.id).one())
+            db.session.delete(beneficiary)
+            student.tenants.remove(tenant)
+            db.session.commit()
+            assert counters(tid) == TenantCounterService.compute([tid])[tid]
+            assert counters(tid)['user_count'] == 1
+            assert counters(tid)['storage_bytes'] == 0
+
+    def test_rollback_discards_deltas(self, test_app, make_tenant, make_user):
+        """Test a rolled back flush leaves the counters alone."""
+        with test_app.app_context():
+            tenant = make_tenant()
+            db.session.commit()
+            make_user('trainer', tenant)
+            db.session.flush()
+            db.session.rollback()
+            assert counters(tenant.id)['user_count'] == 0
+
+    def test_reconcile_repairs_drift(self, test_app, make_tenant, make_user):
+        """Test reconciliation rewrites counters changed behind the ORM's back."""
+        with test_app.app_context():
+            tenant = make_tenant()
+            db.session.commit()
+            make_user('trainer', tenant)
+            db.session.commit()
+            TenantCounter.query.filter_by(tenant_id=tenant.id).update({'user_count': 42})
+            db.session.commit()
+
+            assert TenantCounterService.reconcile([tenant.id]) == [tenant.id]
+            assert counters(tenant.id)['user_count'] == 1
+            assert TenantCounterService.reconcile([tenant.id]) == []
+
+
+class TestQuotas:
+    """Test plan limits are enforced from the counters."""
+
+    def test_beneficiary_quota(self, test_app, make_tenant, make_user):
+        """Test adding past max_beneficiaries raises."""
+        with test_app.app_context():
+            tenant = make_tenant(max_beneficiaries=1)
+            db.session.commit()
+            student = make_user('student', tenant)
+            db.session.flush()
+            TenantCounterService.check_quota(tenant.id, 'beneficiaries')
+            db.session.add(Beneficiary(user_id=student.id, tenant_id=tenant.id))
+            db.session.commit()
+
+            with pytest.raises(QuotaExceeded):
+                TenantCounterService.check_quota(tenant.id, 'beneficiaries')
+            db.session.rollback()
+
+    def test_lock_compiles_for_postgresql(self, test_app):
+        """Test only the counter row is locked, without an outer join."""
+        statement = TenantCounterService.locked_counter(1, 'staff_count')
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        assert 'FROM tenant_counters' in sql
+        assert 'JOIN' not in sql
+        assert sql.rstrip().endswith('FOR UPDATE')
+
+
+class TestTenantEndpoints:
+    """Test tenant endpoints read the counters."""
+
+    def test_list_uses_counters(self, test_app, make_tenant, make_user):
+        """Test the super admin list reports counts without loading members."""
+        with test_app.app_context():
+            tenant = make_tenant()
+            for _ in range(3):
+                make_user('student', tenant)
+            admin = make_user('super_admin')
+            db.session.commit()
+            tenant_id = tenant.id
+            token = create_access_token(identity=str(admin.id))
+
+        response = test_app.test_client().get('/api/tenants', headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200
+        row = next(t for t in response.get_json() if t['id'] == tenant_id)
+        assert row['user_count'] == 3
+        assert row['counters']['staff_count'] == 0
+        assert int(response.headers['X-Query-Count']) <= 5
@@ -0,0 +1,144 @@
+"""Tests for cached unread counters."""
+
+from datetime import datetime, timedelta
+
+from app.extensions import db
+from app.models.notification import Notification, MessageThread, ThreadParticipant, Message, ReadReceipt
+from app.services.notification_service import NotificationService
+from app.services.unread_counters import MemoryBackend, unread_counters
+
+
+class TestMemoryBackend:
+    """Test the process-local backend mirrors the Redis scripts."""
+
+    def test_increments_need_a_loaded_hash(self):
+        """Test increments on a missing hash are dropped and void loads counted before them."""
+        backend = MemoryBackend()
+        version = backend.version('k')
+        backend.incr('k', {'a': 1, '_total': 1})
+        assert backend.get('k') is None
+        backend.load('k', {'_total': 1, 'a': 1}, version)
+        assert backend.get('k') is None
+
+        version = backend.version('k')
+        backend.load('k', {'_total': 2, 'a': 2}, version)
+        backend.load('k', {'_total': 9}, version)
+        backend.incr('k', {'a': -5, '_total': -1})
+        assert backend.get('k') == {'_total': 1, 'a': 0}
+
+    def test_clear(self):
+        """Test clearing one field adjusts the total."""
+        backend = MemoryBackend()
+        backend.load('k', {'_total': 3, 'a': 2, 'b': 1}, backend.version('k'))
+        backend.clear('k', 'a')
+        assert backend.get('k') == {'_total': 1, 'a': 0, 'b': 1}
+        backend.clear('k')
+        assert backend.get('k') == {'_total': 0}
+
+
+class TestNotificationCounters:
+    """Test counters follow the notification service."""
+
+    def test_lifecycle(self, test_app, make_user):
+        """Test create, read, delete and mark-all keep the counts exact."""
+        with test_app.app_context():
+            user_id = make_user('student').id
+            db.session.commit()
+            assert NotificationService.get_unread_count(user_id) == 0
+
+            first = NotificationService.create_notification(user_id, 'message', 'T', 'M')
+            NotificationService.create_notification(user_id, 'message', 'T', 'M')
+            third = NotificationService.create_notification(user_id, 'system', 'T', 'M')
+            assert unread_counters.notification_counts(user_id) == {
+                'total': 3, 'by_type': {'message': 2, 'system': 1}}
+
+            NotificationService.mark_as_read(first.id, user_id)
+            NotificationService.mark_as_read(first.id, user_id)
+            NotificationService.delete_notification(third.id, user_id)
+            assert NotificationService.get_unread_count(user_id) == 1
+            assert NotificationService.get_unread_count(user_id, type='system') == 0
+
+            NotificationService.mark_all_as_read(user_id, type='message')
+            assert NotificationService.get_unread_count(user_id) == 0
+
+    def test_reconcile_repairs_drift(self, test_app, make_user):
+        """Test rows written behind the service's back are picked up."""
+        with test_app.app_context():
+            user_id = make_user('student').id
+            db.session.commit()
+            assert NotificationService.get_unread_count(user_id) == 0
+            NotificationService.create_notification(user_id, 'system', 'T', 'M')
+            db.session.add(Notification(user_id=user_id, type='system', title='T', message='M'))
+            db.session.commit()
+            assert NotificationService.get_unread_count(user_id) == 1
+
+            assert unread_counters.reconcile([user_id]) == [user_id]
+            assert NotificationService.get_unread_count(user_id) == 2
+            assert unread_counters.reconcile([user_id]) == []
+
+
+    def test_write_during_load_is_not_lost(self, test_app, monkeypatch, make_user):
+        """Test a notification committed while a miss is being counted voids that load."""
+        with test_app.app_context():
+            user_id = make_user('student').id
+            db.session.commit()
+            count = unread_counters._notification_counts_from_db
+
+            def count_then_notify(user_ids):
+                counts = count(user_ids)
+                monkeypatch.setattr(unread_counters, '_notification_counts_from_db', count)
+                NotificationService.create_notification(user_id, 'system', 'T', 'M')
+                return counts
+
+            monkeypatch.setattr(unread_counters, '_notification_counts_from_db', count_then_notify)
+            assert NotificationService.get_unread_count(user_id) == 0
+            assert NotificationService.get_unread_count(user_id) == 1
+
+    def test_reconcile_is_scheduled(self, test_app, make_user):
+        """Test the scheduler job reconciles once per interval."""
+        from app.services.scheduler import scheduler
+
+        with test_app.app_context():
+            user_id = make_user('student').id
+            db.session.commit()
+            assert NotificationService.get_unread_count(user_id) == 0
+            db.session.add(Notification(user_id=user_id, type='system', title='T', message='M'))
+            db.session.commit()
+
+            now = datetime.utcnow()
+            assert scheduler.jobs['unread-counters'] == unread_counters.reconcile_due
+            unread_counters._next_reconcile = None
+            assert user_id in unread_counters.reconcile_due(now)
+            db.session.add(Notification(user_id=user_id, type='system', title='T', message='M'))
+            db.session.commit()
+            assert unread_counters.reconcile_due(now + timedelta(seconds=60)) == []
+            interval = test_app.config['UNREAD_COUNTERS_RECONCILE_INTERVAL']
+            assert unread_counters.reconcile_due(now + timedelta(seconds=interval)) == [user_id]
+
+
+class TestThreadCounters:
+    """Test per-thread message counters."""
+
+    def test_counts_messages_without_receipts(self, test_app, make_user):
+        """Test loading from the database and adjusting on post and read."""
+        with test_app.app_context():
+            alice, bob = make_user('student'), make_user('student')
+            db.session.commit()
+            thread = MessageThread(subject='Hi')
+            db.session.add(thread)
+            db.session.flush()
+            for user in (alice, bob):
+                db.session.add(ThreadParticipant(thread_id=thread.id, user_id=user.id))
+            messages = [Message(thread_id=thread.id, sender_id=alice.id, content='x') for _ in range(3)]
+            db.session.add_all(messages)
+            db.session.add(Message(thread_id=thread.id, sender_id=bob.id, content='own'))
+            db.session.flush()
+            db.session.add(ReadReceipt(message_id=messages[0].id, user_id=bob.id))
+            db.session.commit()
+
+            assert unread_counters.thread_counts(bob.id) == {'total': 2, 'threads': {thread.id: 2}}
+            assert unread_counters.thread_counts(alice.id)['total'] == 1
+
+            unread_counters.message_posted(thread.id, [bob.id])
+            unread_counters.thread_read(bob.id, thread.id, 3)
+            assert unread_counters.thread_counts(bob.id) == {'total': 0, 'threads': {}}